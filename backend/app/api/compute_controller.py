@@ -10,6 +10,7 @@ import logging
 
 from core.models import PromptLab
 from app.services.compute_optimizer import ComputeOptimizer
+from app.services.llm_usage import get_prompt_lab_usage
 
 logger = logging.getLogger(__name__)
 
@@ -77,17 +78,28 @@ class PromptLabComputeCostView(APIView):
             # Should we continue?
             optimization_decision = optimizer.should_continue_optimization(prompt_lab)
             
-            # Historical costs (simplified - in production, track actual costs)
-            historical_costs = {
-                'total_iterations': prompt_lab.optimization_iterations,
-                'estimated_total_cost': prompt_lab.optimization_iterations * cost_estimate['total_cost'],
-                'average_cost_per_iteration': cost_estimate['total_cost']
-            }
+            # Historical costs from recorded LLM usage, estimated when none was recorded
+            measured_usage = get_prompt_lab_usage(prompt_lab)
+            if measured_usage['calls']:
+                historical_costs = {
+                    'total_iterations': prompt_lab.optimization_iterations,
+                    'total_cost': measured_usage['total_cost_usd'],
+                    'average_cost_per_iteration': measured_usage['avg_cost_per_optimization_run'],
+                    'source': 'measured'
+                }
+            else:
+                historical_costs = {
+                    'total_iterations': prompt_lab.optimization_iterations,
+                    'estimated_total_cost': prompt_lab.optimization_iterations * cost_estimate['total_cost'],
+                    'average_cost_per_iteration': cost_estimate['total_cost'],
+                    'source': 'estimated'
+                }
             
             response_data = {
                 'prompt_lab_id': str(prompt_lab.id),
                 'next_iteration_cost': cost_estimate,
                 'historical_costs': historical_costs,
+                'measured_usage': measured_usage,
                 'optimization_recommendation': optimization_decision,
                 'cost_saving_tips': self._get_cost_saving_tips(prompt_lab, optimization_decision)
             }
@@ -1,6 +1,11 @@
 """
 Dashboard API Controller for real-time learning progress monitoring
 Provides comprehensive metrics and status visualization for the optimization system
+
+Metrics are computed with GROUP BY / conditional Count aggregates, so each
+request runs a fixed number of queries however much history there is. Period
+totals and daily series sum the daily metrics rollups (whole days, from the
+first day of the period) instead of scanning raw feedback and runs.
 """
 
 from django.http import JsonResponse
@@ -8,7 +13,8 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.db.models import Avg, Count, Q
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, ExtractHour, Left, Length
 from django.utils import timezone
 from datetime import datetime, timedelta
 import json
@@ -16,18 +22,35 @@ import logging
 from typing import Dict, Any, List
 
 from app.services.background_scheduler import get_optimization_status
+from app.services.feedback_trigger_counters import bucket_start
+from app.services.metrics_rollups import rollup_day, rollup_sums, rollups
+from app.services.response_cache import cached_response
 from core.models import (
     SystemPrompt, UserFeedback, Email, Draft, OptimizationRun, 
-    EvaluationSnapshot
+    EvaluationSnapshot, FeedbackTriggerCounter
 )
 
 logger = logging.getLogger(__name__)
 
+FEEDBACK_ACTIONS = ('accept', 'reject', 'edit', 'ignore')
+
+
+def _action_counts(totals: Dict[str, Any]) -> Dict[str, int]:
+    """Per-action feedback counts from summed rollup fields"""
+    return {action: totals[f'{action}_count'] for action in FEEDBACK_ACTIONS}
+
+
+def _count_subquery(queryset) -> Coalesce:
+    """Row count of a correlated queryset as an annotation (0 when empty)"""
+    counted = queryset.order_by().annotate(group=Value(1)).values('group').annotate(count=Count('id')).values('count')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
 
 @method_decorator(csrf_exempt, name='dispatch')
 class DashboardOverviewView(View):
     """Main dashboard overview with key metrics"""
     
+    @cached_response(lab_scoped=False)
     async def get(self, request):
         """Get dashboard overview data"""
         try:
@@ -97,16 +120,17 @@ class DashboardOverviewView(View):
         """Get performance metrics over time"""
         
         # Performance trend over time
-        prompt_versions = []
-        async for prompt in SystemPrompt.objects.filter(
-            created_at__gte=since
-        ).order_by('created_at'):
-            prompt_versions.append({
-                'version': prompt.version,
-                'score': prompt.performance_score,
-                'created_at': prompt.created_at.isoformat(),
-                'is_active': prompt.is_active
-            })
+        prompt_versions = [
+            {
+                'version': prompt['version'],
+                'score': prompt['performance_score'],
+                'created_at': prompt['created_at'].isoformat(),
+                'is_active': prompt['is_active']
+            }
+            async for prompt in SystemPrompt.objects.filter(
+                created_at__gte=since
+            ).order_by('created_at').values('version', 'performance_score', 'created_at', 'is_active')
+        ]
         
         # Calculate performance improvement
         if len(prompt_versions) >= 2:
@@ -130,9 +154,10 @@ class DashboardOverviewView(View):
     async def _calculate_feedback_quality(self, since: datetime) -> Dict[str, Any]:
         """Calculate feedback quality metrics"""
         
-        total_feedback = await UserFeedback.objects.filter(
-            created_at__gte=since
-        ).acount()
+        # Total and per-action counts from the period's rollups
+        totals = await rollups(rollup_day(since)).aaggregate(**rollup_sums())
+        action_counts = _action_counts(totals)
+        total_feedback = totals['feedback_count']
         
         if total_feedback == 0:
             return {
@@ -142,11 +167,6 @@ class DashboardOverviewView(View):
                 'edit_rate': 0.0
             }
         
-        # Count by action type
-        action_counts = {}
-        async for feedback in UserFeedback.objects.filter(created_at__gte=since):
-            action_counts[feedback.action] = action_counts.get(feedback.action, 0) + 1
-        
         return {
             'total_feedback': total_feedback,
             'acceptance_rate': round((action_counts.get('accept', 0) / total_feedback) * 100, 1),
@@ -158,38 +178,36 @@ class DashboardOverviewView(View):
     async def _get_optimization_activity(self, since: datetime) -> Dict[str, Any]:
         """Get optimization activity metrics"""
         
-        optimizations = []
-        total_runs = 0
-        successful_runs = 0
-        total_improvement = 0.0
-        
-        async for opt_run in OptimizationRun.objects.filter(
-            started_at__gte=since
-        ).select_related('old_prompt', 'new_prompt').order_by('-started_at'):
-            
-            total_runs += 1
-            if opt_run.status == 'completed' and opt_run.new_prompt:
-                successful_runs += 1
-                if opt_run.performance_improvement:
-                    total_improvement += opt_run.performance_improvement
-            
-            optimizations.append({
-                'id': opt_run.id,
-                'old_version': opt_run.old_prompt.version,
-                'new_version': opt_run.new_prompt.version if opt_run.new_prompt else None,
-                'status': opt_run.status,
-                'improvement': opt_run.performance_improvement,
-                'feedback_count': opt_run.feedback_count,
-                'started_at': opt_run.started_at.isoformat(),
-                'completed_at': opt_run.completed_at.isoformat() if opt_run.completed_at else None,
-                'error_message': opt_run.error_message
-            })
-        
+        totals = await rollups(rollup_day(since)).aaggregate(**rollup_sums())
+        
+        # Only the runs shown are loaded
+        runs = OptimizationRun.objects.filter(started_at__gte=since)
+        optimizations = [
+            {
+                'id': opt_run['id'],
+                'old_version': opt_run['old_prompt__version'],
+                'new_version': opt_run['new_prompt__version'],
+                'status': opt_run['status'],
+                'improvement': opt_run['performance_improvement'],
+                'feedback_count': opt_run['feedback_count'],
+                'started_at': opt_run['started_at'].isoformat(),
+                'completed_at': opt_run['completed_at'].isoformat() if opt_run['completed_at'] else None,
+                'error_message': opt_run['error_message']
+            }
+            async for opt_run in runs.order_by('-started_at').values(
+                'id', 'old_prompt__version', 'new_prompt__version', 'status', 'performance_improvement',
+                'feedback_count', 'started_at', 'completed_at', 'error_message'
+            )[:10]
+        ]
+        
+        total_runs = totals['optimization_count']
+        successful_runs = totals['optimization_success_count']
+        total_improvement = totals['improvement_sum']
         success_rate = (successful_runs / total_runs * 100) if total_runs > 0 else 0
         avg_improvement = (total_improvement / successful_runs) if successful_runs > 0 else 0
         
         return {
-            'recent_optimizations': optimizations[:10],  # Last 10
+            'recent_optimizations': optimizations,  # Last 10
             'total_runs': total_runs,
             'successful_runs': successful_runs,
             'success_rate': round(success_rate, 1),
@@ -199,31 +217,17 @@ class DashboardOverviewView(View):
     async def _get_feedback_trends(self, since: datetime) -> Dict[str, Any]:
         """Get feedback trends over time"""
         
-        # Group feedback by day
-        daily_feedback = {}
-        
-        async for feedback in UserFeedback.objects.filter(
-            created_at__gte=since
-        ).order_by('created_at'):
-            
-            day_key = feedback.created_at.date().isoformat()
-            if day_key not in daily_feedback:
-                daily_feedback[day_key] = {
-                    'total': 0,
-                    'accept': 0,
-                    'reject': 0,
-                    'edit': 0,
-                    'ignore': 0
-                }
-            
-            daily_feedback[day_key]['total'] += 1
-            daily_feedback[day_key][feedback.action] += 1
+        # Sum each day's rollups (one row per lab and scenario)
+        daily_rows = rollups(rollup_day(since)).values('day').annotate(**rollup_sums()).filter(
+            feedback_count__gt=0
+        ).order_by('day')
         
         # Convert to time series
         trend_data = []
-        for date_str, counts in sorted(daily_feedback.items()):
+        async for row in daily_rows:
+            counts = {'total': row['feedback_count'], **_action_counts(row)}
             trend_data.append({
-                'date': date_str,
+                'date': row['day'].isoformat(),
                 'total_feedback': counts['total'],
                 'acceptance_rate': round((counts['accept'] / counts['total']) * 100, 1),
                 'rejection_rate': round((counts['reject'] / counts['total']) * 100, 1),
@@ -238,15 +242,20 @@ class DashboardOverviewView(View):
     async def _get_prompt_evolution(self) -> Dict[str, Any]:
         """Get prompt evolution timeline"""
         
-        evolution = []
-        async for prompt in SystemPrompt.objects.all().order_by('version'):
-            evolution.append({
-                'version': prompt.version,
-                'performance_score': prompt.performance_score,
-                'created_at': prompt.created_at.isoformat(),
-                'is_active': prompt.is_active,
-                'content_preview': prompt.content[:100] + "..." if len(prompt.content) > 100 else prompt.content
-            })
+        # Previews are cut in SQL so full prompt contents are never loaded
+        evolution = [
+            {
+                'version': prompt['version'],
+                'performance_score': prompt['performance_score'],
+                'created_at': prompt['created_at'].isoformat(),
+                'is_active': prompt['is_active'],
+                'content_preview': prompt['preview'] + "..." if prompt['content_length'] > 100 else prompt['preview']
+            }
+            async for prompt in SystemPrompt.objects.order_by('version').values(
+                'version', 'performance_score', 'created_at', 'is_active',
+                preview=Left('content', 100), content_length=Length('content')
+            )
+        ]
         
         return {
             'evolution_timeline': evolution,
@@ -263,15 +272,18 @@ class DashboardOverviewView(View):
         last_hour = now - timedelta(hours=1)
         recent_emails = await Email.objects.filter(created_at__gte=last_hour).acount()
         recent_drafts = await Draft.objects.filter(created_at__gte=last_hour).acount()
-        recent_feedback = await UserFeedback.objects.filter(created_at__gte=last_hour).acount()
         
         # System health indicators
         active_prompt_exists = await SystemPrompt.objects.filter(is_active=True).aexists()
         
-        # Learning velocity (feedback per hour over last 24h)
+        # Last hour and learning velocity (feedback per hour over last 24h) in one query
         last_24h = now - timedelta(hours=24)
-        feedback_24h = await UserFeedback.objects.filter(created_at__gte=last_24h).acount()
-        learning_velocity = round(feedback_24h / 24, 1)
+        feedback = await UserFeedback.objects.filter(created_at__gte=last_24h).aaggregate(
+            last_hour=Count('id', filter=Q(created_at__gte=last_hour)),
+            last_24h=Count('id')
+        )
+        recent_feedback = feedback['last_hour']
+        learning_velocity = round(feedback['last_24h'] / 24, 1)
         
         return {
             'last_updated': now.isoformat(),
@@ -292,6 +304,7 @@ class DashboardOverviewView(View):
 class LearningMetricsView(View):
     """Detailed learning metrics and analytics"""
     
+    @cached_response(lab_scoped=False)
     async def get(self, request):
         """Get detailed learning analytics"""
         try:
@@ -323,21 +336,13 @@ class LearningMetricsView(View):
     async def _calculate_learning_efficiency(self, since: datetime) -> Dict[str, Any]:
         """Calculate learning efficiency metrics"""
         
-        # Count optimizations and their outcomes
-        total_optimizations = await OptimizationRun.objects.filter(
-            started_at__gte=since
-        ).acount()
-        
-        successful_optimizations = await OptimizationRun.objects.filter(
-            started_at__gte=since,
-            status='completed',
-            new_prompt__isnull=False
-        ).acount()
+        # Optimizations, their outcomes and feedback volume in one rollup query
+        totals = await rollups(rollup_day(since)).aaggregate(**rollup_sums())
+        total_optimizations = totals['optimization_count']
+        successful_optimizations = totals['optimization_success_count']
+        total_feedback = totals['feedback_count']
         
         # Calculate feedback-to-optimization ratio
-        total_feedback = await UserFeedback.objects.filter(
-            created_at__gte=since
-        ).acount()
         
         efficiency_ratio = (successful_optimizations / total_feedback) if total_feedback > 0 else 0
         
@@ -352,35 +357,26 @@ class LearningMetricsView(View):
     async def _analyze_feedback_patterns(self, since: datetime) -> Dict[str, Any]:
         """Analyze feedback patterns for insights"""
         
-        feedback_by_scenario = {}
-        feedback_by_hour = {}
-        
-        async for feedback in UserFeedback.objects.filter(
-            created_at__gte=since
-        ).select_related('draft__email'):
-            
-            # Group by scenario type
-            scenario = feedback.draft.email.scenario_type
-            if scenario not in feedback_by_scenario:
-                feedback_by_scenario[scenario] = {'total': 0, 'accept': 0, 'reject': 0, 'edit': 0}
-            
-            feedback_by_scenario[scenario]['total'] += 1
-            feedback_by_scenario[scenario][feedback.action] += 1
-            
-            # Group by hour of day
-            hour = feedback.created_at.hour
-            if hour not in feedback_by_hour:
-                feedback_by_hour[hour] = 0
-            feedback_by_hour[hour] += 1
-        
-        # Calculate acceptance rates by scenario
+        # Acceptance rates by scenario type
         scenario_performance = {}
-        for scenario, counts in feedback_by_scenario.items():
-            scenario_performance[scenario] = {
-                'total_feedback': counts['total'],
-                'acceptance_rate': round((counts['accept'] / counts['total']) * 100, 1) if counts['total'] > 0 else 0
+        async for row in rollups(rollup_day(since)).values('scenario_type').annotate(**rollup_sums()).filter(
+            feedback_count__gt=0
+        ).order_by('scenario_type'):
+            scenario_performance[row['scenario_type']] = {
+                'total_feedback': row['feedback_count'],
+                'acceptance_rate': round((row['accept_count'] / row['feedback_count']) * 100, 1)
             }
         
+        # Feedback volume by hour of day, from the hourly trigger counter buckets
+        feedback_by_hour = {
+            row['hour']: row['total']
+            async for row in FeedbackTriggerCounter.objects.filter(
+                bucket_start__gte=bucket_start(since)
+            ).annotate(hour=ExtractHour('bucket_start')).values('hour').annotate(
+                total=Sum('feedback_count')
+            ).order_by('hour')
+        }
+        
         return {
             'feedback_by_scenario': scenario_performance,
             'feedback_by_hour': feedback_by_hour,
@@ -390,33 +386,36 @@ class LearningMetricsView(View):
     async def _analyze_optimization_impact(self, since: datetime) -> Dict[str, Any]:
         """Analyze the impact of optimizations"""
         
-        impact_data = []
-        
-        async for opt_run in OptimizationRun.objects.filter(
+        # Feedback before/after each optimization as correlated count subqueries
+        runs = OptimizationRun.objects.filter(
             started_at__gte=since,
             status='completed',
             new_prompt__isnull=False
-        ).select_related('old_prompt', 'new_prompt'):
-            
-            # Get feedback before and after optimization
-            before_feedback = await UserFeedback.objects.filter(
-                draft__system_prompt=opt_run.old_prompt,
-                created_at__lt=opt_run.completed_at
-            ).acount()
-            
-            after_feedback = await UserFeedback.objects.filter(
-                draft__system_prompt=opt_run.new_prompt,
-                created_at__gte=opt_run.completed_at
-            ).acount()
-            
-            impact_data.append({
-                'optimization_id': opt_run.id,
-                'version_change': f"v{opt_run.old_prompt.version} → v{opt_run.new_prompt.version}",
-                'performance_improvement': opt_run.performance_improvement,
-                'feedback_before': before_feedback,
-                'feedback_after': after_feedback,
-                'completed_at': opt_run.completed_at.isoformat()
-            })
+        ).annotate(
+            feedback_before=_count_subquery(UserFeedback.objects.filter(
+                draft__system_prompt=OuterRef('old_prompt'),
+                created_at__lt=OuterRef('completed_at')
+            )),
+            feedback_after=_count_subquery(UserFeedback.objects.filter(
+                draft__system_prompt=OuterRef('new_prompt'),
+                created_at__gte=OuterRef('completed_at')
+            ))
+        ).values(
+            'id', 'old_prompt__version', 'new_prompt__version', 'performance_improvement',
+            'completed_at', 'feedback_before', 'feedback_after'
+        )
+        
+        impact_data = [
+            {
+                'optimization_id': opt_run['id'],
+                'version_change': f"v{opt_run['old_prompt__version']} → v{opt_run['new_prompt__version']}",
+                'performance_improvement': opt_run['performance_improvement'],
+                'feedback_before': opt_run['feedback_before'],
+                'feedback_after': opt_run['feedback_after'],
+                'completed_at': opt_run['completed_at'].isoformat()
+            }
+            async for opt_run in runs
+        ]
         
         return {
             'optimization_impacts': impact_data,
@@ -429,29 +428,22 @@ class LearningMetricsView(View):
         # This is a simplified correlation analysis
         # In a real system, you'd use statistical libraries
         
-        daily_metrics = {}
+        # Daily totals from the rollups; days without feedback are filled in below
+        daily_counts = {
+            row['day']: {'total': row['feedback_count'], 'accepted': row['accept_count']}
+            async for row in rollups(rollup_day(since)).values('day').annotate(**rollup_sums()).order_by('day')
+        }
         
-        # Collect daily metrics
-        current_date = since.date()
-        end_date = timezone.now().date()
+        daily_metrics = {}
+        current_date = rollup_day(since)
+        end_date = rollup_day(timezone.now())
         
         while current_date <= end_date:
-            day_start = timezone.make_aware(datetime.combine(current_date, datetime.min.time()))
-            day_end = day_start + timedelta(days=1)
-            
-            daily_feedback = await UserFeedback.objects.filter(
-                created_at__range=(day_start, day_end)
-            ).acount()
-            
-            daily_acceptance = await UserFeedback.objects.filter(
-                created_at__range=(day_start, day_end),
-                action='accept'
-            ).acount()
-            
-            acceptance_rate = (daily_acceptance / daily_feedback * 100) if daily_feedback > 0 else 0
+            counts = daily_counts.get(current_date, {'total': 0, 'accepted': 0})
+            acceptance_rate = (counts['accepted'] / counts['total'] * 100) if counts['total'] > 0 else 0
             
             daily_metrics[current_date.isoformat()] = {
-                'total_feedback': daily_feedback,
+                'total_feedback': counts['total'],
                 'acceptance_rate': acceptance_rate
             }
             
@@ -18,6 +18,7 @@ from core.models import PromptLab, EvaluationDataset, EvaluationCase, SystemProm
 from app.services.evaluation_case_generator import EvaluationCaseGenerator
 from app.services.evaluation_dataset_migrator import EvaluationDatasetMigrator
 from app.services.draft_case_manager import DraftCaseManager
+from app.services.response_cache import cached_response
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -28,6 +29,7 @@ class EvaluationDatasetListView(View):
     POST /api/evaluations/datasets/
     """
     
+    @cached_response()
     def get(self, request):
         """List datasets (global and session-scoped) with optional parameter filtering"""
         prompt_lab_id = request.GET.get('prompt_lab_id')
@@ -1129,6 +1131,98 @@ class EvaluationRunDetailView(View):
             return JsonResponse({'error': f'Failed to delete evaluation run: {str(e)}'}, status=500)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class EvaluationRunCancelView(View):
+    """
+    Cancel a pending or running evaluation run
+    POST /api/evaluations/runs/<run_id>/cancel/
+    """
+    
+    def post(self, request, run_id):
+        """Stop the run's case loop and in-flight LLM call; finished cases are kept"""
+        from core.models import EvaluationRun
+        from app.services.run_cancellation import cancel_run
+        from app.services.run_leases import evaluation_run_resource, revoke
+        
+        run = get_object_or_404(EvaluationRun, id=run_id)
+        try:
+            if run.status not in ['pending', 'running']:
+                return JsonResponse({'error': f'Cannot cancel evaluation run with status: {run.status}'}, status=400)
+            
+            resource = evaluation_run_resource(run.id)
+            stopped = cancel_run(resource, 'Evaluation cancelled by user')
+            if not stopped:
+                # Running in another process (its heartbeat will notice), or never started
+                revoke(resource)
+                EvaluationRun.objects.filter(id=run.id, status__in=['pending', 'running']).update(
+                    status='cancelled', completed_at=timezone.now()
+                )
+            
+            return JsonResponse({
+                'message': 'Evaluation run cancelled',
+                'run_id': run.id,
+                'stopped_in_process': stopped
+            })
+            
+        except Exception as e:
+            return JsonResponse({'error': f'Failed to cancel evaluation run: {str(e)}'}, status=500)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class EvaluationRunResumeView(View):
+    """
+    Resume a failed or cancelled evaluation run
+    POST /api/evaluations/runs/<run_id>/resume/
+    """
+    
+    def post(self, request, run_id):
+        """Re-execute the run in the background; cases it already scored are kept"""
+        from core.models import EvaluationRun
+        
+        run = get_object_or_404(EvaluationRun, id=run_id)
+        try:
+            if run.status not in ['failed', 'cancelled']:
+                return JsonResponse({'error': f'Cannot resume evaluation run with status: {run.status}'}, status=400)
+            
+            from app.services.evaluation_engine import EvaluationEngine
+            from app.services.unified_llm_provider import LLMProviderFactory, LLMConfig
+            from app.services.reward_aggregator import RewardFunctionAggregator
+            
+            llm_provider = LLMProviderFactory.create_provider(LLMConfig(
+                provider="mock", model="test-model"
+            ))
+            engine = EvaluationEngine(llm_provider, RewardFunctionAggregator(llm_provider))
+            
+            completed_cases = run.results.exclude(details__has_key='error').count()
+            run.status = 'pending'
+            run.completed_at = None
+            run.save(update_fields=['status', 'completed_at'])
+            
+            import threading
+            def resume_evaluation_background():
+                try:
+                    engine.execute_evaluation_run(run)
+                except Exception as e:
+                    import logging
+                    logger = logging.getLogger(__name__)
+                    logger.error(f"Background evaluation resume failed: {str(e)}")
+                    run.status = 'failed'
+                    run.completed_at = timezone.now()
+                    run.save()
+            
+            thread = threading.Thread(target=resume_evaluation_background)
+            thread.start()
+            
+            return JsonResponse({
+                'run_id': run.id,
+                'status': 'pending',
+                'completed_cases': completed_cases
+            }, status=202)
+            
+        except Exception as e:
+            return JsonResponse({'error': f'Failed to resume evaluation run: {str(e)}'}, status=500)
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class EvaluationRunResultsView(View):
     """
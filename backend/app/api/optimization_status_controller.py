@@ -19,6 +19,7 @@ from app.services.background_scheduler import (
     get_optimization_status, BackgroundOptimizationScheduler
 )
 from app.services.optimization_orchestrator import OptimizationTrigger
+from app.services.optimization_queue import get_optimization_queue
 from app.services.unified_llm_provider import LLMConfig
 import os
 import time
@@ -244,6 +245,21 @@ class OptimizationHistoryView(View):
             }, status=500)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class OptimizationQueueView(View):
+    """Optimization queue depth, running slots and wait times"""
+    
+    def get(self, request):
+        try:
+            return JsonResponse(get_optimization_queue().status())
+        except Exception as e:
+            logger.error(f"Error getting optimization queue status: {e}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class FastOptimizationView(View):
     """Fast optimization endpoint for immediate improvements"""
@@ -10,6 +10,7 @@ import uuid
 
 from core.models import PromptLab, SystemPrompt, UserPreference, Email, Draft, DraftReason, ReasonRating, UserFeedback, PromptLabConfidence, ExtractedPreference
 from core.serializers import PromptLabSerializer
+from app.services.response_cache import cached_response
 
 logger = logging.getLogger(__name__)
 
@@ -150,63 +151,45 @@ class PromptLabDetailView(PromptLabAPIView):
         drafts = Draft.objects.filter(email__prompt_lab=prompt_lab)
         
         # Get all reasons associated with these drafts
-        all_reasons = DraftReason.objects.filter(drafts__in=drafts).distinct()
-        total_reasons_generated = all_reasons.count()
-        
-        # Get all reason ratings for these drafts
-        all_ratings = ReasonRating.objects.filter(
-            feedback__draft__in=drafts
+        total_reasons_generated = DraftReason.objects.filter(drafts__in=drafts).distinct().count()
+        
+        # Rating breakdown for these drafts in one query
+        all_ratings = ReasonRating.objects.filter(feedback__draft__email__prompt_lab=prompt_lab)
+        breakdown = all_ratings.aggregate(
+            total=models.Count('id'),
+            liked_total=models.Count('id', filter=models.Q(liked=True)),
+            disliked_total=models.Count('id', filter=models.Q(liked=False))
         )
-        total_reason_ratings = all_ratings.count()
-        
-        # Calculate rating breakdown
-        liked_count = all_ratings.filter(liked=True).count()
-        disliked_count = all_ratings.filter(liked=False).count()
-        
-        # Get most and least liked reasons with aggregated stats
-        reason_stats = {}
-        for rating in all_ratings:
-            reason_id = rating.reason.id
-            if reason_id not in reason_stats:
-                reason_stats[reason_id] = {
-                    'reason': rating.reason,
-                    'likes': 0,
-                    'dislikes': 0
-                }
-            
-            if rating.liked:
-                reason_stats[reason_id]['likes'] += 1
-            else:
-                reason_stats[reason_id]['dislikes'] += 1
+        total_reason_ratings = breakdown['total']
+        liked_count = breakdown['liked_total']
+        disliked_count = breakdown['disliked_total']
+        
+        # Likes and dislikes per reason, grouped in SQL
+        reason_stats = [
+            {
+                'text': row['reason__text'],
+                'confidence': row['reason__confidence'],
+                'like_count': row['like_count'],
+                'dislike_count': row['dislike_count']
+            }
+            for row in all_ratings.order_by('reason_id').values(
+                'reason_id', 'reason__text', 'reason__confidence'
+            ).annotate(
+                like_count=models.Count('id', filter=models.Q(liked=True)),
+                dislike_count=models.Count('id', filter=models.Q(liked=False))
+            )
+        ]
         
         # Sort by likes for most liked
         most_liked_reasons = sorted(
-            [
-                {
-                    'text': stats['reason'].text,
-                    'confidence': stats['reason'].confidence,
-                    'like_count': stats['likes'],
-                    'dislike_count': stats['dislikes']
-                }
-                for stats in reason_stats.values()
-                if stats['likes'] > 0
-            ],
+            [stats for stats in reason_stats if stats['like_count'] > 0],
             key=lambda x: x['like_count'],
             reverse=True
         )
         
         # Sort by dislikes for least liked
         least_liked_reasons = sorted(
-            [
-                {
-                    'text': stats['reason'].text,
-                    'confidence': stats['reason'].confidence,
-                    'like_count': stats['likes'],
-                    'dislike_count': stats['dislikes']
-                }
-                for stats in reason_stats.values()
-                if stats['dislikes'] > 0
-            ],
+            [stats for stats in reason_stats if stats['dislike_count'] > 0],
             key=lambda x: x['dislike_count'],
             reverse=True
         )
@@ -471,6 +454,7 @@ class PromptLabDuplicateView(PromptLabAPIView):
 class PromptLabStatsView(PromptLabAPIView):
     """Get prompt lab statistics and metrics"""
     
+    @cached_response()
     def get(self, request, prompt_lab_id):
         """Get detailed prompt lab statistics"""
         prompt_lab = get_object_or_404(PromptLab, id=prompt_lab_id, is_active=True)
@@ -480,24 +464,21 @@ class PromptLabStatsView(PromptLabAPIView):
             prompts_count = prompt_lab.prompts.count()
             active_prompt = prompt_lab.prompts.filter(is_active=True).first()
             
-            emails_count = prompt_lab.emails.count()
-            synthetic_emails_count = prompt_lab.emails.filter(is_synthetic=True).count()
-            
-            # Get draft and feedback statistics
-            total_drafts = 0
-            total_feedback = 0
-            feedback_by_action = {'accept': 0, 'reject': 0, 'edit': 0, 'ignore': 0}
-            
-            for email in prompt_lab.emails.all():
-                drafts = email.drafts.all()
-                total_drafts += drafts.count()
-                
-                for draft in drafts:
-                    feedback_items = draft.feedback.all()
-                    total_feedback += feedback_items.count()
-                    
-                    for feedback in feedback_items:
-                        feedback_by_action[feedback.action] += 1
+            email_counts = prompt_lab.emails.aggregate(
+                total=models.Count('id'),
+                synthetic=models.Count('id', filter=models.Q(is_synthetic=True))
+            )
+            emails_count = email_counts['total']
+            synthetic_emails_count = email_counts['synthetic']
+            
+            # Draft and feedback statistics from the lab's daily rollups
+            from app.services.metrics_rollups import rollup_sums, rollups
+            totals = rollups(prompt_lab_id=prompt_lab.id).aggregate(**rollup_sums())
+            total_drafts = totals['draft_count']
+            total_feedback = totals['feedback_count']
+            feedback_by_action = {
+                action: totals[f'{action}_count'] for action in ('accept', 'reject', 'edit', 'ignore')
+            }
             
             stats = {
                 'prompt_lab_id': str(prompt_lab.id),
@@ -557,16 +538,17 @@ class DraftReasoningFactorsView(PromptLabAPIView):
             )
         
         try:
-            # Get all reasoning factors for this draft
-            reasons = draft.reasons.all()
+            # Reasoning factors with their rating counts in one query
+            reasons = draft.reasons.annotate(
+                like_count=models.Count('reasonrating', filter=models.Q(reasonrating__liked=True)),
+                dislike_count=models.Count('reasonrating', filter=models.Q(reasonrating__liked=False))
+            )
             
             # Build response with rating statistics
             reasoning_factors = []
             for reason in reasons:
-                # Get rating stats for this reason
-                ratings = ReasonRating.objects.filter(reason=reason)
-                likes = ratings.filter(liked=True).count()
-                dislikes = ratings.filter(liked=False).count()
+                likes = reason.like_count
+                dislikes = reason.dislike_count
                 
                 reasoning_factors.append({
                     'id': reason.id,
@@ -865,6 +847,7 @@ class QuickRateReasonView(PromptLabAPIView):
 class PromptLabConfidenceView(PromptLabAPIView):
     """Get confidence metrics for a prompt lab"""
     
+    @cached_response()
     def get(self, request, prompt_lab_id):
         """Get current confidence metrics for prompt lab"""
         prompt_lab = get_object_or_404(PromptLab, id=prompt_lab_id, is_active=True)
@@ -877,9 +860,9 @@ class PromptLabConfidenceView(PromptLabAPIView):
             # Get or create confidence tracker
             confidence_tracker = calculator.update_prompt_lab_confidence(prompt_lab)
             
-            # Calculate current metrics
-            user_confidence = calculator.calculate_user_confidence(prompt_lab)
-            system_confidence = calculator.calculate_system_confidence(prompt_lab)
+            # Current metrics, just recalculated from the lab's aggregates
+            user_confidence = confidence_tracker.user_confidence
+            system_confidence = confidence_tracker.system_confidence
             
             # Check threshold status
             is_learning_sufficient = confidence_tracker.is_learning_sufficient()
@@ -1230,6 +1213,7 @@ class UpdatePromptLabPreferenceView(PromptLabAPIView):
 class ConvergenceAssessmentView(PromptLabAPIView):
     """Get convergence assessment for a prompt lab"""
     
+    @cached_response()
     def get(self, request, prompt_lab_id):
         """Get comprehensive convergence assessment"""
         prompt_lab = get_object_or_404(PromptLab, id=prompt_lab_id, is_active=True)
@@ -1239,8 +1223,9 @@ class ConvergenceAssessmentView(PromptLabAPIView):
             
             detector = ConvergenceDetector()
             
-            # Get convergence assessment
-            assessment = detector.assess_convergence(prompt_lab)
+            # Stored assessment, recomputed when new data arrived or ?refresh=true
+            refresh = request.query_params.get('refresh', '').lower() in ('1', 'true')
+            assessment = detector.get_assessment(prompt_lab, refresh=refresh)
             
             # Get optimization history for context
             optimization_history = self._get_optimization_history(prompt_lab)
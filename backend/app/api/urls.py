@@ -16,11 +16,13 @@ from .views import (
     TriggerOptimizationWithDatasetView,
     OptimizationRunDetailView,
     CancelOptimizationView,
+    ResumeOptimizationView,
     PromptLabOptimizationsView,
 )
 from .optimization_status_controller import (
     OptimizationStatusView,
     OptimizationHistoryView,
+    OptimizationQueueView,
     FastOptimizationView,
     OptimizationRecommendationsView,
     optimization_health_check,
@@ -77,6 +79,8 @@ from .evaluation_controller import (
     EvaluationRunTriggerView,
     EvaluationRunListView,
     EvaluationRunDetailView,
+    EvaluationRunCancelView,
+    EvaluationRunResumeView,
     EvaluationRunResultsView,
     EvaluationComparePromptsView,
     # Draft case management
@@ -88,6 +92,7 @@ from .evaluation_controller import (
     EvaluationOptimizationDatasetsView,
 )
 from .llm_status_controller import LLMStatusView
+from .compute_controller import PromptLabComputeCostView
 
 urlpatterns = [
     # PromptLab management endpoints
@@ -130,6 +135,9 @@ urlpatterns = [
     path('prompt-labs/<uuid:prompt_lab_id>/convergence/force/', ForceConvergenceView.as_view(), name='force-convergence'),
     path('prompt-labs/<uuid:prompt_lab_id>/convergence/history/', ConvergenceHistoryView.as_view(), name='convergence-history'),
     
+    # Compute cost endpoints
+    path('prompt-labs/<uuid:prompt_lab_id>/compute-cost/', PromptLabComputeCostView.as_view(), name='prompt-lab-compute-cost'),
+    
     # Cold start endpoints
     path('prompt-labs/<uuid:prompt_lab_id>/cold-start/', PromptLabColdStartView.as_view(), name='prompt-lab-cold-start'),
     path('prompt-labs/<uuid:prompt_lab_id>/cold-start/status/', PromptLabColdStartView.as_view(), name='prompt-lab-cold-start-status'),
@@ -155,12 +163,14 @@ urlpatterns = [
     path('optimization/trigger-with-dataset/', TriggerOptimizationWithDatasetView.as_view(), name='trigger-optimization-with-dataset'),
     path('optimization/runs/<uuid:run_id>/', OptimizationRunDetailView.as_view(), name='optimization-run-detail'),
     path('optimization/runs/<uuid:run_id>/cancel/', CancelOptimizationView.as_view(), name='cancel-optimization'),
+    path('optimization/runs/<uuid:run_id>/resume/', ResumeOptimizationView.as_view(), name='resume-optimization'),
     path('optimization/<str:optimization_id>/status/', GetOptimizationProgressView.as_view(), name='get-optimization-status'),
     path('learning/progress/', GetOptimizationProgressView.as_view(), name='get-learning-progress'),
     
     # Automated optimization control endpoints
     path('optimization/scheduler/', OptimizationStatusView.as_view(), name='optimization-scheduler'),
     path('optimization/history/', OptimizationHistoryView.as_view(), name='optimization-history'),
+    path('optimization/queue/', OptimizationQueueView.as_view(), name='optimization-queue'),
     path('optimization/health/', optimization_health_check, name='optimization-health'),
     
     # Fast optimization endpoints
@@ -208,6 +218,8 @@ urlpatterns = [
     path('evaluations/datasets/<int:dataset_id>/runs/', EvaluationRunListView.as_view(), name='evaluation-run-list'),
     path('evaluations/datasets/<int:dataset_id>/runs/delete-all/', EvaluationRunListView.as_view(), name='evaluation-run-delete-all'),
     path('evaluations/runs/<int:run_id>/', EvaluationRunDetailView.as_view(), name='evaluation-run-detail'),
+    path('evaluations/runs/<int:run_id>/cancel/', EvaluationRunCancelView.as_view(), name='evaluation-run-cancel'),
+    path('evaluations/runs/<int:run_id>/resume/', EvaluationRunResumeView.as_view(), name='evaluation-run-resume'),
     path('evaluations/runs/<int:run_id>/results/', EvaluationRunResultsView.as_view(), name='evaluation-run-results'),
     path('evaluations/compare/', EvaluationComparePromptsView.as_view(), name='evaluation-compare-prompts'),
     
@@ -5,20 +5,51 @@ Runs periodic checks for batch-based optimization triggers
 
 import asyncio
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
+from django.db import connections
 from django.utils import timezone
 
 from .optimization_orchestrator import OptimizationOrchestrator, OptimizationTrigger
-from .prompt_rewriter import PromptRewriter
 from .evaluation_engine import EvaluationEngine
 from .reward_aggregator import RewardFunctionAggregator
-from .unified_llm_provider import LLMProviderFactory, LLMConfig
 from .draft_case_manager import DraftCaseScheduler
+from .counter_tables import in_lab
+from .feedback_trigger_counters import TriggerWindow, bucket_start, get_trigger_events, trigger_windows
+from .optimization_queue import AdmissionRejected, get_optimization_queue
+from .run_leases import claim_prompt_lab, heartbeat
 
 logger = logging.getLogger(__name__)
 
 
+def build_optimization_orchestrator(prompt_lab_id=None, trigger_config: OptimizationTrigger = None):
+    """Orchestrator wired like the API's optimization runs, routing each task type to its configured model"""
+    from app.services.optimization_orchestrator import OptimizationOrchestrator
+    from app.services.llm_router import get_llm_router, TaskType
+    from app.services.prompt_rewriter import LLMBasedPromptRewriter
+    
+    router = get_llm_router()
+    llm_provider = router.get_provider(TaskType.DRAFT_GENERATION, prompt_lab_id)
+    scoring_llm_provider = router.get_provider(TaskType.SCORING, prompt_lab_id)
+    reward_aggregator = RewardFunctionAggregator(scoring_llm_provider)
+    evaluation_engine = EvaluationEngine(llm_provider, reward_aggregator, scoring_llm_provider=scoring_llm_provider)
+    prompt_rewriter = LLMBasedPromptRewriter(
+        rewriter_llm_provider=router.get_provider(TaskType.REWRITING, prompt_lab_id),
+        similarity_llm_provider=router.get_provider(TaskType.SIMILARITY, prompt_lab_id),
+        reward_function_aggregator=reward_aggregator,
+        meta_prompt_manager=None
+    )
+    return OptimizationOrchestrator(
+        llm_provider=llm_provider,
+        prompt_rewriter=prompt_rewriter,
+        evaluation_engine=evaluation_engine,
+        trigger_config=trigger_config
+    )
+
+
 class BackgroundOptimizationScheduler:
     """Background scheduler for automated optimization based on feedback thresholds"""
     
@@ -27,17 +58,15 @@ class BackgroundOptimizationScheduler:
         self._last_optimization_time = None
         self._optimization_count_today = 0
         self._last_count_reset_date = None
+        self._state_lock = threading.Lock()
     
-    def check_and_trigger_optimization(self, session=None):
+    def check_and_trigger_optimization(self, prompt_lab=None):
         """Check if optimization should be triggered and execute if needed"""
-        from core.models import Session, SystemPrompt, UserFeedback
+        from core.models import PromptLab
         
         # Reset daily count if needed
         self._reset_daily_count_if_needed()
         
-        # Track if we're checking a specific session
-        specific_session_check = session is not None
-        
         # Check time-based constraints
         if not self._can_optimize_based_on_time():
             logger.info("Skipping optimization: too soon since last optimization")
@@ -48,58 +77,114 @@ class BackgroundOptimizationScheduler:
             logger.info("Skipping optimization: daily limit reached")
             return False
         
-        # Get sessions to check
-        if specific_session_check:
-            sessions_to_check = [session]
+        # Get prompt labs to check
+        if prompt_lab is not None:
+            prompt_labs = [prompt_lab]
         else:
-            sessions_to_check = Session.objects.filter(is_active=True)
+            prompt_labs = list(PromptLab.objects.filter(is_active=True))
         
-        optimization_triggered = False
+        triggered = self._trigger_prompt_labs([
+            current_lab for current_lab, should_trigger in self._evaluate_prompt_labs(prompt_labs) if should_trigger
+        ])
+        return any(triggered.values())
+    
+    def _evaluate_prompt_labs(self, prompt_labs):
+        """Yield (prompt_lab, should_trigger) from the rolling trigger counters"""
+        from core.models import SystemPrompt
+        
+        lab_ids = [lab.id for lab in prompt_labs]
+        with_active_prompt = set(
+            SystemPrompt.objects.filter(prompt_lab_id__in=lab_ids, is_active=True).values_list('prompt_lab_id', flat=True)
+        )
+        windows = trigger_windows(lab_ids, self.trigger_config.feedback_window_hours)
         
-        for current_session in sessions_to_check:
-            # Check if session has active prompt
-            if not SystemPrompt.objects.filter(session=current_session, is_active=True).exists():
+        for prompt_lab in prompt_labs:
+            # Check if prompt lab has active prompt
+            if prompt_lab.id not in with_active_prompt:
+                yield prompt_lab, False
                 continue
             
-            # Get recent feedback
-            cutoff_time = timezone.now() - timedelta(hours=self.trigger_config.feedback_window_hours)
-            recent_feedback = UserFeedback.objects.filter(
-                draft__email__session=current_session,
-                created_at__gte=cutoff_time
-            ).select_related('draft', 'draft__email')
-            
-            feedback_count = recent_feedback.count()
+            window = windows.get(prompt_lab.id, TriggerWindow())
             
             # Check minimum feedback count
-            if feedback_count < self.trigger_config.min_feedback_count:
-                logger.debug(f"Session {current_session.id}: Not enough feedback ({feedback_count} < {self.trigger_config.min_feedback_count})")
+            if window.feedback_count < self.trigger_config.min_feedback_count:
+                logger.debug(f"Prompt lab {prompt_lab.id}: Not enough feedback ({window.feedback_count} < {self.trigger_config.min_feedback_count})")
+                yield prompt_lab, False
                 continue
             
-            # Calculate negative feedback ratio
-            negative_feedback_count = recent_feedback.filter(
-                action__in=['reject', 'edit']
-            ).count()
-            negative_ratio = negative_feedback_count / feedback_count if feedback_count > 0 else 0
-            
             # Check negative feedback threshold
-            if negative_ratio < self.trigger_config.min_negative_feedback_ratio:
-                logger.debug(f"Session {current_session.id}: Negative ratio too low ({negative_ratio:.2f} < {self.trigger_config.min_negative_feedback_ratio})")
+            if window.negative_ratio < self.trigger_config.min_negative_feedback_ratio:
+                logger.debug(f"Prompt lab {prompt_lab.id}: Negative ratio too low ({window.negative_ratio:.2f} < {self.trigger_config.min_negative_feedback_ratio})")
+                yield prompt_lab, False
                 continue
             
-            # Trigger optimization
-            logger.info(f"Triggering optimization for session {current_session.id}: {negative_ratio:.0%} negative feedback")
-            result = self._execute_optimization(current_session, list(recent_feedback))
-            
-            if result.get('success'):
-                self._last_optimization_time = timezone.now()
-                self._optimization_count_today += 1
-                optimization_triggered = True
-                
-                # If checking a specific session, return the result immediately
-                if specific_session_check:
-                    return True
+            logger.info(f"Triggering optimization for prompt lab {prompt_lab.id}: {window.negative_ratio:.0%} negative feedback")
+            yield prompt_lab, True
+    
+    def _trigger_prompt_labs(self, prompt_labs) -> Dict[Any, bool]:
+        """Lease the labs to this worker, then run their optimizations"""
+        if not prompt_labs:
+            return {}
+        
+        # Labs being optimized by another backend process are skipped
+        leases = {prompt_lab.id: claim_prompt_lab(prompt_lab.id) for prompt_lab in prompt_labs}
+        for prompt_lab in prompt_labs:
+            if leases[prompt_lab.id] is None:
+                logger.info(f"Prompt lab {prompt_lab.id} is being optimized by another worker")
+        claimed = [prompt_lab for prompt_lab in prompt_labs if leases[prompt_lab.id]]
+        
+        with heartbeat(*leases.values()):
+            triggered = self._run_prompt_labs(claimed)
+        return {prompt_lab.id: triggered.get(prompt_lab.id, False) for prompt_lab in prompt_labs}
+    
+    def _run_prompt_labs(self, prompt_labs) -> Dict[Any, bool]:
+        """Run the labs' optimizations concurrently through the shared optimization queue"""
+        from core.models import UserFeedback
+        
+        if not prompt_labs:
+            return {}
+        
+        # Leases and feedback are handled here; worker threads only run the optimizations.
+        # Load the feedback the trigger counters counted: same lab attribution and hourly window
+        cutoff_time = bucket_start(timezone.now() - timedelta(hours=self.trigger_config.feedback_window_hours))
+        feedback_by_lab = {
+            prompt_lab.id: list(UserFeedback.objects.filter(
+                in_lab(prompt_lab.id),
+                created_at__gte=cutoff_time
+            ).select_related('draft', 'draft__email'))
+            for prompt_lab in prompt_labs
+        }
         
-        return optimization_triggered
+        if len(prompt_labs) == 1:
+            return {prompt_labs[0].id: self._run_queued(prompt_labs[0], feedback_by_lab[prompt_labs[0].id])}
+        
+        queue = get_optimization_queue()
+        with ThreadPoolExecutor(max_workers=min(len(prompt_labs), queue.limits.max_concurrent)) as executor:
+            futures = {
+                prompt_lab.id: executor.submit(self._run_queued, prompt_lab, feedback_by_lab[prompt_lab.id], True)
+                for prompt_lab in prompt_labs
+            }
+            return {lab_id: future.result() for lab_id, future in futures.items()}
+    
+    def _run_queued(self, prompt_lab, feedback_list, worker_thread: bool = False) -> bool:
+        """Wait for an optimization slot, then run the lab's optimization"""
+        try:
+            with get_optimization_queue().slot(prompt_lab.id):
+                result = self._execute_optimization(prompt_lab, feedback_list)
+        except AdmissionRejected as rejection:
+            logger.info(f"Optimization for prompt lab {prompt_lab.id} not admitted: {rejection}")
+            return False
+        finally:
+            if worker_thread:
+                connections.close_all()
+        
+        if not result.get('success'):
+            return False
+        
+        with self._state_lock:
+            self._last_optimization_time = timezone.now()
+            self._optimization_count_today += 1
+        return True
     
     def _can_optimize_based_on_time(self):
         """Check if enough time has passed since last optimization"""
@@ -118,13 +203,11 @@ class BackgroundOptimizationScheduler:
             self._optimization_count_today = 0
             self._last_count_reset_date = today
     
-    def _execute_optimization(self, session, feedback_list):
+    def _execute_optimization(self, prompt_lab, feedback_list):
         """Execute the optimization"""
-        from app.services.optimization_orchestrator import OptimizationOrchestrator
-        
         try:
-            orchestrator = OptimizationOrchestrator()
-            result = orchestrator.optimize_prompt(session, feedback_list)
+            orchestrator = build_optimization_orchestrator(prompt_lab.id, self.trigger_config)
+            result = orchestrator.optimize_prompt(prompt_lab, feedback_list)
             
             if result.success:
                 return {
@@ -145,101 +228,36 @@ class BackgroundOptimizationScheduler:
             }
     
     def check_all_sessions(self):
-        """Check all active sessions for optimization triggers"""
-        from core.models import Session, SystemPrompt, UserFeedback
+        """Check all active prompt labs for optimization triggers"""
+        from core.models import PromptLab
         
-        results = []
-        sessions = Session.objects.filter(is_active=True)
+        prompt_labs = list(PromptLab.objects.filter(is_active=True))
         
         # Reset daily count if needed
         self._reset_daily_count_if_needed()
         
-        # Check time constraints once for all sessions
+        # Check time constraints once for all prompt labs
         if not self._can_optimize_based_on_time():
             logger.info("Skipping all optimizations: too soon since last optimization")
-            for session in sessions:
-                results.append({
-                    'session_id': session.id,
-                    'session_name': session.name,
-                    'triggered': False
-                })
-            return results
+            return [self._check_result(prompt_lab, False) for prompt_lab in prompt_labs]
         
         # Check daily limit
         if self._optimization_count_today >= self.trigger_config.max_optimization_frequency_per_day:
             logger.info("Skipping all optimizations: daily limit reached")
-            for session in sessions:
-                results.append({
-                    'session_id': session.id,
-                    'session_name': session.name,
-                    'triggered': False
-                })
-            return results
-        
-        # Now check each session without time constraints
-        for session in sessions:
-            triggered = False
-            
-            # Check if session has active prompt
-            if not SystemPrompt.objects.filter(session=session, is_active=True).exists():
-                results.append({
-                    'session_id': session.id,
-                    'session_name': session.name,
-                    'triggered': False
-                })
-                continue
-            
-            # Get recent feedback
-            cutoff_time = timezone.now() - timedelta(hours=self.trigger_config.feedback_window_hours)
-            recent_feedback = UserFeedback.objects.filter(
-                draft__email__session=session,
-                created_at__gte=cutoff_time
-            ).select_related('draft', 'draft__email')
-            
-            feedback_count = recent_feedback.count()
-            
-            # Check minimum feedback count
-            if feedback_count < self.trigger_config.min_feedback_count:
-                logger.debug(f"Session {session.id}: Not enough feedback ({feedback_count} < {self.trigger_config.min_feedback_count})")
-                results.append({
-                    'session_id': session.id,
-                    'session_name': session.name,
-                    'triggered': False
-                })
-                continue
-            
-            # Calculate negative feedback ratio
-            negative_feedback_count = recent_feedback.filter(
-                action__in=['reject', 'edit']
-            ).count()
-            negative_ratio = negative_feedback_count / feedback_count if feedback_count > 0 else 0
-            
-            # Check negative feedback threshold
-            if negative_ratio < self.trigger_config.min_negative_feedback_ratio:
-                logger.debug(f"Session {session.id}: Negative ratio too low ({negative_ratio:.2f} < {self.trigger_config.min_negative_feedback_ratio})")
-                results.append({
-                    'session_id': session.id,
-                    'session_name': session.name,
-                    'triggered': False
-                })
-                continue
-            
-            # Trigger optimization
-            logger.info(f"Triggering optimization for session {session.id}: {negative_ratio:.0%} negative feedback")
-            result = self._execute_optimization(session, list(recent_feedback))
-            
-            if result.get('success'):
-                self._last_optimization_time = timezone.now()
-                self._optimization_count_today += 1
-                triggered = True
-            
-            results.append({
-                'session_id': session.id,
-                'session_name': session.name,
-                'triggered': triggered
-            })
+            return [self._check_result(prompt_lab, False) for prompt_lab in prompt_labs]
         
-        return results
+        # Now check each prompt lab without time constraints
+        evaluated = list(self._evaluate_prompt_labs(prompt_labs))
+        triggered = self._trigger_prompt_labs([prompt_lab for prompt_lab, should_trigger in evaluated if should_trigger])
+        return [self._check_result(prompt_lab, triggered.get(prompt_lab.id, False)) for prompt_lab, _ in evaluated]
+    
+    @staticmethod
+    def _check_result(prompt_lab, triggered: bool) -> Dict[str, Any]:
+        return {
+            'prompt_lab_id': prompt_lab.id,
+            'prompt_lab_name': prompt_lab.name,
+            'triggered': triggered
+        }
 
 
 class OptimizationScheduler:
@@ -248,10 +266,18 @@ class OptimizationScheduler:
     def __init__(
         self,
         check_interval_minutes: int = 60,  # Check every hour by default
-        trigger_config: OptimizationTrigger = None
+        trigger_config: OptimizationTrigger = None,
+        event_driven: Optional[bool] = None
     ):
         self.check_interval_minutes = check_interval_minutes
         self.trigger_config = trigger_config or OptimizationTrigger()
+        # Wake on debounced negative-feedback events instead of waiting out the interval
+        if event_driven is None:
+            event_driven = os.getenv('FEEDBACK_TRIGGER_EVENTS', 'false').lower() in ('1', 'true', 'yes', 'on')
+        self.event_driven = event_driven
+        self._trigger_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event_wakeups = 0
         self.orchestrator: Optional[OptimizationOrchestrator] = None
         self.draft_scheduler: Optional[DraftCaseScheduler] = None
         self.scheduler_task: Optional[asyncio.Task] = None
@@ -260,28 +286,14 @@ class OptimizationScheduler:
         self._check_count = 0
         self._optimization_count = 0
     
-    async def initialize(self, llm_config: LLMConfig):
-        """Initialize the scheduler with LLM configuration"""
-        
-        # Create LLM provider
-        llm_provider = LLMProviderFactory.create_provider(llm_config)
-        
-        # Create reward aggregator
-        reward_aggregator = RewardFunctionAggregator(llm_provider)
-        
-        # Create evaluation engine
-        evaluation_engine = EvaluationEngine(llm_provider, reward_aggregator)
+    async def initialize(self):
+        """Initialize the scheduler's orchestrator and draft case scheduler.
+
+        Providers come from the LLM router like the API's optimization runs.
+        """
         
-        # Create prompt rewriter
-        prompt_rewriter = PromptRewriter(llm_provider, reward_aggregator)
-        
-        # Create orchestrator
-        self.orchestrator = OptimizationOrchestrator(
-            llm_provider=llm_provider,
-            prompt_rewriter=prompt_rewriter,
-            evaluation_engine=evaluation_engine,
-            trigger_config=self.trigger_config
-        )
+        # Create orchestrator (shared by every lab, so it uses the default routes)
+        self.orchestrator = build_optimization_orchestrator(trigger_config=self.trigger_config)
         
         # Create draft case scheduler
         self.draft_scheduler = DraftCaseScheduler()
@@ -299,6 +311,10 @@ class OptimizationScheduler:
             return
         
         self.is_running = True
+        if self.event_driven:
+            self._loop = asyncio.get_running_loop()
+            self._trigger_event = asyncio.Event()
+            get_trigger_events().subscribe(self._on_trigger_event)
         self.scheduler_task = asyncio.create_task(self._scheduler_loop())
         
         # Start draft case scheduler
@@ -314,6 +330,8 @@ class OptimizationScheduler:
             return
         
         self.is_running = False
+        if self.event_driven:
+            get_trigger_events().unsubscribe(self._on_trigger_event)
         
         if self.scheduler_task:
             self.scheduler_task.cancel()
@@ -338,7 +356,7 @@ class OptimizationScheduler:
                 await self._run_optimization_check()
                 
                 # Wait for next check
-                await asyncio.sleep(self.check_interval_minutes * 60)
+                await self._wait_for_next_check()
                 
             except asyncio.CancelledError:
                 logger.info("Scheduler loop cancelled")
@@ -348,6 +366,25 @@ class OptimizationScheduler:
                 # Continue running even if one check fails
                 await asyncio.sleep(300)  # Wait 5 minutes before retrying
     
+    async def _wait_for_next_check(self):
+        """Sleep until the next poll, or until a trigger event arrives when event-driven"""
+        if self._trigger_event is None:
+            await asyncio.sleep(self.check_interval_minutes * 60)
+            return
+        
+        try:
+            await asyncio.wait_for(self._trigger_event.wait(), timeout=self.check_interval_minutes * 60)
+            self._event_wakeups += 1
+        except asyncio.TimeoutError:
+            pass
+        self._trigger_event.clear()
+    
+    def _on_trigger_event(self, prompt_lab_id):
+        """Called from the event bus timer thread"""
+        if self._loop is not None and self._trigger_event is not None:
+            logger.debug(f"Trigger event for prompt lab {prompt_lab_id}")
+            self._loop.call_soon_threadsafe(self._trigger_event.set)
+    
     async def _run_optimization_check(self):
         """Run a single optimization check"""
         
@@ -384,6 +421,8 @@ class OptimizationScheduler:
         return {
             'is_running': self.is_running,
             'check_interval_minutes': self.check_interval_minutes,
+            'event_driven': self.event_driven,
+            'event_wakeups': self._event_wakeups,
             'last_check_time': self._last_check_time,
             'total_checks': self._check_count,
             'total_optimizations': self._optimization_count,
@@ -433,12 +472,12 @@ async def get_scheduler() -> OptimizationScheduler:
     return _scheduler_instance
 
 
-async def start_optimization_scheduler(llm_config: LLMConfig):
+async def start_optimization_scheduler():
     """Start the global optimization scheduler"""
     scheduler = await get_scheduler()
     
     if not scheduler.orchestrator:
-        await scheduler.initialize(llm_config)
+        await scheduler.initialize()
     
     await scheduler.start()
 
@@ -0,0 +1,334 @@
+"""
+Candidate Deduplication
+Collapses identical and near-identical rewrite candidates before they reach
+A/B evaluation, and reuses earlier evaluation results for prompts this lab
+has already evaluated against the same baseline and datasets.
+
+Exact duplicates are detected with a hash of the normalized prompt text;
+near-duplicates with MinHash signatures over word shingles.
+"""
+
+import hashlib
+import logging
+import random
+import re
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from django.utils import timezone
+
+from core.models import EvaluationCase, SystemPrompt
+from .evaluation_engine import ComparisonResult, EvaluationResult
+
+logger = logging.getLogger(__name__)
+
+BASELINE = -1  # duplicate_of target meaning "same as the baseline prompt"
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace; {{parameters}} are kept"""
+    text = (text or '').lower()
+    text = re.sub(r'[^\w{}\s]', ' ', text)
+    return ' '.join(text.split())
+
+
+def prompt_fingerprint(text: str) -> str:
+    """Stable hash of the normalized prompt text"""
+    return hashlib.sha256(normalize_prompt(text).encode('utf-8')).hexdigest()
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Word n-grams of the normalized text"""
+    words = normalize_prompt(text).split()
+    if len(words) <= size:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures for estimating Jaccard similarity of shingle sets"""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, text: str) -> List[int]:
+        # blake2b rather than hash() so signatures are stable across processes
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'big')
+            for shingle in shingles(text, self.shingle_size)
+        ]
+        return [
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._permutations
+        ]
+
+    @staticmethod
+    def similarity(signature_a: Sequence[int], signature_b: Sequence[int]) -> float:
+        if not signature_a or len(signature_a) != len(signature_b):
+            return 0.0
+        return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+
+@dataclass
+class DedupPlan:
+    """Which candidates need a real evaluation and how to fill in the rest"""
+    evaluate: List[int] = field(default_factory=list)
+    duplicate_of: Dict[int, int] = field(default_factory=dict)  # candidate -> representative or BASELINE
+    reused: Dict[int, Dict[str, Any]] = field(default_factory=dict)  # candidate -> prior evaluation record
+    screened_out: Dict[int, float] = field(default_factory=dict)  # candidate -> screening score
+    fingerprints: List[str] = field(default_factory=list)
+    baseline_fingerprint: str = ''
+
+    @property
+    def evaluations_avoided(self) -> int:
+        return len(self.duplicate_of) + len(self.reused)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'candidates': len(self.fingerprints),
+            'evaluated': len(self.evaluate),
+            'baseline_duplicates': sum(1 for target in self.duplicate_of.values() if target == BASELINE),
+            'candidate_duplicates': sum(1 for target in self.duplicate_of.values() if target != BASELINE),
+            'reused': len(self.reused),
+            'screened_out': len(self.screened_out),
+            'evaluations_avoided': self.evaluations_avoided,
+        }
+
+    def screen_out(self, indices: List[int], scores: Dict[int, float]):
+        """Drop candidates that screening did not promote to full evaluation"""
+        for index in indices:
+            self.evaluate.remove(index)
+            self.screened_out[index] = scores[index]
+
+    def source(self, index: int) -> str:
+        if index in self.screened_out:
+            return 'screened_out'
+        if index in self.reused:
+            return 'reused'
+        if index in self.duplicate_of:
+            return 'duplicate'
+        return 'evaluated'
+
+    def expand(
+        self,
+        baseline: SystemPrompt,
+        candidate_prompts: List[SystemPrompt],
+        evaluated_results: List[ComparisonResult]
+    ) -> List[ComparisonResult]:
+        """Build one ComparisonResult per candidate, in candidate order"""
+        by_index = dict(zip(self.evaluate, evaluated_results))
+        baseline_result = next((result.baseline for result in evaluated_results), None)
+
+        results = []
+        for i, prompt in enumerate(candidate_prompts):
+            if i in by_index:
+                results.append(by_index[i])
+            elif i in self.reused:
+                results.append(_comparison_from_record(baseline, prompt, self.reused[i], baseline_result))
+            elif i in self.screened_out:
+                reference = baseline_result or _empty_result(baseline)
+                results.append(ComparisonResult(
+                    baseline=reference,
+                    candidate=replace(
+                        _empty_result(prompt),
+                        performance_score=0.0,
+                        metrics={'screening_score': self.screened_out[i]}
+                    ),
+                    improvement=0.0,
+                    statistical_significance=1.0,
+                    winner='tie',
+                    confidence_level=0.0
+                ))
+            elif self.duplicate_of.get(i, BASELINE) == BASELINE:
+                reference = baseline_result or _empty_result(baseline)
+                results.append(ComparisonResult(
+                    baseline=reference,
+                    candidate=replace(reference, prompt=prompt),
+                    improvement=0.0,
+                    statistical_significance=1.0,
+                    winner='tie',
+                    confidence_level=0.0
+                ))
+            else:
+                representative = results[self.duplicate_of[i]]
+                results.append(replace(representative, candidate=replace(representative.candidate, prompt=prompt)))
+        return results
+
+
+class CandidateDeduplicator:
+    """Plans which rewrite candidates actually need an A/B evaluation"""
+
+    def __init__(self, similarity_threshold: float = 0.9, num_perm: int = 64, shingle_size: int = 3):
+        self.similarity_threshold = similarity_threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+
+    def plan(
+        self,
+        baseline_content: str,
+        candidate_contents: List[str],
+        history: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> DedupPlan:
+        """Group candidates against the baseline, each other and prior evaluations.
+
+        history maps prompt fingerprints to evaluation records from
+        load_candidate_history (same baseline and datasets).
+        """
+        history = history or {}
+        plan = DedupPlan(baseline_fingerprint=prompt_fingerprint(baseline_content))
+        baseline_signature = self.hasher.signature(baseline_content)
+        representatives = []  # (index, fingerprint, signature)
+
+        for i, content in enumerate(candidate_contents):
+            fingerprint = prompt_fingerprint(content)
+            signature = self.hasher.signature(content)
+            plan.fingerprints.append(fingerprint)
+
+            if fingerprint == plan.baseline_fingerprint or self._similar(signature, baseline_signature):
+                plan.duplicate_of[i] = BASELINE
+                continue
+
+            match = next(
+                (index for index, other_fp, other_sig in representatives
+                 if fingerprint == other_fp or self._similar(signature, other_sig)),
+                None
+            )
+            if match is not None:
+                plan.duplicate_of[i] = match
+            elif fingerprint in history:
+                plan.reused[i] = history[fingerprint]
+                representatives.append((i, fingerprint, signature))
+            else:
+                plan.evaluate.append(i)
+                representatives.append((i, fingerprint, signature))
+
+        if plan.evaluations_avoided:
+            logger.info(
+                f"Candidate dedup avoided {plan.evaluations_avoided} of {len(candidate_contents)} evaluations: "
+                f"{plan.summary()}"
+            )
+        return plan
+
+    def _similar(self, signature_a: List[int], signature_b: List[int]) -> bool:
+        return self.hasher.similarity(signature_a, signature_b) >= self.similarity_threshold
+
+
+def dataset_version(dataset_ids: Optional[List[int]]) -> str:
+    """Hash of the datasets' cases; changes when a case is added, removed or edited ('' without datasets)"""
+    if not dataset_ids:
+        return ''
+    digest = hashlib.sha256(repr(sorted(dataset_ids)).encode('utf-8'))
+    cases = EvaluationCase.objects.filter(dataset_id__in=dataset_ids).order_by('id').values_list(
+        'id', 'dataset_id', 'input_text', 'expected_output', 'context'
+    )
+    for case in cases.iterator():
+        digest.update(repr(case).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def comparison_record(
+    comparison: ComparisonResult,
+    baseline_fingerprint: str,
+    candidate_fingerprint: str,
+    dataset_ids: Optional[List[int]],
+    source: str = 'evaluated',
+    screening: Optional[Dict[str, Any]] = None,
+    dataset_key: str = ''
+) -> Dict[str, Any]:
+    """Serializable summary of a comparison, stored with the run's candidate metrics.
+
+    dataset_key is the datasets' dataset_version() when the comparison ran.
+    """
+    record = {
+        'fingerprint': candidate_fingerprint,
+        'baseline_fingerprint': baseline_fingerprint,
+        'dataset_ids': sorted(dataset_ids or []),
+        'dataset_version': dataset_key,
+        'source': source,
+        'baseline_score': comparison.baseline.performance_score,
+        'candidate_score': comparison.candidate.performance_score,
+        'improvement': comparison.improvement,
+        'p_value': comparison.statistical_significance,
+        'winner': comparison.winner,
+        'confidence_level': comparison.confidence_level,
+        'test_cases_used': comparison.candidate.test_cases_used,
+        'error_rate': comparison.candidate.error_rate,
+        'metrics': comparison.candidate.metrics,
+    }
+    if screening is not None:
+        record['screening'] = screening
+    return record
+
+
+def load_candidate_history(
+    prompt_lab_id,
+    baseline_content: str,
+    dataset_ids: Optional[List[int]] = None,
+    limit: int = 20,
+    dataset_key: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Prior candidate evaluations in this lab on the same datasets, keyed by fingerprint.
+
+    Records against a different baseline are rebased when that baseline's
+    score on the datasets is known (see OptimizationHistory.reusable).
+    dataset_key is computed with dataset_version() when not given.
+    """
+    from .optimization_history import OptimizationHistory
+
+    if not prompt_lab_id:
+        return {}
+
+    try:
+        if dataset_key is None:
+            dataset_key = dataset_version(dataset_ids)
+        return OptimizationHistory.load(prompt_lab_id, limit).reusable(baseline_content, dataset_ids, dataset_key)
+    except Exception as e:
+        logger.warning(f"Could not load candidate history for prompt lab {prompt_lab_id}: {e}")
+        return {}
+
+
+def _empty_result(prompt: SystemPrompt) -> EvaluationResult:
+    return EvaluationResult(
+        prompt=prompt,
+        performance_score=prompt.performance_score or 0.0,
+        metrics={},
+        sample_outputs=[],
+        evaluation_time=timezone.now(),
+        test_cases_used=0,
+        error_rate=0.0
+    )
+
+
+def _comparison_from_record(
+    baseline: SystemPrompt,
+    prompt: SystemPrompt,
+    record: Dict[str, Any],
+    baseline_result: Optional[EvaluationResult]
+) -> ComparisonResult:
+    reference = replace(
+        baseline_result or _empty_result(baseline),
+        performance_score=record.get('baseline_score', 0.0)
+    )
+    return ComparisonResult(
+        baseline=reference,
+        candidate=EvaluationResult(
+            prompt=prompt,
+            performance_score=record.get('candidate_score', 0.0),
+            metrics=record.get('metrics', {}),
+            sample_outputs=[],
+            evaluation_time=timezone.now(),
+            test_cases_used=record.get('test_cases_used', 0),
+            error_rate=record.get('error_rate', 0.0)
+        ),
+        improvement=record.get('improvement', 0.0),
+        statistical_significance=record.get('p_value', 1.0),
+        winner=record.get('winner', 'tie'),
+        confidence_level=record.get('confidence_level', 0.0)
+    )
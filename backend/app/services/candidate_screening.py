@@ -0,0 +1,347 @@
+"""
+Candidate Screening
+Multi-fidelity selection of rewrite candidates: every candidate is ranked with
+cheap signals and only the top-ranked ones are promoted to full A/B evaluation.
+
+Screening signals:
+- subset: responses to a small subset of the evaluation cases, scored locally
+  (word overlap with the expected output and length fit; no scoring LLM calls)
+- structure: prompt-structure heuristics relative to the baseline prompt
+- history: feedback success of similar prompts in the similarity index
+
+The budget is counted in candidate case evaluations. screening_share of the
+cost of fully evaluating every candidate goes to screening and the remainder
+funds full evaluations of the promoted candidates. A fraction of runs
+(audit_rate) still evaluate every candidate so screening recall can be measured.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_PARAMETER_PATTERN = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+_META_TEXT_PATTERN = re.compile(
+    r'^\s*(here is|here\'s|improved prompt|rewritten prompt|new prompt|sure[,!])|```',
+    re.IGNORECASE
+)
+_ERROR_RESPONSE_PATTERN = re.compile(r'^(Error generating response|(Ollama|OpenAI) Error:)')
+
+
+@dataclass
+class ScreeningConfig:
+    """Budget split between screening and full evaluation"""
+    enabled: bool = True
+    screening_share: float = 0.2  # Share of the full-evaluation budget spent on screening
+    max_promoted: int = 2  # Upper bound on candidates promoted to full evaluation
+    min_screening_cases: int = 2
+    audit_rate: float = 0.1  # Runs that fully evaluate every candidate to measure recall
+    subset_weight: float = 0.5
+    structure_weight: float = 0.2
+    history_weight: float = 0.3
+
+    @classmethod
+    def from_env(cls) -> 'ScreeningConfig':
+        """Read CANDIDATE_SCREENING, CANDIDATE_SCREENING_SHARE, CANDIDATE_SCREENING_TOP_K
+        and CANDIDATE_SCREENING_AUDIT_RATE"""
+        return cls(
+            enabled=os.getenv('CANDIDATE_SCREENING', 'true').lower() not in ('0', 'false', 'no', 'off'),
+            screening_share=float(os.getenv('CANDIDATE_SCREENING_SHARE', '0.2')),
+            max_promoted=int(os.getenv('CANDIDATE_SCREENING_TOP_K', '2')),
+            audit_rate=float(os.getenv('CANDIDATE_SCREENING_AUDIT_RATE', '0.1'))
+        )
+
+    def budget(self, candidate_count: int, full_case_count: int) -> Tuple[int, int]:
+        """Screening cases per candidate and number of candidates promoted"""
+        if candidate_count <= 0 or full_case_count <= 0:
+            return 0, candidate_count
+        screening_cases = min(
+            full_case_count,
+            max(self.min_screening_cases, int(self.screening_share * full_case_count))
+        )
+        remaining = candidate_count * full_case_count - candidate_count * screening_cases
+        promoted = max(1, min(self.max_promoted, remaining // full_case_count, candidate_count))
+        return screening_cases, promoted
+
+
+@dataclass
+class ScreeningCase:
+    """Input (and expected output, if known) used for low-fidelity scoring"""
+    input_text: str
+    expected_output: str = ''
+    scenario_type: str = 'professional'
+
+
+@dataclass
+class ScreeningResult:
+    """Screening scores for a list of candidates; promoted indices are best first"""
+    scores: List[float]
+    signals: List[Dict[str, Optional[float]]]
+    promoted: List[int]
+    screening_cases: int
+    audited: bool = False
+
+    def rank(self, index: int) -> int:
+        """1-based screening rank of a candidate"""
+        order = sorted(range(len(self.scores)), key=lambda i: self.scores[i], reverse=True)
+        return order.index(index) + 1
+
+    def evaluated(self) -> List[int]:
+        """Candidates that go to full evaluation"""
+        return list(range(len(self.scores))) if self.audited else list(self.promoted)
+
+    def candidate_record(self, index: int) -> Dict[str, Any]:
+        return {
+            'score': round(self.scores[index], 4),
+            'rank': self.rank(index),
+            'promoted': index in self.promoted,
+            'signals': {name: (round(value, 4) if value is not None else None)
+                        for name, value in self.signals[index].items()}
+        }
+
+    def accuracy(self, full_scores: Dict[int, float]) -> Dict[str, Any]:
+        """Compare screening against full-evaluation scores (candidate index -> score)"""
+        summary = {
+            'candidates': len(self.scores),
+            'promoted': len(self.promoted),
+            'screening_cases': self.screening_cases,
+            'audited': self.audited,
+            'evaluations_skipped': len(self.scores) - len(self.evaluated()),
+            'top1_agreement': None,
+            'best_promoted': None,
+            'rank_correlation': None,
+        }
+        if not full_scores:
+            return summary
+
+        best = max(full_scores, key=full_scores.get)
+        screened_best = max(full_scores, key=lambda i: self.scores[i])
+        summary['top1_agreement'] = screened_best == best
+        if self.audited:
+            # Only audited runs know whether screening dropped the eventual winner
+            summary['best_promoted'] = best in self.promoted
+        if len(full_scores) >= 3:
+            summary['rank_correlation'] = _spearman(
+                [self.scores[i] for i in full_scores], list(full_scores.values())
+            )
+        return summary
+
+
+class CandidateScreener:
+    """Ranks candidates with cheap signals before full A/B evaluation"""
+
+    def __init__(self, llm_provider, similarity_index=None, config: Optional[ScreeningConfig] = None):
+        self.llm_provider = llm_provider
+        self.similarity_index = similarity_index
+        self.config = config or ScreeningConfig.from_env()
+
+    def should_screen(self, candidate_count: int, full_case_count: int) -> bool:
+        """Screening only pays off when it leaves some candidates unevaluated"""
+        if not self.config.enabled:
+            return False
+        screening_cases, promoted = self.config.budget(candidate_count, full_case_count)
+        return promoted < candidate_count and screening_cases < full_case_count
+
+    async def screen(
+        self,
+        baseline_content: str,
+        candidate_contents: List[str],
+        cases: Sequence[ScreeningCase],
+        full_case_count: int,
+        prompt_lab_id=None
+    ) -> ScreeningResult:
+        screening_cases, promote_count = self.config.budget(len(candidate_contents), full_case_count)
+        cases = list(cases)[:screening_cases]
+
+        subset_scores = await self._subset_scores(candidate_contents, cases)
+        history_scores = await self._history_scores(candidate_contents, prompt_lab_id)
+
+        signals, scores = [], []
+        for i, content in enumerate(candidate_contents):
+            candidate_signals = {
+                'subset': subset_scores[i],
+                'structure': prompt_structure_score(content, baseline_content),
+                'history': history_scores[i],
+            }
+            signals.append(candidate_signals)
+            scores.append(self._combine(candidate_signals))
+
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        result = ScreeningResult(
+            scores=scores,
+            signals=signals,
+            promoted=order[:promote_count],
+            screening_cases=len(cases),
+            audited=random.random() < self.config.audit_rate
+        )
+        logger.info(
+            f"Screened {len(scores)} candidates on {len(cases)} cases; promoted {result.promoted}"
+            f"{' (audit run: evaluating all)' if result.audited else ''}"
+        )
+        return result
+
+    def _combine(self, signals: Dict[str, Optional[float]]) -> float:
+        weights = {
+            'subset': self.config.subset_weight,
+            'structure': self.config.structure_weight,
+            'history': self.config.history_weight,
+        }
+        available = {name: value for name, value in signals.items() if value is not None}
+        total_weight = sum(weights[name] for name in available)
+        if not total_weight:
+            return 0.0
+        return sum(value * weights[name] for name, value in available.items()) / total_weight
+
+    async def _subset_scores(self, contents: List[str], cases: List[ScreeningCase]) -> List[Optional[float]]:
+        if not cases:
+            return [None] * len(contents)
+
+        async def score(content: str, case: ScreeningCase) -> Optional[float]:
+            try:
+                response = await self.llm_provider.generate(
+                    prompt=f"Please respond to this email:\n{case.input_text}",
+                    system_prompt=content,
+                    temperature=0.3,
+                    max_tokens=300
+                )
+            except Exception as e:
+                logger.warning(f"Screening response failed: {e}")
+                return None
+            if not isinstance(response, str) or _ERROR_RESPONSE_PATTERN.match(response):
+                return None
+            return local_response_score(response.strip(), case.expected_output, case.scenario_type)
+
+        case_scores = await asyncio.gather(*[score(content, case) for content in contents for case in cases])
+        results = []
+        for i in range(len(contents)):
+            values = [value for value in case_scores[i * len(cases):(i + 1) * len(cases)] if value is not None]
+            results.append(sum(values) / len(values) if values else None)
+        return results
+
+    async def _history_scores(self, contents: List[str], prompt_lab_id) -> List[Optional[float]]:
+        from asgiref.sync import sync_to_async
+        from .prompt_similarity_index import get_prompt_similarity_index
+
+        def lookup() -> List[Optional[float]]:
+            index = self.similarity_index or get_prompt_similarity_index()
+            scores = []
+            for content in contents:
+                hits = index.search(content, k=1, prompt_lab_id=prompt_lab_id, min_feedback=3)
+                # Neutral prior pulled toward the neighbour's success rate by similarity
+                scores.append(0.5 + hits[0].similarity * (hits[0].success_rate - 0.5) if hits else None)
+            return scores
+
+        try:
+            return await sync_to_async(lookup)()
+        except Exception as e:
+            logger.warning(f"Screening history lookup failed: {e}")
+            return [None] * len(contents)
+
+
+def prompt_structure_score(content: str, baseline_content: str = '') -> float:
+    """Heuristic 0-1 score of a rewritten prompt's structure"""
+    content = content or ''
+    words = content.split()
+    if len(words) < 5:
+        return 0.0
+
+    # Parameters the baseline relies on must survive the rewrite
+    required = set(_PARAMETER_PATTERN.findall(baseline_content or ''))
+    parameters = len(required & set(_PARAMETER_PATTERN.findall(content))) / len(required) if required else 1.0
+
+    # Rewrites far shorter or longer than the baseline tend to drop or bloat instructions
+    baseline_words = len((baseline_content or '').split())
+    ratio = len(words) / baseline_words if baseline_words else 1.0
+    if 0.7 <= ratio <= 2.5:
+        length = 1.0
+    elif ratio < 0.7:
+        length = max(0.0, ratio / 0.7)
+    else:
+        length = max(0.0, 1.0 - (ratio - 2.5) / 2.5)
+
+    # Leftover chat framing ("Here is the improved prompt:") or code fences
+    clean = 0.3 if _META_TEXT_PATTERN.search(content) else 1.0
+
+    sentences = [s for s in re.split(r'[.!?\n]+', content) if len(s.split()) >= 3]
+    instructions = min(1.0, len(sentences) / 3)
+
+    return (parameters + length + clean + instructions) / 4
+
+
+def local_response_score(response: str, expected_output: str = '', scenario_type: str = 'professional') -> float:
+    """Score a response without an LLM: overlap with the expected output, else length fit"""
+    if not response:
+        return 0.0
+    if expected_output:
+        response_words = set(response.lower().split())
+        expected_words = set(expected_output.lower().split())
+        union = response_words | expected_words
+        jaccard = len(response_words & expected_words) / len(union) if union else 0.0
+        length_ratio = min(len(response), len(expected_output)) / max(len(response), len(expected_output))
+        return 0.7 * jaccard + 0.3 * length_ratio
+
+    min_ideal, max_ideal = {
+        'professional': (50, 200),
+        'casual': (20, 150),
+        'technical': (100, 300),
+        'urgent': (10, 100)
+    }.get(scenario_type, (50, 200))
+    word_count = len(response.split())
+    if min_ideal <= word_count <= max_ideal:
+        return 1.0
+    if word_count < min_ideal:
+        return word_count / min_ideal
+    return max(0.0, 1.0 - (word_count - max_ideal) / max_ideal)
+
+
+def screening_accuracy(prompt_lab_id=None, limit: int = 100) -> Dict[str, Any]:
+    """Aggregate screening accuracy over recent optimization runs"""
+    from core.models import OptimizationRun
+
+    runs = OptimizationRun.objects.filter(detailed_metrics__has_key='screening')
+    if prompt_lab_id:
+        runs = runs.filter(prompt_lab_id=prompt_lab_id)
+    summaries = [
+        metrics['screening'] for metrics in
+        runs.order_by('-started_at').values_list('detailed_metrics', flat=True)[:limit]
+    ]
+
+    def rate(key: str) -> Optional[float]:
+        values = [summary[key] for summary in summaries if summary.get(key) is not None]
+        return sum(1 for value in values if value) / len(values) if values else None
+
+    correlations = [s['rank_correlation'] for s in summaries if s.get('rank_correlation') is not None]
+    return {
+        'runs': len(summaries),
+        'audited_runs': sum(1 for s in summaries if s.get('audited')),
+        'top1_agreement': rate('top1_agreement'),
+        'best_promoted_rate': rate('best_promoted'),
+        'mean_rank_correlation': sum(correlations) / len(correlations) if correlations else None,
+        'evaluations_skipped': sum(s.get('evaluations_skipped', 0) for s in summaries),
+    }
+
+
+def _spearman(a: List[float], b: List[float]) -> Optional[float]:
+    def ranks(values):
+        order = sorted(range(len(values)), key=lambda i: values[i])
+        result = [0.0] * len(values)
+        i = 0
+        while i < len(order):
+            j = i
+            while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+                j += 1
+            for k in range(i, j + 1):
+                result[order[k]] = (i + j) / 2
+            i = j + 1
+        return result
+
+    ra, rb = ranks(a), ranks(b)
+    mean_a, mean_b = sum(ra) / len(ra), sum(rb) / len(rb)
+    covariance = sum((x - mean_a) * (y - mean_b) for x, y in zip(ra, rb))
+    spread = (sum((x - mean_a) ** 2 for x in ra) * sum((y - mean_b) ** 2 for y in rb)) ** 0.5
+    return covariance / spread if spread else None
@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 from django.core.cache import cache
 from core.models import PromptLab, SystemPrompt, UserFeedback
+from .lab_snapshot import LabSnapshot
 
 logger = logging.getLogger(__name__)
 
@@ -55,8 +56,11 @@ class ComputeOptimizer:
     def __init__(self):
         self.logger = logger
     
-    def should_continue_optimization(self, prompt_lab: PromptLab) -> Dict[str, Any]:
-        """Determine if optimization should continue based on ROI"""
+    def should_continue_optimization(self, prompt_lab: PromptLab, snapshot: Optional[LabSnapshot] = None) -> Dict[str, Any]:
+        """Determine if optimization should continue based on ROI
+        
+        Pass the caller's LabSnapshot to reuse its score history.
+        """
         try:
             # Check hard limits first
             if prompt_lab.optimization_iterations >= self.MAX_ITERATIONS_PER_PROMPT_LAB:
@@ -81,7 +85,8 @@ class ComputeOptimizer:
                 }
             
             # Calculate ROI metrics
-            roi_metrics = self._calculate_optimization_roi(prompt_lab)
+            snapshot = snapshot or LabSnapshot.load(prompt_lab)
+            roi_metrics = self._calculate_optimization_roi(prompt_lab, snapshot)
             
             # Progressive convergence based on stage
             improvement_rate = roi_metrics['recent_improvement_rate']
@@ -97,7 +102,7 @@ class ComputeOptimizer:
                 }
             
             # Check confidence vs compute cost
-            compute_cost_ratio = self._estimate_compute_cost_ratio(prompt_lab)
+            compute_cost_ratio = self._estimate_compute_cost_ratio(prompt_lab, roi_metrics)
             if compute_cost_ratio > 2.0:  # Costs outweigh benefits
                 return {
                     'continue': False,
@@ -136,8 +141,16 @@ class ComputeOptimizer:
         cache.set(cache_key, result, self.CACHE_DURATION_SECONDS)
     
     def estimate_optimization_cost(self, prompt_lab: PromptLab) -> Dict[str, float]:
-        """Estimate compute costs for next optimization iteration"""
+        """Estimate compute costs for next optimization iteration
+        
+        Uses the measured cost of previous optimization runs when usage has
+        been recorded for the prompt lab, otherwise falls back to a heuristic.
+        """
         try:
+            measured = self._get_measured_costs(prompt_lab)
+            if measured:
+                return measured
+            
             # Base costs (example values - adjust based on your LLM pricing)
             BASE_OPTIMIZATION_COST = 0.10  # $0.10 per optimization run
             BASE_EVALUATION_COST = 0.05    # $0.05 per evaluation
@@ -163,7 +176,8 @@ class ComputeOptimizer:
                 'evaluation_cost': round(evaluation_cost, 3),
                 'total_cost': round(total_cost, 3),
                 'complexity_multiplier': complexity_multiplier,
-                'estimated_tokens': int(prompt_tokens) if active_prompt else 0
+                'estimated_tokens': int(prompt_tokens) if active_prompt else 0,
+                'source': 'estimated'
             }
             
         except Exception as e:
@@ -175,6 +189,37 @@ class ComputeOptimizer:
                 'error': str(e)
             }
     
+    def _get_measured_costs(self, prompt_lab: PromptLab) -> Optional[Dict[str, Any]]:
+        """Average measured cost per optimization and evaluation run from recorded LLM usage"""
+        from django.db.models import Sum, Count, F
+        from core.models import LLMUsageRecord
+        
+        usage = LLMUsageRecord.objects.filter(prompt_lab=prompt_lab)
+        optimization = usage.filter(optimization_run__isnull=False).aggregate(
+            cost=Sum('cost_usd'),
+            tokens=Sum(F('prompt_tokens') + F('completion_tokens')),
+            runs=Count('optimization_run', distinct=True)
+        )
+        if not optimization['runs']:
+            return None
+        
+        evaluation = usage.filter(optimization_run__isnull=True, evaluation_run__isnull=False).aggregate(
+            cost=Sum('cost_usd'),
+            runs=Count('evaluation_run', distinct=True)
+        )
+        
+        optimization_cost = (optimization['cost'] or 0.0) / optimization['runs']
+        evaluation_cost = (evaluation['cost'] or 0.0) / evaluation['runs'] if evaluation['runs'] else 0.0
+        
+        return {
+            'optimization_cost': round(optimization_cost, 6),
+            'evaluation_cost': round(evaluation_cost, 6),
+            'total_cost': round(optimization_cost + evaluation_cost, 6),
+            'estimated_tokens': int((optimization['tokens'] or 0) / optimization['runs']),
+            'runs_measured': optimization['runs'],
+            'source': 'measured'
+        }
+    
     def get_compute_budget_status(self, user_id: Optional[str] = None) -> Dict[str, Any]:
         """Check compute budget and usage"""
         try:
@@ -225,49 +270,43 @@ class ComputeOptimizer:
         else:
             return 'exploration'
     
-    def _calculate_optimization_roi(self, prompt_lab: PromptLab) -> Dict[str, float]:
+    def _calculate_optimization_roi(self, prompt_lab: PromptLab, snapshot: Optional[LabSnapshot] = None) -> Dict[str, float]:
         """Calculate return on investment metrics"""
         try:
-            # Get recent performance history
-            recent_prompts = SystemPrompt.objects.filter(
-                session=session,
-                performance_score__isnull=False
-            ).order_by('-version')[:5]
+            # Recent performance history, newest first
+            snapshot = snapshot or LabSnapshot.load(prompt_lab)
+            scores = snapshot.scores
             
-            if recent_prompts.count() < 2:
+            if len(scores) < 2:
                 return {'recent_improvement_rate': 1.0}  # Assume high ROI early
             
-            scores = [p.performance_score for p in recent_prompts]
-            
             # Calculate improvement rate
-            if len(scores) >= 2:
-                recent_improvement = scores[0] - scores[1]  # Latest - previous
-                improvement_rate = recent_improvement / scores[1] if scores[1] > 0 else 0
-            else:
-                improvement_rate = 0
+            recent_improvement = scores[0] - scores[1]  # Latest - previous
+            improvement_rate = recent_improvement / scores[1] if scores[1] > 0 else 0
             
-            # Calculate trend
+            # Calculate trend: latest two against the two before them
             if len(scores) >= 3:
-                recent_trend = (scores[0] + scores[1]) / 2 - (scores[2] + scores[3] if len(scores) > 3 else scores[2]) / 2
+                recent_trend = scores[:2].mean() - scores[2:4].mean()
             else:
                 recent_trend = improvement_rate
             
             return {
-                'recent_improvement_rate': improvement_rate,
-                'improvement_trend': recent_trend,
-                'latest_score': scores[0] if scores else 0,
-                'average_score': sum(scores) / len(scores) if scores else 0
+                'recent_improvement_rate': float(improvement_rate),
+                'improvement_trend': float(recent_trend),
+                'improvement_slope': snapshot.score_slope(len(scores)),
+                'latest_score': float(scores[0]),
+                'average_score': float(scores.mean())
             }
             
         except Exception as e:
             self.logger.error(f"Error calculating ROI: {str(e)}")
             return {'recent_improvement_rate': 0}
     
-    def _estimate_compute_cost_ratio(self, prompt_lab: PromptLab) -> float:
+    def _estimate_compute_cost_ratio(self, prompt_lab: PromptLab, roi: Optional[Dict[str, float]] = None) -> float:
         """Estimate ratio of compute cost to expected benefit"""
         try:
             # Get ROI metrics
-            roi = self._calculate_optimization_roi(prompt_lab)
+            roi = roi or self._calculate_optimization_roi(prompt_lab)
             improvement_rate = roi['recent_improvement_rate']
             
             # Estimate cost of next iteration
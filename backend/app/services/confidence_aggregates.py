@@ -0,0 +1,205 @@
+"""
+Confidence Aggregates
+Running per-prompt-lab totals behind the confidence metrics, updated with a
+constant number of statements on each feedback or reason rating write:
+
+- feedback counts by action, reasoned feedback count and reason length sum
+- feedback with reason ratings, and liked/disliked rating totals
+- the current streak of identical actions; new feedback extends it, deletes
+  and edits recompute it from the lab's newest feedback
+- velocity and pattern alignment read the lab's hourly feedback trigger
+  counters (see feedback_trigger_counters) rather than individual feedback
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Length
+
+from core.models import ConfidenceAggregate, FeedbackTriggerCounter, ReasonRating, UserFeedback
+from .counter_tables import in_lab, lab_of, replace_rows, update_row
+from .feedback_signals import FeedbackWrite, RatingWrite
+from .feedback_trigger_counters import ACTION_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+def aggregate_for(prompt_lab_id) -> ConfidenceAggregate:
+    """The lab's aggregate; an unsaved empty one if it has no feedback yet"""
+    return (
+        ConfidenceAggregate.objects.filter(prompt_lab_id=prompt_lab_id).first()
+        or ConfidenceAggregate(prompt_lab_id=prompt_lab_id)
+    )
+
+
+@dataclass
+class FeedbackSplit:
+    """Action counts before and after a point in a lab's feedback history"""
+    before: Dict[str, float]
+    after: Dict[str, float]
+    before_count: int
+    after_count: int
+
+    def actions(self, counts: Dict[str, float]) -> set:
+        return {action for action, count in counts.items() if count > 0}
+
+
+def split_history(prompt_lab_id, fraction: float) -> FeedbackSplit:
+    """Split the lab's feedback at `fraction` of its count, in creation order.
+
+    Reads one trigger counter row per active hour; the hour holding the split
+    point is apportioned between both sides.
+    """
+    counters = list(
+        FeedbackTriggerCounter.objects.filter(prompt_lab_id=prompt_lab_id)
+        .order_by('bucket_start')
+        .values('feedback_count', *ACTION_FIELDS.values())
+    )
+    total = sum(counter['feedback_count'] for counter in counters)
+    split = int(total * fraction)
+
+    before = {action: 0.0 for action in ACTION_FIELDS}
+    after = {action: 0.0 for action in ACTION_FIELDS}
+    seen = 0
+    for counter in counters:
+        size = counter['feedback_count']
+        if not size:
+            continue
+        share = min(max(split - seen, 0), size) / size
+        for action, field_name in ACTION_FIELDS.items():
+            before[action] += counter[field_name] * share
+            after[action] += counter[field_name] * (1 - share)
+        seen += size
+    return FeedbackSplit(before, after, split, total - split)
+
+
+# Aggregate updates
+
+def _update_lab_row(prompt_lab_id, create: bool, **updates):
+    update_row(ConfidenceAggregate, {'prompt_lab_id': prompt_lab_id}, create, **updates)
+
+
+def record_feedback(prompt_lab_id, action: str, reason: Optional[str], delta: int = 1, latest: bool = False):
+    """Add (or with delta=-1 remove) one feedback; `latest` extends or restarts the streak"""
+    updates = {'feedback_count': F('feedback_count') + delta}
+    field_name = ACTION_FIELDS.get(action)
+    if field_name:
+        updates[field_name] = F(field_name) + delta
+    if reason:
+        updates['reasoned_feedback_count'] = F('reasoned_feedback_count') + delta
+        updates['reason_length_sum'] = F('reason_length_sum') + delta * len(reason)
+    if latest:
+        updates['streak_length'] = Case(
+            When(streak_action=action, then=F('streak_length') + 1),
+            default=Value(1),
+            output_field=IntegerField()
+        )
+        updates['streak_action'] = Value(action)
+    _update_lab_row(prompt_lab_id, delta > 0, **updates)
+
+
+def record_reason_rating(prompt_lab_id, liked: bool, delta: int = 1, first_for_feedback: bool = False):
+    """Add (or remove) one rating; `first_for_feedback` when it starts (or ends) the feedback's ratings"""
+    field_name = 'liked_count' if liked else 'disliked_count'
+    updates = {field_name: F(field_name) + delta}
+    if first_for_feedback:
+        updates['rated_feedback_count'] = F('rated_feedback_count') + delta
+    _update_lab_row(prompt_lab_id, delta > 0, **updates)
+
+
+def refresh_streak(prompt_lab_id):
+    """Recompute the lab's streak from its newest feedback (after deletes and edits)"""
+    feedback = UserFeedback.objects.filter(in_lab(prompt_lab_id))
+    streak_action, streak_length = _streak(feedback)
+    ConfidenceAggregate.objects.filter(prompt_lab_id=prompt_lab_id).update(
+        streak_action=streak_action, streak_length=streak_length
+    )
+
+
+def rebuild_confidence_aggregates(prompt_lab_ids: Optional[Iterable] = None) -> int:
+    """Recompute aggregates from UserFeedback and ReasonRating rows; returns rows written"""
+    feedback = UserFeedback.objects.annotate(lab_id=lab_of('draft__')).filter(lab_id__isnull=False)
+    ratings = ReasonRating.objects.annotate(lab_id=lab_of('feedback__draft__')).filter(lab_id__isnull=False)
+    stale = ConfidenceAggregate.objects.all()
+    if prompt_lab_ids is not None:
+        prompt_lab_ids = list(prompt_lab_ids)
+        feedback = feedback.filter(lab_id__in=prompt_lab_ids)
+        ratings = ratings.filter(lab_id__in=prompt_lab_ids)
+        stale = stale.filter(prompt_lab_id__in=prompt_lab_ids)
+
+    reasoned = Q(reason__isnull=False) & ~Q(reason='')
+    aggregates: Dict[object, ConfidenceAggregate] = {}
+    for row in feedback.order_by().values('lab_id').annotate(
+        total=Count('id'),
+        reasoned=Count('id', filter=reasoned),
+        reason_length=Sum(Length('reason'), filter=reasoned),
+        **{field_name: Count('id', filter=Q(action=action)) for action, field_name in ACTION_FIELDS.items()}
+    ):
+        aggregate = ConfidenceAggregate(
+            prompt_lab_id=row['lab_id'],
+            feedback_count=row['total'],
+            reasoned_feedback_count=row['reasoned'],
+            reason_length_sum=row['reason_length'] or 0,
+            **{field_name: row[field_name] for field_name in ACTION_FIELDS.values()}
+        )
+        aggregate.streak_action, aggregate.streak_length = _streak(feedback.filter(lab_id=row['lab_id']))
+        aggregates[row['lab_id']] = aggregate
+
+    for row in ratings.order_by().values('lab_id').annotate(
+        liked_total=Count('id', filter=Q(liked=True)),
+        disliked_total=Count('id', filter=Q(liked=False)),
+        rated=Count('feedback_id', distinct=True)
+    ):
+        aggregate = aggregates.setdefault(row['lab_id'], ConfidenceAggregate(prompt_lab_id=row['lab_id']))
+        aggregate.liked_count = row['liked_total']
+        aggregate.disliked_count = row['disliked_total']
+        aggregate.rated_feedback_count = row['rated']
+
+    return replace_rows(stale, aggregates.values())
+
+
+def _streak(feedback) -> Tuple[str, int]:
+    """Action of the most recent feedback and how many in a row share it"""
+    action, length = '', 0
+    for current in feedback.order_by('-created_at', '-id').values_list('action', flat=True).iterator():
+        if length and current != action:
+            break
+        action, length = current, length + 1
+    return action, length
+
+
+# Write updaters (called from feedback_signals)
+
+def apply_feedback_write(write: FeedbackWrite):
+    prompt_lab_id = write.scope.prompt_lab_id
+    if prompt_lab_id is None or not write.changed('action', 'reason', 'created_at'):
+        return
+    previous, current = write.previous, write.current
+    if write.created:
+        record_feedback(prompt_lab_id, current.action, current.reason, latest=True)
+        return
+    if write.changed('action', 'reason'):
+        record_feedback(prompt_lab_id, previous.action, previous.reason, delta=-1)
+        if current is not None:
+            record_feedback(prompt_lab_id, current.action, current.reason)
+    if write.changed('action', 'created_at'):
+        # Deletes and edits can end or reorder the streak; new feedback only extends it
+        refresh_streak(prompt_lab_id)
+
+
+def apply_rating_write(write: RatingWrite):
+    prompt_lab_id = write.scope.prompt_lab_id
+    if prompt_lab_id is None:
+        return
+    rating = write.rating
+    if write.created:
+        first = not ReasonRating.objects.filter(feedback_id=rating.feedback_id).exclude(pk=rating.pk).exists()
+        record_reason_rating(prompt_lab_id, write.current_liked, first_for_feedback=first)
+    elif write.deleted:
+        last = not ReasonRating.objects.filter(feedback_id=rating.feedback_id).exists()
+        record_reason_rating(prompt_lab_id, write.previous_liked, delta=-1, first_for_feedback=last)
+    else:
+        record_reason_rating(prompt_lab_id, write.previous_liked, delta=-1)
+        record_reason_rating(prompt_lab_id, write.current_liked)
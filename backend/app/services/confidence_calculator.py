@@ -1,13 +1,15 @@
 """
 Confidence Calculator Service
-Calculates user and system confidence metrics for learning sessions
+Calculates user and system confidence metrics for learning sessions from
+running per-lab aggregates (see confidence_aggregates)
 """
 import logging
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from django.utils import timezone
-from django.db.models import Count, Avg, Q
-from core.models import PromptLab, PromptLabConfidence, UserFeedback, ReasonRating, Draft
+from core.models import ConfidenceAggregate, PromptLab, PromptLabConfidence, Draft
+from .confidence_aggregates import aggregate_for, split_history
+from .feedback_trigger_counters import ACTION_FIELDS
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +20,7 @@ class ConfidenceCalculator:
     def __init__(self):
         self.logger = logger
     
-    def calculate_user_confidence(self, prompt_lab: PromptLab) -> float:
+    def calculate_user_confidence(self, prompt_lab: PromptLab, aggregate: Optional[ConfidenceAggregate] = None) -> float:
         """
         Calculate user confidence based on feedback consistency and patterns
         
@@ -28,23 +30,21 @@ class ConfidenceCalculator:
         - User's feedback aligns with their previous patterns
         """
         try:
-            # Get all feedback for this prompt lab
-            feedbacks = UserFeedback.objects.filter(
-                draft__email__prompt_lab=prompt_lab
-            ).order_by('created_at')
+            # Running totals for this prompt lab, maintained on each feedback write
+            aggregate = aggregate or aggregate_for(prompt_lab.id)
             
-            if feedbacks.count() < 2:
+            if aggregate.feedback_count < 2:
                 # Not enough data for confidence calculation
                 return 0.1
             
             # Calculate consistency score
-            consistency_score = self._calculate_feedback_consistency(feedbacks)
+            consistency_score = self._calculate_feedback_consistency(aggregate)
             
             # Calculate feedback depth score (how detailed feedback is)
-            depth_score = self._calculate_feedback_depth(feedbacks)
+            depth_score = self._calculate_feedback_depth(aggregate)
             
             # Calculate pattern alignment score
-            pattern_score = self._calculate_pattern_alignment(feedbacks)
+            pattern_score = self._calculate_pattern_alignment(prompt_lab, aggregate)
             
             # Weight the scores
             user_confidence = (
@@ -60,7 +60,7 @@ class ConfidenceCalculator:
             self.logger.error(f"Error calculating user confidence for prompt lab {prompt_lab.id}: {str(e)}")
             return 0.0
     
-    def calculate_system_confidence(self, prompt_lab: PromptLab) -> float:
+    def calculate_system_confidence(self, prompt_lab: PromptLab, aggregate: Optional[ConfidenceAggregate] = None) -> float:
         """
         Calculate system confidence based on reasoning alignment and prediction accuracy
         
@@ -70,20 +70,19 @@ class ConfidenceCalculator:
         - Feedback patterns are learnable/modelable
         """
         try:
-            # Get all drafts and their reasoning ratings for this prompt lab
-            drafts = Draft.objects.filter(email__prompt_lab=prompt_lab)
-            
-            if drafts.count() == 0:
+            if not Draft.objects.filter(email__prompt_lab=prompt_lab).exists():
                 return 0.1
             
+            aggregate = aggregate or aggregate_for(prompt_lab.id)
+            
             # Calculate reasoning alignment score
-            reasoning_score = self._calculate_reasoning_alignment(prompt_lab)
+            reasoning_score = self._calculate_reasoning_alignment(aggregate)
             
             # Calculate prediction accuracy (how well system predicts user actions)
-            prediction_score = self._calculate_prediction_accuracy(prompt_lab)
+            prediction_score = self._calculate_prediction_accuracy(aggregate)
             
             # Calculate learning velocity (how quickly system improves)
-            velocity_score = self._calculate_learning_velocity(prompt_lab)
+            velocity_score = self._calculate_learning_velocity(prompt_lab, aggregate)
             
             # Weight the scores
             system_confidence = (
@@ -99,24 +98,17 @@ class ConfidenceCalculator:
             self.logger.error(f"Error calculating system confidence for prompt lab {prompt_lab.id}: {str(e)}")
             return 0.0
     
-    def _calculate_feedback_consistency(self, feedbacks) -> float:
+    def _calculate_feedback_consistency(self, aggregate: ConfidenceAggregate) -> float:
         """Calculate how consistent user feedback patterns are"""
-        if feedbacks.count() < 3:
+        if aggregate.feedback_count < 3:
             return 0.3  # Low confidence with limited data
         
-        # Group feedback by action type
-        action_counts = feedbacks.values('action').annotate(count=Count('action'))
-        total_feedback = feedbacks.count()
-        
         # Calculate entropy-like measure of consistency
         # More consistent patterns = higher confidence
-        action_distribution = []
-        for action_count in action_counts:
-            proportion = action_count['count'] / total_feedback
-            action_distribution.append(proportion)
+        action_counts = [getattr(aggregate, field_name) for field_name in ACTION_FIELDS.values()]
+        max_proportion = max(action_counts) / aggregate.feedback_count
         
         # If one action dominates (>60%), high consistency
-        max_proportion = max(action_distribution) if action_distribution else 0
         if max_proportion > 0.6:
             return 0.8
         elif max_proportion > 0.4:
@@ -124,23 +116,20 @@ class ConfidenceCalculator:
         else:
             return 0.3  # Very mixed feedback = lower confidence
     
-    def _calculate_feedback_depth(self, feedbacks) -> float:
+    def _calculate_feedback_depth(self, aggregate: ConfidenceAggregate) -> float:
         """Calculate how detailed/thoughtful user feedback is"""
-        if feedbacks.count() == 0:
+        if aggregate.feedback_count == 0:
             return 0.0
         
-        # Count feedback with reasons
-        with_reasons = feedbacks.exclude(reason='').exclude(reason__isnull=True).count()
-        reason_ratio = with_reasons / feedbacks.count()
+        # Share of feedback with reasons
+        reason_ratio = aggregate.reasoned_feedback_count / aggregate.feedback_count
         
-        # Count feedback with reasoning factor ratings
-        with_ratings = feedbacks.filter(reason_ratings__isnull=False).distinct().count()
-        rating_ratio = with_ratings / feedbacks.count() if feedbacks.count() > 0 else 0
+        # Share of feedback with reasoning factor ratings
+        rating_ratio = aggregate.rated_feedback_count / aggregate.feedback_count
         
-        # Calculate average reason length for non-empty reasons
-        non_empty_reasons = feedbacks.exclude(reason='').exclude(reason__isnull=True)
-        if non_empty_reasons.count() > 0:
-            avg_reason_length = sum(len(f.reason) for f in non_empty_reasons) / non_empty_reasons.count()
+        # Average reason length for non-empty reasons
+        if aggregate.reasoned_feedback_count > 0:
+            avg_reason_length = aggregate.reason_length_sum / aggregate.reasoned_feedback_count
             length_score = min(1.0, avg_reason_length / 50)  # Normalize to 50 chars
         else:
             length_score = 0.0
@@ -149,24 +138,20 @@ class ConfidenceCalculator:
         depth_score = (reason_ratio * 0.4 + rating_ratio * 0.4 + length_score * 0.2)
         return max(0.0, min(1.0, depth_score))
     
-    def _calculate_pattern_alignment(self, feedbacks) -> float:
+    def _calculate_pattern_alignment(self, prompt_lab: PromptLab, aggregate: ConfidenceAggregate) -> float:
         """Calculate how well user's recent feedback aligns with their historical patterns"""
-        if feedbacks.count() < 5:
+        if aggregate.feedback_count < 5:
             return 0.5  # Neutral score with limited data
         
         # Split into historical (first 80%) and recent (last 20%)
-        total_count = feedbacks.count()
-        split_point = int(total_count * 0.8)
+        split = split_history(prompt_lab.id, 0.8)
         
-        historical = feedbacks[:split_point]
-        recent = feedbacks[split_point:]
-        
-        if recent.count() == 0:
+        if split.after_count == 0:
             return 0.5
         
         # Calculate action distribution in both periods
-        historical_actions = set(historical.values_list('action', flat=True))
-        recent_actions = set(recent.values_list('action', flat=True))
+        historical_actions = split.actions(split.before)
+        recent_actions = split.actions(split.after)
         
         # Calculate overlap
         action_overlap = len(historical_actions.intersection(recent_actions))
@@ -178,21 +163,15 @@ class ConfidenceCalculator:
         alignment_score = action_overlap / total_unique_actions
         return max(0.3, min(1.0, alignment_score))
     
-    def _calculate_reasoning_alignment(self, prompt_lab: PromptLab) -> float:
+    def _calculate_reasoning_alignment(self, aggregate: ConfidenceAggregate) -> float:
         """Calculate how well reasoning factors align with user preferences"""
-        # Get all reason ratings for this prompt lab
-        reason_ratings = ReasonRating.objects.filter(
-            feedback__draft__email__prompt_lab=prompt_lab
-        )
+        total_count = aggregate.liked_count + aggregate.disliked_count
         
-        if reason_ratings.count() == 0:
+        if total_count == 0:
             return 0.3  # Low confidence without rating data
         
         # Calculate percentage of liked vs disliked ratings
-        liked_count = reason_ratings.filter(liked=True).count()
-        total_count = reason_ratings.count()
-        
-        like_ratio = liked_count / total_count
+        like_ratio = aggregate.liked_count / total_count
         
         # Higher like ratio = better alignment = higher confidence
         # Transform ratio to confidence score
@@ -205,29 +184,24 @@ class ConfidenceCalculator:
         else:
             return 0.3
     
-    def _calculate_prediction_accuracy(self, prompt_lab: PromptLab) -> float:
+    def _calculate_prediction_accuracy(self, aggregate: ConfidenceAggregate) -> float:
         """Calculate how accurately system can predict user actions"""
         # This is a placeholder for future ML model predictions
         # For now, use reasoning alignment as proxy
-        return self._calculate_reasoning_alignment(prompt_lab)
+        return self._calculate_reasoning_alignment(aggregate)
     
-    def _calculate_learning_velocity(self, prompt_lab: PromptLab) -> float:
+    def _calculate_learning_velocity(self, prompt_lab: PromptLab, aggregate: ConfidenceAggregate) -> float:
         """Calculate how quickly the system is improving"""
-        # Get feedback over time and look for improvement trends
-        feedbacks = UserFeedback.objects.filter(
-            draft__email__prompt_lab=prompt_lab
-        ).order_by('created_at')
-        
-        if feedbacks.count() < 5:
+        if aggregate.feedback_count < 5:
             return 0.4  # Moderate score with limited data
         
-        # Look at acceptance rate over time
-        total_count = feedbacks.count()
-        first_half = feedbacks[:total_count//2]
-        second_half = feedbacks[total_count//2:]
+        # Look at acceptance rate over time, from hourly feedback buckets
+        split = split_history(prompt_lab.id, 0.5)
+        if not split.before_count or not split.after_count:
+            return 0.4
         
-        first_accept_rate = first_half.filter(action='accept').count() / first_half.count()
-        second_accept_rate = second_half.filter(action='accept').count() / second_half.count()
+        first_accept_rate = split.before['accept'] / split.before_count
+        second_accept_rate = split.after['accept'] / split.after_count
         
         improvement = second_accept_rate - first_accept_rate
         
@@ -262,15 +236,15 @@ class ConfidenceCalculator:
     def is_cold_start_complete(self, prompt_lab: PromptLab) -> bool:
         """Check if cold start phase is complete"""
         # Cold start is complete when we have sufficient feedback and reasonable confidence
-        feedbacks = UserFeedback.objects.filter(draft__email__prompt_lab=prompt_lab)
+        aggregate = aggregate_for(prompt_lab.id)
         
         # Need minimum amount of feedback
-        if feedbacks.count() < 5:
+        if aggregate.feedback_count < 5:
             return False
         
         # Need at least basic confidence levels
-        user_conf = self.calculate_user_confidence(prompt_lab)
-        system_conf = self.calculate_system_confidence(prompt_lab)
+        user_conf = self.calculate_user_confidence(prompt_lab, aggregate)
+        system_conf = self.calculate_system_confidence(prompt_lab, aggregate)
         
         # Lower thresholds for cold start completion
         return user_conf >= 0.4 and system_conf >= 0.4
@@ -278,9 +252,10 @@ class ConfidenceCalculator:
     def update_prompt_lab_confidence(self, prompt_lab: PromptLab) -> PromptLabConfidence:
         """Calculate and update confidence metrics for a prompt lab"""
         try:
-            # Calculate metrics
-            user_confidence = self.calculate_user_confidence(prompt_lab)
-            system_confidence = self.calculate_system_confidence(prompt_lab)
+            # Calculate metrics from the lab's running aggregates
+            aggregate = aggregate_for(prompt_lab.id)
+            user_confidence = self.calculate_user_confidence(prompt_lab, aggregate)
+            system_confidence = self.calculate_system_confidence(prompt_lab, aggregate)
             
             # Get or create confidence tracker
             confidence_tracker, created = PromptLabConfidence.objects.get_or_create(
@@ -303,11 +278,10 @@ class ConfidenceCalculator:
                 confidence_tracker.confidence_trend = confidence_trend
             
             # Update detailed breakdown
-            feedbacks = UserFeedback.objects.filter(draft__email__prompt_lab=prompt_lab)
-            confidence_tracker.feedback_consistency_score = self._calculate_feedback_consistency(feedbacks)
-            confidence_tracker.reasoning_alignment_score = self._calculate_reasoning_alignment(prompt_lab)
-            confidence_tracker.total_feedback_count = feedbacks.count()
-            confidence_tracker.consistent_feedback_streak = self._calculate_consistency_streak(feedbacks)
+            confidence_tracker.feedback_consistency_score = self._calculate_feedback_consistency(aggregate)
+            confidence_tracker.reasoning_alignment_score = self._calculate_reasoning_alignment(aggregate)
+            confidence_tracker.total_feedback_count = aggregate.feedback_count
+            confidence_tracker.consistent_feedback_streak = self._calculate_consistency_streak(aggregate)
             
             confidence_tracker.save()
             return confidence_tracker
@@ -321,28 +295,10 @@ class ConfidenceCalculator:
             )
             return confidence_tracker
     
-    def _calculate_consistency_streak(self, feedbacks) -> int:
+    def _calculate_consistency_streak(self, aggregate: ConfidenceAggregate) -> int:
         """Calculate current streak of consistent feedback"""
-        if feedbacks.count() == 0:
+        if aggregate.feedback_count < 2:
             return 0
         
-        # Look at last 5 feedback items
-        recent_feedbacks = list(feedbacks.order_by('-created_at')[:5])
-        
-        if len(recent_feedbacks) < 2:
-            return 0
-        
-        # Check if recent actions are similar
-        recent_actions = [f.action for f in recent_feedbacks]
-        
-        # Count streak of same action from most recent
-        streak = 1
-        current_action = recent_actions[0]
-        
-        for action in recent_actions[1:]:
-            if action == current_action:
-                streak += 1
-            else:
-                break
-        
-        return streak
\ No newline at end of file
+        # Streak of same action from most recent, looking at the last 5 feedback items
+        return min(aggregate.streak_length, 5)
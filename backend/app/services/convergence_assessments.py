@@ -0,0 +1,106 @@
+"""
+Convergence Assessments
+Persisted convergence assessments per prompt lab, so repeated convergence
+checks reuse the last result instead of rerunning every detector query:
+
+- each fresh assessment is stored as a ConvergenceAssessment row; the rows
+  form the lab's convergence history
+- the lab's latest row stays current until new prompt scores, feedback or
+  optimization iterations arrive, which clear it through model signals
+- writes that bypass model signals (bulk_create, queryset.update) can call
+  invalidate_convergence, or callers can ask the detector for a refresh
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+
+from core.models import ConvergenceAssessment, PromptLab, SystemPrompt
+from .feedback_signals import FeedbackWrite
+
+logger = logging.getLogger(__name__)
+
+HISTORY_LIMIT = 50
+
+
+def current_assessment(prompt_lab_id) -> Optional[ConvergenceAssessment]:
+    """The lab's latest assessment if no new data has arrived since"""
+    return ConvergenceAssessment.objects.filter(prompt_lab_id=prompt_lab_id, is_current=True).first()
+
+
+def record_assessment(prompt_lab: PromptLab, assessment: Dict[str, Any]) -> ConvergenceAssessment:
+    """Store a fresh assessment as the lab's current one"""
+    with transaction.atomic():
+        invalidate_convergence(prompt_lab.id)
+        return ConvergenceAssessment.objects.create(
+            prompt_lab=prompt_lab,
+            converged=bool(assessment.get('converged', False)),
+            confidence_score=assessment.get('confidence_score', 0.0),
+            factors=assessment.get('factors', {}),
+            assessment=assessment,
+            optimization_iterations=prompt_lab.optimization_iterations,
+            total_feedback_collected=prompt_lab.total_feedback_collected
+        )
+
+
+def invalidate_convergence(prompt_lab_id) -> int:
+    """Mark the lab's current assessment stale; returns rows updated"""
+    return ConvergenceAssessment.objects.filter(prompt_lab_id=prompt_lab_id, is_current=True).update(is_current=False)
+
+
+def assessment_history(prompt_lab_id, limit: int = HISTORY_LIMIT) -> List[ConvergenceAssessment]:
+    """The lab's stored assessments, newest first"""
+    return list(ConvergenceAssessment.objects.filter(prompt_lab_id=prompt_lab_id).order_by('-created_at', '-id')[:limit])
+
+
+# Signal handlers
+
+def connect_convergence_invalidation():
+    """Clear current assessments when the data they were computed from changes (feedback: feedback_signals)"""
+    post_init.connect(_remember_prompt, sender=SystemPrompt, dispatch_uid='convergence_prompt_init')
+    post_save.connect(_on_prompt_saved, sender=SystemPrompt, dispatch_uid='convergence_prompt_save')
+    post_init.connect(_remember_lab, sender=PromptLab, dispatch_uid='convergence_lab_init')
+    post_save.connect(_on_lab_saved, sender=PromptLab, dispatch_uid='convergence_lab_save')
+
+
+def apply_feedback_write(write: FeedbackWrite):
+    """Feedback updater (called from feedback_signals)"""
+    if write.scope.prompt_lab_id is not None and write.changed('action'):
+        invalidate_convergence(write.scope.prompt_lab_id)
+
+
+def _remember_prompt(sender, instance, **kwargs):
+    instance._convergence_score = instance.__dict__.get('performance_score')
+
+
+def _on_prompt_saved(sender, instance, created, **kwargs):
+    previous_score = getattr(instance, '_convergence_score', None)
+    _remember_prompt(sender, instance)
+    changed = instance.performance_score is not None if created else previous_score != instance.performance_score
+    if instance.prompt_lab_id is None or not changed:
+        return
+    try:
+        with transaction.atomic():
+            invalidate_convergence(instance.prompt_lab_id)
+    except Exception as e:
+        logger.warning(f"Could not invalidate convergence assessment for prompt {instance.pk}: {e}")
+
+
+def _remember_lab(sender, instance, **kwargs):
+    instance._convergence_state = (
+        instance.__dict__.get('optimization_iterations'), instance.__dict__.get('total_feedback_collected')
+    )
+
+
+def _on_lab_saved(sender, instance, created, **kwargs):
+    previous_state = getattr(instance, '_convergence_state', None)
+    _remember_lab(sender, instance)
+    if created or previous_state == instance._convergence_state:
+        return
+    try:
+        with transaction.atomic():
+            invalidate_convergence(instance.pk)
+    except Exception as e:
+        logger.warning(f"Could not invalidate convergence assessment for prompt lab {instance.pk}: {e}")
@@ -1,6 +1,8 @@
 """
 Convergence Detector Service
-Detects when optimization loops have converged and should stop learning
+Detects when optimization loops have converged and should stop learning;
+assessments are persisted and reused until new data arrives (see
+convergence_assessments)
 """
 import logging
 from typing import Dict, List, Any, Optional, Tuple
@@ -8,6 +10,8 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 from django.db.models import Avg, Count, Q
 from core.models import PromptLab, SystemPrompt, UserFeedback
+from .convergence_assessments import assessment_history, current_assessment, record_assessment
+from .lab_snapshot import LabSnapshot
 
 logger = logging.getLogger(__name__)
 
@@ -57,8 +61,11 @@ class ConvergenceDetector:
                     'assessment_timestamp': timezone.now().isoformat()
                 }
             
+            # Scores and feedback for every check below, loaded once
+            snapshot = self.load_snapshot(prompt_lab)
+            
             # Check if we should even run convergence check (save compute)
-            optimization_decision = compute_optimizer.should_continue_optimization(prompt_lab)
+            optimization_decision = compute_optimizer.should_continue_optimization(prompt_lab, snapshot)
             if not optimization_decision.get('continue', True):
                 # Force convergence if compute costs too high
                 return {
@@ -78,14 +85,14 @@ class ConvergenceDetector:
                 }
             
             # Check all convergence factors
-            performance_plateau = self.detect_performance_plateau(prompt_lab)
+            performance_plateau = self.detect_performance_plateau(prompt_lab, snapshot)
             confidence_convergence = self.check_confidence_convergence(prompt_lab)
-            feedback_stability = self.detect_feedback_stability(prompt_lab)
+            feedback_stability = self.detect_feedback_stability(prompt_lab, snapshot)
             minimum_iterations = self._check_minimum_iterations(prompt_lab)
             minimum_feedback = self._check_minimum_feedback(prompt_lab)
             
             # Check for negative trends (early exit if performance declining)
-            negative_trend = self._check_negative_performance_trend(prompt_lab)
+            negative_trend = self._check_negative_performance_trend(prompt_lab, snapshot)
             if negative_trend:
                 return {
                     'converged': True,
@@ -121,7 +128,9 @@ class ConvergenceDetector:
             prerequisites_met = minimum_iterations and minimum_feedback
             
             converged = key_factors_met and prerequisites_met
-            confidence_score = self.calculate_convergence_confidence(prompt_lab)
+            confidence_score = self.calculate_convergence_confidence(
+                prompt_lab, snapshot, plateau=performance_plateau, stability=feedback_stability
+            )
             
             # Generate recommendations based on current state
             recommendations = self.generate_recommendations(prompt_lab, factors, converged)
@@ -144,35 +153,27 @@ class ConvergenceDetector:
                 'error': str(e)
             }
     
-    def detect_performance_plateau(self, prompt_lab: PromptLab) -> bool:
+    def load_snapshot(self, prompt_lab: PromptLab) -> LabSnapshot:
+        """Load the score history and recent feedback every check reads"""
+        return LabSnapshot.load(prompt_lab, self.PERFORMANCE_WINDOW_SIZE, self.FEEDBACK_STABILITY_WINDOW)
+    
+    def detect_performance_plateau(self, prompt_lab: PromptLab, snapshot: Optional[LabSnapshot] = None) -> bool:
         """Detect if performance has plateaued (no significant improvement)"""
         try:
-            # Get recent prompt performance scores
-            recent_prompts = SystemPrompt.objects.filter(
-                prompt_lab=prompt_lab,
-                performance_score__isnull=False
-            ).order_by('-version')[:self.PERFORMANCE_WINDOW_SIZE]
+            snapshot = snapshot or self.load_snapshot(prompt_lab)
+            window = self.PERFORMANCE_WINDOW_SIZE
             
-            if recent_prompts.count() < self.PERFORMANCE_WINDOW_SIZE:
+            if snapshot.recent_scores(window) is None:
                 return False  # Not enough data to detect plateau
             
-            scores = [prompt.performance_score for prompt in recent_prompts]
-            
-            if not scores:
-                return False
-            
             # Use progressive thresholds based on iteration count
             threshold = self._get_progressive_threshold(prompt_lab)
             
             # Check if performance improvement is minimal
-            max_score = max(scores)
-            min_score = min(scores)
-            performance_range = max_score - min_score
+            performance_range = snapshot.score_range(window)
             
-            # Also check trend: is the latest score significantly better than earlier ones?
-            latest_score = scores[0]  # Most recent (first in reverse order)
-            earliest_score = scores[-1]  # Oldest in this window
-            improvement = latest_score - earliest_score
+            # Also check trend: is the latest score significantly better than the oldest in the window?
+            improvement = snapshot.score_improvement(window)
             
             # Plateau detected if both range and improvement are below threshold
             plateau_detected = (
@@ -182,6 +183,7 @@ class ConvergenceDetector:
             
             self.logger.info(f"Performance plateau check for prompt lab {prompt_lab.id}: "
                            f"range={performance_range:.3f}, improvement={improvement:.3f}, "
+                           f"slope={snapshot.score_slope(window):.4f}, variance={snapshot.score_variance(window):.5f}, "
                            f"threshold={threshold:.3f}, plateau={plateau_detected}")
             
             return plateau_detected
@@ -218,29 +220,20 @@ class ConvergenceDetector:
             self.logger.error(f"Error checking confidence convergence: {str(e)}")
             return False
     
-    def detect_feedback_stability(self, prompt_lab: PromptLab) -> bool:
+    def detect_feedback_stability(self, prompt_lab: PromptLab, snapshot: Optional[LabSnapshot] = None) -> bool:
         """Detect if user feedback patterns have stabilized"""
         try:
-            # Get recent feedback
-            recent_feedback = UserFeedback.objects.filter(
-                draft__email__prompt_lab=prompt_lab
-            ).order_by('-created_at')[:self.FEEDBACK_STABILITY_WINDOW]
+            snapshot = snapshot or self.load_snapshot(prompt_lab)
+            window = self.FEEDBACK_STABILITY_WINDOW
             
-            if recent_feedback.count() < self.FEEDBACK_STABILITY_WINDOW:
+            if snapshot.recent_actions(window) is None:
                 return False  # Not enough feedback to assess stability
             
-            # Analyze action patterns
-            actions = [f.action for f in recent_feedback]
-            
             # Calculate consistency: most common action should dominate
-            from collections import Counter
-            action_counts = Counter(actions)
-            most_common_action, most_common_count = action_counts.most_common(1)[0]
-            
-            consistency_ratio = most_common_count / len(actions)
+            consistency_ratio = snapshot.action_consistency(window)
             
             # Check for acceptance pattern specifically (indicates satisfaction)
-            accept_ratio = action_counts.get('accept', 0) / len(actions)
+            accept_ratio = snapshot.action_ratio(window, 'accept')
             
             # Stability detected if either:
             # 1. High consistency in any action, OR
@@ -260,7 +253,7 @@ class ConvergenceDetector:
             self.logger.error(f"Error detecting feedback stability: {str(e)}")
             return False
     
-    def check_early_stopping_criteria(self, prompt_lab: PromptLab) -> bool:
+    def check_early_stopping_criteria(self, prompt_lab: PromptLab, snapshot: Optional[LabSnapshot] = None) -> bool:
         """Check if early stopping conditions are met (shouldn't stop early)"""
         try:
             # Early stopping should NOT happen if:
@@ -271,18 +264,9 @@ class ConvergenceDetector:
             insufficient_iterations = prompt_lab.optimization_iterations < self.MINIMUM_ITERATIONS
             insufficient_feedback = prompt_lab.total_feedback_collected < self.MINIMUM_FEEDBACK_COUNT
             
-            # Check for recent negative performance trend
-            recent_prompts = SystemPrompt.objects.filter(
-                prompt_lab=prompt_lab,
-                performance_score__isnull=False
-            ).order_by('-version')[:3]
-            
-            negative_trend = False
-            if recent_prompts.count() >= 3:
-                scores = [p.performance_score for p in recent_prompts]
-                # Check if performance is declining
-                if scores[0] < scores[-1]:  # Latest < oldest
-                    negative_trend = True
+            # Check for recent negative performance trend (latest < oldest of the last 3)
+            snapshot = snapshot or self.load_snapshot(prompt_lab)
+            negative_trend = snapshot.recent_scores(3) is not None and snapshot.score_improvement(3) < 0
             
             # Should NOT stop early if any of these conditions are true
             should_not_stop = insufficient_iterations or insufficient_feedback or negative_trend
@@ -293,13 +277,23 @@ class ConvergenceDetector:
             self.logger.error(f"Error checking early stopping criteria: {str(e)}")
             return False
     
-    def calculate_convergence_confidence(self, prompt_lab: PromptLab) -> float:
-        """Calculate confidence score for convergence decision"""
+    def calculate_convergence_confidence(self, prompt_lab: PromptLab, snapshot: Optional[LabSnapshot] = None,
+                                         plateau: Optional[bool] = None, stability: Optional[bool] = None) -> float:
+        """Calculate confidence score for convergence decision
+        
+        Plateau and stability results the caller already has are reused.
+        """
         try:
             confidence_factors = []
+            if plateau is None or stability is None:
+                snapshot = snapshot or self.load_snapshot(prompt_lab)
+            if plateau is None:
+                plateau = self.detect_performance_plateau(prompt_lab, snapshot)
+            if stability is None:
+                stability = self.detect_feedback_stability(prompt_lab, snapshot)
             
             # Factor 1: Performance stability
-            if self.detect_performance_plateau(prompt_lab):
+            if plateau:
                 confidence_factors.append(0.3)  # 30% weight
             else:
                 confidence_factors.append(0.0)
@@ -311,7 +305,7 @@ class ConvergenceDetector:
                 confidence_factors.append(0.0)
             
             # Factor 3: Feedback stability
-            if self.detect_feedback_stability(prompt_lab):
+            if stability:
                 confidence_factors.append(0.25)  # 25% weight
             else:
                 confidence_factors.append(0.0)
@@ -433,20 +427,37 @@ class ConvergenceDetector:
             self.logger.error(f"Error determining convergence check timing: {str(e)}")
             return False
     
+    def get_assessment(self, prompt_lab: PromptLab, refresh: bool = False) -> Dict[str, Any]:
+        """Current convergence assessment, reusing the stored one until new scores, feedback or iterations arrive"""
+        if not refresh:
+            try:
+                cached = current_assessment(prompt_lab.id)
+                if cached is not None:
+                    return cached.assessment
+            except Exception as e:
+                self.logger.warning(f"Could not load stored convergence assessment for prompt lab {prompt_lab.id}: {str(e)}")
+        
+        assessment = self.assess_convergence(prompt_lab)
+        if 'error' not in assessment:
+            try:
+                record_assessment(prompt_lab, assessment)
+            except Exception as e:
+                self.logger.warning(f"Could not store convergence assessment for prompt lab {prompt_lab.id}: {str(e)}")
+        return assessment
+    
     def get_convergence_history(self, prompt_lab: PromptLab) -> List[Dict[str, Any]]:
-        """Get historical convergence assessments for a prompt lab"""
+        """Get historical convergence assessments for a prompt lab, newest first"""
         try:
-            # For now, return current assessment as history
-            # In production, could store historical assessments in database
-            
-            current_assessment = self.assess_convergence(prompt_lab)
+            # Bring the history up to date if new data arrived since the last assessment
+            self.get_assessment(prompt_lab)
             
             return [{
-                'timestamp': current_assessment.get('assessment_timestamp'),
-                'converged': current_assessment.get('converged', False),
-                'confidence_score': current_assessment.get('confidence_score', 0.0),
-                'factors': current_assessment.get('factors', {})
-            }]
+                'timestamp': row.assessment.get('assessment_timestamp', row.created_at.isoformat()),
+                'converged': row.converged,
+                'confidence_score': row.confidence_score,
+                'factors': row.factors,
+                'is_current': row.is_current
+            } for row in assessment_history(prompt_lab.id)]
             
         except Exception as e:
             self.logger.error(f"Error getting convergence history: {str(e)}")
@@ -457,8 +468,8 @@ class ConvergenceDetector:
         try:
             # Validate that forced convergence is appropriate
             if not override_confidence:
-                current_assessment = self.assess_convergence(prompt_lab)
-                if current_assessment.get('confidence_score', 0) < 0.5:
+                assessment = self.get_assessment(prompt_lab)
+                if assessment.get('confidence_score', 0) < 0.5:
                     return {
                         'success': False,
                         'error': 'Convergence confidence too low for manual override without force flag'
@@ -490,38 +501,30 @@ class ConvergenceDetector:
         """Check if minimum feedback count has been reached"""
         return prompt_lab.total_feedback_collected >= self.MINIMUM_FEEDBACK_COUNT
     
-    def _check_negative_performance_trend(self, prompt_lab: PromptLab) -> bool:
+    def _check_negative_performance_trend(self, prompt_lab: PromptLab, snapshot: Optional[LabSnapshot] = None) -> bool:
         """Check if performance is declining (early exit condition)"""
         try:
-            # Need at least 3 data points to detect trend
-            recent_prompts = SystemPrompt.objects.filter(
-                prompt_lab=prompt_lab,
-                performance_score__isnull=False
-            ).order_by('-version')[:3]
+            snapshot = snapshot or self.load_snapshot(prompt_lab)
             
-            if recent_prompts.count() < 3:
+            # Need at least 3 data points to detect trend
+            scores = snapshot.recent_scores(3)
+            if scores is None:
                 return False
             
-            scores = [p.performance_score for p in recent_prompts]
-            
             # Check if performance is consistently declining
             # scores[0] is most recent, scores[2] is oldest
-            declining = scores[0] < scores[1] < scores[2]
+            declining = snapshot.strictly_declining(3)
             
             # Also check if recent drop is significant (>5%)
-            if len(scores) >= 2:
-                # scores[0] is most recent, scores[1] is previous
-                # If recent is lower than previous, it's a drop
-                if scores[0] < scores[1]:
-                    drop_percentage = (scores[1] - scores[0]) / scores[1] if scores[1] > 0 else 0
-                    significant_drop = drop_percentage > 0.05
-                else:
-                    significant_drop = False
-                
-                return declining or significant_drop
+            # scores[0] is most recent, scores[1] is previous
+            if scores[0] < scores[1]:
+                drop_percentage = (scores[1] - scores[0]) / scores[1] if scores[1] > 0 else 0
+                significant_drop = drop_percentage > 0.05
+            else:
+                significant_drop = False
             
-            return declining
+            return bool(declining or significant_drop)
             
         except Exception as e:
             self.logger.error(f"Error checking negative trend: {str(e)}")
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,72 @@
+"""
+Counter Tables
+Shared plumbing for the tables that keep running totals beside the rows they
+count (feedback trigger counters, confidence aggregates, daily metrics
+rollups):
+
+- update_row() applies F() deltas with one UPDATE and only creates the row for
+  an addition; removals never create rows, since the lab may be mid-deletion
+- writes that bypass model signals (bulk_create, queryset.update) are not
+  counted; rebuild() (or the rebuild_counters command) recomputes the tables
+  from their source rows afterwards
+- in_lab() and lab_of() attribute feedback and drafts to their email's prompt
+  lab, falling back to the draft prompt's lab, like feedback_signals does
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.db.models.functions import Coalesce
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Table name -> rebuild function taking an optional list of prompt lab ids
+TABLES = {
+    'trigger_counters': 'app.services.feedback_trigger_counters.rebuild_trigger_counters',
+    'confidence_aggregates': 'app.services.confidence_aggregates.rebuild_confidence_aggregates',
+    'metrics_rollups': 'app.services.metrics_rollups.rebuild_metrics_rollups',
+}
+
+
+def in_lab(prompt_lab_id, draft_path: str = 'draft__') -> Q:
+    """Filter for rows whose draft (at `draft_path`) belongs to the lab"""
+    return Q(**{f'{draft_path}email__prompt_lab_id': prompt_lab_id}) | Q(**{
+        f'{draft_path}email__prompt_lab__isnull': True,
+        f'{draft_path}system_prompt__prompt_lab_id': prompt_lab_id,
+    })
+
+
+def lab_of(draft_path: str = 'draft__') -> Coalesce:
+    """Lab id of the draft at `draft_path`, for annotate()"""
+    return Coalesce(f'{draft_path}email__prompt_lab_id', f'{draft_path}system_prompt__prompt_lab_id')
+
+
+def update_row(model, key: Dict[str, Any], create: bool, **updates):
+    """One UPDATE when the row exists; it is only created when `create` is set"""
+    rows = model.objects.filter(**key)
+    if not rows.update(**updates) and create:
+        model.objects.get_or_create(**key)
+        rows.update(**updates)
+
+
+def replace_rows(stale: QuerySet, rows: Iterable) -> int:
+    """Swap the stale rows for recomputed ones in one transaction; returns rows written"""
+    rows = list(rows)
+    with transaction.atomic():
+        stale.delete()
+        stale.model.objects.bulk_create(rows, batch_size=1000)
+    logger.info(f"Rebuilt {len(rows)} {stale.model._meta.verbose_name_plural}")
+    return len(rows)
+
+
+def rebuild(prompt_lab_ids: Optional[Iterable] = None, tables: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Recompute counter tables (default: all) from their source rows; returns rows written per table"""
+    if prompt_lab_ids is not None:
+        prompt_lab_ids = list(prompt_lab_ids)
+    return {
+        table: import_string(TABLES[table])(prompt_lab_ids)
+        for table in (tables or TABLES)
+    }
@@ -0,0 +1,236 @@
+"""
+Deadline Planner
+Sizes fast optimization runs to a wall-clock budget from measured provider
+latency:
+
+- latency profiles (p50/p95 latency and completion throughput per model) come
+  from recent LLMUsageRecord rows, with conservative defaults for models that
+  have no history yet
+- the plan picks the candidate count, test case count, evaluation concurrency
+  and max_tokens whose p95 duration fits the budget
+- a Deadline travels with the run in a context variable; evaluators stop
+  starting cases once it passes and cut in-flight calls at it, so the run
+  returns its best-so-far result
+- the realized time is reported against the planned time
+"""
+
+import asyncio
+import contextvars
+import logging
+import math
+import statistics
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Assumed until a model has enough recorded calls
+DEFAULT_P50_MS = 1500.0
+DEFAULT_P95_MS = 4000.0
+DEFAULT_TOKENS_PER_SECOND = 40.0
+DEFAULT_COMPLETION_TOKENS = 250
+MIN_SAMPLES = 5
+
+# Provider calls per evaluated case: response generation, reward scoring, perplexity
+SCORING_CALLS_PER_CASE = 2
+# Share of the budget the plan may fill; the rest absorbs DB work and tail latency
+BUDGET_SAFETY = 0.85
+# Response lengths tried, longest first; shorter ones only when the longer cannot fit
+MAX_TOKENS_OPTIONS = (300, 200, 150, 100)
+# Smallest evaluation worth running at full response length (candidates x cases)
+USEFUL_EVALUATIONS = 10
+
+
+@dataclass
+class LatencyProfile:
+    """Measured latency and throughput of one model"""
+    model: str
+    p50_ms: float = DEFAULT_P50_MS
+    p95_ms: float = DEFAULT_P95_MS
+    tokens_per_second: float = DEFAULT_TOKENS_PER_SECOND  # Completion tokens per second of latency
+    completion_tokens: int = DEFAULT_COMPLETION_TOKENS  # Median completion length
+    samples: int = 0
+
+    def call_seconds(self, max_tokens: Optional[int] = None) -> float:
+        """p95 duration of one call, shortened by the generation time max_tokens cuts off"""
+        seconds = self.p95_ms / 1000
+        if max_tokens and max_tokens < self.completion_tokens and self.tokens_per_second > 0:
+            saved = (self.completion_tokens - max_tokens) / self.tokens_per_second
+            seconds = max(seconds - saved, seconds * 0.25)
+        return seconds
+
+
+def load_latency_profile(model: str, window: int = 200) -> LatencyProfile:
+    """Profile a model from its most recent successful calls"""
+    from core.models import LLMUsageRecord
+
+    rows = list(
+        LLMUsageRecord.objects.filter(model=model, success=True)
+        .order_by('-created_at')
+        .values_list('latency_ms', 'completion_tokens')[:window]
+    )
+    if len(rows) < MIN_SAMPLES:
+        return LatencyProfile(model=model, samples=len(rows))
+
+    latencies = sorted(latency for latency, _ in rows)
+    throughputs = [tokens / (latency / 1000) for latency, tokens in rows if tokens and latency > 0]
+    return LatencyProfile(
+        model=model,
+        p50_ms=statistics.median(latencies),
+        p95_ms=latencies[int(0.95 * (len(latencies) - 1))],
+        tokens_per_second=statistics.median(throughputs) if throughputs else DEFAULT_TOKENS_PER_SECOND,
+        completion_tokens=int(statistics.median(tokens for _, tokens in rows)) or DEFAULT_COMPLETION_TOKENS,
+        samples=len(rows)
+    )
+
+
+@dataclass
+class DeadlinePlan:
+    """How much optimization work fits the time budget"""
+    time_budget: float
+    candidates: int
+    test_cases: int
+    concurrency: int
+    max_tokens: int
+    rewrite_seconds: float
+    evaluation_seconds: float
+    fits: bool  # False when even the smallest plan exceeds the budget
+
+    @property
+    def planned_seconds(self) -> float:
+        return self.rewrite_seconds + self.evaluation_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), 'planned_seconds': self.planned_seconds}
+
+
+def plan_fast_optimization(
+    time_budget: float,
+    generation: LatencyProfile,
+    scoring: Optional[LatencyProfile] = None,
+    max_concurrency: int = 4,
+    max_candidates: int = 5,
+    max_test_cases: int = 15,
+    min_test_cases: int = 3
+) -> DeadlinePlan:
+    """Largest candidates x cases evaluation whose p95 duration fits the budget.
+
+    Each candidate is A/B tested against the baseline, so every candidate adds
+    two prompt evaluations; prompt evaluations run in parallel up to the
+    provider's concurrency ceiling and their cases run one after another.
+    """
+    scoring = scoring or generation
+    usable = time_budget * BUDGET_SAFETY
+    rewrite_seconds = generation.call_seconds()
+    best = None
+
+    for max_tokens in MAX_TOKENS_OPTIONS:
+        per_case = generation.call_seconds(max_tokens) + SCORING_CALLS_PER_CASE * scoring.call_seconds()
+        for candidates in range(1, max_candidates + 1):
+            concurrency = max(1, min(2 * candidates, max_concurrency))
+            waves = math.ceil(2 * candidates / concurrency)
+            budget_left = usable - rewrite_seconds
+            cases = min(max_test_cases, int(budget_left / (waves * per_case))) if budget_left > 0 else 0
+            if cases < min_test_cases:
+                continue
+            plan = DeadlinePlan(
+                time_budget=time_budget,
+                candidates=candidates,
+                test_cases=cases,
+                concurrency=concurrency,
+                max_tokens=max_tokens,
+                rewrite_seconds=rewrite_seconds,
+                evaluation_seconds=waves * cases * per_case,
+                fits=True
+            )
+            if best is None or plan.candidates * plan.test_cases > best.candidates * best.test_cases:
+                best = plan
+        if best and best.candidates * best.test_cases >= USEFUL_EVALUATIONS:
+            break
+
+    if best is None:
+        # Nothing fits: run the smallest plan and let the deadline cut it short
+        max_tokens = MAX_TOKENS_OPTIONS[-1]
+        per_case = generation.call_seconds(max_tokens) + SCORING_CALLS_PER_CASE * scoring.call_seconds()
+        best = DeadlinePlan(
+            time_budget=time_budget,
+            candidates=1,
+            test_cases=min_test_cases,
+            concurrency=min(2, max(1, max_concurrency)),
+            max_tokens=max_tokens,
+            rewrite_seconds=rewrite_seconds,
+            evaluation_seconds=math.ceil(2 / min(2, max(1, max_concurrency))) * min_test_cases * per_case,
+            fits=False
+        )
+    return best
+
+
+class Deadline:
+    """Wall-clock deadline of a planned run"""
+
+    def __init__(self, seconds: float, plan: Optional[DeadlinePlan] = None):
+        self.seconds = seconds
+        self.plan = plan
+        self.started = time.monotonic()
+        self.expires = self.started + seconds
+        self.cut_short = False  # Set once work was skipped or cut off for time
+
+    @property
+    def max_tokens(self) -> Optional[int]:
+        return self.plan.max_tokens if self.plan else None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    async def bound(self, awaitable: Awaitable[T]) -> T:
+        """Await, raising asyncio.TimeoutError if the deadline passes first"""
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.remaining())
+        except asyncio.TimeoutError:
+            self.cut_short = True
+            raise
+
+    def report(self) -> Dict[str, Any]:
+        """Realized vs planned time"""
+        realized = self.elapsed()
+        report = {
+            'time_budget': self.seconds,
+            'realized_seconds': realized,
+            'met_budget': realized <= self.seconds,
+            'cut_short': self.cut_short,
+        }
+        if self.plan:
+            report['plan'] = self.plan.to_dict()
+            report['planned_seconds'] = self.plan.planned_seconds
+            report['realized_vs_planned'] = realized / self.plan.planned_seconds if self.plan.planned_seconds else None
+        return report
+
+
+_current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    'run_deadline', default=None
+)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """Make the deadline the one evaluators honor for the duration of the block"""
+    reset = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(reset)
@@ -7,14 +7,14 @@ import random
 import uuid
 from typing import List, Dict, Any, Optional
 from core.models import SystemPrompt
-from .unified_llm_provider import get_llm_provider
+from .llm_router import get_task_provider, TaskType
 
 
 class EvaluationCaseGenerator:
     """Service for generating synthetic evaluation cases from prompts"""
     
     def __init__(self):
-        self.llm_provider = get_llm_provider()
+        self.llm_provider = get_task_provider(TaskType.EXPECTED_OUTPUT)
         
         # Parameter value generators based on common parameter names
         self.parameter_generators = {
@@ -12,6 +12,7 @@ from core.models import (
 )
 from .reward_aggregator import RewardFunctionAggregator
 from .unified_llm_provider import BaseLLMProvider
+from .run_cancellation import RunCancelled, check_cancelled
 from asgiref.sync import sync_to_async
 import asyncio
 import statistics
@@ -71,8 +72,14 @@ class PromptEvaluator(ABC):
 class BatchPromptEvaluator(PromptEvaluator):
     """Evaluates prompts by running them against a batch of test cases"""
     
-    def __init__(self, reward_aggregator: RewardFunctionAggregator):
+    def __init__(
+        self,
+        reward_aggregator: RewardFunctionAggregator,
+        scoring_llm_provider: Optional[BaseLLMProvider] = None
+    ):
         self.reward_aggregator = reward_aggregator
+        # Perplexity scoring can run on a cheaper model than generation
+        self.scoring_llm_provider = scoring_llm_provider
     
     async def evaluate_prompt(
         self,
@@ -80,28 +87,44 @@ class BatchPromptEvaluator(PromptEvaluator):
         test_cases: List[EvaluationTestCase],
         llm_provider: BaseLLMProvider
     ) -> EvaluationResult:
-        """Evaluate prompt performance across multiple test cases"""
+        """Evaluate prompt performance across multiple test cases.
+        
+        Inside a checkpointed optimization run, cases this prompt already
+        completed are replayed from the checkpoint and new ones are recorded.
+        Under a run deadline, evaluation stops once it passes and the cases
+        scored so far make up the result.
+        """
+        from .deadline_planner import current_deadline
+        from .run_checkpoints import current_checkpoint
         
         start_time = timezone.now()
         all_scores = []
         all_metrics = []
         sample_outputs = []
         errors = 0
+        attempted = 0
+        checkpoint = current_checkpoint()
+        deadline = current_deadline()
         
         logger.info(f"Evaluating prompt v{prompt.version} against {len(test_cases)} test cases")
         
         # Run evaluation across all test cases
         for i, test_case in enumerate(test_cases):
+            check_cancelled()
+            if deadline is not None and deadline.expired and all_scores:
+                deadline.cut_short = True
+                break
+            attempted += 1
             try:
-                # Generate response using the prompt
-                draft_response = await self._generate_response_with_prompt(
-                    prompt, test_case.email, llm_provider
-                )
-                
-                # Calculate performance metrics
-                metrics = await self._calculate_metrics(
-                    prompt, draft_response, test_case, llm_provider
-                )
+                completed = checkpoint.lookup(prompt.content, test_case) if checkpoint else None
+                if completed:
+                    draft_response, metrics = completed
+                else:
+                    work = self._score_case(prompt, test_case, llm_provider)
+                    # The first case always finishes, so every prompt gets a score
+                    draft_response, metrics = await (deadline.bound(work) if deadline and all_scores else work)
+                    if checkpoint:
+                        await checkpoint.record(prompt.content, test_case, draft_response, metrics)
                 
                 all_scores.append(metrics['overall_score'])
                 all_metrics.append(metrics)
@@ -111,17 +134,23 @@ class BatchPromptEvaluator(PromptEvaluator):
                     sample_outputs.append(draft_response)
                     
             except Exception as e:
+                if deadline is not None and deadline.expired and all_scores:
+                    # Cut off by the deadline rather than failed
+                    attempted -= 1
+                    break
                 logger.error(f"Error evaluating test case {i}: {e}")
                 errors += 1
                 continue
         
         if not all_scores:
             raise ValueError("No successful evaluations completed")
+        if attempted < len(test_cases):
+            logger.info(f"Deadline reached; prompt v{prompt.version} scored on {len(all_scores)} of {len(test_cases)} cases")
         
         # Aggregate results
         overall_performance = statistics.mean(all_scores)
         aggregated_metrics = self._aggregate_metrics(all_metrics)
-        error_rate = errors / len(test_cases)
+        error_rate = errors / attempted
         
         return EvaluationResult(
             prompt=prompt,
@@ -129,10 +158,25 @@ class BatchPromptEvaluator(PromptEvaluator):
             metrics=aggregated_metrics,
             sample_outputs=sample_outputs,
             evaluation_time=start_time,
-            test_cases_used=len(test_cases) - errors,
+            test_cases_used=attempted - errors,
             error_rate=error_rate
         )
     
+    async def _score_case(
+        self,
+        prompt: SystemPrompt,
+        test_case: EvaluationTestCase,
+        llm_provider: BaseLLMProvider
+    ) -> Tuple[str, Dict[str, float]]:
+        """Generate a response to the case and calculate its performance metrics"""
+        draft_response = await self._generate_response_with_prompt(
+            prompt, test_case.email, llm_provider
+        )
+        metrics = await self._calculate_metrics(
+            prompt, draft_response, test_case, llm_provider
+        )
+        return draft_response, metrics
+    
     async def _generate_response_with_prompt(
         self,
         prompt: SystemPrompt,
@@ -140,6 +184,10 @@ class BatchPromptEvaluator(PromptEvaluator):
         llm_provider: BaseLLMProvider
     ) -> str:
         """Generate response using the given prompt"""
+        from .deadline_planner import current_deadline
+        
+        # A deadline-planned run may shorten responses to fit its budget
+        deadline = current_deadline()
         
         # Build email context
         email_content = f"""
@@ -153,7 +201,7 @@ Body: {email.body}
             prompt=f"Please respond to this email:\n{email_content}",
             system_prompt=prompt.content,
             temperature=0.7,
-            max_tokens=300
+            max_tokens=(deadline.max_tokens if deadline else None) or 300
         )
         
         return response.strip()
@@ -192,7 +240,9 @@ Body: {email.body}
         )
         
         # Calculate additional metrics
-        perplexity_score = await self._calculate_perplexity_score(response, llm_provider)
+        perplexity_score = await self._calculate_perplexity_score(
+            response, self.scoring_llm_provider or llm_provider
+        )
         length_score = self._calculate_length_appropriateness(response, test_case)
         
         return {
@@ -476,10 +526,11 @@ class EvaluationEngine:
     def __init__(
         self,
         llm_provider: BaseLLMProvider,
-        reward_aggregator: RewardFunctionAggregator
+        reward_aggregator: RewardFunctionAggregator,
+        scoring_llm_provider: Optional[BaseLLMProvider] = None
     ):
         self.llm_provider = llm_provider
-        self.evaluator = BatchPromptEvaluator(reward_aggregator)
+        self.evaluator = BatchPromptEvaluator(reward_aggregator, scoring_llm_provider)
         self.ab_testing = ABTestingEngine(self.evaluator)
         self.test_suite = EvaluationTestSuite()
     
@@ -634,7 +685,37 @@ class EvaluationEngine:
         return run
     
     def execute_evaluation_run(self, run: EvaluationRun) -> List[DBEvaluationResult]:
-        """Execute an evaluation run synchronously."""
+        """Execute an evaluation run synchronously, recording its LLM usage.
+        
+        The run is leased to this worker while it executes; a run leased by a
+        live worker elsewhere is refused, one whose worker died is taken over.
+        Cancelling the run stops it between cases and aborts the in-flight
+        LLM call. Re-executing an interrupted run keeps the cases it already
+        scored and evaluates only the rest.
+        """
+        from .llm_usage import track_llm_usage
+        from .run_cancellation import cancellation_scope
+        from .run_leases import claim_evaluation_run, evaluation_run_resource, heartbeat
+        
+        run_lease = claim_evaluation_run(run.id)
+        if run_lease is None:
+            raise ValueError(f"Evaluation run {run.id} is already being executed by another worker")
+        
+        with cancellation_scope(evaluation_run_resource(run.id)) as cancellation, \
+                heartbeat(run_lease, on_lost=lambda lease: cancellation.cancel('Evaluation run lease was revoked')), \
+                track_llm_usage(prompt_lab_id=run.prompt.prompt_lab_id, evaluation_run_id=run.id) as usage:
+            try:
+                return self._run_evaluation_cases(run)
+            finally:
+                try:
+                    usage.persist()
+                except Exception as e:
+                    logger.error(f"Failed to persist LLM usage for evaluation run {run.id}: {e}")
+    
+    def _run_evaluation_cases(self, run: EvaluationRun) -> List[DBEvaluationResult]:
+        """Generate and score a response for every case in the run's dataset."""
+        results = []
+        scores = []
         try:
             run.status = 'running'
             run.save()
@@ -644,10 +725,17 @@ class EvaluationEngine:
             if not cases:
                 raise ValueError(f"No evaluation cases found for dataset {run.dataset.name}")
             
-            results = []
-            scores = []
+            # Results already stored by an interrupted execution are the run's
+            # checkpoint: keep the scored cases, retry the ones that errored
+            run.results.filter(details__has_key='error').delete()
+            completed = {result.case_id: result for result in run.results.all()}
             
             for case in cases:
+                check_cancelled()
+                if case.id in completed:
+                    results.append(completed[case.id])
+                    scores.append(completed[case.id].similarity_score)
+                    continue
                 try:
                     # Generate response for this case
                     response = self._generate_response_for_case(run.prompt, case)
@@ -701,6 +789,15 @@ class EvaluationEngine:
             logger.info(f"Completed evaluation run {run.id} with overall score {overall_score:.3f}")
             return results
             
+        except RunCancelled as cancelled:
+            # Keep the finished cases; the score covers only those
+            run.status = 'cancelled'
+            run.overall_score = sum(scores) / len(scores) if scores else None
+            run.completed_at = timezone.now()
+            run.save()
+            logger.info(f"Cancelled evaluation run {run.id} after {len(results)} case(s): {cancelled.reason}")
+            return results
+            
         except Exception as e:
             run.status = 'failed'
             run.completed_at = timezone.now()
@@ -710,10 +807,10 @@ class EvaluationEngine:
     
     def _generate_response_for_case(self, prompt: SystemPrompt, case: EvaluationCase) -> str:
         """Generate a response for an evaluation case."""
-        from .unified_llm_provider import LLMProviderFactory
+        from .llm_router import get_task_provider, TaskType
         
-        # Use provider from environment configuration (supports Ollama, OpenAI, etc.)
-        provider = LLMProviderFactory.from_environment()
+        # Use the draft generation route (environment configuration plus any prompt lab override)
+        provider = get_task_provider(TaskType.DRAFT_GENERATION, prompt.prompt_lab_id)
         
         # Substitute parameters in prompt content
         prompt_content = prompt.content
@@ -732,8 +829,10 @@ class EvaluationEngine:
                 if loop.is_running():
                     # We're in an async context, create a new thread
                     import concurrent.futures
+                    import contextvars
                     with concurrent.futures.ThreadPoolExecutor() as executor:
-                        future = executor.submit(asyncio.run, provider.generate(
+                        # Carry usage tracking context into the worker thread
+                        future = executor.submit(contextvars.copy_context().run, asyncio.run, provider.generate(
                             prompt=case.input_text,
                             system_prompt=prompt_content,
                             temperature=0.7,
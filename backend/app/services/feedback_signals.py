@@ -0,0 +1,259 @@
+"""
+Feedback Signals
+The single post_init/post_save/post_delete pipeline for UserFeedback,
+ReasonRating and Draft writes, shared by every structure that follows them:
+
+- each write's prompt lab, scenario and prompt are looked up once (one
+  query) and handed to every updater as a WriteScope
+- previous feedback and rating state is remembered once per loaded instance,
+  and saves that change none of it are not dispatched at all
+- updaters (trigger counters, confidence aggregates, daily metrics rollups,
+  convergence invalidation) each run in their own savepoint, so a failure is
+  rolled back and logged without stopping the rest or breaking the caller's
+  transaction
+- commit hooks (response cache versions, prompt similarity index) do not
+  write to the database and run without a savepoint
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+
+from django.db import transaction
+from django.db.models import Subquery
+from django.db.models.signals import post_delete, post_init, post_save
+
+from core.models import Draft, DraftReason, Email, ReasonRating, SystemPrompt, UserFeedback
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WriteScope:
+    """Where a feedback, rating or draft write is counted.
+
+    The lab is the email's prompt lab, falling back to the draft prompt's lab.
+    """
+    prompt_lab_id: Any
+    scenario_type: str
+    system_prompt_id: Any
+
+
+@dataclass(frozen=True)
+class FeedbackState:
+    action: str
+    created_at: datetime
+    reason: str
+
+
+@dataclass
+class FeedbackWrite:
+    feedback: UserFeedback
+    scope: WriteScope
+    previous: Optional[FeedbackState]  # None for new feedback
+    current: Optional[FeedbackState]  # None for deleted feedback
+
+    @property
+    def created(self) -> bool:
+        return self.previous is None
+
+    @property
+    def deleted(self) -> bool:
+        return self.current is None
+
+    def changed(self, *fields: str) -> bool:
+        """New, deleted, or any of the given state fields differ"""
+        if self.created or self.deleted:
+            return True
+        return any(getattr(self.previous, name) != getattr(self.current, name) for name in fields)
+
+
+@dataclass
+class RatingWrite:
+    rating: ReasonRating
+    scope: WriteScope
+    feedback_created_at: datetime  # Ratings are bucketed by their feedback's time
+    factor: str  # The rated reason's text
+    previous_liked: Optional[bool]  # None for new ratings
+    current_liked: Optional[bool]  # None for deleted ratings
+
+    @property
+    def created(self) -> bool:
+        return self.previous_liked is None
+
+    @property
+    def deleted(self) -> bool:
+        return self.current_liked is None
+
+
+@dataclass
+class DraftWrite:
+    draft: Draft
+    scope: WriteScope
+    created: bool = False
+    deleted: bool = False
+
+
+# Updaters write to the database, each in its own savepoint; commit hooks do
+# not and run without one
+_feedback_updaters: List[Callable[[FeedbackWrite], None]] = []
+_rating_updaters: List[Callable[[RatingWrite], None]] = []
+_draft_updaters: List[Callable[[DraftWrite], None]] = []
+_feedback_commit_hooks: List[Callable[[FeedbackWrite], None]] = []
+_rating_commit_hooks: List[Callable[[RatingWrite], None]] = []
+_draft_commit_hooks: List[Callable[[DraftWrite], None]] = []
+
+
+def connect_feedback_signals():
+    """Register the updaters and connect the shared handlers"""
+    from . import (
+        confidence_aggregates, convergence_assessments, feedback_trigger_counters, metrics_rollups,
+        prompt_similarity_index, response_cache
+    )
+    _feedback_updaters[:] = [
+        feedback_trigger_counters.apply_feedback_write,
+        confidence_aggregates.apply_feedback_write,
+        metrics_rollups.apply_feedback_write,
+        convergence_assessments.apply_feedback_write,
+    ]
+    _rating_updaters[:] = [
+        feedback_trigger_counters.apply_rating_write,
+        confidence_aggregates.apply_rating_write,
+    ]
+    _draft_updaters[:] = [
+        metrics_rollups.apply_draft_write,
+    ]
+    _feedback_commit_hooks[:] = [response_cache.apply_write, prompt_similarity_index.apply_feedback_write]
+    _rating_commit_hooks[:] = [response_cache.apply_write]
+    _draft_commit_hooks[:] = [response_cache.apply_write]
+
+    post_init.connect(_remember_feedback, sender=UserFeedback, dispatch_uid='feedback_signals_feedback_init')
+    post_save.connect(_on_feedback_saved, sender=UserFeedback, dispatch_uid='feedback_signals_feedback_save')
+    post_delete.connect(_on_feedback_deleted, sender=UserFeedback, dispatch_uid='feedback_signals_feedback_delete')
+    post_init.connect(_remember_rating, sender=ReasonRating, dispatch_uid='feedback_signals_rating_init')
+    post_save.connect(_on_rating_saved, sender=ReasonRating, dispatch_uid='feedback_signals_rating_save')
+    post_delete.connect(_on_rating_deleted, sender=ReasonRating, dispatch_uid='feedback_signals_rating_delete')
+    post_save.connect(_on_draft_saved, sender=Draft, dispatch_uid='feedback_signals_draft_save')
+    post_delete.connect(_on_draft_deleted, sender=Draft, dispatch_uid='feedback_signals_draft_delete')
+
+
+def _dispatch(updaters, commit_hooks, write, description: str):
+    for function in [*updaters, *commit_hooks]:
+        try:
+            if function in commit_hooks:
+                function(write)
+                continue
+            # A savepoint per updater: a failed statement must not poison the caller's transaction
+            with transaction.atomic():
+                function(write)
+        except Exception as e:
+            logger.warning(f"{function.__module__.rsplit('.', 1)[-1]} could not apply {description}: {e}")
+
+
+# Scope lookups (one query each)
+
+_DRAFT_SCOPE = ('email__prompt_lab_id', 'system_prompt__prompt_lab_id', 'email__scenario_type', 'system_prompt_id')
+
+
+def _scope(email_lab, prompt_lab, scenario_type, system_prompt_id) -> WriteScope:
+    return WriteScope(email_lab or prompt_lab, scenario_type or '', system_prompt_id)
+
+
+def _draft_scope(draft_id) -> Optional[WriteScope]:
+    row = Draft.objects.filter(pk=draft_id).values_list(*_DRAFT_SCOPE).first()
+    return _scope(*row) if row else None
+
+
+def _deleted_draft_scope(draft: Draft) -> Optional[WriteScope]:
+    # The draft row is gone; read its email and prompt instead
+    row = Email.objects.filter(pk=draft.email_id).annotate(
+        prompt_lab_fallback=Subquery(
+            SystemPrompt.objects.filter(pk=draft.system_prompt_id).values('prompt_lab_id')[:1]
+        )
+    ).values_list('prompt_lab_id', 'prompt_lab_fallback', 'scenario_type').first()
+    return _scope(*row, draft.system_prompt_id) if row else None
+
+
+# UserFeedback
+
+def _feedback_state(instance) -> Optional[FeedbackState]:
+    """Tracked fields as loaded; None when any of them is deferred"""
+    fields = ('action', 'created_at', 'reason')
+    if any(name not in instance.__dict__ for name in fields):
+        return None
+    return FeedbackState(*(instance.__dict__[name] for name in fields))
+
+
+def _remember_feedback(sender, instance, **kwargs):
+    instance._feedback_state = _feedback_state(instance)
+
+
+def _on_feedback_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_feedback_state', None)
+    _remember_feedback(sender, instance)
+    current = instance._feedback_state
+    if not created and (previous is None or previous == current):
+        return  # Nothing tracked changed, or the previous state was deferred
+    scope = _draft_scope(instance.draft_id)
+    if scope is not None and current is not None:
+        write = FeedbackWrite(instance, scope, None if created else previous, current)
+        _dispatch(_feedback_updaters, _feedback_commit_hooks, write, f"feedback {instance.pk}")
+
+
+def _on_feedback_deleted(sender, instance, **kwargs):
+    state = _feedback_state(instance)
+    scope = _draft_scope(instance.draft_id)
+    if scope is not None and state is not None:
+        write = FeedbackWrite(instance, scope, state, None)
+        _dispatch(_feedback_updaters, _feedback_commit_hooks, write, f"deleted feedback {instance.pk}")
+
+
+# ReasonRating
+
+def _remember_rating(sender, instance, **kwargs):
+    instance._rating_liked = instance.__dict__.get('liked')
+
+
+def _rating_context(instance):
+    """(scope, feedback time, factor) of a rating"""
+    row = UserFeedback.objects.filter(pk=instance.feedback_id).annotate(
+        factor=Subquery(DraftReason.objects.filter(pk=instance.reason_id).values('text')[:1])
+    ).values_list(*(f'draft__{name}' for name in _DRAFT_SCOPE), 'created_at', 'factor').first()
+    if row is None or row[5] is None:
+        return None
+    return _scope(*row[:4]), row[4], row[5]
+
+
+def _on_rating_saved(sender, instance, created, **kwargs):
+    previous_liked = getattr(instance, '_rating_liked', None)
+    _remember_rating(sender, instance)
+    if not created and (previous_liked is None or previous_liked == instance.liked):
+        return
+    context = _rating_context(instance)
+    if context is not None:
+        write = RatingWrite(instance, *context, None if created else previous_liked, instance.liked)
+        _dispatch(_rating_updaters, _rating_commit_hooks, write, f"reason rating {instance.pk}")
+
+
+def _on_rating_deleted(sender, instance, **kwargs):
+    context = _rating_context(instance)
+    if context is not None:
+        write = RatingWrite(instance, *context, instance.liked, None)
+        _dispatch(_rating_updaters, _rating_commit_hooks, write, f"deleted reason rating {instance.pk}")
+
+
+# Draft
+
+def _on_draft_saved(sender, instance, created, **kwargs):
+    scope = _draft_scope(instance.pk)
+    if scope is not None:
+        write = DraftWrite(instance, scope, created=created)
+        _dispatch(_draft_updaters, _draft_commit_hooks, write, f"draft {instance.pk}")
+
+
+def _on_draft_deleted(sender, instance, **kwargs):
+    scope = _deleted_draft_scope(instance)
+    if scope is not None:
+        write = DraftWrite(instance, scope, deleted=True)
+        _dispatch(_draft_updaters, _draft_commit_hooks, write, f"deleted draft {instance.pk}")
@@ -0,0 +1,314 @@
+"""
+Feedback Trigger Counters
+Rolling per-prompt-lab feedback tallies maintained on each feedback write, so
+optimization trigger checks sum a lab's hourly buckets instead of rescanning
+UserFeedback on every poll:
+
+- hourly FeedbackTriggerCounter rows with feedback counts by action
+- reason rating tallies: total likes and dislikes per reasoning factor
+- optional debounced trigger events pushed to subscribers (the optimization
+  scheduler) when negative feedback arrives, instead of waiting for the poll
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import FeedbackTriggerCounter, ReasonRating, UserFeedback
+from .counter_tables import lab_of, replace_rows, update_row
+from .feedback_signals import FeedbackWrite, RatingWrite
+
+logger = logging.getLogger(__name__)
+
+NEGATIVE_ACTIONS = ('reject', 'edit')
+ACTION_FIELDS = {
+    'accept': 'accept_count',
+    'reject': 'reject_count',
+    'edit': 'edit_count',
+    'ignore': 'ignore_count',
+}
+FACTOR_KEY_LENGTH = 200
+
+
+def bucket_start(moment: datetime) -> datetime:
+    """Start of the hourly bucket a timestamp falls in"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+@dataclass
+class TriggerWindow:
+    """Feedback tallies summed over a trigger window"""
+    feedback_count: int = 0
+    action_counts: Dict[str, int] = field(default_factory=dict)
+    reason_likes: int = 0
+    factor_dislikes: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def negative_count(self) -> int:
+        return sum(self.action_counts.get(action, 0) for action in NEGATIVE_ACTIONS)
+
+    @property
+    def negative_ratio(self) -> float:
+        return self.negative_count / self.feedback_count if self.feedback_count else 0.0
+
+    @property
+    def average_rating(self) -> Optional[float]:
+        """Reason ratings on the 1-5 scale used by the triggers (like = 5, dislike = 1)"""
+        dislikes = sum(self.factor_dislikes.values())
+        rated = self.reason_likes + dislikes
+        return 1.0 + 4.0 * self.reason_likes / rated if rated else None
+
+    def consistent_issues(self, threshold: float = 0.4) -> List[str]:
+        """Factors disliked in at least `threshold` of the window's feedback"""
+        if not self.feedback_count:
+            return []
+        minimum = self.feedback_count * threshold
+        return sorted(factor for factor, count in self.factor_dislikes.items() if count >= minimum)
+
+    def add_counter(self, counter: FeedbackTriggerCounter):
+        self.feedback_count += counter.feedback_count
+        for action, field_name in ACTION_FIELDS.items():
+            self.action_counts[action] = self.action_counts.get(action, 0) + getattr(counter, field_name)
+        self.reason_likes += counter.reason_likes
+        self._add_dislikes(counter.factor_dislikes or {})
+
+    def merge(self, other: 'TriggerWindow'):
+        self.feedback_count += other.feedback_count
+        for action, count in other.action_counts.items():
+            self.action_counts[action] = self.action_counts.get(action, 0) + count
+        self.reason_likes += other.reason_likes
+        self._add_dislikes(other.factor_dislikes)
+
+    def _add_dislikes(self, dislikes: Dict[str, int]):
+        for factor, count in dislikes.items():
+            self.factor_dislikes[factor] = self.factor_dislikes.get(factor, 0) + count
+
+
+def trigger_windows(
+    prompt_lab_ids: Optional[Iterable[Any]] = None,
+    hours: int = 24,
+    now: Optional[datetime] = None
+) -> Dict[Any, TriggerWindow]:
+    """Per-lab windows over the last `hours`, widened to whole hourly buckets.
+
+    Reads at most one counter row per lab and hour, whatever the feedback volume.
+    """
+    cutoff = bucket_start((now or timezone.now()) - timedelta(hours=hours))
+    counters = FeedbackTriggerCounter.objects.filter(bucket_start__gte=cutoff)
+    if prompt_lab_ids is not None:
+        counters = counters.filter(prompt_lab_id__in=list(prompt_lab_ids))
+
+    windows = {}
+    for counter in counters.order_by():
+        windows.setdefault(counter.prompt_lab_id, TriggerWindow()).add_counter(counter)
+    return windows
+
+
+def trigger_window(prompt_lab_id=None, hours: int = 24, now: Optional[datetime] = None) -> TriggerWindow:
+    """Window for one lab, or summed across all labs when prompt_lab_id is None"""
+    window = TriggerWindow()
+    for lab_window in trigger_windows(None if prompt_lab_id is None else [prompt_lab_id], hours, now).values():
+        window.merge(lab_window)
+    return window
+
+
+# Counter updates
+
+def record_feedback(prompt_lab_id, created_at: datetime, action: str, delta: int = 1):
+    """Add (or with delta=-1 remove) one feedback to its lab's hourly bucket"""
+    updates = {'feedback_count': F('feedback_count') + delta}
+    field_name = ACTION_FIELDS.get(action)
+    if field_name:
+        updates[field_name] = F(field_name) + delta
+    _update_bucket(prompt_lab_id, created_at, delta > 0, updated_at=timezone.now(), **updates)
+
+
+def record_reason_rating(prompt_lab_id, created_at: datetime, factor: str, liked: bool, delta: int = 1):
+    """Add (or remove) one reason rating, bucketed by its feedback's creation time"""
+    if liked:
+        _update_bucket(
+            prompt_lab_id, created_at, delta > 0, reason_likes=F('reason_likes') + delta, updated_at=timezone.now()
+        )
+        return
+
+    key = _bucket_key(prompt_lab_id, created_at)
+    if delta > 0:
+        FeedbackTriggerCounter.objects.get_or_create(**key)
+
+    factor = factor[:FACTOR_KEY_LENGTH]
+    with transaction.atomic():
+        counter = FeedbackTriggerCounter.objects.filter(**key).select_for_update().first()
+        if counter is None:
+            return
+        count = (counter.factor_dislikes or {}).get(factor, 0) + delta
+        if count > 0:
+            counter.factor_dislikes[factor] = count
+        else:
+            counter.factor_dislikes.pop(factor, None)
+        counter.save(update_fields=['factor_dislikes', 'updated_at'])
+
+
+def _bucket_key(prompt_lab_id, created_at: datetime) -> Dict[str, Any]:
+    return {'prompt_lab_id': prompt_lab_id, 'bucket_start': bucket_start(created_at)}
+
+
+def _update_bucket(prompt_lab_id, created_at: datetime, create: bool, **updates):
+    update_row(FeedbackTriggerCounter, _bucket_key(prompt_lab_id, created_at), create, **updates)
+
+
+def rebuild_trigger_counters(prompt_lab_ids: Optional[Iterable] = None) -> int:
+    """Recompute counters from UserFeedback and ReasonRating rows; returns rows written"""
+    feedback = UserFeedback.objects.annotate(lab_id=lab_of('draft__')).filter(lab_id__isnull=False)
+    ratings = ReasonRating.objects.annotate(lab_id=lab_of('feedback__draft__')).filter(lab_id__isnull=False)
+    stale = FeedbackTriggerCounter.objects.all()
+    if prompt_lab_ids is not None:
+        prompt_lab_ids = list(prompt_lab_ids)
+        feedback = feedback.filter(lab_id__in=prompt_lab_ids)
+        ratings = ratings.filter(lab_id__in=prompt_lab_ids)
+        stale = stale.filter(prompt_lab_id__in=prompt_lab_ids)
+
+    counters: Dict[tuple, FeedbackTriggerCounter] = {}
+
+    def counter_for(lab_id, created_at):
+        key = (lab_id, bucket_start(created_at))
+        if key not in counters:
+            counters[key] = FeedbackTriggerCounter(prompt_lab_id=lab_id, bucket_start=key[1], factor_dislikes={})
+        return counters[key]
+
+    for lab_id, created_at, action in feedback.values_list('lab_id', 'created_at', 'action').iterator(chunk_size=5000):
+        counter = counter_for(lab_id, created_at)
+        counter.feedback_count += 1
+        if action in ACTION_FIELDS:
+            setattr(counter, ACTION_FIELDS[action], getattr(counter, ACTION_FIELDS[action]) + 1)
+
+    for lab_id, created_at, factor, liked in ratings.values_list(
+        'lab_id', 'feedback__created_at', 'reason__text', 'liked'
+    ).iterator(chunk_size=5000):
+        counter = counter_for(lab_id, created_at)
+        if liked:
+            counter.reason_likes += 1
+        else:
+            key = factor[:FACTOR_KEY_LENGTH]
+            counter.factor_dislikes[key] = counter.factor_dislikes.get(key, 0) + 1
+
+    return replace_rows(stale, counters.values())
+
+
+# Trigger events
+
+class TriggerEvents:
+    """Debounced per-lab trigger notifications pushed from feedback writes.
+
+    Each push restarts the lab's quiet-period timer; subscribers are called once
+    no further push arrived for `debounce_seconds`, or `max_delay_seconds` after
+    the first push during a continuous stream of writes. Callbacks run on a
+    timer thread and must hand off to their own loop.
+    """
+
+    def __init__(self, debounce_seconds: float = 30.0, max_delay_seconds: float = 300.0):
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self._subscribers: List[Callable[[Any], None]] = []
+        self._pending: Dict[Any, tuple] = {}  # prompt_lab_id -> (timer, first push time)
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[Any], None]):
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Any], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+            if not self._subscribers:
+                for timer, _ in self._pending.values():
+                    timer.cancel()
+                self._pending.clear()
+
+    def push(self, prompt_lab_id) -> bool:
+        """Schedule a debounced event for the lab; no-op without subscribers"""
+        with self._lock:
+            if not self._subscribers:
+                return False
+            now = time.monotonic()
+            pending = self._pending.get(prompt_lab_id)
+            first_push = pending[1] if pending else now
+            if pending:
+                pending[0].cancel()
+            delay = min(self.debounce_seconds, max(0.0, first_push + self.max_delay_seconds - now))
+            timer = threading.Timer(delay, self._fire, [prompt_lab_id])
+            timer.daemon = True
+            self._pending[prompt_lab_id] = (timer, first_push)
+            timer.start()
+            return True
+
+    def _fire(self, prompt_lab_id):
+        with self._lock:
+            self._pending.pop(prompt_lab_id, None)
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(prompt_lab_id)
+            except Exception as e:
+                logger.warning(f"Trigger event subscriber failed for prompt lab {prompt_lab_id}: {e}")
+
+
+_events: Optional[TriggerEvents] = None
+_events_lock = threading.Lock()
+
+
+def get_trigger_events() -> TriggerEvents:
+    """Process-wide trigger event bus"""
+    global _events
+    with _events_lock:
+        if _events is None:
+            _events = TriggerEvents(
+                debounce_seconds=float(os.getenv('FEEDBACK_TRIGGER_DEBOUNCE_SECONDS', '30')),
+                max_delay_seconds=float(os.getenv('FEEDBACK_TRIGGER_MAX_DELAY_SECONDS', '300'))
+            )
+        return _events
+
+
+def _push_on_commit(prompt_lab_id):
+    transaction.on_commit(lambda: get_trigger_events().push(prompt_lab_id))
+
+
+# Write updaters (called from feedback_signals)
+
+def apply_feedback_write(write: FeedbackWrite):
+    prompt_lab_id = write.scope.prompt_lab_id
+    if prompt_lab_id is None or not write.changed('action', 'created_at'):
+        return
+    previous, current = write.previous, write.current
+    if previous is not None:
+        record_feedback(prompt_lab_id, previous.created_at, previous.action, delta=-1)
+    if current is not None:
+        record_feedback(prompt_lab_id, current.created_at, current.action)
+    if write.created and current.action in NEGATIVE_ACTIONS:
+        _push_on_commit(prompt_lab_id)
+    if previous and current and bucket_start(previous.created_at) != bucket_start(current.created_at):
+        # Ratings are bucketed by their feedback's time and move with it
+        for factor, liked in write.feedback.reason_ratings.values_list('reason__text', 'liked'):
+            record_reason_rating(prompt_lab_id, previous.created_at, factor, liked, delta=-1)
+            record_reason_rating(prompt_lab_id, current.created_at, factor, liked)
+
+
+def apply_rating_write(write: RatingWrite):
+    prompt_lab_id = write.scope.prompt_lab_id
+    if prompt_lab_id is None:
+        return
+    if write.previous_liked is not None:
+        record_reason_rating(prompt_lab_id, write.feedback_created_at, write.factor, write.previous_liked, delta=-1)
+    if write.current_liked is not None:
+        record_reason_rating(prompt_lab_id, write.feedback_created_at, write.factor, write.current_liked)
+        if not write.current_liked:
+            _push_on_commit(prompt_lab_id)
@@ -0,0 +1,93 @@
+"""
+Lab Snapshot
+Score history and recent feedback of a prompt lab, loaded once per
+convergence or compute decision instead of once per detector:
+
+- one query for the latest prompt performance scores, one for the latest
+  feedback actions
+- both held as NumPy arrays, newest first
+- plateau, trend, slope and feedback stability math runs vectorized on the
+  arrays
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from core.models import PromptLab, SystemPrompt, UserFeedback
+
+logger = logging.getLogger(__name__)
+
+SCORE_WINDOW = 5
+FEEDBACK_WINDOW = 15
+
+
+@dataclass
+class LabSnapshot:
+    """Latest scores and feedback actions of one prompt lab, newest first"""
+    prompt_lab: PromptLab
+    scores: np.ndarray  # float64 performance scores of scored prompts, by version
+    actions: np.ndarray  # Feedback action strings, by creation time
+
+    @classmethod
+    def load(cls, prompt_lab: PromptLab, score_window: int = SCORE_WINDOW,
+             feedback_window: int = FEEDBACK_WINDOW) -> 'LabSnapshot':
+        scores = SystemPrompt.objects.filter(
+            prompt_lab=prompt_lab,
+            performance_score__isnull=False
+        ).order_by('-version').values_list('performance_score', flat=True)[:score_window]
+        actions = UserFeedback.objects.filter(
+            draft__email__prompt_lab=prompt_lab
+        ).order_by('-created_at').values_list('action', flat=True)[:feedback_window]
+        return cls(
+            prompt_lab=prompt_lab,
+            scores=np.fromiter(scores, dtype=np.float64),
+            actions=np.array(list(actions), dtype=object)
+        )
+
+    def recent_scores(self, count: int) -> Optional[np.ndarray]:
+        """The latest `count` scores, or None when fewer are recorded"""
+        return self.scores[:count] if len(self.scores) >= count else None
+
+    def score_range(self, count: int) -> float:
+        window = self.recent_scores(count)
+        return float(np.ptp(window)) if window is not None else 0.0
+
+    def score_improvement(self, count: int) -> float:
+        """Latest score minus the oldest in the window"""
+        window = self.recent_scores(count)
+        return float(window[0] - window[-1]) if window is not None else 0.0
+
+    def score_slope(self, count: int) -> float:
+        """Least-squares score change per version over the window"""
+        window = self.recent_scores(count)
+        if window is None or count < 2:
+            return 0.0
+        return float(np.polyfit(np.arange(count), window[::-1], 1)[0])
+
+    def score_variance(self, count: int) -> float:
+        window = self.recent_scores(count)
+        return float(np.var(window)) if window is not None else 0.0
+
+    def strictly_declining(self, count: int) -> bool:
+        """Each of the latest `count` scores is below the one before it"""
+        window = self.recent_scores(count)
+        # Newest first, so a decline shows as increasing values
+        return window is not None and bool(np.all(np.diff(window) > 0))
+
+    def recent_actions(self, count: int) -> Optional[np.ndarray]:
+        return self.actions[:count] if len(self.actions) >= count else None
+
+    def action_consistency(self, count: int) -> float:
+        """Share of the latest `count` feedback taken by the most common action"""
+        window = self.recent_actions(count)
+        if window is None:
+            return 0.0
+        _, counts = np.unique(window, return_counts=True)
+        return float(counts.max() / len(window))
+
+    def action_ratio(self, count: int, action: str) -> float:
+        window = self.recent_actions(count)
+        return float(np.mean(window == action)) if window is not None else 0.0
@@ -0,0 +1,403 @@
+"""
+LLM Task Router
+Maps each kind of LLM work (draft generation, rewriting, similarity, scoring,
+expected-output generation) to its own provider chain and limits, so cheap
+fast models can serve the high-volume tasks while stronger models rewrite.
+
+Routes are configured via environment variables and can be overridden per
+prompt lab through PromptLab.llm_routing.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+import weakref
+from dataclasses import dataclass, field, replace
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from .unified_llm_provider import (
+    BaseLLMProvider, LLMConfig, LLMProviderFactory, EmailDraft
+)
+from .llm_usage import llm_task
+from .run_cancellation import cancellable
+
+logger = logging.getLogger(__name__)
+
+
+class TaskType:
+    """LLM task types that can be routed independently"""
+    DRAFT_GENERATION = 'draft_generation'
+    REWRITING = 'rewriting'
+    SIMILARITY = 'similarity'
+    SCORING = 'scoring'
+    EXPECTED_OUTPUT = 'expected_output'
+
+    ALL = [DRAFT_GENERATION, REWRITING, SIMILARITY, SCORING, EXPECTED_OUTPUT]
+
+
+# Per-task defaults: scoring and similarity are high-volume and need short,
+# low-temperature completions; rewriting benefits from longer outputs and
+# allows the rewriter's default three-candidate fan-out to run in one round.
+DEFAULT_TASK_LIMITS = {
+    TaskType.DRAFT_GENERATION: {'max_tokens': 500, 'temperature': 0.7, 'timeout': 60.0, 'max_concurrency': 4},
+    TaskType.REWRITING: {'max_tokens': 500, 'temperature': 0.7, 'timeout': 60.0, 'max_concurrency': 3},
+    TaskType.SIMILARITY: {'max_tokens': 100, 'temperature': 0.2, 'timeout': 20.0, 'max_concurrency': 8},
+    TaskType.SCORING: {'max_tokens': 50, 'temperature': 0.1, 'timeout': 15.0, 'max_concurrency': 8},
+    TaskType.EXPECTED_OUTPUT: {'max_tokens': 500, 'temperature': 0.7, 'timeout': 60.0, 'max_concurrency': 4},
+}
+
+# Providers that report failures as text instead of raising
+_ERROR_RESPONSE_PATTERN = re.compile(r'^(Ollama|OpenAI) Error:')
+
+
+@dataclass
+class TaskRoute:
+    """Provider chain and limits for one task type"""
+    task_type: str
+    chain: List[LLMConfig] = field(default_factory=list)  # Primary first, then fallbacks
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    timeout: Optional[float] = None  # Seconds per provider attempt
+    max_concurrency: int = 4
+    cooldown_seconds: float = 30.0  # Skip a failing provider for this long
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'task_type': self.task_type,
+            'chain': [f"{config.provider}:{config.model}" for config in self.chain],
+            'max_tokens': self.max_tokens,
+            'temperature': self.temperature,
+            'timeout': self.timeout,
+            'max_concurrency': self.max_concurrency,
+        }
+
+
+def parse_chain(spec: Union[str, List[Any]], base: Optional[LLMConfig] = None) -> List[LLMConfig]:
+    """Parse a provider chain.
+
+    Accepts "provider:model,provider:model" strings or a list of
+    "provider:model" strings / {"provider", "model", ...} dicts. Only the first
+    colon separates provider from model, so Ollama tags such as
+    "ollama:llama3.2:1b" are preserved.
+    """
+    if isinstance(spec, str):
+        entries = [item.strip() for item in spec.split(',') if item.strip()]
+    else:
+        entries = list(spec or [])
+
+    chain = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            provider = entry.get('provider')
+            model = entry.get('model')
+            api_key = entry.get('api_key')
+            base_url = entry.get('base_url')
+        else:
+            provider, _, model = str(entry).partition(':')
+            api_key = base_url = None
+
+        if not provider:
+            continue
+
+        same_provider = base is not None and base.provider.lower() == provider.lower()
+        chain.append(LLMConfig(
+            provider=provider,
+            model=model or (base.model if same_provider else _default_model(provider)),
+            api_key=api_key or (base.api_key if same_provider else None),
+            base_url=base_url or (base.base_url if same_provider else None),
+            temperature=base.temperature if base else 0.7,
+            max_tokens=base.max_tokens if base else 500
+        ))
+    return chain
+
+
+def _default_model(provider: str) -> str:
+    default_models = {
+        "ollama": "llama3.2:3b",
+        "openai": "gpt-3.5-turbo",
+        "anthropic": "claude-3-haiku-20240307",
+        "claude": "claude-3-haiku-20240307",
+        "mock": "mock-model",
+        "replay": "replay"
+    }
+    return default_models.get(provider.lower(), "llama3.2:3b")
+
+
+class RoutedLLMProvider(BaseLLMProvider):
+    """Provider that applies a task route: per-attempt timeout, concurrency
+    ceiling, task defaults for max_tokens/temperature and fallback on failure."""
+
+    def __init__(self, route: TaskRoute, providers: List[BaseLLMProvider], router: 'LLMRouter'):
+        super().__init__(providers[0].config if providers else None)
+        self.route = route
+        self.task_type = route.task_type
+        self.providers = providers
+        self._router = router
+
+    @property
+    def primary(self) -> BaseLLMProvider:
+        return self.providers[0]
+
+    async def generate(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system_prompt: Optional[str] = None,
+        **kwargs
+    ) -> str:
+        """Generate text using the first healthy provider in the chain"""
+        temperature = temperature if temperature is not None else self.route.temperature
+        max_tokens = max_tokens or self.route.max_tokens
+        timeout = kwargs.get('timeout') or self.route.timeout
+
+        async def call(provider):
+            response = await provider.generate(
+                prompt=prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_prompt=system_prompt
+            )
+            if isinstance(response, str) and _ERROR_RESPONSE_PATTERN.match(response):
+                raise RuntimeError(response)
+            return response
+
+        return await self._call_with_fallback('generate', call, timeout)
+
+    async def generate_drafts(
+        self,
+        email_content: str,
+        system_prompt: str,
+        user_preferences: List[Dict[str, Any]] = None,
+        constraints: Dict[str, Any] = None,
+        num_drafts: int = 3
+    ) -> List[EmailDraft]:
+        async def call(provider):
+            return await provider.generate_drafts(
+                email_content=email_content,
+                system_prompt=system_prompt,
+                user_preferences=user_preferences,
+                constraints=constraints,
+                num_drafts=num_drafts
+            )
+
+        return await self._call_with_fallback('generate_drafts', call, self.route.timeout)
+
+    async def get_log_probabilities(self, text: str, context: Optional[str] = None) -> List[float]:
+        async def call(provider):
+            return await provider.get_log_probabilities(text, context)
+
+        return await self._call_with_fallback('get_log_probabilities', call, self.route.timeout)
+
+    async def health_check(self) -> Dict[str, Any]:
+        checks = []
+        for provider in self.providers:
+            try:
+                checks.append(await provider.health_check())
+            except Exception as e:
+                checks.append({"status": "unhealthy", "error": str(e)})
+        healthy = any(check.get('status') == 'healthy' for check in checks)
+        return {
+            "status": "healthy" if healthy else "unhealthy",
+            "task_type": self.task_type,
+            "chain": checks
+        }
+
+    async def _call_with_fallback(self, operation: str, call, timeout: Optional[float]):
+        # Label usage records from the underlying providers with this task
+        # Cancelling the run this call works for cancels the call and frees its slot
+        with llm_task(self.task_type):
+            return await cancellable(self._try_chain(operation, call, timeout))
+
+    async def _try_chain(self, operation: str, call, timeout: Optional[float]):
+        last_error = None
+        candidates = self._router.order_by_health(self.route, self.providers)
+
+        for provider in candidates:
+            key = self._router.provider_key(provider.config)
+            try:
+                async with self._router.concurrency_slot(self.route):
+                    if timeout:
+                        result = await asyncio.wait_for(call(provider), timeout=timeout)
+                    else:
+                        result = await call(provider)
+                self._router.mark_healthy(key)
+                return result
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                last_error = e
+                self._router.mark_failed(key, self.route.cooldown_seconds)
+                logger.warning(
+                    f"LLM route '{self.task_type}' {operation} failed on {key}: "
+                    f"{type(e).__name__}: {e}"
+                )
+
+        raise RuntimeError(
+            f"All providers failed for task '{self.task_type}': {last_error}"
+        ) from last_error
+
+
+class LLMRouter:
+    """Builds routed providers per task type from environment and prompt lab config.
+
+    Environment variables (TASK is the upper-cased task type, e.g. SCORING):
+        LLM_ROUTE_<TASK>                  provider chain, e.g. "ollama:llama3.2:1b,mock"
+        LLM_ROUTE_<TASK>_MAX_TOKENS       default max_tokens for the task
+        LLM_ROUTE_<TASK>_TEMPERATURE      default temperature for the task
+        LLM_ROUTE_<TASK>_TIMEOUT          seconds per provider attempt
+        LLM_ROUTE_<TASK>_MAX_CONCURRENCY  concurrent in-flight calls for the task
+    Tasks without LLM_ROUTE_<TASK> use the global LLM_* provider.
+    """
+
+    def __init__(self, environ: Optional[Dict[str, str]] = None):
+        self.environ = environ if environ is not None else os.environ
+        self._failed_until: Dict[str, float] = {}
+        self._semaphores: Dict[Tuple[str, int], 'weakref.WeakKeyDictionary'] = {}
+
+    # Route resolution
+
+    def get_route(self, task_type: str, prompt_lab=None) -> TaskRoute:
+        """Resolve the route for a task, applying prompt lab overrides"""
+        if task_type not in DEFAULT_TASK_LIMITS:
+            raise ValueError(f"Unknown LLM task type: {task_type}")
+
+        prefix = f"LLM_ROUTE_{task_type.upper()}"
+        limits = DEFAULT_TASK_LIMITS[task_type]
+        spec = self.environ.get(prefix)
+        base = self._global_config()
+
+        route = TaskRoute(
+            task_type=task_type,
+            chain=parse_chain(spec, base) if spec else [base],
+            max_tokens=self._env_int(f"{prefix}_MAX_TOKENS", limits['max_tokens']),
+            temperature=self._env_float(f"{prefix}_TEMPERATURE", limits['temperature']),
+            timeout=self._env_float(f"{prefix}_TIMEOUT", limits['timeout']),
+            max_concurrency=self._env_int(f"{prefix}_MAX_CONCURRENCY", limits['max_concurrency']),
+        )
+
+        overrides = self._lab_overrides(prompt_lab, task_type)
+        if overrides:
+            route = self._apply_overrides(route, overrides, base)
+        return route
+
+    def get_provider(self, task_type: str, prompt_lab=None) -> RoutedLLMProvider:
+        """Get a routed provider for a task type"""
+        route = self.get_route(task_type, prompt_lab)
+        providers = [self._provider_for(config) for config in route.chain]
+        return RoutedLLMProvider(route, providers, self)
+
+    def describe_routes(self, prompt_lab=None) -> Dict[str, Any]:
+        return {task: self.get_route(task, prompt_lab).describe() for task in TaskType.ALL}
+
+    def _global_config(self) -> LLMConfig:
+        provider = self.environ.get("LLM_PROVIDER", "ollama")
+        return LLMConfig(
+            provider=provider,
+            model=self.environ.get("LLM_MODEL", _default_model(provider)),
+            api_key=self.environ.get("LLM_API_KEY"),
+            base_url=self.environ.get("LLM_BASE_URL"),
+            temperature=float(self.environ.get("LLM_TEMPERATURE", "0.7")),
+            max_tokens=int(self.environ.get("LLM_MAX_TOKENS", "500"))
+        )
+
+    def _lab_overrides(self, prompt_lab, task_type: str) -> Dict[str, Any]:
+        if prompt_lab is None:
+            return {}
+        if hasattr(prompt_lab, 'llm_routing'):
+            routing = prompt_lab.llm_routing
+        else:
+            from core.models import PromptLab
+            try:
+                routing = PromptLab.objects.filter(id=prompt_lab).values_list('llm_routing', flat=True).first()
+            except Exception as e:
+                logger.warning(f"Could not load LLM routing for prompt lab {prompt_lab}: {e}")
+                routing = None
+        return (routing or {}).get(task_type) or {}
+
+    def _apply_overrides(self, route: TaskRoute, overrides: Dict[str, Any], base: LLMConfig) -> TaskRoute:
+        changes = {}
+        if overrides.get('chain'):
+            changes['chain'] = parse_chain(overrides['chain'], base) or route.chain
+        for key in ('max_tokens', 'max_concurrency'):
+            if overrides.get(key) is not None:
+                changes[key] = int(overrides[key])
+        for key in ('temperature', 'timeout', 'cooldown_seconds'):
+            if overrides.get(key) is not None:
+                changes[key] = float(overrides[key])
+        return replace(route, **changes)
+
+    def _env_int(self, name: str, default: int) -> int:
+        try:
+            return int(self.environ.get(name, default))
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid integer for {name}; using {default}")
+            return default
+
+    def _env_float(self, name: str, default: float) -> float:
+        try:
+            return float(self.environ.get(name, default))
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid number for {name}; using {default}")
+            return default
+
+    # Provider instances and health
+
+    @staticmethod
+    def provider_key(config: Optional[LLMConfig]) -> str:
+        if config is None:
+            return 'unknown'
+        return f"{config.provider.lower()}:{config.model}:{config.base_url or ''}"
+
+    def _provider_for(self, config: LLMConfig) -> BaseLLMProvider:
+        # Provider clients are created per use, as elsewhere in the app, since
+        # async clients must not be shared across event loops.
+        if self.environ is os.environ and config == self._global_config():
+            return LLMProviderFactory.from_environment()
+        return LLMProviderFactory.create_provider(config)
+
+    def order_by_health(self, route: TaskRoute, providers: List[BaseLLMProvider]) -> List[BaseLLMProvider]:
+        """Providers in chain order, with ones cooling down after failures moved last"""
+        now = time.monotonic()
+        healthy = [p for p in providers if self._failed_until.get(self.provider_key(p.config), 0) <= now]
+        cooling = [p for p in providers if p not in healthy]
+        return healthy + cooling
+
+    def mark_failed(self, key: str, cooldown_seconds: float):
+        self._failed_until[key] = time.monotonic() + cooldown_seconds
+
+    def mark_healthy(self, key: str):
+        self._failed_until.pop(key, None)
+
+    def concurrency_slot(self, route: TaskRoute) -> asyncio.Semaphore:
+        """Semaphore for the running event loop, shared by routes with the same task and limit.
+
+        Keyed by the limit too, so a lab's max_concurrency override gets its own
+        pool instead of whichever limit created the task's semaphore first.
+        """
+        loop = asyncio.get_running_loop()
+        key = (route.task_type, route.max_concurrency)
+        per_loop = self._semaphores.setdefault(key, weakref.WeakKeyDictionary())
+        semaphore = per_loop.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(max(1, route.max_concurrency))
+            per_loop[loop] = semaphore
+        return semaphore
+
+
+_router_instance: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    """Get the process-wide LLM router"""
+    global _router_instance
+    if _router_instance is None:
+        _router_instance = LLMRouter()
+    return _router_instance
+
+
+def get_task_provider(task_type: str, prompt_lab=None) -> RoutedLLMProvider:
+    """Get a routed provider for a task type, honouring prompt lab overrides"""
+    return get_llm_router().get_provider(task_type, prompt_lab)
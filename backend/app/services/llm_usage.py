@@ -0,0 +1,336 @@
+"""
+LLM Usage Accounting
+Records prompt/completion tokens, latency, model and task type for every
+provider call, and aggregates them per optimization run, evaluation run and
+prompt lab so cost decisions use measured rather than estimated numbers.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# USD per 1M tokens as (prompt, completion); local and mock models are free
+MODEL_PRICING = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4': (30.00, 60.00),
+    'claude-3-haiku': (0.25, 1.25),
+    'claude-3-5-haiku': (0.80, 4.00),
+    'claude-3-5-sonnet': (3.00, 15.00),
+    'claude-3-sonnet': (3.00, 15.00),
+    'claude-3-opus': (15.00, 75.00),
+}
+FREE_PROVIDERS = {'ollama', 'mock', 'replay'}
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token estimate for providers that do not report usage"""
+    if not text:
+        return 0
+    return int(len(text.split()) * 1.5)
+
+
+def calculate_cost(provider: str, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Cost in USD for a call, using the longest matching model price prefix"""
+    if (provider or '').lower() in FREE_PROVIDERS:
+        return 0.0
+    model_name = (model or '').lower()
+    matches = [name for name in MODEL_PRICING if model_name.startswith(name)]
+    if not matches:
+        return 0.0
+    prompt_price, completion_price = MODEL_PRICING[max(matches, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+@dataclass
+class UsageRecord:
+    """A single LLM provider call"""
+    provider: str
+    model: str
+    task_type: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency_ms: float
+    cost_usd: float
+    estimated: bool = False  # Tokens estimated because the provider reported none
+    success: bool = True
+    prompt_lab_id: Optional[str] = None
+    optimization_run_id: Optional[str] = None
+    evaluation_run_id: Optional[int] = None
+    persisted: bool = False  # Saved by one of the trackers that saw it
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class UsageTracker:
+    """Collects usage records for one scope (optimization run, evaluation run, ...)"""
+    prompt_lab_id: Optional[str] = None
+    optimization_run_id: Optional[str] = None
+    evaluation_run_id: Optional[int] = None
+    records: List[UsageRecord] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def add(self, record: UsageRecord):
+        with self._lock:
+            self.records.append(record)
+
+    @property
+    def total_cost_usd(self) -> float:
+        return sum(r.cost_usd for r in self.records)
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate totals plus per-task and per-model breakdowns"""
+        with self._lock:
+            records = list(self.records)
+        return summarize_records(records)
+
+    def persist(self) -> int:
+        """Store records not yet saved as LLMUsageRecord rows; returns rows written.
+
+        A call seen by nested trackers is stored once, linked to every run
+        that was active when it was made.
+        """
+        from core.models import LLMUsageRecord
+
+        with _persist_lock:
+            pending = [r for r in self.records if not r.persisted]
+            for r in pending:
+                r.persisted = True
+
+        if not pending:
+            return 0
+
+        LLMUsageRecord.objects.bulk_create([
+            LLMUsageRecord(
+                prompt_lab_id=r.prompt_lab_id,
+                optimization_run_id=r.optimization_run_id,
+                evaluation_run_id=r.evaluation_run_id,
+                task_type=r.task_type,
+                provider=r.provider,
+                model=r.model,
+                prompt_tokens=r.prompt_tokens,
+                completion_tokens=r.completion_tokens,
+                latency_ms=r.latency_ms,
+                cost_usd=r.cost_usd,
+                estimated=r.estimated,
+                success=r.success
+            )
+            for r in pending
+        ])
+        return len(pending)
+
+
+def summarize_records(records: List[UsageRecord]) -> Dict[str, Any]:
+    latencies = sorted(r.latency_ms for r in records)
+
+    def group(key):
+        groups: Dict[str, Dict[str, Any]] = {}
+        for r in records:
+            name = getattr(r, key)
+            entry = groups.setdefault(name, {
+                'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                'cost_usd': 0.0, 'total_latency_ms': 0.0
+            })
+            entry['calls'] += 1
+            entry['prompt_tokens'] += r.prompt_tokens
+            entry['completion_tokens'] += r.completion_tokens
+            entry['cost_usd'] += r.cost_usd
+            entry['total_latency_ms'] += r.latency_ms
+        for entry in groups.values():
+            entry['avg_latency_ms'] = entry['total_latency_ms'] / entry['calls']
+        return groups
+
+    return {
+        'calls': len(records),
+        'failed_calls': sum(1 for r in records if not r.success),
+        'estimated_calls': sum(1 for r in records if r.estimated),
+        'prompt_tokens': sum(r.prompt_tokens for r in records),
+        'completion_tokens': sum(r.completion_tokens for r in records),
+        'total_tokens': sum(r.total_tokens for r in records),
+        'total_cost_usd': sum(r.cost_usd for r in records),
+        'total_latency_ms': sum(latencies),
+        'avg_latency_ms': sum(latencies) / len(latencies) if latencies else 0.0,
+        'p95_latency_ms': latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        'by_task': group('task_type'),
+        'by_model': group('model'),
+    }
+
+
+_persist_lock = threading.Lock()
+_active_trackers: contextvars.ContextVar = contextvars.ContextVar('llm_usage_trackers', default=())
+_current_task_type: contextvars.ContextVar = contextvars.ContextVar('llm_task_type', default='unrouted')
+
+
+@contextmanager
+def track_llm_usage(
+    prompt_lab_id: Optional[str] = None,
+    optimization_run_id: Optional[str] = None,
+    evaluation_run_id: Optional[int] = None
+):
+    """Collect usage for all provider calls made inside this scope.
+
+    Scopes nest, so a call inside an evaluation run started by an
+    optimization run is counted by both trackers.
+    """
+    tracker = UsageTracker(
+        prompt_lab_id=str(prompt_lab_id) if prompt_lab_id else None,
+        optimization_run_id=str(optimization_run_id) if optimization_run_id else None,
+        evaluation_run_id=evaluation_run_id
+    )
+    token = _active_trackers.set(_active_trackers.get() + (tracker,))
+    try:
+        yield tracker
+    finally:
+        _active_trackers.reset(token)
+
+
+@contextmanager
+def llm_task(task_type: str):
+    """Label provider calls made inside this scope with a task type"""
+    token = _current_task_type.set(task_type)
+    try:
+        yield
+    finally:
+        _current_task_type.reset(token)
+
+
+def record_usage(
+    provider: str,
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    latency_ms: float,
+    estimated: bool = False,
+    success: bool = True
+) -> UsageRecord:
+    """Record one provider call against every active tracker"""
+    trackers = _active_trackers.get()
+
+    def scope_value(attribute):
+        # Innermost scope wins
+        for tracker in reversed(trackers):
+            value = getattr(tracker, attribute)
+            if value is not None:
+                return value
+        return None
+
+    record = UsageRecord(
+        provider=provider,
+        model=model,
+        task_type=_current_task_type.get(),
+        prompt_tokens=int(prompt_tokens or 0),
+        completion_tokens=int(completion_tokens or 0),
+        latency_ms=latency_ms,
+        cost_usd=calculate_cost(provider, model, prompt_tokens or 0, completion_tokens or 0),
+        estimated=estimated,
+        success=success,
+        prompt_lab_id=scope_value('prompt_lab_id'),
+        optimization_run_id=scope_value('optimization_run_id'),
+        evaluation_run_id=scope_value('evaluation_run_id')
+    )
+    for tracker in trackers:
+        tracker.add(record)
+    return record
+
+
+class UsageTimer:
+    """Measures a provider call and records it with reported or estimated tokens"""
+
+    def __init__(self, provider: str, model: str, prompt_text: str = ''):
+        self.provider = provider
+        self.model = model
+        self.prompt_text = prompt_text
+        self._start = time.perf_counter()
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def success(
+        self,
+        completion_text: str = '',
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None
+    ) -> UsageRecord:
+        estimated = prompt_tokens is None or completion_tokens is None
+        return record_usage(
+            self.provider,
+            self.model,
+            prompt_tokens if prompt_tokens is not None else estimate_tokens(self.prompt_text),
+            completion_tokens if completion_tokens is not None else estimate_tokens(completion_text),
+            self.elapsed_ms,
+            estimated=estimated
+        )
+
+    def failure(self) -> UsageRecord:
+        return record_usage(
+            self.provider, self.model, estimate_tokens(self.prompt_text), 0,
+            self.elapsed_ms, estimated=True, success=False
+        )
+
+
+def get_prompt_lab_usage(prompt_lab) -> Dict[str, Any]:
+    """Aggregate persisted usage for a prompt lab with database aggregation"""
+    from django.db.models import Sum, Count, Avg, Q
+    from core.models import LLMUsageRecord
+
+    queryset = LLMUsageRecord.objects.filter(prompt_lab=prompt_lab)
+    totals = queryset.aggregate(
+        calls=Count('id'),
+        failed_calls=Count('id', filter=Q(success=False)),
+        prompt_tokens=Sum('prompt_tokens'),
+        completion_tokens=Sum('completion_tokens'),
+        total_cost_usd=Sum('cost_usd'),
+        avg_latency_ms=Avg('latency_ms'),
+        optimization_runs=Count('optimization_run', distinct=True),
+        evaluation_runs=Count('evaluation_run', distinct=True)
+    )
+    by_task = {
+        row['task_type']: {
+            'calls': row['calls'],
+            'total_tokens': (row['prompt_tokens'] or 0) + (row['completion_tokens'] or 0),
+            'cost_usd': row['cost_usd'] or 0.0,
+            'avg_latency_ms': row['avg_latency_ms'] or 0.0
+        }
+        for row in queryset.values('task_type').annotate(
+            calls=Count('id'),
+            prompt_tokens=Sum('prompt_tokens'),
+            completion_tokens=Sum('completion_tokens'),
+            cost_usd=Sum('cost_usd'),
+            avg_latency_ms=Avg('latency_ms')
+        )
+    }
+
+    prompt_tokens = totals['prompt_tokens'] or 0
+    completion_tokens = totals['completion_tokens'] or 0
+    total_cost = totals['total_cost_usd'] or 0.0
+    optimization_runs = totals['optimization_runs']
+    optimization_cost = queryset.filter(optimization_run__isnull=False).aggregate(
+        cost=Sum('cost_usd'))['cost'] or 0.0
+
+    return {
+        'calls': totals['calls'],
+        'failed_calls': totals['failed_calls'],
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+        'total_cost_usd': total_cost,
+        'avg_latency_ms': totals['avg_latency_ms'] or 0.0,
+        'optimization_runs': optimization_runs,
+        'evaluation_runs': totals['evaluation_runs'],
+        'avg_cost_per_optimization_run': optimization_cost / optimization_runs if optimization_runs else None,
+        'by_task': by_task,
+    }
@@ -5,7 +5,7 @@ Collects detailed performance data including component scores, statistical analy
 
 import logging
 from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from datetime import datetime
 from django.utils import timezone
 
@@ -36,6 +36,7 @@ class CandidateMetrics:
     error_rate: float
     generation_time_ms: float
     sample_outputs: List[str]
+    comparison: Dict[str, Any] = field(default_factory=dict)  # A/B outcome, reused by candidate dedup
 
 
 @dataclass
@@ -94,7 +95,8 @@ class MetricsCollector:
         component_scores: Dict[str, float],
         test_results: Dict[str, Any],
         generation_time_ms: float,
-        sample_outputs: List[str] = None
+        sample_outputs: List[str] = None,
+        comparison: Optional[Dict[str, Any]] = None
     ):
         """Add metrics for a candidate prompt"""
         
@@ -124,7 +126,8 @@ class MetricsCollector:
             test_cases_failed=failed,
             error_rate=error_rate,
             generation_time_ms=generation_time_ms,
-            sample_outputs=sample_outputs[:3] if sample_outputs else []  # Store top 3 samples
+            sample_outputs=sample_outputs[:3] if sample_outputs else [],  # Store top 3 samples
+            comparison=comparison or {}
         )
         
         if candidate_id == "baseline":
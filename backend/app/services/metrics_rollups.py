@@ -0,0 +1,216 @@
+"""
+Metrics Rollups
+Daily activity totals per prompt lab and email scenario, maintained on each
+write so dashboards read a few rows per day instead of scanning history:
+
+- feedback counts by action and draft counts, bucketed by creation day and
+  the email's scenario
+- optimization attempts, successes (completed with a new prompt) and summed
+  improvement, bucketed by the run's start day (scenario '')
+- rollup_sums() aggregate expressions for readers; filter with rollups()
+"""
+
+import logging
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, QuerySet, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from core.models import DailyMetricsRollup, Draft, OptimizationRun, UserFeedback
+from .counter_tables import lab_of, replace_rows, update_row
+from .feedback_signals import DraftWrite, FeedbackWrite
+from .feedback_trigger_counters import ACTION_FIELDS
+
+logger = logging.getLogger(__name__)
+
+ALL_LABS = object()  # rollups() default: every lab, including rows without one
+OPTIMIZATION_SCENARIO = ''
+COUNT_FIELDS = (
+    'feedback_count', *ACTION_FIELDS.values(), 'draft_count', 'optimization_count', 'optimization_success_count'
+)
+
+
+def rollup_day(moment: datetime) -> date:
+    """Day a timestamp is rolled up under (current timezone, like TruncDate)"""
+    return timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+
+
+def rollups(since: Optional[date] = None, prompt_lab_id=ALL_LABS) -> QuerySet:
+    """Rollup rows from `since` (inclusive), optionally for one lab"""
+    queryset = DailyMetricsRollup.objects.order_by()
+    if since is not None:
+        queryset = queryset.filter(day__gte=since)
+    if prompt_lab_id is not ALL_LABS:
+        queryset = queryset.filter(prompt_lab_id=prompt_lab_id)
+    return queryset
+
+
+def rollup_sums() -> Dict[str, Coalesce]:
+    """Summed rollup fields (0 when no rows), for aggregate() or grouped annotate()"""
+    sums = {name: Coalesce(Sum(name), 0) for name in COUNT_FIELDS}
+    sums['improvement_sum'] = Coalesce(Sum('improvement_sum'), Value(0.0), output_field=FloatField())
+    return sums
+
+
+# Rollup updates
+
+def _update_row(prompt_lab_id, day: date, scenario_type: str, create: bool, **updates):
+    key = {'prompt_lab_id': prompt_lab_id, 'day': day, 'scenario_type': scenario_type or ''}
+    update_row(DailyMetricsRollup, key, create, updated_at=timezone.now(), **updates)
+
+
+def record_feedback(prompt_lab_id, day: date, scenario_type: str, action: str, delta: int = 1):
+    """Add (or with delta=-1 remove) one feedback"""
+    updates = {'feedback_count': F('feedback_count') + delta}
+    field_name = ACTION_FIELDS.get(action)
+    if field_name:
+        updates[field_name] = F(field_name) + delta
+    _update_row(prompt_lab_id, day, scenario_type, delta > 0, **updates)
+
+
+def record_draft(prompt_lab_id, day: date, scenario_type: str, delta: int = 1):
+    _update_row(prompt_lab_id, day, scenario_type, delta > 0, draft_count=F('draft_count') + delta)
+
+
+def record_optimization(prompt_lab_id, day: date, successful: bool, improvement: Optional[float], delta: int = 1):
+    """Add (or remove) one optimization run; improvement only counts for successful runs"""
+    updates = {'optimization_count': F('optimization_count') + delta}
+    if successful:
+        updates['optimization_success_count'] = F('optimization_success_count') + delta
+        if improvement:
+            updates['improvement_sum'] = F('improvement_sum') + delta * improvement
+    _update_row(prompt_lab_id, day, OPTIMIZATION_SCENARIO, delta > 0, **updates)
+
+
+def rebuild_metrics_rollups(prompt_lab_ids: Optional[Iterable] = None) -> int:
+    """Recompute rollups from UserFeedback, Draft and OptimizationRun rows; returns rows written.
+
+    Without prompt_lab_ids every row is rebuilt, including activity outside a lab.
+    """
+    feedback = UserFeedback.objects.annotate(
+        lab_id=lab_of('draft__'),
+        scenario=F('draft__email__scenario_type'),
+        day=TruncDate('created_at')
+    )
+    drafts = Draft.objects.annotate(
+        lab_id=lab_of(''),
+        scenario=F('email__scenario_type'),
+        day=TruncDate('created_at')
+    )
+    runs = OptimizationRun.objects.annotate(lab_id=F('prompt_lab_id'), day=TruncDate('started_at'))
+    stale = DailyMetricsRollup.objects.all()
+    if prompt_lab_ids is not None:
+        prompt_lab_ids = list(prompt_lab_ids)
+        feedback = feedback.filter(lab_id__in=prompt_lab_ids)
+        drafts = drafts.filter(lab_id__in=prompt_lab_ids)
+        runs = runs.filter(lab_id__in=prompt_lab_ids)
+        stale = stale.filter(prompt_lab_id__in=prompt_lab_ids)
+
+    rows: Dict[Tuple, DailyMetricsRollup] = {}
+
+    def row_for(lab_id, day, scenario_type):
+        key = (lab_id, day, scenario_type or '')
+        if key not in rows:
+            rows[key] = DailyMetricsRollup(prompt_lab_id=lab_id, day=day, scenario_type=key[2])
+        return rows[key]
+
+    for counts in feedback.order_by().values('lab_id', 'day', 'scenario').annotate(
+        total=Count('id'),
+        **{field_name: Count('id', filter=Q(action=action)) for action, field_name in ACTION_FIELDS.items()}
+    ):
+        row = row_for(counts['lab_id'], counts['day'], counts['scenario'])
+        row.feedback_count = counts['total']
+        for field_name in ACTION_FIELDS.values():
+            setattr(row, field_name, counts[field_name])
+
+    for counts in drafts.order_by().values('lab_id', 'day', 'scenario').annotate(total=Count('id')):
+        row_for(counts['lab_id'], counts['day'], counts['scenario']).draft_count = counts['total']
+
+    successful = Q(status='completed', new_prompt__isnull=False)
+    for counts in runs.order_by().values('lab_id', 'day').annotate(
+        total=Count('id'),
+        succeeded=Count('id', filter=successful),
+        improvement=Sum('performance_improvement', filter=successful)
+    ):
+        row = row_for(counts['lab_id'], counts['day'], OPTIMIZATION_SCENARIO)
+        row.optimization_count = counts['total']
+        row.optimization_success_count = counts['succeeded']
+        row.improvement_sum = counts['improvement'] or 0.0
+
+    return replace_rows(stale, rows.values())
+
+
+# Signal handlers
+
+def apply_feedback_write(write: FeedbackWrite):
+    """Feedback updater (called from feedback_signals)"""
+    if not write.changed('action', 'created_at'):
+        return
+    scope = write.scope
+    if write.previous is not None:
+        record_feedback(scope.prompt_lab_id, rollup_day(write.previous.created_at), scope.scenario_type,
+                        write.previous.action, delta=-1)
+    if write.current is not None:
+        record_feedback(scope.prompt_lab_id, rollup_day(write.current.created_at), scope.scenario_type,
+                        write.current.action)
+
+
+def apply_draft_write(write: DraftWrite):
+    """Draft updater (called from feedback_signals)"""
+    if write.created or write.deleted:
+        record_draft(write.scope.prompt_lab_id, rollup_day(write.draft.created_at), write.scope.scenario_type,
+                     delta=-1 if write.deleted else 1)
+
+
+def connect_metrics_rollups():
+    """Keep optimization rollups current on every OptimizationRun write (feedback and drafts: feedback_signals)"""
+    post_init.connect(_remember_run, sender=OptimizationRun, dispatch_uid='metrics_rollups_run_init')
+    post_save.connect(_on_run_saved, sender=OptimizationRun, dispatch_uid='metrics_rollups_run_save')
+    post_delete.connect(_on_run_deleted, sender=OptimizationRun, dispatch_uid='metrics_rollups_run_delete')
+
+
+def _run_contribution(instance) -> Optional[Tuple]:
+    started_at = instance.__dict__.get('started_at')
+    if started_at is None:
+        return None
+    successful = instance.__dict__.get('status') == 'completed' and instance.__dict__.get('new_prompt_id') is not None
+    return (
+        instance.__dict__.get('prompt_lab_id'),
+        rollup_day(started_at),
+        successful,
+        instance.__dict__.get('performance_improvement')
+    )
+
+
+def _remember_run(sender, instance, **kwargs):
+    instance._rollup_contribution = _run_contribution(instance)
+
+
+def _on_run_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_rollup_contribution', None)
+    _remember_run(sender, instance)
+    current = instance._rollup_contribution
+    if not created and previous == current:
+        return
+    try:
+        with transaction.atomic():
+            if not created and previous is not None:
+                record_optimization(*previous, delta=-1)
+            if current is not None:
+                record_optimization(*current)
+    except Exception as e:
+        logger.warning(f"Could not update metrics rollup for optimization run {instance.pk}: {e}")
+
+
+def _on_run_deleted(sender, instance, **kwargs):
+    try:
+        contribution = _run_contribution(instance)
+        if contribution is not None:
+            with transaction.atomic():
+                record_optimization(*contribution, delta=-1)
+    except Exception as e:
+        logger.warning(f"Could not update metrics rollup for deleted optimization run {instance.pk}: {e}")
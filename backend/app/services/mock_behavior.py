@@ -0,0 +1,172 @@
+"""
+Mock Provider Load Behaviour
+Latency, streaming delay, failure and concurrency injection for MockProvider,
+so concurrency problems in evaluation, draft generation and the background
+threads can be reproduced offline.
+
+Environment:
+    MOCK_LLM_LATENCY            "none" (default), "fixed", "lognormal" or "trace"
+    MOCK_LLM_LATENCY_MS         fixed latency, or median for lognormal (default 500)
+    MOCK_LLM_LATENCY_SIGMA      lognormal shape parameter (default 0.5)
+    MOCK_LLM_LATENCY_TRACE      file of recorded latencies: a replay store
+                                (.jsonl.gz), a JSON list, or one value per line
+    MOCK_LLM_TOKENS_PER_SECOND  streaming rate added per completion token (0 = off)
+    MOCK_LLM_ERROR_RATE         probability a call raises MockProviderError
+    MOCK_LLM_TIMEOUT_RATE       probability a call hangs, then raises TimeoutError
+    MOCK_LLM_TIMEOUT_SECONDS    how long an injected timeout hangs (default 30)
+    MOCK_LLM_MAX_CONCURRENCY    process-wide in-flight ceiling, e.g. 1 for a single
+                                Ollama GPU (0 = unlimited)
+    MOCK_LLM_SEED               seed for reproducible latency and failure draws
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import math
+import os
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MockProviderError(RuntimeError):
+    """Failure injected by the mock provider"""
+    pass
+
+
+@dataclass
+class MockBehavior:
+    """Simulated latency and failure profile for MockProvider"""
+    latency_mode: str = 'none'  # "none", "fixed", "lognormal", "trace"
+    latency_ms: float = 500.0
+    latency_sigma: float = 0.5
+    latency_trace: List[float] = field(default_factory=list)  # Recorded latencies in ms
+    tokens_per_second: float = 0.0
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 30.0
+    max_concurrency: int = 0
+    seed: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return (
+            self.latency_mode != 'none' or self.tokens_per_second > 0 or
+            self.error_rate > 0 or self.timeout_rate > 0 or self.max_concurrency > 0
+        )
+
+    @classmethod
+    def from_environment(cls) -> 'MockBehavior':
+        seed = os.getenv('MOCK_LLM_SEED')
+        trace_path = os.getenv('MOCK_LLM_LATENCY_TRACE')
+        return cls(
+            latency_mode=os.getenv('MOCK_LLM_LATENCY', 'none').lower(),
+            latency_ms=float(os.getenv('MOCK_LLM_LATENCY_MS', '500')),
+            latency_sigma=float(os.getenv('MOCK_LLM_LATENCY_SIGMA', '0.5')),
+            latency_trace=load_latency_trace(trace_path) if trace_path else [],
+            tokens_per_second=float(os.getenv('MOCK_LLM_TOKENS_PER_SECOND', '0')),
+            error_rate=float(os.getenv('MOCK_LLM_ERROR_RATE', '0')),
+            timeout_rate=float(os.getenv('MOCK_LLM_TIMEOUT_RATE', '0')),
+            timeout_seconds=float(os.getenv('MOCK_LLM_TIMEOUT_SECONDS', '30')),
+            max_concurrency=int(os.getenv('MOCK_LLM_MAX_CONCURRENCY', '0')),
+            seed=int(seed) if seed else None
+        )
+
+
+def load_latency_trace(path: str) -> List[float]:
+    """Load recorded latencies (ms) from a replay store, JSON list or plain text file"""
+    try:
+        if path.endswith('.gz'):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return [
+                    float(json.loads(line)['latency_ms'])
+                    for line in f if line.strip() and 'latency_ms' in line
+                ]
+        with open(path, encoding='utf-8') as f:
+            content = f.read().strip()
+        if content.startswith('['):
+            return [float(value) for value in json.loads(content)]
+        return [float(line) for line in content.splitlines() if line.strip()]
+    except Exception as e:
+        logger.error(f"Could not load latency trace {path}: {e}")
+        return []
+
+
+class _ConcurrencyCeiling:
+    """Process-wide in-flight limit shared across threads and event loops"""
+
+    def __init__(self, limit: int):
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    async def __aenter__(self):
+        # Poll rather than block so the event loop keeps serving other tasks
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(0.005)
+
+    async def __aexit__(self, *exc):
+        self._semaphore.release()
+
+
+_ceilings: Dict[int, _ConcurrencyCeiling] = {}
+_ceilings_lock = threading.Lock()
+
+
+def _ceiling_for(limit: int) -> _ConcurrencyCeiling:
+    with _ceilings_lock:
+        if limit not in _ceilings:
+            _ceilings[limit] = _ConcurrencyCeiling(limit)
+        return _ceilings[limit]
+
+
+class MockLoadSimulator:
+    """Applies a MockBehavior around each mock provider call"""
+
+    def __init__(self, behavior: MockBehavior):
+        self.behavior = behavior
+        self.rng = random.Random(behavior.seed)
+        self._ceiling = _ceiling_for(behavior.max_concurrency) if behavior.max_concurrency > 0 else None
+
+    def sample_latency_seconds(self) -> float:
+        behavior = self.behavior
+        if behavior.latency_mode == 'fixed':
+            return behavior.latency_ms / 1000
+        if behavior.latency_mode == 'lognormal':
+            return self.rng.lognormvariate(math.log(max(behavior.latency_ms, 1e-3)), behavior.latency_sigma) / 1000
+        if behavior.latency_mode == 'trace' and behavior.latency_trace:
+            return self.rng.choice(behavior.latency_trace) / 1000
+        return 0.0
+
+    async def run(self, produce, completion_tokens=None):
+        """Run produce() under the simulated GPU ceiling, latency and failures.
+
+        completion_tokens(result) gives the token count used for the
+        streaming delay.
+        """
+        if self._ceiling:
+            async with self._ceiling:
+                return await self._simulate(produce, completion_tokens)
+        return await self._simulate(produce, completion_tokens)
+
+    async def _simulate(self, produce, completion_tokens):
+        behavior = self.behavior
+        draw = self.rng.random()
+
+        if draw < behavior.timeout_rate:
+            await asyncio.sleep(behavior.timeout_seconds)
+            raise asyncio.TimeoutError("Injected mock provider timeout")
+
+        delay = self.sample_latency_seconds()
+        if delay:
+            await asyncio.sleep(delay)
+
+        if draw < behavior.timeout_rate + behavior.error_rate:
+            raise MockProviderError("Injected mock provider error")
+
+        result = produce()
+        if behavior.tokens_per_second > 0 and completion_tokens:
+            await asyncio.sleep(completion_tokens(result) / behavior.tokens_per_second)
+        return result
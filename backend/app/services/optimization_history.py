@@ -0,0 +1,201 @@
+"""
+Optimization History
+Reads the per-candidate outcomes stored in OptimizationRun.candidate_metrics
+back so a new cycle starts from what earlier cycles learned:
+
+- reusable(): cached comparison records for candidates whose content and
+  datasets (ids and case contents, see dataset_version) are unchanged, rebased onto the current baseline when only the
+  baseline changed and its score on those datasets is known
+- losers(): rewrites that lost to their baseline, used as negative examples
+- contenders(): rewrites that beat their baseline but were not deployed,
+  re-entered into the next cycle
+- trajectory(): scored prompts in ascending order for OPRO-style meta-prompts
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.utils import timezone
+
+from .candidate_dedup import prompt_fingerprint
+from .evaluation_engine import ABTestingEngine, EvaluationResult
+
+logger = logging.getLogger(__name__)
+
+# Sources whose scores come from a real (or reused) full evaluation
+SCORED_SOURCES = ('evaluated', 'reused', 'duplicate')
+
+
+@dataclass
+class CandidateOutcome:
+    """One candidate's recorded comparison against its baseline"""
+    content: str
+    fingerprint: str
+    baseline_fingerprint: str
+    dataset_ids: List[int]
+    dataset_version: str
+    candidate_score: float
+    baseline_score: float
+    improvement: float
+    winner: str
+    source: str
+    run_id: str
+    record: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        """False when the stored prompt_content was truncated"""
+        return bool(self.content) and prompt_fingerprint(self.content) == self.fingerprint
+
+    @property
+    def lost(self) -> bool:
+        return self.winner == 'baseline' or self.improvement < 0
+
+
+class OptimizationHistory:
+    """Candidate outcomes of a lab's recent completed runs, newest first"""
+
+    def __init__(self, outcomes: List[CandidateOutcome]):
+        self.outcomes = outcomes
+
+    @classmethod
+    def load(cls, prompt_lab_id, limit: int = 20) -> 'OptimizationHistory':
+        from core.models import OptimizationRun
+
+        runs = OptimizationRun.objects.filter(
+            prompt_lab_id=prompt_lab_id, status='completed'
+        ).order_by('-started_at').values_list('id', 'candidate_metrics')[:limit]
+
+        outcomes = []
+        for run_id, candidate_metrics in runs:
+            for entry in candidate_metrics or []:
+                record = entry.get('comparison') if isinstance(entry, dict) else None
+                if not record or not record.get('fingerprint'):
+                    continue
+                outcomes.append(CandidateOutcome(
+                    content=entry.get('prompt_content', ''),
+                    fingerprint=record['fingerprint'],
+                    baseline_fingerprint=record.get('baseline_fingerprint', ''),
+                    dataset_ids=sorted(record.get('dataset_ids') or []),
+                    dataset_version=record.get('dataset_version', ''),
+                    candidate_score=record.get('candidate_score', 0.0),
+                    baseline_score=record.get('baseline_score', 0.0),
+                    improvement=record.get('improvement', 0.0),
+                    winner=record.get('winner', 'tie'),
+                    source=record.get('source', 'evaluated'),
+                    run_id=str(run_id),
+                    record=record
+                ))
+        return cls(outcomes)
+
+    def _scored(self) -> Iterable[CandidateOutcome]:
+        return (o for o in self.outcomes if o.source in SCORED_SOURCES)
+
+    # Cached scores
+
+    def reusable(
+        self, baseline_content: str, dataset_ids: Optional[List[int]] = None, dataset_key: str = ''
+    ) -> Dict[str, Dict[str, Any]]:
+        """Comparison records keyed by candidate fingerprint for this baseline and datasets.
+
+        dataset_key is the datasets' current dataset_version(); outcomes scored
+        on an earlier version of their cases are never reused.
+        """
+        baseline_fingerprint = prompt_fingerprint(baseline_content)
+        dataset_ids = sorted(dataset_ids or [])
+
+        exact, latest, known_scores = {}, {}, {}  # known_scores: fingerprint -> (score, cases)
+        for outcome in self._scored():
+            if outcome.dataset_ids != dataset_ids or outcome.dataset_version != dataset_key:
+                continue
+            # Outcomes are newest first, so keep the most recent evaluation
+            if outcome.baseline_fingerprint == baseline_fingerprint:
+                exact.setdefault(outcome.fingerprint, outcome.record)
+            latest.setdefault(outcome.fingerprint, outcome)
+            cases = outcome.record.get('test_cases_used', 0)
+            known_scores.setdefault(outcome.fingerprint, (outcome.candidate_score, cases))
+            known_scores.setdefault(outcome.baseline_fingerprint, (outcome.baseline_score, cases))
+
+        if baseline_fingerprint not in known_scores:
+            return exact
+
+        rebased = {
+            fingerprint: _rebase(outcome, *known_scores[baseline_fingerprint], baseline_fingerprint)
+            for fingerprint, outcome in latest.items()
+            if fingerprint not in exact and fingerprint != baseline_fingerprint
+        }
+        return {**rebased, **exact}
+
+    # Warm start
+
+    def losers(self, limit: int = 3, exclude: Iterable[str] = ()) -> List[CandidateOutcome]:
+        """Distinct rewrites that lost to their baseline, worst first"""
+        return self._distinct(
+            sorted((o for o in self._scored() if o.lost and o.content), key=lambda o: o.improvement),
+            limit, exclude
+        )
+
+    def contenders(self, baseline_content: str, limit: int = 2, exclude: Iterable[str] = ()) -> List[CandidateOutcome]:
+        """Distinct complete rewrites that beat their baseline, best first"""
+        baseline_fingerprint = prompt_fingerprint(baseline_content)
+        return self._distinct(
+            sorted(
+                (o for o in self._scored()
+                 if o.winner == 'candidate' and o.improvement > 0 and o.complete
+                 and o.fingerprint != baseline_fingerprint),
+                key=lambda o: o.improvement, reverse=True
+            ),
+            limit, exclude
+        )
+
+    def trajectory(self, limit: int = 3) -> List[Dict[str, Any]]:
+        """Best distinct scored prompts in ascending score order (OPRO meta-prompt format)"""
+        best = self._distinct(
+            sorted((o for o in self._scored() if o.content), key=lambda o: o.candidate_score, reverse=True),
+            limit
+        )
+        return [
+            {'prompt': o.content, 'score': o.candidate_score, 'improvement': o.improvement, 'winner': o.winner}
+            for o in reversed(best)
+        ]
+
+    @staticmethod
+    def _distinct(outcomes: Iterable[CandidateOutcome], limit: int, exclude: Iterable[str] = ()) -> List[CandidateOutcome]:
+        seen = set(exclude)
+        result = []
+        for outcome in outcomes:
+            if outcome.fingerprint in seen:
+                continue
+            seen.add(outcome.fingerprint)
+            result.append(outcome)
+            if len(result) >= limit:
+                break
+        return result
+
+
+def _rebase(outcome: CandidateOutcome, baseline_score: float, baseline_cases: int, baseline_fingerprint: str) -> Dict[str, Any]:
+    """Recompute a prior outcome's comparison against a different baseline's known score"""
+    baseline_result = _score_only(baseline_score, baseline_cases)
+    candidate_result = _score_only(outcome.candidate_score, outcome.record.get('test_cases_used', 0))
+    ab_testing = ABTestingEngine(evaluator=None)
+    p_value = ab_testing._calculate_statistical_significance(baseline_result, candidate_result)
+    improvement = (outcome.candidate_score - baseline_score) / baseline_score * 100 if baseline_score else 0.0
+    return {
+        **outcome.record,
+        'baseline_fingerprint': baseline_fingerprint,
+        'baseline_score': baseline_score,
+        'candidate_score': outcome.candidate_score,
+        'improvement': improvement,
+        'p_value': p_value,
+        'winner': ab_testing._determine_winner(baseline_result, candidate_result, p_value),
+        'confidence_level': max(0.0, 1.0 - p_value),
+        'rebased': True,
+    }
+
+
+def _score_only(score: float, cases: int) -> EvaluationResult:
+    return EvaluationResult(
+        prompt=None, performance_score=score, metrics={}, sample_outputs=[],
+        evaluation_time=timezone.now(), test_cases_used=cases, error_rate=0.0
+    )
@@ -5,9 +5,11 @@ Triggers optimization based on batches of feedback rather than individual instan
 
 import asyncio
 import logging
+import os
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
+from django.db.models import F
 from django.utils import timezone
 from asgiref.sync import sync_to_async
 
@@ -18,6 +20,17 @@ from .reward_aggregator import RewardFunctionAggregator
 from .unified_llm_provider import BaseLLMProvider
 from .optimization_progress import OptimizationProgressReporter
 from .metrics_collector import MetricsCollector
+from .llm_usage import track_llm_usage
+from .candidate_dedup import (
+    CandidateDeduplicator, comparison_record, dataset_version, load_candidate_history, prompt_fingerprint
+)
+from .candidate_screening import CandidateScreener, ScreeningCase
+from .feedback_trigger_counters import trigger_window
+from .run_checkpoints import CheckpointStore, checkpoint_scope
+from .response_cache import bump_on_commit
+from .deadline_planner import (
+    Deadline, DeadlinePlan, current_deadline, deadline_scope, load_latency_profile, plan_fast_optimization
+)
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +57,7 @@ class OptimizationResult:
     improvement_percentage: float
     feedback_batch_size: int
     optimization_time: datetime
+    deadline_report: Optional[Dict[str, Any]] = None  # Realized vs planned time of a budgeted run
 
 
 class OptimizationOrchestrator:
@@ -54,12 +68,17 @@ class OptimizationOrchestrator:
         llm_provider: BaseLLMProvider,
         prompt_rewriter: PromptRewriter,
         evaluation_engine: EvaluationEngine,
-        trigger_config: OptimizationTrigger = None
+        trigger_config: OptimizationTrigger = None,
+        candidate_screener: Optional[CandidateScreener] = None
     ):
         self.llm_provider = llm_provider
         self.prompt_rewriter = prompt_rewriter
         self.evaluation_engine = evaluation_engine
         self.trigger_config = trigger_config or OptimizationTrigger()
+        # Cheap first-stage ranking so only the top candidates get full A/B tests
+        self.candidate_screener = candidate_screener or CandidateScreener(llm_provider)
+        # Prior winners that were never deployed, re-entered into each cycle
+        self.warm_start_reentries = int(os.getenv('WARM_START_REENTRIES', '2'))
         self._optimization_lock = asyncio.Lock()
         self._last_optimization_time: Optional[datetime] = None
         self._optimization_count_today = 0
@@ -70,6 +89,7 @@ class OptimizationOrchestrator:
             'emergency': {'mode': 'fast', 'timeout': 5, 'min_improvement': 3.0},
             'continuous': {'mode': 'single_shot', 'timeout': 10, 'min_improvement': 5.0},
             'batch': {'mode': 'mini_opro', 'timeout': 30, 'min_improvement': 8.0},
+            'evolutionary': {'mode': 'evolutionary', 'timeout': 120, 'min_improvement': 5.0},
             'thorough': {'mode': 'legacy', 'timeout': 120, 'min_improvement': 10.0}
         }
     
@@ -115,16 +135,53 @@ class OptimizationOrchestrator:
             return result
     
     async def _analyze_feedback_for_triggers(self) -> Dict[str, Any]:
-        """Analyze recent feedback to determine if optimization should be triggered"""
+        """Analyze recent feedback to determine if optimization should be triggered
         
-        # Get feedback from the configured time window
-        cutoff_time = timezone.now() - timedelta(hours=self.trigger_config.feedback_window_hours)
+        Reads the rolling per-lab trigger counters; feedback rows are only loaded
+        once a trigger fires.
+        """
+        try:
+            window = await sync_to_async(trigger_window)(hours=self.trigger_config.feedback_window_hours)
+        except Exception as e:
+            logger.warning(f"Trigger counters unavailable, scanning recent feedback instead: {e}")
+            return await self._scan_feedback_for_triggers()
+        
+        if window.feedback_count < self.trigger_config.min_feedback_count:
+            return {
+                'should_trigger': False,
+                'reason': f'Insufficient feedback count: {window.feedback_count} < {self.trigger_config.min_feedback_count}',
+                'feedback_count': window.feedback_count,
+                'feedback_batch': []
+            }
         
-        recent_feedback = [
+        average_rating = window.average_rating if window.average_rating is not None else 3.0  # Default neutral
+        should_trigger, trigger_reason = self._trigger_decision(
+            window.negative_ratio, average_rating, bool(window.consistent_issues())
+        )
+        
+        return {
+            'should_trigger': should_trigger,
+            'reason': trigger_reason,
+            'feedback_count': window.feedback_count,
+            'negative_feedback_ratio': window.negative_ratio,
+            'average_rating': average_rating,
+            'consistent_issues': window.consistent_issues(),
+            'feedback_batch': await self._load_recent_feedback() if should_trigger else []
+        }
+    
+    async def _load_recent_feedback(self) -> List[UserFeedback]:
+        """Feedback from the configured time window"""
+        cutoff_time = timezone.now() - timedelta(hours=self.trigger_config.feedback_window_hours)
+        return [
             feedback async for feedback in UserFeedback.objects.filter(
                 created_at__gte=cutoff_time
             ).select_related('draft__system_prompt')
         ]
+    
+    async def _scan_feedback_for_triggers(self) -> Dict[str, Any]:
+        """Trigger analysis computed from the feedback rows, used when counters are unavailable"""
+        
+        recent_feedback = await self._load_recent_feedback()
         
         if len(recent_feedback) < self.trigger_config.min_feedback_count:
             return {
@@ -156,19 +213,9 @@ class OptimizationOrchestrator:
         negative_feedback_ratio = negative_feedback_count / len(recent_feedback)
         average_rating = total_rating_sum / rating_count if rating_count > 0 else 3.0  # Default neutral
         
-        # Determine if we should trigger optimization
-        should_trigger = False
-        trigger_reason = ""
-        
-        if negative_feedback_ratio >= self.trigger_config.min_negative_feedback_ratio:
-            should_trigger = True
-            trigger_reason = f"High negative feedback ratio: {negative_feedback_ratio:.1%}"
-        elif average_rating < 2.5:  # Below neutral on 1-5 scale
-            should_trigger = True
-            trigger_reason = f"Low average rating: {average_rating:.2f}"
-        elif self._has_consistent_issues(recent_feedback):
-            should_trigger = True
-            trigger_reason = "Consistent quality issues detected"
+        should_trigger, trigger_reason = self._trigger_decision(
+            negative_feedback_ratio, average_rating, self._has_consistent_issues(recent_feedback)
+        )
         
         return {
             'should_trigger': should_trigger,
@@ -179,6 +226,16 @@ class OptimizationOrchestrator:
             'feedback_batch': recent_feedback
         }
     
+    def _trigger_decision(self, negative_feedback_ratio: float, average_rating: float, consistent_issues: bool) -> Tuple[bool, str]:
+        """Whether the window's feedback warrants optimization, and why"""
+        if negative_feedback_ratio >= self.trigger_config.min_negative_feedback_ratio:
+            return True, f"High negative feedback ratio: {negative_feedback_ratio:.1%}"
+        if average_rating < 2.5:  # Below neutral on 1-5 scale
+            return True, f"Low average rating: {average_rating:.2f}"
+        if consistent_issues:
+            return True, "Consistent quality issues detected"
+        return False, ""
+    
     def _has_consistent_issues(self, feedback_batch: List[UserFeedback]) -> bool:
         """Detect consistent issues across the feedback batch"""
         
@@ -222,17 +279,17 @@ class OptimizationOrchestrator:
         
         logger.info(f"Starting optimization cycle with {len(feedback_batch)} feedback instances")
         
-        # Get current active prompt for the session
-        session = None
-        if feedback_batch:
-            # Extract session from feedback
+        # Get current active prompt for the prompt lab
+        prompt_lab_id = trigger_analysis.get('prompt_lab_id')
+        if prompt_lab_id is None and feedback_batch:
+            # Extract the prompt lab from feedback (its id is loaded with the email)
             first_feedback = feedback_batch[0]
             if hasattr(first_feedback, 'draft') and hasattr(first_feedback.draft, 'email'):
-                session = first_feedback.draft.email.session
+                prompt_lab_id = first_feedback.draft.email.prompt_lab_id
         
-        # Check cold start status if we have a session
-        if session and not self._check_cold_start_status(session):
-            logger.warning(f"Optimization blocked for session {session.id}: Cold start not complete")
+        # Check cold start status if we have a prompt lab
+        if prompt_lab_id and not self._check_cold_start_status(prompt_lab_id):
+            logger.warning(f"Optimization blocked for prompt lab {prompt_lab_id}: Cold start not complete")
             return OptimizationResult(
                 trigger_reason="Cold start not complete",
                 baseline_prompt=None,
@@ -245,9 +302,9 @@ class OptimizationOrchestrator:
                 optimization_time=start_time
             )
         
-        if session:
+        if prompt_lab_id:
             current_prompt = await sync_to_async(
-                SystemPrompt.objects.filter(session=session, is_active=True).first
+                SystemPrompt.objects.filter(prompt_lab_id=prompt_lab_id, is_active=True).first
             )()
         else:
             current_prompt = await sync_to_async(
@@ -265,6 +322,13 @@ class OptimizationOrchestrator:
         
         logger.info(f"Using optimization strategy: {optimization_strategy['name']}")
         
+        # A deadline-planned run sizes rewriting and evaluation to its time budget
+        deadline = current_deadline()
+        plan = deadline.plan if deadline else None
+        rewrite_timeout = optimization_strategy['timeout']
+        if plan:
+            rewrite_timeout = min(rewrite_timeout, max(plan.rewrite_seconds, deadline.remaining() - plan.evaluation_seconds))
+        
         # Generate candidate prompts with timeout
         try:
             candidates = await asyncio.wait_for(
@@ -272,22 +336,31 @@ class OptimizationOrchestrator:
                     rewrite_context,
                     mode=optimization_strategy['mode']
                 ),
-                timeout=optimization_strategy['timeout']
+                timeout=rewrite_timeout
             )
         except asyncio.TimeoutError:
-            logger.warning(f"Optimization timed out after {optimization_strategy['timeout']}s, falling back to fast mode")
-            candidates = await self.prompt_rewriter.rewrite_prompt(
-                rewrite_context,
-                mode="fast"
-            )
+            if deadline:
+                # No time left for a second rewrite; keep the current prompt
+                logger.warning(f"Candidate generation exceeded its {rewrite_timeout:.1f}s share of the time budget")
+                deadline.cut_short = True
+                candidates = []
+            else:
+                logger.warning(f"Optimization timed out after {optimization_strategy['timeout']}s, falling back to fast mode")
+                candidates = await self.prompt_rewriter.rewrite_prompt(
+                    rewrite_context,
+                    mode="fast"
+                )
         
         logger.info(f"Generated {len(candidates)} candidate prompts")
+        if plan:
+            candidates = sorted(candidates, key=lambda c: c.confidence, reverse=True)[:plan.candidates]
+        candidates = candidates + await self._reentered_candidates(current_prompt, candidates)
         
-        # Evaluate candidates against current prompt
-        evaluation_results = await self.evaluation_engine.compare_prompt_candidates(
+        # Evaluate candidates against current prompt, skipping duplicates
+        evaluation_results, _, _ = await self._compare_unique_candidates(
             current_prompt,
             [SystemPrompt(content=c.content, version=current_prompt.version + 1) for c in candidates],
-            test_case_count=15  # Use more test cases for batch optimization
+            test_case_count=plan.test_cases if plan else 15  # Use more test cases for batch optimization
         )
         
         # Find best candidate
@@ -333,7 +406,6 @@ class OptimizationOrchestrator:
         """Build rewrite context from batch of feedback"""
         
         # Aggregate feedback insights
-        recent_feedback = []
         performance_history = {}
         
         # Process feedback batch
@@ -342,12 +414,6 @@ class OptimizationOrchestrator:
         factor_ratings = {}
         
         for feedback in feedback_batch:
-            recent_feedback.append({
-                'action': feedback.action,
-                'reasoning': getattr(feedback, 'reasoning', ''),
-                'factors': getattr(feedback, 'reasoning_factors', {})
-            })
-            
             if feedback.action in ['reject', 'edit']:
                 negative_actions += 1
             
@@ -388,7 +454,7 @@ class OptimizationOrchestrator:
         return RewriteContext(
             email_scenario=primary_scenario,
             current_prompt=current_prompt,
-            recent_feedback=recent_feedback[-5:],  # Last 5 for context
+            recent_feedback=list(feedback_batch[-5:]),  # Last 5 for context; the rewriter reads their actions
             performance_history=performance_history,
             constraints=constraints
         )
@@ -426,7 +492,7 @@ class OptimizationOrchestrator:
         
         # Create new prompt version
         new_prompt = SystemPrompt(
-            session=current_prompt.session,  # Preserve session
+            prompt_lab_id=current_prompt.prompt_lab_id,  # Preserve prompt lab
             content=new_candidate.content,
             version=current_prompt.version + 1,
             performance_score=comparison_result.candidate.performance_score,
@@ -465,15 +531,15 @@ class OptimizationOrchestrator:
             'available_strategies': self.optimization_strategies
         }
     
-    def _check_cold_start_status(self, session) -> bool:
-        """Check if optimization is allowed based on cold start status"""
+    def _check_cold_start_status(self, prompt_lab) -> bool:
+        """Check if optimization is allowed based on cold start status (prompt lab or its id)"""
         try:
             from app.services.cold_start_manager import ColdStartManager
             cold_start_manager = ColdStartManager()
             
             # Check if cold start allows optimization
-            if not cold_start_manager.should_allow_optimization(session):
-                logger.info(f"Optimization blocked for session {session.id}: Cold start not complete")
+            if not cold_start_manager.should_allow_optimization(prompt_lab):
+                logger.info(f"Optimization blocked for prompt lab {getattr(prompt_lab, 'id', prompt_lab)}: Cold start not complete")
                 return False
             
             return True
@@ -486,7 +552,7 @@ class OptimizationOrchestrator:
             # On error, be conservative and block optimization
             return False
     
-    def optimize_prompt(self, session, feedback_list):
+    def optimize_prompt(self, prompt_lab, feedback_list):
         """Synchronous wrapper for manual optimization trigger"""
         import asyncio
         from dataclasses import dataclass
@@ -500,7 +566,7 @@ class OptimizationOrchestrator:
             error_message: str = ""
         
         # Check cold start status first
-        if not self._check_cold_start_status(session):
+        if not self._check_cold_start_status(prompt_lab):
             return SimpleOptimizationResult(
                 success=False,
                 error_message="Optimization blocked: Cold start phase not complete"
@@ -517,7 +583,8 @@ class OptimizationOrchestrator:
                 'reason': f"Manual trigger with {len(feedback_list)} feedback items",
                 'feedback_count': len(feedback_list),
                 'feedback_batch': feedback_list,
-                'forced_strategy': 'continuous'
+                'forced_strategy': 'continuous',
+                'prompt_lab_id': prompt_lab.id
             }
             
             # Execute optimization
@@ -527,7 +594,7 @@ class OptimizationOrchestrator:
             if result.deployed and result.best_candidate:
                 # Get the newly created prompt
                 new_prompt = SystemPrompt.objects.filter(
-                    session=session,
+                    prompt_lab=prompt_lab,
                     version=result.baseline_prompt.version + 1
                 ).first()
                 
@@ -598,7 +665,12 @@ class OptimizationOrchestrator:
         return await self._execute_optimization_cycle(trigger_analysis)
     
     async def fast_optimize(self, time_budget: int = 10, min_performance: float = 0.7) -> OptimizationResult:
-        """Fast optimization mode for immediate improvements"""
+        """Fast optimization mode for immediate improvements.
+        
+        The candidate count, test case count and response length are planned
+        from measured provider latency to fit the time budget, which is then
+        enforced as a deadline; the result carries realized vs planned time.
+        """
         
         logger.info(f"Starting fast optimization with {time_budget}s budget")
         
@@ -610,10 +682,35 @@ class OptimizationOrchestrator:
         else:
             strategy = 'batch'
         
-        return await self.force_optimization(
-            reason=f"Fast optimization (budget: {time_budget}s)",
-            strategy=strategy
+        deadline = Deadline(time_budget, await self._plan_deadline(time_budget))
+        logger.info(f"Fast optimization plan: {deadline.plan.to_dict()}")
+        
+        with deadline_scope(deadline):
+            result = await self.force_optimization(
+                reason=f"Fast optimization (budget: {time_budget}s)",
+                strategy=strategy
+            )
+        result.deadline_report = deadline.report()
+        logger.info(
+            f"Fast optimization took {result.deadline_report['realized_seconds']:.1f}s "
+            f"(planned {deadline.plan.planned_seconds:.1f}s, budget {time_budget}s)"
         )
+        return result
+    
+    async def _plan_deadline(self, time_budget: float) -> DeadlinePlan:
+        """Plan the run from the latency measured for the generation and scoring models"""
+        scoring_provider = getattr(self.evaluation_engine, 'scoring_llm_provider', None) or self.llm_provider
+        
+        def model_name(provider):
+            return getattr(getattr(provider, 'config', None), 'model', None) or 'unknown'
+        
+        generation = await sync_to_async(load_latency_profile)(model_name(self.llm_provider))
+        scoring = await sync_to_async(load_latency_profile)(model_name(scoring_provider))
+        from .llm_router import RoutedLLMProvider
+        
+        # Prompt evaluations run in parallel up to the routed provider's concurrency ceiling
+        max_concurrency = self.llm_provider.route.max_concurrency if isinstance(self.llm_provider, RoutedLLMProvider) else 4
+        return plan_fast_optimization(time_budget, generation, scoring, max_concurrency=max_concurrency)
     
     async def trigger_optimization_with_datasets(
         self,
@@ -621,6 +718,62 @@ class OptimizationOrchestrator:
         dataset_ids: List[int],
         force: bool = False,
         optimization_run_id: Optional[str] = None
+    ) -> Any:
+        """Run dataset optimization while recording the LLM usage it incurs.
+        
+        Usage records are persisted even when the run fails; on success the
+        measured cost is attached to the result and stored on the run's
+        cost_analysis.
+        """
+        with track_llm_usage(prompt_lab_id=prompt_lab_id, optimization_run_id=optimization_run_id) as usage:
+            try:
+                result = await self._run_dataset_optimization(
+                    prompt_lab_id, dataset_ids, force, optimization_run_id
+                )
+            finally:
+                await sync_to_async(self._persist_usage)(usage)
+        
+        result.cost_analysis = await sync_to_async(self._record_cost_analysis)(
+            usage, result, optimization_run_id, prompt_lab_id
+        )
+        return result
+    
+    def _persist_usage(self, usage) -> None:
+        try:
+            usage.persist()
+        except Exception as e:
+            logger.error(f"Failed to persist LLM usage records: {e}")
+    
+    def _record_cost_analysis(
+        self, usage, result, optimization_run_id: Optional[str], prompt_lab_id=None
+    ) -> Dict[str, Any]:
+        """Build cost analysis from measured usage and store it on the optimization run"""
+        from core.models import OptimizationRun
+        
+        metrics_collector = MetricsCollector()
+        metrics_collector.set_cost_analysis(
+            total_cost_usd=usage.total_cost_usd,
+            iterations_performed=1,
+            evaluations_performed=getattr(result, 'test_cases_used', 0)
+        )
+        cost_analysis = metrics_collector.get_cost_analysis()
+        cost_analysis['usage'] = usage.summary()
+        
+        if optimization_run_id:
+            try:
+                OptimizationRun.objects.filter(id=optimization_run_id).update(cost_analysis=cost_analysis)
+                bump_on_commit(prompt_lab_id)
+            except Exception as e:
+                logger.error(f"Failed to store cost analysis for run {optimization_run_id}: {e}")
+        
+        return cost_analysis
+    
+    async def _run_dataset_optimization(
+        self,
+        prompt_lab_id: str,
+        dataset_ids: List[int],
+        force: bool = False,
+        optimization_run_id: Optional[str] = None
     ) -> Any:
         """Manually trigger optimization using specific evaluation datasets
         
@@ -678,7 +831,7 @@ class OptimizationOrchestrator:
             # Simple convergence check based on whether we have a convergence detector
             try:
                 convergence_detector = ConvergenceDetector()
-                convergence = await sync_to_async(convergence_detector.assess_convergence)(prompt_lab)
+                convergence = await sync_to_async(convergence_detector.get_assessment)(prompt_lab)
                 if convergence.get('converged', False):
                     raise ValueError("Prompt has converged. Use force=True to override.")
             except Exception as e:
@@ -693,23 +846,31 @@ class OptimizationOrchestrator:
         
         logger.info(f"Loaded {len(test_cases)} cases from {len(dataset_ids)} datasets")
         
-        # 4. Generate candidate prompts using rewriter
+        # 4. Generate candidate prompts using rewriter, unless resuming from a checkpoint
         from .prompt_rewriter import RewriteContext
         
-        rewrite_context = RewriteContext(
-            email_scenario="dataset_based_optimization",
-            current_prompt=active_prompt,
-            recent_feedback=[],  # No user feedback for dataset-based optimization
-            performance_history={},
-            constraints={'manual_trigger': True, 'dataset_count': len(dataset_ids)}
-        )
-        
-        candidates = await self.prompt_rewriter.rewrite_prompt(
-            context=rewrite_context,
-            mode="fast"
-        )
-        
-        logger.info(f"Generated {len(candidates)} candidate prompts")
+        checkpoint = await self._open_checkpoint(optimization_run_id, dataset_ids)
+        candidates = checkpoint.candidates() if checkpoint else []
+        if candidates:
+            logger.info(f"Reusing {len(candidates)} checkpointed candidate prompts")
+        else:
+            rewrite_context = RewriteContext(
+                email_scenario="dataset_based_optimization",
+                current_prompt=active_prompt,
+                recent_feedback=[],  # No user feedback for dataset-based optimization
+                performance_history={},
+                constraints={'manual_trigger': True, 'dataset_count': len(dataset_ids), 'dataset_ids': dataset_ids}
+            )
+            
+            candidates = await self.prompt_rewriter.rewrite_prompt(
+                context=rewrite_context,
+                mode="fast"
+            )
+            
+            logger.info(f"Generated {len(candidates)} candidate prompts")
+            candidates = candidates + await self._reentered_candidates(active_prompt, candidates)
+            if checkpoint:
+                await sync_to_async(checkpoint.save_candidates)(candidates)
         
         # 6. Convert candidates to SystemPrompt objects for evaluation
         candidate_prompts = []
@@ -724,14 +885,24 @@ class OptimizationOrchestrator:
             )
             candidate_prompts.append(temp_prompt)
         
-        # 7. Evaluate with datasets
-        comparison_results = await self.evaluation_engine.compare_prompt_candidates(
-            baseline=active_prompt,
-            candidates=candidate_prompts,
-            test_case_count=len(test_cases),
-            dataset_ids=dataset_ids,
-            evaluation_config=None
-        )
+        # 7. Evaluate with datasets, skipping duplicates and previously evaluated prompts;
+        # each completed prompt/case evaluation is checkpointed
+        with checkpoint_scope(checkpoint):
+            comparison_results, candidate_metrics, screening = await self._compare_unique_candidates(
+                active_prompt,
+                candidate_prompts,
+                test_case_count=len(test_cases),
+                dataset_ids=dataset_ids,
+                prompt_lab_id=prompt_lab.id
+            )
+        detailed_metrics = {'screening': screening} if screening else {}
+        if checkpoint:
+            detailed_metrics['checkpoint'] = checkpoint.summary()
+        if optimization_run_id:
+            await sync_to_async(
+                OptimizationRun.objects.filter(id=optimization_run_id).update
+            )(candidate_metrics=candidate_metrics, detailed_metrics=detailed_metrics)
+            await sync_to_async(bump_on_commit)(prompt_lab.id)
         
         # 8. Find best performing candidate
         best_result = None
@@ -785,11 +956,182 @@ class OptimizationOrchestrator:
                 'content': best_result.candidate.prompt.content if best_result else active_prompt.content
             })(),
             'datasets_used': len(dataset_ids),
-            'test_cases_used': len(test_cases)
+            'test_cases_used': len(test_cases),
+            'candidate_metrics': candidate_metrics,
+            'detailed_metrics': detailed_metrics
         })()
         
         return result
     
+    async def _open_checkpoint(self, optimization_run_id: Optional[str], dataset_ids: List[int]) -> Optional[CheckpointStore]:
+        if not optimization_run_id:
+            return None
+        try:
+            return await sync_to_async(CheckpointStore.open)(optimization_run_id, dataset_ids)
+        except Exception as e:
+            logger.warning(f"Checkpointing disabled for optimization {optimization_run_id}: {e}")
+            return None
+    
+    async def resume_optimization(self, optimization_run_id: str) -> Any:
+        """Continue a checkpointed dataset optimization run.
+        
+        The checkpointed candidates are evaluated again, replaying every
+        prompt/case evaluation that already completed.
+        """
+        from core.models import OptimizationCheckpoint
+        
+        checkpoint = await sync_to_async(
+            OptimizationCheckpoint.objects.select_related('optimization_run').get
+        )(optimization_run_id=optimization_run_id)
+        await sync_to_async(OptimizationCheckpoint.objects.filter(pk=checkpoint.pk).update)(
+            resume_count=F('resume_count') + 1
+        )
+        run = checkpoint.optimization_run
+        return await self.trigger_optimization_with_datasets(
+            prompt_lab_id=str(run.prompt_lab_id),
+            dataset_ids=checkpoint.dataset_ids or run.datasets_used,
+            force=True,  # The convergence check already passed when the run started
+            optimization_run_id=str(run.id)
+        )
+    
+    async def _compare_unique_candidates(
+        self,
+        baseline: SystemPrompt,
+        candidate_prompts: List[SystemPrompt],
+        test_case_count: int,
+        dataset_ids: Optional[List[int]] = None,
+        prompt_lab_id=None
+    ) -> Tuple[list, List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """A/B test only distinct, not previously evaluated, screened-in candidates.
+        
+        Returns one comparison per candidate (in order), candidate metrics
+        recording each outcome so later runs in the lab can reuse them, and a
+        screening accuracy summary (None when screening did not run).
+        """
+        dataset_key = await sync_to_async(dataset_version)(dataset_ids)
+        history = await sync_to_async(load_candidate_history)(
+            prompt_lab_id, baseline.content, dataset_ids, dataset_key=dataset_key
+        ) if prompt_lab_id else {}
+        plan = CandidateDeduplicator().plan(baseline.content, [p.content for p in candidate_prompts], history)
+        
+        screening = None
+        screened = list(plan.evaluate)
+        if self.candidate_screener.should_screen(len(screened), test_case_count):
+            try:
+                screening = await self.candidate_screener.screen(
+                    baseline.content,
+                    [candidate_prompts[i].content for i in screened],
+                    await self._load_screening_cases(
+                        dataset_ids, self.candidate_screener.config.budget(len(screened), test_case_count)[0]
+                    ),
+                    full_case_count=test_case_count,
+                    prompt_lab_id=prompt_lab_id
+                )
+                promoted = {screened[j] for j in screening.evaluated()}
+                plan.screen_out(
+                    [i for i in screened if i not in promoted],
+                    {screened[j]: score for j, score in enumerate(screening.scores)}
+                )
+            except Exception as e:
+                logger.warning(f"Candidate screening failed, evaluating all candidates: {e}")
+                screening = None
+        
+        evaluated = []
+        if plan.evaluate:
+            evaluated = await self.evaluation_engine.compare_prompt_candidates(
+                baseline=baseline,
+                candidates=[candidate_prompts[i] for i in plan.evaluate],
+                test_case_count=test_case_count,
+                dataset_ids=dataset_ids,
+                evaluation_config=None
+            )
+        results = plan.expand(baseline, candidate_prompts, evaluated)
+        
+        logger.info(
+            f"Evaluated {len(plan.evaluate)} of {len(candidate_prompts)} candidates; "
+            f"avoided {plan.evaluations_avoided} evaluations via dedup/reuse, "
+            f"{len(plan.screened_out)} via screening"
+        )
+        
+        screening_summary = None
+        if screening:
+            screening_summary = screening.accuracy({
+                j: results[i].candidate.performance_score
+                for j, i in enumerate(screened) if i in plan.evaluate
+            })
+        
+        metrics_collector = MetricsCollector()
+        for i, comparison in enumerate(results):
+            candidate = comparison.candidate
+            # test_cases_used counts successes; error_rate is failures over all cases
+            failed = round(candidate.test_cases_used * candidate.error_rate / (1 - candidate.error_rate)) if candidate.error_rate < 1 else 0
+            metrics_collector.add_candidate_metrics(
+                candidate_id=f"candidate_{i + 1}",
+                prompt_content=candidate_prompts[i].content,
+                performance_score=candidate.performance_score,
+                component_scores=candidate.metrics,
+                test_results={'passed': candidate.test_cases_used, 'failed': failed},
+                generation_time_ms=0.0,
+                sample_outputs=candidate.sample_outputs,
+                comparison=comparison_record(
+                    comparison, plan.baseline_fingerprint, plan.fingerprints[i], dataset_ids, plan.source(i),
+                    screening=screening.candidate_record(screened.index(i)) if screening and i in screened else None,
+                    dataset_key=dataset_key
+                )
+            )
+        
+        return results, metrics_collector.get_candidate_metrics(), screening_summary
+    
+    async def _reentered_candidates(
+        self,
+        baseline: SystemPrompt,
+        candidates: List[RewriteCandidate]
+    ) -> List[RewriteCandidate]:
+        """Strong earlier candidates from the lab's history that were never deployed.
+        
+        Their cached scores are reused by candidate dedup, so re-entering them
+        usually costs no evaluation.
+        """
+        from .optimization_history import OptimizationHistory
+        
+        if not baseline.prompt_lab_id or self.warm_start_reentries <= 0:
+            return []
+        try:
+            history = await sync_to_async(OptimizationHistory.load)(baseline.prompt_lab_id)
+        except Exception as e:
+            logger.warning(f"Could not load optimization history for warm start: {e}")
+            return []
+        
+        contenders = history.contenders(
+            baseline.content,
+            limit=self.warm_start_reentries,
+            exclude={prompt_fingerprint(c.content) for c in candidates}
+        )
+        if contenders:
+            logger.info(f"Re-entering {len(contenders)} prior candidates from optimization history")
+        return [
+            RewriteCandidate(
+                content=outcome.content,
+                confidence=outcome.record.get('confidence_level', 0.5),
+                temperature=0.0,
+                reasoning=f"Re-entered from run {outcome.run_id} ({outcome.improvement:+.1f}% vs its baseline)"
+            )
+            for outcome in contenders
+        ]
+    
+    async def _load_screening_cases(self, dataset_ids: Optional[List[int]], limit: int) -> List[ScreeningCase]:
+        """Cases for screening: the first dataset cases (human-reviewed first) or suite emails"""
+        if dataset_ids:
+            from .dataset_optimization_service import DatasetOptimizationService
+            cases = await sync_to_async(DatasetOptimizationService().load_evaluation_cases)(dataset_ids, limit=limit)
+            return [ScreeningCase(case.input_text, case.expected_output) for case in cases]
+        
+        test_cases = await self.evaluation_engine.test_suite.generate_test_cases()
+        return [
+            ScreeningCase(f"Subject: {tc.email.subject}\nFrom: {tc.email.sender}\nBody: {tc.email.body}", '', tc.scenario_type)
+            for tc in test_cases[:limit]
+        ]
+    
     def _select_optimization_strategy(self, trigger_analysis: Dict[str, Any], feedback_count: int) -> Dict[str, Any]:
         """Select optimization strategy based on context"""
         
@@ -887,8 +1229,8 @@ class OptimizationOrchestrator:
                 logger.info(f"Convergence check not needed for prompt lab {prompt_lab.id}")
                 return False
             
-            # Perform convergence assessment
-            assessment = await sync_to_async(detector.assess_convergence)(prompt_lab)
+            # Reuse the stored assessment unless new scores, feedback or iterations arrived
+            assessment = await sync_to_async(detector.get_assessment)(prompt_lab)
             
             if assessment.get('converged', False):
                 confidence = assessment.get('confidence_score', 0.0)
@@ -0,0 +1,296 @@
+"""
+Optimization Queue
+Admission gate for optimization runs across prompt labs. Callers enqueue a
+run, block in wait() until it is dispatched, run it in their own thread and
+release the slot:
+
+- global and per-provider concurrency caps
+- one queued or running optimization per prompt lab (unless forced)
+- weighted fair queuing across labs: each lab's virtual finish time grows by
+  cost / weight per run, so labs that optimize often cannot starve the rest
+- labs with a high negative-feedback ratio get a larger weight
+- admission control against ComputeOptimizer's daily budget
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when an optimization run cannot be queued or was not dispatched in time"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason  # lab_busy, queue_full, budget_exhausted or timeout
+
+
+@dataclass
+class QueueLimits:
+    """Concurrency caps and fairness settings"""
+    max_concurrent: int = 4
+    provider_limits: Dict[str, int] = field(default_factory=dict)  # e.g. {'ollama': 1}
+    default_provider_limit: int = 2
+    max_queue_depth: int = 50
+    negative_feedback_boost: float = 2.0  # Weight multiplier added at 100% negative feedback
+    wait_timeout_seconds: float = 600.0
+
+    @classmethod
+    def from_env(cls) -> 'QueueLimits':
+        provider_limits = {}
+        for item in os.getenv('OPTIMIZATION_PROVIDER_LIMITS', '').split(','):
+            name, _, limit = item.partition('=')
+            if name.strip() and limit.strip().isdigit():
+                provider_limits[name.strip().lower()] = int(limit)
+        return cls(
+            max_concurrent=int(os.getenv('OPTIMIZATION_MAX_CONCURRENT', '4')),
+            provider_limits=provider_limits,
+            default_provider_limit=int(os.getenv('OPTIMIZATION_PROVIDER_DEFAULT_LIMIT', '2')),
+            max_queue_depth=int(os.getenv('OPTIMIZATION_MAX_QUEUE_DEPTH', '50')),
+            negative_feedback_boost=float(os.getenv('OPTIMIZATION_NEGATIVE_FEEDBACK_BOOST', '2.0')),
+            wait_timeout_seconds=float(os.getenv('OPTIMIZATION_QUEUE_TIMEOUT_SECONDS', '600')),
+        )
+
+    def provider_limit(self, provider: str) -> int:
+        return max(1, self.provider_limits.get(provider, self.default_provider_limit))
+
+
+@dataclass
+class QueueTicket:
+    """One optimization run's place in the queue"""
+    prompt_lab_id: str
+    provider: str
+    weight: float
+    virtual_start: float
+    virtual_finish: float
+    sequence: int
+    enqueued_at: float
+    started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self.started_at is not None
+
+    def waited(self, now: float) -> float:
+        return (self.started_at or now) - self.enqueued_at
+
+
+class OptimizationQueue:
+    """Thread-safe weighted fair queue in front of optimization runs"""
+
+    def __init__(
+        self,
+        limits: Optional[QueueLimits] = None,
+        compute_optimizer=None,
+        lab_weight: Optional[Callable[[str], float]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.limits = limits or QueueLimits.from_env()
+        self._compute_optimizer = compute_optimizer
+        self._lab_weight = lab_weight or self.negative_feedback_weight
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._waiting: List[QueueTicket] = []
+        self._running: List[QueueTicket] = []
+        self._labs: Counter = Counter()  # Tickets per lab, queued or running
+        self._virtual_time = 0.0
+        self._lab_finish: Dict[str, float] = {}
+        self._sequence = 0
+        self._recent_waits = deque(maxlen=100)
+        self._dispatched = 0
+
+    @property
+    def compute_optimizer(self):
+        if self._compute_optimizer is None:
+            from .compute_optimizer import ComputeOptimizer
+            self._compute_optimizer = ComputeOptimizer()
+        return self._compute_optimizer
+
+    # Admission
+
+    def enqueue(self, prompt_lab_id, provider: str = 'default', cost: float = 1.0, exclusive: bool = True) -> QueueTicket:
+        """Queue a run or raise AdmissionRejected immediately"""
+        prompt_lab_id = str(prompt_lab_id)
+        provider = (provider or 'default').lower()
+        weight = max(0.1, self._lab_weight(prompt_lab_id))
+        budget = self.compute_optimizer.get_compute_budget_status()
+
+        with self._condition:
+            if exclusive and self._labs[prompt_lab_id]:
+                raise AdmissionRejected('lab_busy', f'An optimization is already queued or running for prompt lab {prompt_lab_id}')
+            if len(self._waiting) >= self.limits.max_queue_depth:
+                raise AdmissionRejected('queue_full', f'Optimization queue is full ({len(self._waiting)} waiting)')
+            # Queued and running runs will each use one budgeted iteration
+            if budget.get('budget_remaining', 0) - len(self._waiting) - len(self._running) <= 0:
+                raise AdmissionRejected('budget_exhausted', 'Daily compute budget exhausted')
+
+            start = max(self._virtual_time, self._lab_finish.get(prompt_lab_id, 0.0))
+            self._sequence += 1
+            ticket = QueueTicket(
+                prompt_lab_id=prompt_lab_id,
+                provider=provider,
+                weight=weight,
+                virtual_start=start,
+                virtual_finish=start + cost / weight,
+                sequence=self._sequence,
+                enqueued_at=self._clock()
+            )
+            self._lab_finish[prompt_lab_id] = ticket.virtual_finish
+            self._labs[prompt_lab_id] += 1
+            self._waiting.append(ticket)
+            self._dispatch()
+            return ticket
+
+    def wait(self, ticket: QueueTicket, timeout: Optional[float] = None, cancellation=None) -> QueueTicket:
+        """Block until the ticket is dispatched; raises AdmissionRejected on timeout.
+        
+        With a cancellation token, the wait is abandoned within a second of the
+        run being cancelled.
+        """
+        timeout = self.limits.wait_timeout_seconds if timeout is None else timeout
+        deadline = self._clock() + timeout
+        with self._condition:
+            while not ticket.running:
+                remaining = deadline - self._clock()
+                if cancellation is not None and cancellation.cancelled:
+                    self._remove(ticket)
+                    cancellation.raise_if_cancelled()
+                if remaining <= 0:
+                    self._remove(ticket)
+                    raise AdmissionRejected('timeout', f'Timed out after {timeout:.0f}s waiting for an optimization slot')
+                self._condition.wait(remaining if cancellation is None else min(remaining, 1.0))
+        return ticket
+
+    def release(self, ticket: QueueTicket):
+        """Free the ticket's slot (or drop it from the queue if it never started)"""
+        with self._condition:
+            self._remove(ticket)
+
+    @contextmanager
+    def slot(self, prompt_lab_id, provider: str = 'default', cost: float = 1.0,
+             exclusive: bool = True, timeout: Optional[float] = None):
+        ticket = self.enqueue(prompt_lab_id, provider, cost, exclusive)
+        try:
+            yield self.wait(ticket, timeout)
+        finally:
+            self.release(ticket)
+
+    def is_busy(self, prompt_lab_id) -> bool:
+        with self._condition:
+            return self._labs[str(prompt_lab_id)] > 0
+
+    # Scheduling
+
+    def _dispatch(self):
+        """Start waiting tickets in virtual-finish order while capacity allows"""
+        started = False
+        while len(self._running) < self.limits.max_concurrent:
+            ticket = self._next_eligible()
+            if ticket is None:
+                break
+            self._waiting.remove(ticket)
+            ticket.started_at = self._clock()
+            self._running.append(ticket)
+            # Start-time fair queuing: system virtual time follows the start tag in service
+            self._virtual_time = max(self._virtual_time, ticket.virtual_start)
+            self._recent_waits.append(ticket.waited(ticket.started_at))
+            self._dispatched += 1
+            started = True
+            try:
+                self.compute_optimizer.increment_usage_counter()
+            except Exception as e:
+                logger.warning(f"Could not record compute usage for optimization: {e}")
+        if started:
+            self._condition.notify_all()
+
+    def _next_eligible(self) -> Optional[QueueTicket]:
+        running_per_provider = Counter(t.provider for t in self._running)
+        eligible = [
+            t for t in self._waiting
+            if running_per_provider[t.provider] < self.limits.provider_limit(t.provider)
+        ]
+        return min(eligible, key=lambda t: (t.virtual_finish, t.sequence), default=None)
+
+    def _remove(self, ticket: QueueTicket):
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+        elif ticket in self._running:
+            self._running.remove(ticket)
+        else:
+            return
+        self._labs[ticket.prompt_lab_id] -= 1
+        if self._labs[ticket.prompt_lab_id] <= 0:
+            del self._labs[ticket.prompt_lab_id]
+        self._dispatch()
+
+    def negative_feedback_weight(self, prompt_lab_id: str) -> float:
+        """1.0, boosted up to 1 + negative_feedback_boost for labs whose recent feedback is all negative"""
+        try:
+            from .feedback_trigger_counters import trigger_window
+            return 1.0 + self.limits.negative_feedback_boost * trigger_window(prompt_lab_id).negative_ratio
+        except Exception as e:
+            logger.debug(f"Could not read trigger counters for prompt lab {prompt_lab_id}: {e}")
+            return 1.0
+
+    # Status
+
+    def status(self) -> Dict[str, Any]:
+        with self._condition:
+            now = self._clock()
+            waiting = sorted(self._waiting, key=lambda t: (t.virtual_finish, t.sequence))
+            running = list(self._running)
+            recent = list(self._recent_waits)
+            dispatched = self._dispatched
+
+        providers = {}
+        for ticket in running + waiting:
+            entry = providers.setdefault(ticket.provider, {
+                'running': 0, 'queued': 0, 'limit': self.limits.provider_limit(ticket.provider)
+            })
+            entry['running' if ticket.running else 'queued'] += 1
+
+        queued_waits = [t.waited(now) for t in waiting]
+        return {
+            'running': len(running),
+            'queued': len(waiting),
+            'max_concurrent': self.limits.max_concurrent,
+            'max_queue_depth': self.limits.max_queue_depth,
+            'dispatched_total': dispatched,
+            'providers': providers,
+            'wait_seconds': {
+                'queued_max': max(queued_waits, default=0.0),
+                'recent_avg': sum(recent) / len(recent) if recent else 0.0,
+                'recent_max': max(recent, default=0.0),
+            },
+            'labs': [
+                {
+                    'prompt_lab_id': t.prompt_lab_id,
+                    'state': 'running' if t.running else 'queued',
+                    'position': None if t.running else waiting.index(t) + 1,
+                    'provider': t.provider,
+                    'weight': round(t.weight, 3),
+                    'waited_seconds': round(t.waited(now), 3),
+                }
+                for t in running + waiting
+            ],
+        }
+
+
+_queue: Optional[OptimizationQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_optimization_queue() -> OptimizationQueue:
+    """Process-wide optimization queue"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = OptimizationQueue()
+        return _queue
@@ -0,0 +1,345 @@
+"""
+Prompt Evolution
+Population-based search mode for the prompt rewriter. Each prompt lab keeps a
+population of prompts across optimization cycles (PromptPopulationMember); a
+cycle breeds offspring by LLM mutation and crossover of tournament-selected
+parents and keeps them if they beat the weakest member.
+
+Cycles run under an explicit LLM-call budget covering both variation calls
+and fitness calls. Breeding is steady-state rather than generational:
+several workers each take budget for one offspring, generate it, score it
+and insert it, so generation and evaluation calls overlap and no worker
+waits for a generation to finish.
+
+Fitness is the cheap screening score (local response scoring on a few cases
+plus prompt-structure heuristics), averaged across every cycle a member was
+scored in. The orchestrator still A/B tests the returned candidates in full.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from core.models import PromptPopulationMember, UserFeedback
+from .candidate_dedup import prompt_fingerprint
+from .candidate_screening import ScreeningCase, local_response_score, prompt_structure_score
+
+logger = logging.getLogger(__name__)
+
+MUTATION_OPERATORS = [
+    "Make the instructions more specific and actionable",
+    "Restructure the prompt so the most important instruction comes first",
+    "Tighten the wording and remove redundant instructions",
+    "Add guidance on tone and how to handle unclear requests",
+    "Clarify what a complete, high-quality reply must contain",
+]
+
+_PREAMBLE_PATTERN = re.compile(r'^\s*(improved|new|rewritten|combined|mutated)? ?prompt\s*:\s*', re.IGNORECASE)
+
+
+@dataclass
+class EvolutionConfig:
+    """Population size and per-cycle budget"""
+    population_size: int = 8
+    llm_call_budget: int = 40  # Variation plus fitness calls per cycle
+    workers: int = 3  # Offspring in flight at once
+    fitness_cases: int = 3
+    crossover_rate: float = 0.5
+    tournament_size: int = 3
+    candidates: int = 3  # Members returned for full evaluation
+
+    @classmethod
+    def from_env(cls) -> 'EvolutionConfig':
+        """Read EVOLUTION_POPULATION_SIZE, EVOLUTION_LLM_CALL_BUDGET, EVOLUTION_WORKERS
+        and EVOLUTION_FITNESS_CASES"""
+        return cls(
+            population_size=int(os.getenv('EVOLUTION_POPULATION_SIZE', '8')),
+            llm_call_budget=int(os.getenv('EVOLUTION_LLM_CALL_BUDGET', '40')),
+            workers=int(os.getenv('EVOLUTION_WORKERS', '3')),
+            fitness_cases=int(os.getenv('EVOLUTION_FITNESS_CASES', '3'))
+        )
+
+
+class LLMCallBudget:
+    """Calls are reserved before they are made so concurrent workers never overspend"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.limit - self.used
+
+    def reserve(self, calls: int) -> bool:
+        if calls > self.remaining:
+            return False
+        self.used += calls
+        return True
+
+    def refund(self, calls: int):
+        self.used = max(0, self.used - calls)
+
+
+@dataclass
+class EvolutionReport:
+    """What a cycle spent and how far it moved the population"""
+    llm_calls: int = 0
+    offspring: int = 0
+    accepted: int = 0
+    failed: int = 0
+    best_fitness_before: Optional[float] = None
+    best_fitness_after: Optional[float] = None
+    origins: Dict[str, int] = field(default_factory=dict)  # Accepted offspring per operator
+
+    @property
+    def progress_per_call(self) -> float:
+        if not self.llm_calls or self.best_fitness_after is None:
+            return 0.0
+        return (self.best_fitness_after - (self.best_fitness_before or 0.0)) / self.llm_calls
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'llm_calls': self.llm_calls,
+            'offspring': self.offspring,
+            'accepted': self.accepted,
+            'failed': self.failed,
+            'best_fitness_before': self.best_fitness_before,
+            'best_fitness_after': self.best_fitness_after,
+            'progress_per_call': self.progress_per_call,
+            'origins': self.origins,
+        }
+
+
+class PromptEvolution:
+    """Steady-state evolutionary search over a prompt lab's population"""
+
+    def __init__(
+        self,
+        rewriter_llm,
+        task_llm=None,
+        config: Optional[EvolutionConfig] = None,
+        rng: Optional[random.Random] = None
+    ):
+        self.rewriter_llm = rewriter_llm
+        self.task_llm = task_llm
+        self.config = config or EvolutionConfig.from_env()
+        self.rng = rng or random.Random()
+
+    async def run_cycle(
+        self,
+        prompt_lab_id,
+        current_content: str,
+        cases: List[ScreeningCase]
+    ) -> Tuple[List[PromptPopulationMember], EvolutionReport]:
+        """Breed offspring until the budget is spent; returns the best members
+        (excluding the current prompt) and the cycle report"""
+        cases = cases[:self.config.fitness_cases]
+        budget = LLMCallBudget(self.config.llm_call_budget)
+        report = EvolutionReport()
+        population = await sync_to_async(self._load_population)(prompt_lab_id)
+        report.best_fitness_before = max((m.fitness for m in population if m.fitness is not None), default=None)
+        task_llm = self.task_llm or await sync_to_async(self._default_task_llm)(prompt_lab_id)
+
+        current_fingerprint = prompt_fingerprint(current_content)
+        current = next((m for m in population if m.fingerprint == current_fingerprint), None)
+        if current is None:
+            current = PromptPopulationMember(
+                prompt_lab_id=prompt_lab_id, content=current_content, fingerprint=current_fingerprint, origin='seed'
+            )
+            population.append(current)
+        if budget.reserve(len(cases)):
+            self._record_fitness(current, await self._fitness(task_llm, current.content, current_content, cases))
+
+        async def worker():
+            while budget.reserve(1 + len(cases)):
+                child = await self._breed(population, prompt_lab_id)
+                if child is None or any(m.fingerprint == child.fingerprint for m in population):
+                    # Variation call was spent; the fitness calls were not
+                    budget.refund(len(cases))
+                    report.failed += 1
+                    continue
+                report.offspring += 1
+                self._record_fitness(child, await self._fitness(task_llm, child.content, current_content, cases))
+                if self._insert(population, child, protected=current):
+                    report.accepted += 1
+                    report.origins[child.origin] = report.origins.get(child.origin, 0) + 1
+
+        await asyncio.gather(*[worker() for _ in range(max(1, self.config.workers))])
+
+        report.llm_calls = budget.used
+        report.best_fitness_after = max((m.fitness for m in population if m.fitness is not None), default=None)
+        await sync_to_async(self._save_population)(prompt_lab_id, population)
+        logger.info(f"Evolution cycle for prompt lab {prompt_lab_id}: {report.summary()}")
+
+        ranked = sorted(
+            (m for m in population if m.is_alive and m.fingerprint != current_fingerprint and m.fitness is not None),
+            key=lambda m: m.fitness, reverse=True
+        )
+        return ranked[:self.config.candidates], report
+
+    # Variation
+
+    async def _breed(self, population: List[PromptPopulationMember], prompt_lab_id) -> Optional[PromptPopulationMember]:
+        alive = [m for m in population if m.is_alive]
+        if len(alive) >= 2 and self.rng.random() < self.config.crossover_rate:
+            first = self._tournament(alive)
+            second = self._tournament([m for m in alive if m is not first])
+            parents, origin = [first, second], 'crossover'
+            instruction = f"""Combine the strongest instructions of these two email assistant prompts into one prompt.
+Keep any {{{{parameters}}}} they use.
+
+Prompt A:
+\"\"\"{first.content}\"\"\"
+
+Prompt B:
+\"\"\"{second.content}\"\"\"
+
+Generate ONLY the combined prompt without any explanations:
+"""
+            temperature = 0.7
+        else:
+            parent = self._tournament(alive)
+            parents, origin = [parent], 'mutation'
+            operator = self.rng.choice(MUTATION_OPERATORS)
+            instruction = f"""Rewrite this email assistant prompt. {operator}.
+Keep its purpose and any {{{{parameters}}}} it uses.
+
+\"\"\"{parent.content}\"\"\"
+
+Generate ONLY the rewritten prompt without any explanations:
+"""
+            temperature = 0.9
+
+        try:
+            response = await self.rewriter_llm.generate(instruction, temperature=temperature, max_tokens=300)
+        except Exception as e:
+            logger.warning(f"Evolution {origin} failed: {e}")
+            return None
+        content = _PREAMBLE_PATTERN.sub('', (response or '').strip()).strip().strip('"').strip()
+        if not content:
+            return None
+
+        return PromptPopulationMember(
+            prompt_lab_id=prompt_lab_id,
+            content=content,
+            fingerprint=prompt_fingerprint(content),
+            origin=origin,
+            parent_ids=[p.id for p in parents if p.id],
+            generation=max(p.generation for p in parents) + 1
+        )
+
+    def _tournament(self, members: List[PromptPopulationMember]) -> PromptPopulationMember:
+        entrants = self.rng.sample(members, min(self.config.tournament_size, len(members)))
+        return max(entrants, key=lambda m: m.fitness if m.fitness is not None else -1.0)
+
+    # Selection
+
+    def _insert(
+        self,
+        population: List[PromptPopulationMember],
+        child: PromptPopulationMember,
+        protected: PromptPopulationMember
+    ) -> bool:
+        """Add the child, retiring the weakest member once the population is full"""
+        alive = [m for m in population if m.is_alive]
+        if any(m.fingerprint == child.fingerprint for m in alive):
+            return False  # Another worker bred the same prompt meanwhile
+        if len(alive) < self.config.population_size:
+            population.append(child)
+            return True
+
+        # The current prompt stays so offspring are always compared against it
+        weakest = min(
+            (m for m in alive if m is not protected),
+            key=lambda m: m.fitness if m.fitness is not None else -1.0,
+            default=None
+        )
+        if weakest is None or (weakest.fitness is not None and child.fitness <= weakest.fitness):
+            return False
+        weakest.is_alive = False
+        population.append(child)
+        return True
+
+    # Fitness
+
+    async def _fitness(self, task_llm, content: str, baseline_content: str, cases: List[ScreeningCase]) -> float:
+        structure = prompt_structure_score(content, baseline_content)
+        if not cases:
+            return structure
+
+        async def score(case: ScreeningCase) -> Optional[float]:
+            try:
+                response = await task_llm.generate(
+                    prompt=f"Please respond to this email:\n{case.input_text}",
+                    system_prompt=content,
+                    temperature=0.3,
+                    max_tokens=300
+                )
+                return local_response_score(response.strip(), case.expected_output, case.scenario_type)
+            except Exception as e:
+                logger.warning(f"Evolution fitness call failed: {e}")
+                return None
+
+        scores = [value for value in await asyncio.gather(*[score(case) for case in cases]) if value is not None]
+        if not scores:
+            return structure
+        return 0.8 * sum(scores) / len(scores) + 0.2 * structure
+
+    @staticmethod
+    def _record_fitness(member: PromptPopulationMember, fitness: float):
+        member.fitness = fitness if member.fitness is None else (
+            (member.fitness * member.evaluations + fitness) / (member.evaluations + 1)
+        )
+        member.evaluations += 1
+
+    # Persistence
+
+    def _load_population(self, prompt_lab_id) -> List[PromptPopulationMember]:
+        return list(PromptPopulationMember.objects.filter(prompt_lab_id=prompt_lab_id, is_alive=True))
+
+    def _save_population(self, prompt_lab_id, population: List[PromptPopulationMember]):
+        with transaction.atomic():
+            existing = [m for m in population if m.pk]
+            if existing:
+                PromptPopulationMember.objects.bulk_update(existing, ['fitness', 'evaluations', 'is_alive'])
+            new = [m for m in population if not m.pk and m.is_alive]
+            if new:
+                # Offspring retired within the cycle are not worth a row
+                PromptPopulationMember.objects.bulk_create(new, ignore_conflicts=True)
+
+    def _default_task_llm(self, prompt_lab_id):
+        from .llm_router import TaskType, get_llm_router
+        return get_llm_router().get_provider(TaskType.DRAFT_GENERATION, prompt_lab_id)
+
+
+def load_fitness_cases(context, limit: int) -> List[ScreeningCase]:
+    """Cases with known-good replies: dataset cases, else accepted or edited drafts"""
+    dataset_ids = context.constraints.get('dataset_ids') if context.constraints else None
+    if dataset_ids:
+        from .dataset_optimization_service import DatasetOptimizationService
+        return [
+            ScreeningCase(case.input_text, case.expected_output)
+            for case in DatasetOptimizationService().load_evaluation_cases(dataset_ids, limit=limit)
+        ]
+
+    feedback_ids = [f.id for f in context.recent_feedback if getattr(f, 'id', None)]
+    cases = []
+    for feedback in UserFeedback.objects.filter(
+        id__in=feedback_ids, action__in=['accept', 'edit']
+    ).select_related('draft__email')[:limit]:
+        email = feedback.draft.email
+        expected = feedback.edited_content if feedback.action == 'edit' else feedback.draft.content
+        cases.append(ScreeningCase(
+            f"Subject: {email.subject}\nFrom: {email.sender}\nBody: {email.body}",
+            expected or '',
+            email.scenario_type or 'professional'
+        ))
+    return cases
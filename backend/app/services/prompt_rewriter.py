@@ -4,7 +4,13 @@ from core.models import SystemPrompt, Email, UserFeedback
 from dataclasses import dataclass
 import asyncio
 import logging
+import os
 from django.db.models import Q, Avg, Count
+from asgiref.sync import sync_to_async
+from .prompt_similarity_index import ALL_SCENARIOS, get_prompt_similarity_index
+from .prompt_evolution import PromptEvolution, load_fitness_cases
+from .optimization_history import OptimizationHistory
+from .run_cancellation import check_cancelled
 from django.utils import timezone
 from datetime import timedelta
 
@@ -79,7 +85,12 @@ class LLMBasedPromptRewriter(PromptRewriter):
         rewriter_llm_provider,
         similarity_llm_provider,
         reward_function_aggregator,
-        meta_prompt_manager
+        meta_prompt_manager,
+        candidate_count: Optional[int] = None,
+        candidate_temperatures: Optional[List[float]] = None,
+        candidate_timeout: Optional[float] = None,
+        similarity_index=None,
+        evolution: Optional[PromptEvolution] = None
     ):
         self.rewriter_llm = rewriter_llm_provider
         self.similarity_llm = similarity_llm_provider
@@ -87,6 +98,26 @@ class LLMBasedPromptRewriter(PromptRewriter):
         self.meta_prompt_manager = meta_prompt_manager
         self.feedback_patterns = []  # Cache for performance
         
+        # Candidate fan-out: candidates are generated concurrently (the routed
+        # provider's per-task concurrency limit still applies) and any call that
+        # exceeds candidate_timeout is dropped instead of failing the batch.
+        # Defaults come from REWRITER_CANDIDATE_COUNT, REWRITER_CANDIDATE_TEMPERATURES
+        # (comma-separated) and REWRITER_CANDIDATE_TIMEOUT
+        if candidate_temperatures is None and os.getenv('REWRITER_CANDIDATE_TEMPERATURES'):
+            candidate_temperatures = [
+                float(value) for value in os.getenv('REWRITER_CANDIDATE_TEMPERATURES').split(',') if value.strip()
+            ]
+        self.candidate_count = max(1, candidate_count or int(os.getenv('REWRITER_CANDIDATE_COUNT', '3')))
+        self.candidate_temperatures = candidate_temperatures or None  # None = per-strategy defaults
+        self.candidate_timeout = candidate_timeout or float(os.getenv('REWRITER_CANDIDATE_TIMEOUT', '30'))
+        
+        # Local TF-IDF index of prompt versions; similarity lookups need no LLM call
+        self.similarity_index = similarity_index or get_prompt_similarity_index()
+        
+        # Population search used by the 'evolutionary' mode; fitness calls go to
+        # the lab's draft-generation route unless a task provider is injected
+        self.evolution = evolution or PromptEvolution(rewriter_llm_provider)
+        
         # Modern optimization settings
         self.optimization_modes = {
             'fast': {'max_iterations': 1, 'candidates': 1, 'timeout': 5},
@@ -143,6 +174,8 @@ Generate ONLY the improved prompt without any explanations:
             return await self._single_shot_optimization(context)
         elif mode == 'mini_opro':
             return await self._mini_opro_optimization(context)
+        elif mode == 'evolutionary':
+            return await self._evolutionary_optimization(context)
         else:
             # Legacy mode for backward compatibility
             return await self._legacy_optimization(context, mode)
@@ -165,6 +198,8 @@ Generate ONLY the improved prompt without any explanations:
         task_context = self._build_task_context(context)
         performance_feedback = self._format_performance_feedback(context)
         main_issue = self._identify_primary_issue(context)
+        history = await self._load_optimization_history(context)
+        rejected = history.losers(limit=2) if history else []
         
         optimization_prompt = f"""
 Improve this prompt to make it more effective:
@@ -175,7 +210,7 @@ Main issue to fix: {main_issue}
 Context: {task_context}
 
 Make the prompt more specific and actionable while keeping it clear.
-
+{self._format_rejected_rewrites(rejected) if rejected else ''}
 Improved prompt:
 """
         
@@ -201,8 +236,10 @@ Improved prompt:
     async def _mini_opro_optimization(self, context: RewriteContext) -> List[RewriteCandidate]:
         """Lightweight OPRO implementation (15-30 seconds)"""
         
-        # Build mini meta-prompt with optimization trajectory
-        recent_history = await self._get_recent_optimization_history(context, limit=3)
+        # Build mini meta-prompt with optimization trajectory and known losers
+        history = await self._load_optimization_history(context)
+        recent_history = history.trajectory(limit=3) if history else []
+        rejected = history.losers(limit=3) if history else []
         
         task_context = self._build_task_context(context)
         performance_feedback = self._format_performance_feedback(context)
@@ -216,33 +253,69 @@ Improved prompt:
         # Add optimization trajectory if available
         if recent_history:
             mini_metaprompt += f"\n\nRecent optimization attempts and results:\n{self._format_optimization_history(recent_history)}"
+        if rejected:
+            mini_metaprompt += f"\n\n{self._format_rejected_rewrites(rejected)}"
         
-        mini_metaprompt += "\n\nGenerate 3 improved versions focusing on the main weakness:\n"
+        mini_metaprompt += f"\n\nGenerate {self.candidate_count} improved versions focusing on the main weakness:\n"
         
         try:
-            # Generate 3 candidates in parallel if possible
-            candidates = []
-            for i in range(3):
-                response = await self.rewriter_llm.generate(
-                    mini_metaprompt + f"\nVersion {i+1}:",
-                    temperature=0.4 + (i * 0.1),  # Slight temperature variation
-                    max_tokens=200,
-                    timeout=10
-                )
-                
-                candidates.append(RewriteCandidate(
+            temperatures = self._candidate_temperatures([0.4, 0.5, 0.6])  # Slight temperature variation
+            responses = await self._generate_candidates_concurrently([
+                (mini_metaprompt + f"\nVersion {i+1}:", temperature, {'max_tokens': 200, 'timeout': 10})
+                for i, temperature in enumerate(temperatures)
+            ])
+            
+            candidates = [
+                RewriteCandidate(
                     content=response.strip(),
                     confidence=0.7 + (0.1 if i == 0 else 0),  # First candidate slightly higher confidence
-                    temperature=0.4 + (i * 0.1),
+                    temperature=temperatures[i],
                     reasoning=f"Mini-OPRO candidate {i+1} with slight variation"
-                ))
+                )
+                for i, response in enumerate(responses) if response is not None
+            ]
             
+            if not candidates:
+                raise RuntimeError("All Mini-OPRO candidate generations failed")
             return candidates
             
         except Exception as e:
             logger.warning(f"Mini-OPRO optimization failed: {e}")
             return await self._single_shot_optimization(context)  # Fallback
     
+    async def _evolutionary_optimization(self, context: RewriteContext) -> List[RewriteCandidate]:
+        """Population-based search that carries over between cycles (budgeted LLM calls)"""
+        
+        prompt_lab_id = context.current_prompt.prompt_lab_id
+        if not prompt_lab_id:
+            logger.info("Evolutionary mode needs a prompt lab to keep its population; using Mini-OPRO")
+            return await self._mini_opro_optimization(context)
+        
+        try:
+            cases = await sync_to_async(load_fitness_cases)(context, self.evolution.config.fitness_cases)
+            members, report = await self.evolution.run_cycle(prompt_lab_id, context.current_prompt.content, cases)
+        except Exception as e:
+            logger.warning(f"Evolutionary optimization failed: {e}")
+            return await self._mini_opro_optimization(context)  # Fallback
+        
+        if not members:
+            logger.info("Evolution produced no member beyond the current prompt; using Mini-OPRO")
+            return await self._mini_opro_optimization(context)
+        
+        return [
+            RewriteCandidate(
+                content=member.content,
+                confidence=member.fitness,
+                temperature=0.9 if member.origin == 'mutation' else 0.7,
+                reasoning=(
+                    f"Evolutionary {member.origin} (generation {member.generation}, fitness "
+                    f"{member.fitness:.3f} over {member.evaluations} evaluations; "
+                    f"cycle used {report.llm_calls} LLM calls)"
+                )
+            )
+            for member in members
+        ]
+    
     async def select_best_candidate(
         self,
         candidates: List[RewriteCandidate],
@@ -298,50 +371,46 @@ Improved prompt:
         logger.info(f"Updated feedback patterns. Reward: {reward:.3f}, Action: {user_feedback.action}")
     
     async def _find_similar_successful_prompts(self, context: RewriteContext) -> List[SimilarityMatch]:
-        """Find similar successful prompts from database using LLM similarity matching"""
-        
-        # Get successful prompts from recent feedback
-        successful_prompts = await self._get_successful_prompts_from_db(context.email_scenario)
-        
-        if not successful_prompts:
-            return []
+        """Find similar successful prompts using the local similarity index"""
         
-        # Use LLM to find similar prompts
-        similarity_instruction = f"""
-        Compare the current prompt with these successful prompts and rate similarity (0-1):
-        
-        Current Prompt: "{context.current_prompt.content}"
-        Current Scenario: {context.email_scenario}
-        
-        Successful Prompts:
-        {self._format_successful_prompts(successful_prompts)}
-        
-        Return JSON format: [{{"prompt_id": 1, "similarity": 0.8, "reason": "both focus on professional tone"}}]
-        """
+        current_prompt = context.current_prompt
+        scenario_type = self._index_scenario(context.email_scenario)
         
         try:
-            similarity_response = await self.similarity_llm.generate(
-                similarity_instruction,
-                temperature=0.1,
-                max_tokens=500
+            hits = await sync_to_async(self.similarity_index.search)(
+                current_prompt.content,
+                k=3,  # Top 3 matches
+                scenario_type=scenario_type,
+                exclude_ids=[current_prompt.id] if current_prompt.id else [],
+                min_feedback=3,  # Minimum feedback count
+                min_success_rate=0.6  # 60% success threshold
             )
+            prompts = await self._load_prompts([hit.prompt_id for hit in hits])
             
-            # Parse similarity scores (simplified - in production use proper JSON parsing)
-            matches = []
-            for prompt_data in successful_prompts[:3]:  # Top 3 matches
-                matches.append(SimilarityMatch(
-                    prompt=prompt_data['prompt'],
-                    similarity_score=0.7,  # Placeholder - would parse from LLM response
-                    feedback_pattern=prompt_data['feedback_summary'],
-                    success_rate=prompt_data['success_rate']
-                ))
-            
-            return matches
+            return [
+                SimilarityMatch(
+                    prompt=prompts[hit.prompt_id],
+                    similarity_score=hit.similarity,
+                    feedback_pattern=hit.feedback_summary,
+                    success_rate=hit.success_rate
+                )
+                for hit in hits if hit.prompt_id in prompts
+            ]
             
         except Exception as e:
             logger.warning(f"Similarity matching failed: {e}")
             return []
     
+    def _index_scenario(self, scenario_type: str) -> str:
+        """Map rewrite scenarios without email feedback onto all scenarios"""
+        known = {choice for choice, _ in Email.SCENARIO_CHOICES}
+        return scenario_type if scenario_type in known else ALL_SCENARIOS
+    
+    async def _load_prompts(self, prompt_ids: List[int]) -> Dict[int, SystemPrompt]:
+        if not prompt_ids:
+            return {}
+        return await sync_to_async(SystemPrompt.objects.in_bulk)(prompt_ids)
+    
     async def _try_cached_pattern_optimization(self, context: RewriteContext) -> Optional[RewriteCandidate]:
         """Try to optimize using cached successful patterns (sub-second)"""
         
@@ -468,35 +537,88 @@ Improved prompt:
             reasoning="Conservative rewrite based on successful patterns"
         )]
     
-    async def _generate_exploratory_rewrites(self, instruction: str) -> List[RewriteCandidate]:
+    async def _generate_exploratory_rewrites(self, instruction: str, count: Optional[int] = None) -> List[RewriteCandidate]:
         """Generate multiple diverse candidate rewrites"""
-        candidates = []
+        focus_areas = ['clarity', 'engagement', 'efficiency', 'specificity', 'structure']
+        temperatures = self._candidate_temperatures([0.7], count)  # Higher temperature for diversity
+        focuses = [focus_areas[i % len(focus_areas)] for i in range(len(temperatures))]
         
-        for i in range(3):  # Generate 3 diverse candidates
-            enhanced_instruction = f"{instruction}\n\nVariation {i+1}: Focus on {'clarity' if i==0 else 'engagement' if i==1 else 'efficiency'}:"
-            
-            response = await self.rewriter_llm.generate(
-                enhanced_instruction,
-                temperature=0.7,  # Higher temperature for diversity
-                max_tokens=300
-            )
-            
-            candidates.append(RewriteCandidate(
+        responses = await self._generate_candidates_concurrently([
+            (f"{instruction}\n\nVariation {i+1}: Focus on {focus}:", temperatures[i], {'max_tokens': 300})
+            for i, focus in enumerate(focuses)
+        ])
+        
+        candidates = [
+            RewriteCandidate(
                 content=response.strip(),
                 confidence=0.6,
-                temperature=0.7,
-                reasoning=f"Exploratory rewrite focusing on {'clarity' if i==0 else 'engagement' if i==1 else 'efficiency'}"
-            ))
+                temperature=temperatures[i],
+                reasoning=f"Exploratory rewrite focusing on {focuses[i]}"
+            )
+            for i, response in enumerate(responses) if response is not None
+        ]
         
+        if not candidates:
+            raise RuntimeError("All exploratory rewrite generations failed")
         return candidates
     
     async def _generate_hybrid_rewrites(self, instruction: str) -> List[RewriteCandidate]:
         """Generate mix of conservative and exploratory candidates"""
-        conservative = await self._generate_conservative_rewrites(instruction)
-        exploratory = await self._generate_exploratory_rewrites(instruction)
+        # Conservative + (candidate_count - 1) exploratory, all in flight at once
+        exploratory_count = max(1, self.candidate_count - 1)
+        results = await asyncio.gather(
+            self._generate_conservative_rewrites(instruction),
+            self._generate_exploratory_rewrites(instruction, count=exploratory_count),
+            return_exceptions=True
+        )
+        check_cancelled()  # return_exceptions would otherwise hide a cancelled run
+        
+        candidates = []
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning(f"Hybrid rewrite generation partially failed: {result}")
+            else:
+                candidates.extend(result)
+        
+        if not candidates:
+            raise RuntimeError("All hybrid rewrite generations failed")
+        return candidates
+    
+    def _candidate_temperatures(self, defaults: List[float], count: Optional[int] = None) -> List[float]:
+        """Temperature per candidate, cycling through the configured (or default) values"""
+        temperatures = self.candidate_temperatures or defaults
+        return [temperatures[i % len(temperatures)] for i in range(count or self.candidate_count)]
+    
+    async def _generate_candidates_concurrently(
+        self,
+        requests: List[Tuple[str, float, Dict[str, Any]]]
+    ) -> List[Optional[str]]:
+        """Run (prompt, temperature, kwargs) generations concurrently.
+        
+        Returns responses in request order, with None for calls that failed or
+        exceeded candidate_timeout so callers can keep the partial results.
+        """
+        async def generate(prompt: str, temperature: float, kwargs: Dict[str, Any]) -> str:
+            return await asyncio.wait_for(
+                self.rewriter_llm.generate(prompt, temperature=temperature, **kwargs),
+                timeout=self.candidate_timeout
+            )
         
-        # Return conservative + top 2 exploratory
-        return conservative + exploratory[:2]
+        results = await asyncio.gather(
+            *[generate(prompt, temperature, kwargs) for prompt, temperature, kwargs in requests],
+            return_exceptions=True
+        )
+        check_cancelled()  # return_exceptions would otherwise hide a cancelled run
+        
+        responses = []
+        for i, result in enumerate(results):
+            if isinstance(result, BaseException):
+                reason = "timed out" if isinstance(result, asyncio.TimeoutError) else f"failed: {result}"
+                logger.warning(f"Candidate generation {i+1}/{len(requests)} {reason}")
+                responses.append(None)
+            else:
+                responses.append(result)
+        return responses
     
     def _summarize_feedback(self, feedback_list: List[UserFeedback]) -> str:
         """Summarize recent user feedback for context"""
@@ -509,61 +631,29 @@ Improved prompt:
         return f"Recent actions: {action_counts}"
     
     async def _get_successful_prompts_from_db(self, scenario_type: str) -> List[Dict]:
-        """Query database for successful prompts in similar scenarios"""
+        """Successful prompts in similar scenarios, from the similarity index's feedback counters"""
         try:
-            # Get prompts with positive feedback in the last 30 days
-            recent_date = timezone.now() - timedelta(days=30)
+            hits = await sync_to_async(self.similarity_index.successful_prompts)(
+                self._index_scenario(scenario_type),
+                min_feedback=3,  # Minimum feedback count
+                min_success_rate=0.6,  # 60% success threshold
+                limit=5  # Top 5
+            )
+            prompts = await self._load_prompts([hit.prompt_id for hit in hits])
             
-            # Query successful feedback patterns using async ORM
-            successful_feedback = [
-                feedback async for feedback in UserFeedback.objects.filter(
-                    action__in=['accept', 'edit'],
-                    created_at__gte=recent_date,
-                    draft__email__scenario_type=scenario_type
-                ).select_related('draft__system_prompt')
+            return [
+                {
+                    'prompt': prompts[hit.prompt_id],
+                    'success_rate': hit.success_rate,
+                    'feedback_summary': hit.feedback_summary
+                }
+                for hit in hits if hit.prompt_id in prompts
             ]
             
-            prompt_performance = {}
-            for feedback in successful_feedback:
-                prompt_id = feedback.draft.system_prompt.id
-                if prompt_id not in prompt_performance:
-                    prompt_performance[prompt_id] = {
-                        'prompt': feedback.draft.system_prompt,
-                        'accepts': 0,
-                        'edits': 0,
-                        'total': 0
-                    }
-                
-                prompt_performance[prompt_id][feedback.action + 's'] += 1
-                prompt_performance[prompt_id]['total'] += 1
-            
-            # Calculate success rates and return top performers
-            successful_prompts = []
-            for prompt_id, data in prompt_performance.items():
-                if data['total'] >= 3:  # Minimum feedback count
-                    success_rate = (data['accepts'] + data['edits']) / data['total']
-                    if success_rate >= 0.6:  # 60% success threshold
-                        successful_prompts.append({
-                            'prompt': data['prompt'],
-                            'success_rate': success_rate,
-                            'feedback_summary': f"Accepts: {data['accepts']}, Edits: {data['edits']}"
-                        })
-            
-            # Sort by success rate
-            successful_prompts.sort(key=lambda x: x['success_rate'], reverse=True)
-            return successful_prompts[:5]  # Top 5
-            
         except Exception as e:
             logger.error(f"Failed to query successful prompts: {e}")
             return []
     
-    def _format_successful_prompts(self, prompts: List[Dict]) -> str:
-        """Format successful prompts for LLM similarity comparison"""
-        formatted = ""
-        for i, prompt_data in enumerate(prompts):
-            formatted += f"{i+1}. \"{prompt_data['prompt'].content}\" (Success: {prompt_data['success_rate']:.1%})\n"
-        return formatted
-    
     async def _store_successful_pattern(
         self, 
         original_prompt: SystemPrompt, 
@@ -760,20 +850,28 @@ Improved prompt:
         
         return content
     
-    async def _get_recent_optimization_history(self, context: RewriteContext, limit: int = 3) -> List[Dict]:
-        """Get recent optimization history for OPRO-style trajectory"""
-        
+    async def _load_optimization_history(self, context: RewriteContext) -> Optional[OptimizationHistory]:
+        """Candidate outcomes of the lab's recent runs, or None without a prompt lab"""
+        prompt_lab_id = getattr(context.current_prompt, 'prompt_lab_id', None)
+        if not prompt_lab_id:
+            return None
         try:
-            # Query recent system prompts with performance data
-            recent_prompts = []
-            
-            # This would query recent prompts and their performance in a real implementation
-            # For now, return empty to avoid database complexity
-            return recent_prompts
-            
+            return await sync_to_async(OptimizationHistory.load)(prompt_lab_id)
         except Exception as e:
-            logger.debug(f"Failed to get optimization history: {e}")
-            return []
+            logger.debug(f"Failed to load optimization history: {e}")
+            return None
+    
+    async def _get_recent_optimization_history(self, context: RewriteContext, limit: int = 3) -> List[Dict]:
+        """Get recent optimization history for OPRO-style trajectory"""
+        history = await self._load_optimization_history(context)
+        return history.trajectory(limit) if history else []
+    
+    def _format_rejected_rewrites(self, rejected) -> str:
+        """Negative examples: rewrites that already lost to their baseline"""
+        formatted = "These earlier rewrites performed worse than the prompt they replaced; do not repeat them:\n"
+        for i, outcome in enumerate(rejected):
+            formatted += f"{i+1}. \"{outcome.content}\" ({outcome.improvement:+.1f}%)\n"
+        return formatted
     
     def _format_optimization_history(self, history: List[Dict]) -> str:
         """Format optimization history for meta-prompt"""
@@ -0,0 +1,307 @@
+"""
+Prompt Similarity Index
+Local TF-IDF index over SystemPrompt versions with their performance scores and
+feedback success rates, replacing LLM similarity calls and per-call feedback
+scans in the prompt rewriter.
+
+Prompts are embedded with hashed word unigrams/bigrams (no fitted vocabulary),
+so new or edited prompts are added incrementally from model signals once the
+write commits. Feedback counters are updated the same way, and the whole index is rebuilt from two
+aggregate queries once it is older than max_age_seconds, which also picks up
+writes from other processes or bulk updates that bypass signals.
+"""
+
+import logging
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, List, Optional, Iterable
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+
+from core.models import SystemPrompt, UserFeedback
+from .feedback_signals import FeedbackWrite
+
+logger = logging.getLogger(__name__)
+
+ALL_SCENARIOS = 'all'
+SUCCESS_ACTIONS = ('accept', 'edit')
+
+
+@dataclass
+class PromptStats:
+    """Indexed prompt metadata and feedback counters"""
+    prompt_id: int
+    prompt_lab_id: Optional[str]
+    version: int
+    performance_score: Optional[float]
+    feedback: Dict[str, Dict[str, int]] = field(default_factory=dict)  # scenario -> accepts/edits/total
+
+    def counts(self, scenario_type: str = ALL_SCENARIOS) -> Dict[str, int]:
+        if scenario_type == ALL_SCENARIOS:
+            totals = {'accepts': 0, 'edits': 0, 'total': 0}
+            for counts in self.feedback.values():
+                for key in totals:
+                    totals[key] += counts[key]
+            return totals
+        return self.feedback.get(scenario_type, {'accepts': 0, 'edits': 0, 'total': 0})
+
+    def success_rate(self, scenario_type: str = ALL_SCENARIOS) -> float:
+        counts = self.counts(scenario_type)
+        return (counts['accepts'] + counts['edits']) / counts['total'] if counts['total'] else 0.0
+
+
+@dataclass
+class SimilarPrompt:
+    """Search hit"""
+    prompt_id: int
+    similarity: float
+    performance_score: Optional[float]
+    success_rate: float
+    feedback_summary: str
+
+
+class PromptSimilarityIndex:
+    """Brute-force cosine search over hashed TF-IDF prompt vectors"""
+
+    def __init__(self, dimensions: int = 2048, max_age_seconds: float = 300.0, feedback_window_days: int = 30):
+        self.dimensions = dimensions
+        self.max_age_seconds = max_age_seconds
+        self.feedback_window_days = feedback_window_days
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._row_of: Dict[int, int] = {}
+        self._stats: List[Optional[PromptStats]] = []
+        self._tf = np.zeros((0, self.dimensions), dtype=np.float32)  # Grows by doubling; rows past len(_stats) unused
+        self._df = np.zeros(self.dimensions, dtype=np.float32)
+        self._weighted = None  # Cached L2-normalized TF-IDF matrix
+        self._built_at = None
+
+    # Vectorization
+
+    def _term_counts(self, text: str) -> np.ndarray:
+        words = re.findall(r'\w+', (text or '').lower())
+        terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for term in terms:
+            vector[zlib.crc32(term.encode('utf-8')) % self.dimensions] += 1
+        # Sublinear term frequency
+        np.log1p(vector, out=vector)
+        return vector
+
+    def _idf(self) -> np.ndarray:
+        documents = sum(1 for stats in self._stats if stats is not None)
+        return np.log((1 + documents) / (1 + self._df)) + 1
+
+    def _normalized(self, matrix: np.ndarray) -> np.ndarray:
+        weighted = matrix * self._idf()
+        norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+        norms[norms == 0] = 1
+        return weighted / norms
+
+    # Maintenance
+
+    def ensure_built(self):
+        with self._lock:
+            if self._built_at is None or time.monotonic() - self._built_at > self.max_age_seconds:
+                self.rebuild()
+
+    def rebuild(self):
+        """Load all prompts and feedback counters from the database"""
+        start = time.perf_counter()
+        prompts = list(SystemPrompt.objects.values_list('id', 'prompt_lab_id', 'version', 'performance_score', 'content'))
+        since = timezone.now() - timedelta(days=self.feedback_window_days)
+        feedback = (
+            UserFeedback.objects.filter(created_at__gte=since)
+            .values('draft__system_prompt_id', 'draft__email__scenario_type')
+            .annotate(
+                accepts=Count('id', filter=Q(action='accept')),
+                edits=Count('id', filter=Q(action='edit')),
+                total=Count('id')
+            )
+        )
+
+        with self._lock:
+            self._reset()
+            if prompts:
+                self._tf = np.vstack([self._term_counts(content) for *_, content in prompts])
+                self._df = (self._tf > 0).sum(axis=0).astype(np.float32)
+            for row, (prompt_id, prompt_lab_id, version, score, _) in enumerate(prompts):
+                self._row_of[prompt_id] = row
+                self._stats.append(PromptStats(prompt_id, prompt_lab_id and str(prompt_lab_id), version, score))
+            for item in feedback:
+                row = self._row_of.get(item['draft__system_prompt_id'])
+                if row is not None:
+                    self._stats[row].feedback[item['draft__email__scenario_type']] = {
+                        'accepts': item['accepts'], 'edits': item['edits'], 'total': item['total']
+                    }
+            self._built_at = time.monotonic()
+
+        logger.debug(f"Built prompt similarity index: {len(prompts)} prompts in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def upsert_prompt(self, prompt: SystemPrompt):
+        """Add or refresh one prompt's vector and score"""
+        with self._lock:
+            if self._built_at is None:
+                return  # Built lazily on first use
+            vector = self._term_counts(prompt.content)
+            row = self._row_of.get(prompt.id)
+            if row is None:
+                row = len(self._stats)
+                if row == len(self._tf):
+                    grown = np.zeros((max(16, 2 * row), self.dimensions), dtype=np.float32)
+                    grown[:row] = self._tf
+                    self._tf = grown
+                self._row_of[prompt.id] = row
+                self._stats.append(PromptStats(prompt.id, None, prompt.version, None))
+                self._tf[row] = vector
+            else:
+                self._df -= self._tf[row] > 0
+                self._tf[row] = vector
+            self._df += vector > 0
+            stats = self._stats[row]
+            stats.prompt_lab_id = prompt.prompt_lab_id and str(prompt.prompt_lab_id)
+            stats.version = prompt.version
+            stats.performance_score = prompt.performance_score
+            self._weighted = None
+
+    def remove_prompt(self, prompt_id: int):
+        with self._lock:
+            row = self._row_of.pop(prompt_id, None)
+            if row is None:
+                return
+            self._df -= self._tf[row] > 0
+            self._tf[row] = 0
+            self._stats[row] = None
+            self._weighted = None
+
+    def record_feedback(self, prompt_id: int, scenario_type: str, action: str):
+        """Increment feedback counters for a prompt"""
+        with self._lock:
+            row = self._row_of.get(prompt_id)
+            if row is None or self._stats[row] is None:
+                return
+            counts = self._stats[row].feedback.setdefault(scenario_type, {'accepts': 0, 'edits': 0, 'total': 0})
+            counts['total'] += 1
+            if action in SUCCESS_ACTIONS:
+                counts[action + 's'] += 1
+
+    # Queries
+
+    def search(
+        self,
+        text: str,
+        k: int = 3,
+        scenario_type: str = ALL_SCENARIOS,
+        prompt_lab_id=None,
+        exclude_ids: Iterable[int] = (),
+        min_feedback: int = 0,
+        min_success_rate: float = 0.0
+    ) -> List[SimilarPrompt]:
+        """Most similar indexed prompts that meet the success criteria"""
+        self.ensure_built()
+        with self._lock:
+            if not self._row_of:
+                return []
+            if self._weighted is None:
+                self._weighted = self._normalized(self._tf[:len(self._stats)])
+            similarities = self._weighted @ self._normalized(self._term_counts(text))
+
+            excluded = set(exclude_ids)
+            hits = []
+            for row in np.argsort(-similarities):
+                stats = self._stats[row]
+                if stats is None or stats.prompt_id in excluded:
+                    continue
+                if prompt_lab_id is not None and stats.prompt_lab_id != str(prompt_lab_id):
+                    continue
+                counts = stats.counts(scenario_type)
+                if counts['total'] < min_feedback or stats.success_rate(scenario_type) < min_success_rate:
+                    continue
+                hits.append(self._hit(stats, float(similarities[row]), scenario_type))
+                if len(hits) >= k:
+                    break
+            return hits
+
+    def successful_prompts(
+        self,
+        scenario_type: str = ALL_SCENARIOS,
+        min_feedback: int = 3,
+        min_success_rate: float = 0.6,
+        limit: int = 5
+    ) -> List[SimilarPrompt]:
+        """Prompts ranked by feedback success rate"""
+        self.ensure_built()
+        with self._lock:
+            ranked = [
+                self._hit(stats, 0.0, scenario_type) for stats in self._stats
+                if stats is not None
+                and stats.counts(scenario_type)['total'] >= min_feedback
+                and stats.success_rate(scenario_type) >= min_success_rate
+            ]
+        ranked.sort(key=lambda hit: hit.success_rate, reverse=True)
+        return ranked[:limit]
+
+    @staticmethod
+    def _hit(stats: PromptStats, similarity: float, scenario_type: str) -> SimilarPrompt:
+        counts = stats.counts(scenario_type)
+        return SimilarPrompt(
+            prompt_id=stats.prompt_id,
+            similarity=similarity,
+            performance_score=stats.performance_score,
+            success_rate=stats.success_rate(scenario_type),
+            feedback_summary=f"Accepts: {counts['accepts']}, Edits: {counts['edits']}"
+        )
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+
+_index: Optional[PromptSimilarityIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_prompt_similarity_index() -> PromptSimilarityIndex:
+    """Process-wide index, kept current by SystemPrompt and UserFeedback signals"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PromptSimilarityIndex()
+        return _index
+
+
+# Signal handlers
+
+def connect_prompt_similarity_index():
+    """Apply committed SystemPrompt writes to the process-wide index once it exists (feedback: feedback_signals)"""
+    post_save.connect(_on_prompt_saved, sender=SystemPrompt, dispatch_uid='prompt_similarity_index_prompt')
+    post_delete.connect(_on_prompt_deleted, sender=SystemPrompt, dispatch_uid='prompt_similarity_index_delete')
+
+
+def _on_prompt_saved(sender, instance, **kwargs):
+    if _index is not None:
+        # Rolled-back prompts must not be indexed
+        transaction.on_commit(lambda: _index.upsert_prompt(instance))
+
+
+def _on_prompt_deleted(sender, instance, **kwargs):
+    if _index is not None:
+        prompt_id = instance.id
+        transaction.on_commit(lambda: _index.remove_prompt(prompt_id))
+
+
+def apply_feedback_write(write: FeedbackWrite):
+    """Feedback commit hook (called from feedback_signals); only new feedback is counted"""
+    if _index is None or not write.created:
+        return
+    target = (write.scope.system_prompt_id, write.scope.scenario_type, write.current.action)
+    transaction.on_commit(lambda: _index.record_feedback(*target))
@@ -0,0 +1,261 @@
+"""
+Record/Replay LLM Provider
+Captures request/response pairs (with timing) from any provider into a
+compact gzip JSON-lines store, and serves them back offline so optimization
+and evaluation cycles can be benchmarked reproducibly without a live model.
+
+Environment:
+    LLM_REPLAY_MODE     "record" wraps every provider created by the factory;
+                        LLM_PROVIDER=replay serves from the store
+    LLM_REPLAY_PATH     store location (default: llm_replay.jsonl.gz)
+    LLM_REPLAY_LATENCY  scale for recorded latencies in replay (0 = instant)
+    LLM_REPLAY_STRICT   "true" raises on unrecorded requests instead of
+                        falling back to a generic response
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+from .unified_llm_provider import BaseLLMProvider, LLMConfig, EmailDraft
+from .llm_usage import track_llm_usage, record_usage, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPLAY_PATH = 'llm_replay.jsonl.gz'
+
+
+def request_key(operation: str, **request) -> str:
+    """Stable key for a provider request, independent of the serving model"""
+    normalized = {k: (round(v, 3) if isinstance(v, float) else v) for k, v in request.items()}
+    payload = json.dumps([operation, normalized], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class ReplayStore:
+    """Append-only gzip JSON-lines store of recorded provider calls"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._cursors: Dict[str, int] = defaultdict(int)
+
+    def append(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Each append adds a gzip member; gzip readers concatenate them
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                f.write(line)
+            if self._entries is not None:
+                self._entries[entry['key']].append(entry)
+
+    def load(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            if self._entries is None:
+                entries = defaultdict(list)
+                if os.path.exists(self.path):
+                    with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                        for line in f:
+                            if line.strip():
+                                entry = json.loads(line)
+                                entries[entry['key']].append(entry)
+                self._entries = entries
+            return self._entries
+
+    def next_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Next recorded response for a key, cycling through repeated recordings"""
+        recorded = self.load().get(key)
+        if not recorded:
+            return None
+        with self._lock:
+            index = self._cursors[key] % len(recorded)
+            self._cursors[key] += 1
+        return recorded[index]
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.load().values())
+
+
+_stores: Dict[str, ReplayStore] = {}
+
+
+def get_replay_store(path: Optional[str] = None) -> ReplayStore:
+    """Shared store per path so concurrent recorders append to one file"""
+    path = path or os.getenv('LLM_REPLAY_PATH', DEFAULT_REPLAY_PATH)
+    if path not in _stores:
+        _stores[path] = ReplayStore(path)
+    return _stores[path]
+
+
+class RecordingProvider(BaseLLMProvider):
+    """Wraps a real provider and records every call to a ReplayStore"""
+
+    def __init__(self, inner: BaseLLMProvider, store: ReplayStore):
+        super().__init__(inner.config)
+        self.inner = inner
+        self.store = store
+
+    async def generate(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system_prompt: Optional[str] = None,
+        **kwargs
+    ) -> str:
+        request = {
+            'prompt': prompt, 'system_prompt': system_prompt,
+            'temperature': temperature, 'max_tokens': max_tokens
+        }
+        return await self._record('generate', request, self.inner.generate(**request))
+
+    async def generate_drafts(
+        self,
+        email_content: str,
+        system_prompt: str,
+        user_preferences: List[Dict[str, Any]] = None,
+        constraints: Dict[str, Any] = None,
+        num_drafts: int = 3
+    ) -> List[EmailDraft]:
+        request = {
+            'email_content': email_content, 'system_prompt': system_prompt,
+            'user_preferences': user_preferences, 'constraints': constraints,
+            'num_drafts': num_drafts
+        }
+        drafts = await self._record(
+            'generate_drafts', request, self.inner.generate_drafts(**request),
+            serialize=lambda result: [draft.__dict__ for draft in (result or [])]
+        )
+        return drafts
+
+    async def get_log_probabilities(self, text: str, context: Optional[str] = None) -> List[float]:
+        request = {'text': text, 'context': context}
+        return await self._record('get_log_probabilities', request, self.inner.get_log_probabilities(**request))
+
+    async def health_check(self) -> Dict[str, Any]:
+        status = await self.inner.health_check()
+        return {**status, 'recording_to': self.store.path}
+
+    async def _record(self, operation: str, request: Dict[str, Any], call, serialize=None):
+        start = time.perf_counter()
+        # Nested scope so the inner provider's usage record can be captured
+        with track_llm_usage() as usage:
+            result = await call
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        entry = {
+            'key': request_key(operation, **request),
+            'operation': operation,
+            'request': request,
+            'response': serialize(result) if serialize else result,
+            'latency_ms': round(latency_ms, 2),
+            'provider': self.config.provider if self.config else None,
+            'model': self.config.model if self.config else None,
+        }
+        if usage.records:
+            entry['prompt_tokens'] = usage.records[-1].prompt_tokens
+            entry['completion_tokens'] = usage.records[-1].completion_tokens
+        try:
+            self.store.append(entry)
+        except Exception as e:
+            logger.error(f"Failed to record {operation} call to {self.store.path}: {e}")
+        return result
+
+
+class ReplayProvider(BaseLLMProvider):
+    """Serves recorded responses from a ReplayStore"""
+
+    def __init__(
+        self,
+        config: LLMConfig,
+        store: Optional[ReplayStore] = None,
+        latency_scale: Optional[float] = None,
+        strict: Optional[bool] = None
+    ):
+        super().__init__(config)
+        self.store = store or get_replay_store(config.base_url)
+        self.latency_scale = latency_scale if latency_scale is not None else float(os.getenv('LLM_REPLAY_LATENCY', '0'))
+        self.strict = strict if strict is not None else os.getenv('LLM_REPLAY_STRICT', 'false').lower() == 'true'
+        self.hits = 0
+        self.misses = 0
+
+    async def generate(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system_prompt: Optional[str] = None,
+        **kwargs
+    ) -> str:
+        request = {
+            'prompt': prompt, 'system_prompt': system_prompt,
+            'temperature': temperature, 'max_tokens': max_tokens
+        }
+        return await self._replay('generate', request, fallback=lambda: f"Replay miss for: {prompt[:50]}...")
+
+    async def generate_drafts(
+        self,
+        email_content: str,
+        system_prompt: str,
+        user_preferences: List[Dict[str, Any]] = None,
+        constraints: Dict[str, Any] = None,
+        num_drafts: int = 3
+    ) -> List[EmailDraft]:
+        request = {
+            'email_content': email_content, 'system_prompt': system_prompt,
+            'user_preferences': user_preferences, 'constraints': constraints,
+            'num_drafts': num_drafts
+        }
+        drafts = await self._replay('generate_drafts', request, fallback=lambda: [])
+        return [EmailDraft(**draft) for draft in drafts]
+
+    async def get_log_probabilities(self, text: str, context: Optional[str] = None) -> List[float]:
+        request = {'text': text, 'context': context}
+        return await self._replay('get_log_probabilities', request, fallback=lambda: [])
+
+    async def health_check(self) -> Dict[str, Any]:
+        return {
+            "status": "healthy" if os.path.exists(self.store.path) else "unhealthy",
+            "provider": "replay",
+            "model": self.config.model,
+            "recorded_calls": len(self.store),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    async def _replay(self, operation: str, request: Dict[str, Any], fallback):
+        start = time.perf_counter()
+        entry = self.store.next_entry(request_key(operation, **request))
+
+        if entry is None:
+            self.misses += 1
+            if self.strict:
+                raise LookupError(f"No recorded {operation} response in {self.store.path}")
+            logger.warning(f"Replay miss for {operation}; serving fallback response")
+            return fallback()
+
+        self.hits += 1
+        if self.latency_scale > 0 and entry.get('latency_ms'):
+            await asyncio.sleep(entry['latency_ms'] * self.latency_scale / 1000)
+
+        response = entry['response']
+        record_usage(
+            'replay',
+            entry.get('model') or self.config.model,
+            entry.get('prompt_tokens', estimate_tokens(request.get('prompt') or request.get('text'))),
+            entry.get('completion_tokens', estimate_tokens(response if isinstance(response, str) else '')),
+            (time.perf_counter() - start) * 1000,
+            estimated='prompt_tokens' not in entry
+        )
+        return response
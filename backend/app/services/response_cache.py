@@ -0,0 +1,223 @@
+"""
+Response Cache
+Cached GET responses for the read-heavy endpoints the frontend auto-refreshes
+(dashboard, confidence, convergence, lab stats, dataset lists):
+
+- responses are keyed on the endpoint path, query parameters and version
+  counters kept in the Django cache, one per prompt lab plus a global one
+- writes to feedback, prompts, optimization runs, datasets and labs bump the
+  counters through model signals once they commit, so the next request
+  misses and recomputes
+- the cache must be shared by every backend process, and bumps must be
+  atomic across them (settings.CACHES uses a locked file-based cache beside
+  the SQLite database); a per-process cache would leave other processes
+  serving responses their writes never invalidated
+- queryset.update() and bulk writes bypass the signals; call bump_on_commit
+  after them
+- each response carries an ETag; a conditional GET whose If-None-Match still
+  matches is answered 304 from the cache without touching the database
+- entries expire after RESPONSE_CACHE_SECONDS (default 30, 0 disables) so
+  time-windowed metrics still roll forward; ?refresh=true recomputes
+"""
+
+import asyncio
+import functools
+import hashlib
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.response import Response
+
+from core.models import (
+    Email, EvaluationCase, EvaluationDataset, OptimizationRun, PromptLab, SystemPrompt, UserPreference
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'response_cache'
+GLOBAL_SCOPE = 'global'
+
+
+def cache_seconds() -> int:
+    return int(os.getenv('RESPONSE_CACHE_SECONDS', '30'))
+
+
+def _version_key(scope: str) -> str:
+    return f'{KEY_PREFIX}:version:{scope}'
+
+
+def scope_version(scope: str) -> int:
+    """Current version of a scope; a missing counter restarts at the clock so old ETags never match"""
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(prompt_lab_id=None):
+    """Invalidate cached responses of a prompt lab and every global (cross-lab) response.
+
+    Call it once the write is committed (see bump_on_commit): a bump inside the
+    transaction lets a concurrent request cache the pre-commit data under the
+    new version.
+    """
+    scopes = [GLOBAL_SCOPE] + ([f'lab:{prompt_lab_id}'] if prompt_lab_id else [])
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.add(_version_key(scope), time.time_ns(), None)
+
+
+def bump_on_commit(prompt_lab_id=None):
+    """Bump the versions when the current transaction commits (immediately outside one)"""
+    transaction.on_commit(lambda: bump_version(prompt_lab_id))
+
+
+def _lab_from_request(request, kwargs) -> Optional[str]:
+    return kwargs.get('prompt_lab_id') or request.GET.get('prompt_lab_id')
+
+
+def _cache_key(request, kwargs, lab_scoped: bool) -> str:
+    prompt_lab_id = _lab_from_request(request, kwargs) if lab_scoped else None
+    scope = f'lab:{prompt_lab_id}' if prompt_lab_id else GLOBAL_SCOPE
+    params = '&'.join(f'{name}={value}' for name, value in sorted(request.GET.items()) if name != 'refresh')
+    raw = f'{request.path}?{params}@{scope}:{scope_version(scope)}'
+    return f'{KEY_PREFIX}:response:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+
+def _etag(key: str) -> str:
+    return f'"{key.rsplit(":", 1)[-1]}"'
+
+
+def _from_cache(request, key: str):
+    """Cached response (or 304) for the key, None on a miss"""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    etag = _etag(key)
+    if etag in [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        response = HttpResponseNotModified()
+    elif entry['kind'] == 'data':
+        response = Response(entry['data'])
+    else:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    return _with_headers(response, etag)
+
+
+def _store(key: str, response, timeout: int):
+    if response.status_code != 200:
+        return response
+    if isinstance(response, Response):
+        entry = {'kind': 'data', 'data': response.data}
+    else:
+        entry = {'kind': 'content', 'content': response.content, 'content_type': response['Content-Type']}
+    cache.set(key, entry, timeout)
+    return _with_headers(response, _etag(key))
+
+
+def _with_headers(response, etag: str):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'  # Always revalidate; the ETag makes that cheap
+    return response
+
+
+def cached_response(lab_scoped: bool = True) -> Callable:
+    """Cache a view's GET handler (sync or async).
+
+    Lab-scoped responses are keyed on the prompt_lab_id URL kwarg or query
+    parameter; the rest (and lab-scoped calls without a lab) use the global
+    version, which every write bumps.
+    """
+    def decorator(view_method):
+        def lookup(request, kwargs):
+            timeout = cache_seconds()
+            if timeout <= 0:
+                return None, None, timeout
+            key = _cache_key(request, kwargs, lab_scoped)
+            if request.GET.get('refresh', '').lower() in ('1', 'true'):
+                return key, None, timeout
+            return key, _from_cache(request, key), timeout
+
+        if asyncio.iscoroutinefunction(view_method):
+            @functools.wraps(view_method)
+            async def async_wrapper(self, request, *args, **kwargs):
+                key, cached, timeout = lookup(request, kwargs)
+                if cached is not None:
+                    return cached
+                response = await view_method(self, request, *args, **kwargs)
+                return _store(key, response, timeout) if key else response
+            return async_wrapper
+
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key, cached, timeout = lookup(request, kwargs)
+            if cached is not None:
+                return cached
+            response = view_method(self, request, *args, **kwargs)
+            return _store(key, response, timeout) if key else response
+        return wrapper
+    return decorator
+
+
+# Signal handlers
+
+def connect_response_cache():
+    """Bump version counters on the writes cached endpoints read from (feedback, ratings, drafts: feedback_signals)"""
+    for model, resolve in _LAB_RESOLVERS.items():
+        name = model.__name__.lower()
+        post_save.connect(_on_saved, sender=model, dispatch_uid=f'response_cache_{name}_save')
+        post_delete.connect(_on_deleted, sender=model, dispatch_uid=f'response_cache_{name}_delete')
+    post_init.connect(_remember_run_status, sender=OptimizationRun, dispatch_uid='response_cache_run_init')
+
+
+_LAB_RESOLVERS = {
+    Email: lambda instance: instance.prompt_lab_id,
+    SystemPrompt: lambda instance: instance.prompt_lab_id,
+    OptimizationRun: lambda instance: instance.prompt_lab_id,
+    EvaluationDataset: lambda instance: instance.prompt_lab_id,
+    EvaluationCase: lambda instance: EvaluationDataset.objects.filter(pk=instance.dataset_id).values_list(
+        'prompt_lab_id', flat=True
+    ).first(),
+    PromptLab: lambda instance: instance.pk,
+    UserPreference: lambda instance: instance.prompt_lab_id,
+}
+
+
+def apply_write(write):
+    """Feedback, rating and draft commit hook (called from feedback_signals)"""
+    bump_on_commit(write.scope.prompt_lab_id)
+
+
+def _remember_run_status(sender, instance, **kwargs):
+    # Read __dict__ so deferred fields are not loaded for every instance
+    instance._response_cache_status = instance.__dict__.get('status')
+
+
+def _bump_for(instance):
+    try:
+        bump_on_commit(_LAB_RESOLVERS[type(instance)](instance))
+    except Exception as e:
+        logger.warning(f"Could not bump response cache version for {type(instance).__name__} {instance.pk}: {e}")
+
+
+def _on_saved(sender, instance, created, **kwargs):
+    if sender is OptimizationRun:
+        # Progress updates do not change cached results; status transitions (completion) do
+        previous_status = getattr(instance, '_response_cache_status', None)
+        _remember_run_status(sender, instance)
+        if not created and previous_status == instance.status:
+            return
+    _bump_for(instance)
+
+
+def _on_deleted(sender, instance, **kwargs):
+    _bump_for(instance)
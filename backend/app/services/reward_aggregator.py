@@ -300,11 +300,13 @@ class RewardFunctionAggregator:
     ) -> float:
         """Evaluate a rewrite candidate for selection"""
         
-        # Simulate task performance with candidate prompt
-        # In real implementation, this would run the task LLM
+        from .candidate_screening import prompt_structure_score
+        
+        # No task LLM call here: structure heuristics stand in for accuracy, and a
+        # response is only scored when the caller already has one (e.g. from screening)
         simulated_performance = {
-            'accuracy': 0.8,  # Placeholder
-            'actual_output': f"Response using: {candidate.content[:50]}...",
+            'accuracy': prompt_structure_score(candidate.content, evaluation_context.get('original_prompt', '')),
+            'actual_output': evaluation_context.get('actual_output', ''),
             'expected_output': evaluation_context.get('expected_output', '')
         }
         
@@ -0,0 +1,148 @@
+"""
+Run Cancellation
+Cooperative cancellation for optimization and evaluation runs. Each run
+executing in this process registers a CancellationToken under its lease
+resource key; cancelling the token:
+
+- cancels the asyncio tasks running on its behalf (the top-level optimization
+  coroutine and every routed LLM call), on whichever event loop they run, so
+  gathers unwind and provider concurrency slots are released
+- makes check_cancelled() raise at loop boundaries in the rewriter, the
+  evaluators and the evaluation case loop
+
+The active token travels in a context variable, so it follows the run into
+copied contexts such as sync_to_async and evaluation worker threads. Runs
+owned by another process are cancelled through their lease: the owner's
+heartbeat notices the lease is gone and cancels its local token.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Optional, Set, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class RunCancelled(asyncio.CancelledError):
+    """Raised inside a run that was cancelled; not swallowed by `except Exception`"""
+
+    def __init__(self, resource: str = '', reason: str = ''):
+        super().__init__(f"{resource} cancelled: {reason}" if resource else reason)
+        self.resource = resource
+        self.reason = reason
+
+
+class CancellationToken:
+    """Cancellation state for one run, shared by every task and thread working on it"""
+
+    def __init__(self, resource: str):
+        self.resource = resource
+        self.reason = ''
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._tasks: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Task]] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = 'cancelled') -> bool:
+        """Cancel the run; safe to call from any thread. False if already cancelled"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            tasks = list(self._tasks)
+        for loop, task in tasks:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(task.cancel)
+        logger.info(f"Cancelled {self.resource}: {reason} ({len(tasks)} in-flight task(s))")
+        return True
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise RunCancelled(self.resource, self.reason)
+
+    def attach(self, task: asyncio.Task):
+        entry = (asyncio.get_running_loop(), task)
+        with self._lock:
+            self._tasks.add(entry)
+            cancelled = self._event.is_set()
+        if cancelled:
+            task.cancel()
+        return entry
+
+    def detach(self, entry):
+        with self._lock:
+            self._tasks.discard(entry)
+
+
+_current_token: contextvars.ContextVar[Optional[CancellationToken]] = contextvars.ContextVar(
+    'run_cancellation_token', default=None
+)
+_registry: Dict[str, CancellationToken] = {}
+_registry_lock = threading.Lock()
+
+
+def current_token() -> Optional[CancellationToken]:
+    return _current_token.get()
+
+
+def check_cancelled():
+    """Raise RunCancelled if the run this code is working for was cancelled"""
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+@contextmanager
+def cancellation_scope(resource: str):
+    """Register a token for the run and make it current for the block"""
+    token = CancellationToken(resource)
+    with _registry_lock:
+        _registry[resource] = token
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+        with _registry_lock:
+            if _registry.get(resource) is token:
+                del _registry[resource]
+
+
+def cancel_run(resource: str, reason: str = 'Cancelled by user') -> bool:
+    """Cancel a run executing in this process; False if it is not running here"""
+    with _registry_lock:
+        token = _registry.get(resource)
+    return token.cancel(reason) if token else False
+
+
+def running_here(resource: str) -> bool:
+    with _registry_lock:
+        return resource in _registry
+
+
+async def cancellable(awaitable: Awaitable[T], token: Optional[CancellationToken] = None) -> T:
+    """Await as a task the token can cancel; raises RunCancelled once cancelled"""
+    token = token or _current_token.get()
+    if token is None:
+        return await awaitable
+    token.raise_if_cancelled()
+
+    task = asyncio.ensure_future(awaitable)
+    entry = token.attach(task)
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if token.cancelled:
+            raise RunCancelled(token.resource, token.reason) from None
+        raise
+    finally:
+        token.detach(entry)
@@ -0,0 +1,132 @@
+"""
+Run Checkpoints
+Per-(prompt, case) checkpoints for dataset optimization runs, so a run that
+dies mid-evaluation resumes where it stopped instead of starting over:
+
+- the candidates under test are stored when generated; a resumed run reuses
+  them instead of calling the rewriter again
+- each completed prompt/case evaluation (response and metrics) is recorded
+  as it finishes; a resumed run replays those and evaluates only the rest
+- failed case evaluations are not recorded, so they are retried on resume
+
+Evaluators find the active checkpoint through a context variable set by the
+orchestrator for the duration of the run.
+"""
+
+import contextvars
+import hashlib
+import logging
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+
+from core.models import CheckpointCaseResult, OptimizationCheckpoint
+from .candidate_dedup import prompt_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def case_key(test_case) -> str:
+    """Stable identity of an evaluation test case (its scenario and email text)"""
+    email = test_case.email
+    text = f"{test_case.scenario_type}\n{email.subject}\n{email.body}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class CheckpointStore:
+    """Completed evaluations of one optimization run, cached in memory"""
+
+    def __init__(self, checkpoint: OptimizationCheckpoint):
+        self.checkpoint = checkpoint
+        self._results: Dict[Tuple[str, str], Tuple[str, Dict[str, Any]]] = {
+            (r.prompt_fingerprint, r.case_key): (r.response, r.metrics)
+            for r in checkpoint.case_results.all()
+        }
+        self.replayed = 0
+        self.recorded = 0
+
+    @classmethod
+    def open(cls, optimization_run_id, dataset_ids: Optional[List[int]] = None) -> 'CheckpointStore':
+        """Load the run's checkpoint, creating an empty one for a fresh run"""
+        checkpoint, created = OptimizationCheckpoint.objects.get_or_create(
+            optimization_run_id=optimization_run_id,
+            defaults={'dataset_ids': list(dataset_ids or [])}
+        )
+        store = cls(checkpoint)
+        if not created:
+            logger.info(
+                f"Resuming optimization {optimization_run_id} from checkpoint: "
+                f"{len(checkpoint.candidates)} candidates, {len(store._results)} completed evaluations"
+            )
+        return store
+
+    @property
+    def completed(self) -> int:
+        return len(self._results)
+
+    def candidates(self) -> List[Any]:
+        from .prompt_rewriter import RewriteCandidate
+        return [RewriteCandidate(**candidate) for candidate in self.checkpoint.candidates]
+
+    def save_candidates(self, candidates: List[Any]):
+        self.checkpoint.candidates = [asdict(candidate) for candidate in candidates]
+        OptimizationCheckpoint.objects.filter(pk=self.checkpoint.pk).update(candidates=self.checkpoint.candidates)
+
+    def lookup(self, prompt_content: str, test_case) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(response, metrics) if this prompt/case pair already completed"""
+        cached = self._results.get((prompt_fingerprint(prompt_content), case_key(test_case)))
+        if cached is not None:
+            self.replayed += 1
+        return cached
+
+    async def record(self, prompt_content: str, test_case, response: str, metrics: Dict[str, Any]):
+        key = (prompt_fingerprint(prompt_content), case_key(test_case))
+        if key in self._results:
+            return
+        self._results[key] = (response, metrics)
+        try:
+            await sync_to_async(self._insert)(key, response, metrics)
+            self.recorded += 1
+        except Exception as e:
+            # A missed checkpoint only costs a re-evaluation on resume
+            logger.warning(f"Could not checkpoint evaluation for run {self.checkpoint.optimization_run_id}: {e}")
+
+    def _insert(self, key: Tuple[str, str], response: str, metrics: Dict[str, Any]):
+        try:
+            with transaction.atomic():
+                CheckpointCaseResult.objects.create(
+                    checkpoint=self.checkpoint, prompt_fingerprint=key[0], case_key=key[1],
+                    response=response, metrics=metrics
+                )
+        except IntegrityError:
+            pass  # The same pair finished concurrently (the baseline is evaluated per A/B test)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'resume_count': self.checkpoint.resume_count,
+            'completed_evaluations': self.completed,
+            'replayed_evaluations': self.replayed,
+            'recorded_evaluations': self.recorded,
+        }
+
+
+_current_store: contextvars.ContextVar[Optional[CheckpointStore]] = contextvars.ContextVar(
+    'run_checkpoint_store', default=None
+)
+
+
+def current_checkpoint() -> Optional[CheckpointStore]:
+    return _current_store.get()
+
+
+@contextmanager
+def checkpoint_scope(store: Optional[CheckpointStore]):
+    """Make the store the one evaluators record to for the duration of the block"""
+    reset = _current_store.set(store)
+    try:
+        yield store
+    finally:
+        _current_store.reset(reset)
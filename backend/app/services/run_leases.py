@@ -0,0 +1,226 @@
+"""
+Run Leases
+DB-backed leases that let several backend processes share optimization work
+without an external coordinator:
+
+- a prompt lab lease: one worker at a time optimizes a lab
+- leases on OptimizationRun and EvaluationRun, renewed by a heartbeat thread
+  while the worker is busy
+- claims are a conditional UPDATE or a unique INSERT, so they are atomic on
+  any database
+- a crashed worker stops heartbeating; once its lease expires another worker
+  can claim the lab or run, and the orphaned runs are marked failed
+- a worker whose run lease is revoked (e.g. the run was cancelled from
+  another process) learns of it on its next heartbeat
+"""
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import EvaluationRun, OptimizationRun, WorkLease
+from .response_cache import bump_on_commit
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('pending', 'running')
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def lease_ttl() -> timedelta:
+    return timedelta(seconds=float(os.getenv('RUN_LEASE_TTL_SECONDS', '90')))
+
+
+def prompt_lab_resource(prompt_lab_id) -> str:
+    return f"prompt_lab:{prompt_lab_id}"
+
+
+def optimization_run_resource(run_id) -> str:
+    return f"optimization_run:{run_id}"
+
+
+def evaluation_run_resource(run_id) -> str:
+    return f"evaluation_run:{run_id}"
+
+
+@dataclass
+class Lease:
+    """A claimed resource; renew() before expires_at or another worker may take it over"""
+    resource: str
+    owner: str
+    ttl: timedelta
+    expires_at: datetime
+    lost: bool = False
+
+    def renew(self) -> bool:
+        """Extend the lease; False (and lost=True) if another worker took it over"""
+        now = timezone.now()
+        renewed = WorkLease.objects.filter(resource=self.resource, owner=self.owner).update(
+            heartbeat_at=now, expires_at=now + self.ttl
+        )
+        if renewed:
+            self.expires_at = now + self.ttl
+        else:
+            self.lost = True
+            logger.warning(f"Lost lease on {self.resource} held by {self.owner}")
+        return bool(renewed)
+
+    def release(self):
+        WorkLease.objects.filter(resource=self.resource, owner=self.owner).delete()
+
+
+def claim(resource: str, owner: Optional[str] = None, ttl: Optional[timedelta] = None) -> Optional[Lease]:
+    """Take the resource's lease if it is free, expired or already ours"""
+    owner = owner or WORKER_ID
+    ttl = ttl or lease_ttl()
+    now = timezone.now()
+
+    # Take over an expired lease (or renew our own) in one statement
+    taken = WorkLease.objects.filter(
+        Q(expires_at__lt=now) | Q(owner=owner), resource=resource
+    ).update(owner=owner, acquired_at=now, heartbeat_at=now, expires_at=now + ttl)
+    if not taken:
+        try:
+            with transaction.atomic():
+                WorkLease.objects.create(
+                    resource=resource, owner=owner, acquired_at=now, heartbeat_at=now, expires_at=now + ttl
+                )
+        except IntegrityError:
+            return None  # Held by a live worker
+    return Lease(resource, owner, ttl, now + ttl)
+
+
+def claim_prompt_lab(prompt_lab_id, owner: Optional[str] = None, ttl: Optional[timedelta] = None) -> Optional[Lease]:
+    """Claim the right to optimize a prompt lab, failing runs orphaned by a dead worker"""
+    lease = claim(prompt_lab_resource(prompt_lab_id), owner, ttl)
+    if lease:
+        reap_expired_runs(prompt_lab_id)
+    return lease
+
+
+def claim_optimization_run(run_id, owner: Optional[str] = None, ttl: Optional[timedelta] = None) -> Optional[Lease]:
+    return claim(optimization_run_resource(run_id), owner, ttl)
+
+
+def claim_evaluation_run(run_id, owner: Optional[str] = None, ttl: Optional[timedelta] = None) -> Optional[Lease]:
+    return claim(evaluation_run_resource(run_id), owner, ttl)
+
+
+def revoke(resource: str) -> bool:
+    """Drop whoever holds the resource's lease; the holder notices on its next heartbeat"""
+    return bool(WorkLease.objects.filter(resource=resource).delete()[0])
+
+
+def lease_owner(resource: str) -> Optional[str]:
+    """Owner of a live lease on the resource, if any"""
+    return WorkLease.objects.filter(resource=resource, expires_at__gte=timezone.now()).values_list(
+        'owner', flat=True
+    ).first()
+
+
+def reap_expired_runs(prompt_lab_id=None, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Mark active runs whose worker stopped heartbeating as failed"""
+    now = now or timezone.now()
+    reaped = {}
+    for key, model, lab_field, resource_for in (
+        ('optimization_runs', OptimizationRun, 'prompt_lab_id', optimization_run_resource),
+        ('evaluation_runs', EvaluationRun, 'prompt__prompt_lab_id', evaluation_run_resource),
+    ):
+        runs = model.objects.filter(status__in=ACTIVE_STATUSES)
+        if prompt_lab_id is not None:
+            runs = runs.filter(**{lab_field: prompt_lab_id})
+        resources = {resource_for(run_id): (run_id, lab_id) for run_id, lab_id in runs.values_list('id', lab_field)}
+        expired = list(WorkLease.objects.filter(resource__in=list(resources), expires_at__lt=now))
+
+        reaped[key] = 0
+        for lease in expired:
+            # Deleting the lease first means only one worker reaps the run, and a
+            # worker that renewed in the meantime keeps it
+            if not WorkLease.objects.filter(pk=lease.pk, owner=lease.owner, expires_at__lt=now).delete()[0]:
+                continue
+            updates = {'status': 'failed', 'completed_at': now}
+            if model is OptimizationRun:
+                updates['error_message'] = (
+                    f"Worker {lease.owner} stopped heartbeating; lease expired at {lease.expires_at.isoformat()}"
+                )
+            run_id, run_lab_id = resources[lease.resource]
+            if model.objects.filter(id=run_id, status__in=ACTIVE_STATUSES).update(**updates):
+                reaped[key] += 1
+                bump_on_commit(run_lab_id)
+    if any(reaped.values()):
+        logger.warning(f"Reaped runs with expired leases: {reaped}")
+    return reaped
+
+
+def purge_expired_leases(now: Optional[datetime] = None) -> int:
+    """Delete expired leases that no longer guard an active run"""
+    reap_expired_runs(now=now)
+    return WorkLease.objects.filter(expires_at__lt=now or timezone.now()).delete()[0]
+
+
+class LeaseHeartbeat:
+    """Renews leases from a background thread every ttl / 3"""
+
+    def __init__(self, *leases: Optional[Lease], interval: Optional[float] = None,
+                 on_lost: Optional[Callable[[Lease], None]] = None):
+        self.leases: List[Lease] = [lease for lease in leases if lease is not None]
+        self.on_lost = on_lost
+        ttl = min((lease.ttl for lease in self.leases), default=lease_ttl())
+        self.interval = interval or ttl.total_seconds() / 3
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='lease-heartbeat', daemon=True)
+
+    @property
+    def lost(self) -> bool:
+        return any(lease.lost for lease in self.leases)
+
+    def start(self) -> 'LeaseHeartbeat':
+        if self.leases:
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                for lease in self.leases:
+                    if lease.lost:
+                        continue
+                    try:
+                        if not lease.renew() and self.on_lost:
+                            self.on_lost(lease)
+                    except Exception as e:
+                        # The lease only lapses if renewals keep failing past the TTL
+                        logger.error(f"Lease heartbeat for {lease.resource} failed: {e}")
+        finally:
+            connection.close()
+
+
+@contextmanager
+def heartbeat(*leases: Optional[Lease], release: bool = True, on_lost: Optional[Callable[[Lease], None]] = None):
+    """Keep the leases alive for the duration of the block, then release them"""
+    beat = LeaseHeartbeat(*leases, on_lost=on_lost).start()
+    try:
+        yield beat
+    finally:
+        beat.stop()
+        if release:
+            for lease in beat.leases:
+                try:
+                    lease.release()
+                except Exception as e:
+                    logger.error(f"Failed to release lease on {lease.resource}: {e}")
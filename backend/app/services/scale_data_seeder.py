@@ -0,0 +1,371 @@
+"""
+Scale Data Seeder
+Bulk-generates realistic prompt labs with email/draft/feedback history and
+evaluation datasets at production volumes, so quadratic behaviour in the
+views and services shows up when profiling. Generation is deterministic for
+a given seed and streams rows in chunks to keep memory flat.
+"""
+
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import (
+    PromptLab, SystemPrompt, Email, Draft, DraftReason, UserFeedback, ReasonRating,
+    EvaluationDataset, EvaluationCase, EvaluationRun, EvaluationResult, OptimizationRun
+)
+
+from .counter_tables import rebuild
+
+logger = logging.getLogger(__name__)
+
+SCALE_LAB_MARKER = "[scale-seed]"
+
+SCENARIOS = ['professional', 'casual', 'complaint', 'inquiry']
+ACTIONS = ['accept', 'reject', 'edit', 'ignore']
+ACTION_WEIGHTS = [0.45, 0.2, 0.25, 0.1]
+TOPICS = [
+    'invoice', 'meeting', 'refund', 'shipping delay', 'account access', 'pricing',
+    'contract renewal', 'product feedback', 'onboarding', 'outage', 'partnership', 'hiring'
+]
+OPENERS = ['Hi there,', 'Hello,', 'Dear team,', 'Good morning,', 'Hey,']
+ASKS = [
+    'Could you clarify the next steps for the {topic}?',
+    'I am still waiting on an update regarding the {topic}.',
+    'Can we set up time this week to discuss the {topic}?',
+    'There seems to be a problem with the {topic} and I need help.',
+    'Thanks for the quick turnaround on the {topic}.',
+]
+REASON_TEMPLATES = [
+    'Matches the {tone} tone of the sender',
+    'Addresses the {topic} directly',
+    'Keeps the reply short and actionable',
+    'Acknowledges the sender before answering',
+    'Offers a concrete next step on the {topic}',
+    'Avoids committing to dates we cannot meet',
+]
+
+
+@dataclass
+class ScaleProfile:
+    """How many rows of each kind to generate"""
+    labs: int = 1
+    emails_per_lab: int = 1000
+    drafts_per_email: int = 2
+    reasons_per_draft: int = 3
+    reason_pool_per_lab: int = 50
+    feedback_ratio: float = 0.8  # Fraction of drafts that receive feedback
+    ratings_per_feedback: int = 2
+    prompt_versions_per_lab: int = 5
+    datasets_per_lab: int = 2
+    cases_per_dataset: int = 200
+    runs_per_dataset: int = 3
+    optimization_runs_per_lab: int = 10
+    history_days: int = 90
+    seed: int = 42
+    chunk_size: int = 2000  # Emails per insert chunk
+
+    def estimated_rows(self) -> Dict[str, int]:
+        drafts = self.emails_per_lab * self.drafts_per_email
+        feedback = int(drafts * self.feedback_ratio)
+        datasets = self.datasets_per_lab
+        per_lab = {
+            'prompts': self.prompt_versions_per_lab,
+            'emails': self.emails_per_lab,
+            'draft_reasons': self.reason_pool_per_lab,
+            'drafts': drafts,
+            'draft_reason_links': drafts * self.reasons_per_draft,
+            'feedback': feedback,
+            'reason_ratings': feedback * min(self.ratings_per_feedback, self.reasons_per_draft),
+            'datasets': datasets,
+            'evaluation_cases': datasets * self.cases_per_dataset,
+            'evaluation_runs': datasets * self.runs_per_dataset,
+            'evaluation_results': datasets * self.runs_per_dataset * self.cases_per_dataset,
+            'optimization_runs': self.optimization_runs_per_lab,
+        }
+        rows = {name: count * self.labs for name, count in per_lab.items()}
+        rows['prompt_labs'] = self.labs
+        return rows
+
+    @classmethod
+    def for_total_rows(cls, total_rows: int, **overrides) -> 'ScaleProfile':
+        """Size emails_per_lab so the whole run produces roughly total_rows rows"""
+        profile = cls(**{**overrides, 'emails_per_lab': 0})
+        fixed_rows = sum(profile.estimated_rows().values())
+        # Probe with many emails so integer truncation of fractional ratios does not skew the rate
+        profile.emails_per_lab = 10_000
+        per_email_rows = (sum(profile.estimated_rows().values()) - fixed_rows) / 10_000  # Across all labs
+        profile.emails_per_lab = max(1, int((total_rows - fixed_rows) / max(per_email_rows, 1e-9)))
+        return profile
+
+
+@dataclass
+class SeedReport:
+    """Rows created and time taken"""
+    rows: Dict[str, int] = field(default_factory=dict)
+    prompt_lab_ids: List[str] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    def add(self, name: str, count: int):
+        self.rows[name] = self.rows.get(name, 0) + count
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows.values())
+
+
+class ScaleDataSeeder:
+    """Generates prompt lab data in bulk according to a ScaleProfile"""
+
+    def __init__(self, profile: ScaleProfile, progress: Optional[Callable[[str], None]] = None):
+        self.profile = profile
+        self.progress = progress or (lambda message: None)
+        self.anchor = timezone.now()
+
+    def seed(self) -> SeedReport:
+        report = SeedReport()
+        start = time.perf_counter()
+
+        for lab_index in range(self.profile.labs):
+            # Per-lab generator so a lab's data does not depend on how many labs precede it
+            rng = random.Random(f"{self.profile.seed}:{lab_index}")
+            prompt_lab = self._seed_lab(lab_index, rng, report)
+            report.prompt_lab_ids.append(str(prompt_lab.id))
+            self.progress(
+                f"Lab {lab_index + 1}/{self.profile.labs} done: "
+                f"{report.total_rows:,} rows in {time.perf_counter() - start:.1f}s"
+            )
+
+        report.elapsed_seconds = time.perf_counter() - start
+        logger.info(f"Seeded {report.total_rows} rows in {report.elapsed_seconds:.1f}s")
+        return report
+
+    @staticmethod
+    def clear() -> int:
+        """Delete labs created by previous seeding runs along with all their data"""
+        labs = PromptLab.objects.filter(description__startswith=SCALE_LAB_MARKER)
+        lab_ids = list(labs.values_list('id', flat=True))
+        if not lab_ids:
+            return 0
+
+        reason_ids = set(
+            Draft.reasons.through.objects.filter(draft__email__prompt_lab__in=lab_ids)
+            .values_list('draftreason_id', flat=True).distinct()
+        )
+        # Delete leaf tables first with raw deletes; the cascade collector would
+        # load every row into memory, which takes longer than seeding them
+        with transaction.atomic():
+            for queryset in [
+                ReasonRating.objects.filter(feedback__draft__email__prompt_lab__in=lab_ids),
+                UserFeedback.objects.filter(draft__email__prompt_lab__in=lab_ids),
+                Draft.reasons.through.objects.filter(draft__email__prompt_lab__in=lab_ids),
+                Draft.objects.filter(email__prompt_lab__in=lab_ids),
+                EvaluationResult.objects.filter(run__dataset__prompt_lab__in=lab_ids),
+                Email.objects.filter(prompt_lab__in=lab_ids),
+            ]:
+                queryset._raw_delete(queryset.db)
+            DraftReason.objects.filter(id__in=reason_ids, drafts__isnull=True).delete()
+            labs.delete()
+        return len(lab_ids)
+
+    def _timestamp(self, rng: random.Random):
+        return self.anchor - timedelta(seconds=rng.randint(0, self.profile.history_days * 86400))
+
+    def _seed_lab(self, lab_index: int, rng: random.Random, report: SeedReport) -> PromptLab:
+        profile = self.profile
+
+        with transaction.atomic():
+            prompt_lab = PromptLab.objects.create(
+                name=f"Scale Lab {lab_index + 1}",
+                description=f"{SCALE_LAB_MARKER} seed={profile.seed} emails={profile.emails_per_lab}",
+                created_at=self.anchor - timedelta(days=profile.history_days)
+            )
+            prompts = SystemPrompt.objects.bulk_create([
+                SystemPrompt(
+                    prompt_lab=prompt_lab,
+                    content=f"You are a helpful email assistant (v{version}). "
+                            f"Reply in a {rng.choice(['professional', 'friendly', 'concise'])} tone.",
+                    version=version,
+                    is_active=version == profile.prompt_versions_per_lab,
+                    performance_score=round(rng.uniform(0.5, 0.9), 3),
+                    created_at=self._timestamp(rng)
+                )
+                for version in range(1, max(1, profile.prompt_versions_per_lab) + 1)
+            ])
+            reasons = DraftReason.objects.bulk_create([
+                DraftReason(
+                    text=rng.choice(REASON_TEMPLATES).format(tone=rng.choice(SCENARIOS), topic=rng.choice(TOPICS)),
+                    confidence=round(rng.uniform(0.4, 0.98), 2),
+                    created_at=self._timestamp(rng)
+                )
+                for _ in range(max(profile.reasons_per_draft, profile.reason_pool_per_lab))
+            ])
+        report.add('prompt_labs', 1)
+        report.add('prompts', len(prompts))
+        report.add('draft_reasons', len(reasons))
+
+        emails_done = 0
+        feedback_total = 0
+        while emails_done < profile.emails_per_lab:
+            count = min(profile.chunk_size, profile.emails_per_lab - emails_done)
+            feedback_total += self._seed_email_chunk(prompt_lab, prompts, reasons, count, emails_done, rng, report)
+            emails_done += count
+
+        self._seed_evaluations(prompt_lab, prompts, rng, report)
+        self._seed_optimization_runs(prompt_lab, prompts, rng, report)
+        for table, count in rebuild([prompt_lab.id]).items():
+            report.add(table, count)
+
+        PromptLab.objects.filter(id=prompt_lab.id).update(
+            total_emails_processed=profile.emails_per_lab,
+            total_feedback_collected=feedback_total,
+            optimization_iterations=profile.optimization_runs_per_lab
+        )
+        return prompt_lab
+
+    def _seed_email_chunk(self, prompt_lab, prompts, reasons, count, offset, rng, report) -> int:
+        profile = self.profile
+        reasons_per_draft = min(profile.reasons_per_draft, len(reasons))
+        ratings_per_feedback = min(profile.ratings_per_feedback, reasons_per_draft)
+
+        with transaction.atomic():
+            emails = []
+            for i in range(count):
+                topic = rng.choice(TOPICS)
+                emails.append(Email(
+                    prompt_lab=prompt_lab,
+                    subject=f"Re: {topic} #{offset + i}",
+                    body=f"{rng.choice(OPENERS)} {rng.choice(ASKS).format(topic=topic)} Best, Customer {offset + i}",
+                    sender=f"customer{offset + i}@example.com",
+                    scenario_type=rng.choice(SCENARIOS),
+                    created_at=self._timestamp(rng)
+                ))
+            emails = Email.objects.bulk_create(emails)
+
+            drafts = Draft.objects.bulk_create([
+                Draft(
+                    email=email,
+                    content=f"Thanks for your note about {email.subject[4:]}. Option {n + 1}: we will follow up shortly.",
+                    system_prompt=rng.choice(prompts),
+                    created_at=email.created_at + timedelta(seconds=rng.randint(1, 120))
+                )
+                for email in emails
+                for n in range(profile.drafts_per_email)
+            ])
+
+            links = []
+            draft_reasons = {}
+            for draft in drafts:
+                chosen = rng.sample(reasons, reasons_per_draft)
+                draft_reasons[draft.id] = chosen
+                links.extend(Draft.reasons.through(draft_id=draft.id, draftreason_id=r.id) for r in chosen)
+            Draft.reasons.through.objects.bulk_create(links)
+
+            feedback = []
+            for draft in drafts:
+                if rng.random() >= profile.feedback_ratio:
+                    continue
+                action = rng.choices(ACTIONS, weights=ACTION_WEIGHTS)[0]
+                feedback.append(UserFeedback(
+                    draft=draft,
+                    action=action,
+                    reason=f"{action.title()}ed because of the tone" if action != 'ignore' else '',
+                    edited_content=f"{draft.content} Let me know if that works." if action == 'edit' else '',
+                    created_at=draft.created_at + timedelta(minutes=rng.randint(1, 600))
+                ))
+            feedback = UserFeedback.objects.bulk_create(feedback)
+
+            ratings = ReasonRating.objects.bulk_create([
+                ReasonRating(feedback=item, reason=reason, liked=rng.random() < 0.6, created_at=item.created_at)
+                for item in feedback
+                for reason in rng.sample(draft_reasons[item.draft_id], ratings_per_feedback)
+            ])
+
+        report.add('emails', len(emails))
+        report.add('drafts', len(drafts))
+        report.add('draft_reason_links', len(links))
+        report.add('feedback', len(feedback))
+        report.add('reason_ratings', len(ratings))
+        return len(feedback)
+
+    def _seed_evaluations(self, prompt_lab, prompts, rng, report):
+        profile = self.profile
+
+        for dataset_index in range(profile.datasets_per_lab):
+            with transaction.atomic():
+                dataset = EvaluationDataset.objects.create(
+                    prompt_lab=prompt_lab,
+                    name=f"Scale dataset {dataset_index + 1}",
+                    description=f"{SCALE_LAB_MARKER} generated evaluation cases",
+                    case_count=profile.cases_per_dataset,
+                    quality_score=round(rng.uniform(0.5, 0.95), 2)
+                )
+                cases = []
+                for i in range(profile.cases_per_dataset):
+                    topic = rng.choice(TOPICS)
+                    cases.append(EvaluationCase(
+                        dataset=dataset,
+                        input_text=f"{rng.choice(OPENERS)} {rng.choice(ASKS).format(topic=topic)}",
+                        expected_output=f"Thank you for reaching out about the {topic}. Here is what happens next.",
+                        context={'topic': topic, 'index': i}
+                    ))
+                cases = EvaluationCase.objects.bulk_create(cases, batch_size=profile.chunk_size)
+            report.add('datasets', 1)
+            report.add('evaluation_cases', len(cases))
+
+            for _ in range(profile.runs_per_dataset):
+                self._seed_evaluation_run(dataset, rng.choice(prompts), cases, rng, report)
+
+    def _seed_evaluation_run(self, dataset, prompt, cases, rng, report):
+        started_at = self._timestamp(rng)
+        with transaction.atomic():
+            run = EvaluationRun.objects.create(
+                dataset=dataset,
+                prompt=prompt,
+                status='completed',
+                started_at=started_at,
+                completed_at=started_at + timedelta(minutes=rng.randint(1, 30))
+            )
+            results = []
+            for case in cases:
+                score = round(min(1.0, max(0.0, rng.gauss(0.7, 0.15))), 3)
+                results.append(EvaluationResult(
+                    run=run,
+                    case=case,
+                    generated_output=f"Generated reply for case {case.id}",
+                    similarity_score=score,
+                    passed=score >= 0.7,
+                    details={'seeded': True}
+                ))
+            EvaluationResult.objects.bulk_create(results, batch_size=self.profile.chunk_size)
+            if results:
+                run.overall_score = sum(r.similarity_score for r in results) / len(results)
+                run.save(update_fields=['overall_score'])
+        report.add('evaluation_runs', 1)
+        report.add('evaluation_results', len(results))
+
+    def _seed_optimization_runs(self, prompt_lab, prompts, rng, report):
+        runs = []
+        for _ in range(self.profile.optimization_runs_per_lab):
+            started_at = self._timestamp(rng)
+            improvement = round(rng.uniform(-5, 15), 2)
+            baseline, optimized = rng.choice(prompts), rng.choice(prompts)
+            runs.append(OptimizationRun(
+                prompt_lab=prompt_lab,
+                baseline_prompt=baseline,
+                optimized_prompt=optimized,
+                status=rng.choices(['completed', 'failed'], weights=[0.9, 0.1])[0],
+                test_cases_used=self.profile.cases_per_dataset,
+                performance_improvement=improvement,
+                deployed=improvement > 5,
+                started_at=started_at,
+                completed_at=started_at + timedelta(minutes=rng.randint(2, 45))
+            ))
+        OptimizationRun.objects.bulk_create(runs)
+        report.add('optimization_runs', len(runs))
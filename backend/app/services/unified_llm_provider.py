@@ -11,6 +11,9 @@ from typing import Dict, Any, List, Optional, Union
 from dataclasses import dataclass
 import json
 
+from .llm_usage import UsageTimer, estimate_tokens
+from .mock_behavior import MockBehavior, MockLoadSimulator
+
 
 @dataclass
 class LLMConfig:
@@ -39,6 +42,14 @@ class BaseLLMProvider(ABC):
     def __init__(self, config: LLMConfig):
         self.config = config
     
+    def _usage_timer(self, *texts: Optional[str]) -> UsageTimer:
+        """Start timing a provider call for usage accounting"""
+        return UsageTimer(
+            self.config.provider if self.config else self.__class__.__name__,
+            self.config.model if self.config else 'unknown',
+            ' '.join(text for text in texts if text)
+        )
+    
     @abstractmethod
     async def generate(
         self, 
@@ -103,6 +114,7 @@ class OllamaProvider(BaseLLMProvider):
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
         
+        usage = self._usage_timer(system_prompt, prompt)
         try:
             response = await asyncio.to_thread(
                 self.client.chat,
@@ -110,8 +122,15 @@ class OllamaProvider(BaseLLMProvider):
                 messages=messages,
                 options={"temperature": temp, "num_predict": tokens}
             )
-            return response['message']['content'].strip()
+            content = response['message']['content'].strip()
+            usage.success(
+                content,
+                prompt_tokens=response.get('prompt_eval_count'),
+                completion_tokens=response.get('eval_count')
+            )
+            return content
         except Exception as e:
+            usage.failure()
             return f"Ollama Error: {str(e)}"
     
     async def generate_drafts(
@@ -375,6 +394,7 @@ class OpenAIProvider(BaseLLMProvider):
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
         
+        usage = self._usage_timer(system_prompt, prompt)
         try:
             response = await self.client.chat.completions.create(
                 model=self.config.model,
@@ -382,8 +402,16 @@ class OpenAIProvider(BaseLLMProvider):
                 temperature=temperature or self.config.temperature,
                 max_tokens=max_tokens or self.config.max_tokens
             )
-            return response.choices[0].message.content.strip()
+            content = response.choices[0].message.content.strip()
+            reported = getattr(response, 'usage', None)
+            usage.success(
+                content,
+                prompt_tokens=getattr(reported, 'prompt_tokens', None),
+                completion_tokens=getattr(reported, 'completion_tokens', None)
+            )
+            return content
         except Exception as e:
+            usage.failure()
             return f"OpenAI Error: {str(e)}"
     
     async def generate_drafts(
@@ -438,6 +466,7 @@ class OpenAIProvider(BaseLLMProvider):
             else:
                 messages.append({"role": "user", "content": f"Please repeat this exactly: {text}"})
             
+            usage = self._usage_timer(context, text)
             response = await self.client.chat.completions.create(
                 model=self.config.model,
                 messages=messages,
@@ -446,6 +475,12 @@ class OpenAIProvider(BaseLLMProvider):
                 logprobs=True,
                 top_logprobs=1
             )
+            reported = getattr(response, 'usage', None)
+            usage.success(
+                text,
+                prompt_tokens=getattr(reported, 'prompt_tokens', None),
+                completion_tokens=getattr(reported, 'completion_tokens', None)
+            )
             
             # Extract log probabilities from response
             if response.choices[0].logprobs and response.choices[0].logprobs.content:
@@ -524,13 +559,22 @@ class AnthropicProvider(BaseLLMProvider):
             if system_prompt:
                 kwargs["system"] = system_prompt
             
-            response = await self.client.messages.create(**kwargs)
+            usage = self._usage_timer(system_prompt, prompt)
+            try:
+                response = await self.client.messages.create(**kwargs)
+            except Exception:
+                usage.failure()
+                raise
             
             # Extract text from response
-            if response.content and len(response.content) > 0:
-                return response.content[0].text
-            else:
-                return ""
+            content = response.content[0].text if response.content and len(response.content) > 0 else ""
+            reported = getattr(response, 'usage', None)
+            usage.success(
+                content,
+                prompt_tokens=getattr(reported, 'input_tokens', None),
+                completion_tokens=getattr(reported, 'output_tokens', None)
+            )
+            return content
                 
         except Exception as e:
             raise Exception(f"Anthropic API error: {str(e)}")
@@ -675,16 +719,42 @@ Format your response as JSON with this structure:
 
 
 class MockProvider(BaseLLMProvider):
-    """Mock provider for testing"""
+    """Mock provider for testing
+    
+    Answers instantly by default; a MockBehavior (configured from MOCK_LLM_*
+    environment variables) adds latency, streaming delay, injected failures
+    and a concurrency ceiling for load testing.
+    """
+    
+    def __init__(self, config: LLMConfig, behavior: Optional[MockBehavior] = None):
+        super().__init__(config)
+        self.behavior = behavior or MockBehavior.from_environment()
+        self.load = MockLoadSimulator(self.behavior) if self.behavior.enabled else None
+    
+    async def _simulate(self, produce, completion_tokens=None):
+        if self.load is None:
+            return produce()
+        return await self.load.run(produce, completion_tokens)
     
     async def generate(self, prompt: str, system_prompt: Optional[str] = None, **kwargs) -> str:
-        # Generate more realistic responses for evaluation testing
-        if system_prompt and "email assistant" in system_prompt.lower():
-            return self._generate_mock_email_response(prompt, system_prompt)
-        elif "email" in prompt.lower() or "subject:" in prompt.lower():
-            return self._generate_mock_email_response(prompt, system_prompt)
-        else:
+        usage = self._usage_timer(system_prompt, prompt)
+        
+        def compose():
+            # Generate more realistic responses for evaluation testing
+            if system_prompt and "email assistant" in system_prompt.lower():
+                return self._generate_mock_email_response(prompt, system_prompt)
+            elif "email" in prompt.lower() or "subject:" in prompt.lower():
+                return self._generate_mock_email_response(prompt, system_prompt)
             return f"Mock response to: {prompt[:50]}..."
+        
+        try:
+            response = await self._simulate(compose, completion_tokens=estimate_tokens)
+        except BaseException:
+            usage.failure()
+            raise
+        
+        usage.success(response)
+        return response
     
     def _generate_mock_email_response(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         """Generate a realistic mock email response"""
@@ -866,7 +936,7 @@ Customer Service Team
         return random.choice(responses)
     
     async def generate_drafts(self, email_content: str, system_prompt: str, **kwargs) -> List[EmailDraft]:
-        return [
+        return await self._simulate(lambda: [
             EmailDraft(
                 content=f"Mock draft response to email about: {email_content[:30]}...",
                 reasoning=["Mock reasoning 1", "Mock reasoning 2", "Mock reasoning 3"],
@@ -874,7 +944,7 @@ Customer Service Team
                 draft_id=i+1,
                 metadata={"provider": "mock"}
             ) for i in range(kwargs.get('num_drafts', 3))
-        ]
+        ], completion_tokens=lambda drafts: sum(estimate_tokens(d.content) for d in drafts))
     
     async def health_check(self) -> Dict[str, Any]:
         return {"status": "healthy", "provider": "mock", "model": "mock-model"}
@@ -885,6 +955,9 @@ Customer Service Team
         context: Optional[str] = None
     ) -> List[float]:
         """Mock log probabilities for testing"""
+        return await self._simulate(lambda: self._mock_log_probabilities(text))
+    
+    def _mock_log_probabilities(self, text: str) -> List[float]:
         import re
         import math
         
@@ -922,11 +995,22 @@ class LLMProviderFactory:
             "mock": MockProvider
         }
         
+        if config.provider.lower() == "replay":
+            from .replay_provider import ReplayProvider
+            return ReplayProvider(config)
+        
         provider_class = providers.get(config.provider.lower())
         if not provider_class:
             raise ValueError(f"Unsupported provider: {config.provider}")
         
-        return provider_class(config)
+        provider = provider_class(config)
+        
+        # Capture real traffic for offline replay when requested
+        if os.getenv("LLM_REPLAY_MODE", "").lower() == "record":
+            from .replay_provider import RecordingProvider, get_replay_store
+            provider = RecordingProvider(provider, get_replay_store())
+        
+        return provider
     
     @staticmethod
     def from_environment() -> BaseLLMProvider:
@@ -940,7 +1024,8 @@ class LLMProviderFactory:
             "openai": "gpt-3.5-turbo",
             "anthropic": "claude-3-haiku-20240307",
             "claude": "claude-3-haiku-20240307",
-            "mock": "mock-model"
+            "mock": "mock-model",
+            "replay": "replay"
         }
         
         default_model = default_models.get(provider.lower(), "llama3.2:3b")
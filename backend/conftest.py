@@ -1,7 +1,17 @@
 import os
 import django
+import pytest
 from django.conf import settings
 
 def pytest_configure():
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'looplearner.settings')
-    django.setup()
\ No newline at end of file
+    # Each test worker has its own database, so it gets its own cache too
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    django.setup()
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """Cached responses and version counters must not outlive the test database they came from"""
+    from django.core.cache import cache
+    cache.clear()
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from app.services.feedback_signals import connect_feedback_signals
+        from app.services.convergence_assessments import connect_convergence_invalidation
+        from app.services.metrics_rollups import connect_metrics_rollups
+        from app.services.response_cache import connect_response_cache
+        from app.services.prompt_similarity_index import connect_prompt_similarity_index
+        connect_feedback_signals()
+        connect_convergence_invalidation()
+        connect_metrics_rollups()
+        connect_response_cache()
+        connect_prompt_similarity_index()
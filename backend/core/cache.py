@@ -0,0 +1,55 @@
+"""
+Cache backends
+"""
+
+import os
+import pickle
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+
+class LockedFileBasedCache(FileBasedCache):
+    """FileBasedCache whose incr() and add() are atomic across processes on this host.
+
+    The stock versions read and then write the entry, so concurrent callers
+    can lose updates; here they hold an exclusive lock on a file in the cache
+    directory. incr() keeps the entry's expiry.
+    """
+
+    lock_filename = 'atomic.lock'
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, self.lock_filename), 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked():
+            value = self.get(key, self._missing_key, version=version)
+            if value is self._missing_key:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = value + delta
+            self.set(key, new_value, self._remaining_timeout(key, version), version=version)
+            return new_value
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def _remaining_timeout(self, key, version):
+        """Seconds until the entry expires (None if it never does); entries start with their expiry"""
+        try:
+            with open(self._key_to_file(key, version), 'rb') as f:
+                expiry = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        return None if expiry is None else max(expiry - time.time(), 1)
@@ -1,11 +1,13 @@
 """
 Management command to clean up stuck optimization runs.
-Marks old running optimizations as failed if they haven't been updated recently.
+Fails runs whose worker lease expired, and marks old running optimizations
+without a live lease as failed if they haven't been updated recently.
 """
 from datetime import timedelta
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from core.models import OptimizationRun
+from core.models import OptimizationRun, WorkLease
+from app.services.run_leases import optimization_run_resource, purge_expired_leases
 
 
 class Command(BaseCommand):
@@ -28,14 +30,27 @@ class Command(BaseCommand):
         timeout_minutes = options['timeout_minutes']
         dry_run = options['dry_run']
         
+        # Runs whose worker stopped heartbeating are failed straight away
+        if not dry_run:
+            purged = purge_expired_leases()
+            if purged:
+                self.stdout.write(self.style.SUCCESS(f'Released {purged} expired worker lease(s).'))
+        
         # Calculate the cutoff time
         cutoff_time = timezone.now() - timedelta(minutes=timeout_minutes)
         
-        # Find stuck optimizations
+        # Find stuck optimizations; runs with a live lease are still being worked on
         stuck_optimizations = OptimizationRun.objects.filter(
             status='running',
             started_at__lt=cutoff_time
         )
+        leased = {
+            resource.split(':', 1)[1] for resource in WorkLease.objects.filter(
+                resource__in=[optimization_run_resource(run_id) for run_id in stuck_optimizations.values_list('id', flat=True)],
+                expires_at__gte=timezone.now()
+            ).values_list('resource', flat=True)
+        }
+        stuck_optimizations = stuck_optimizations.exclude(id__in=leased)
         
         count = stuck_optimizations.count()
         
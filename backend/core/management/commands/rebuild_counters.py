@@ -0,0 +1,23 @@
+"""
+Management command to rebuild the counter tables (app/services/counter_tables.py).
+"""
+from django.core.management.base import BaseCommand
+from app.services.counter_tables import TABLES, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute counter tables from the rows they count'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--table',
+            action='append',
+            choices=list(TABLES),
+            help='Only rebuild this table (repeatable; default: all)'
+        )
+        parser.add_argument('--prompt-lab', help='Only rebuild this prompt lab (UUID)')
+
+    def handle(self, *args, **options):
+        prompt_lab_ids = [options['prompt_lab']] if options['prompt_lab'] else None
+        for table, count in rebuild(prompt_lab_ids, options['table']).items():
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} {table} rows'))
@@ -0,0 +1,82 @@
+"""
+Management command to bulk-generate production-scale prompt lab data.
+Used to profile endpoints and services against realistic table sizes.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from app.services.scale_data_seeder import ScaleDataSeeder, ScaleProfile
+
+
+class Command(BaseCommand):
+    help = 'Generate deterministic prompt labs, emails, drafts, feedback and evaluation results at scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--labs', type=int, default=1, help='Number of prompt labs (default: 1)')
+        parser.add_argument('--emails-per-lab', type=int, default=1000, help='Emails per lab (default: 1000)')
+        parser.add_argument(
+            '--total-rows',
+            type=int,
+            help='Approximate total rows to create; sizes --emails-per-lab automatically (max 10,000,000)'
+        )
+        parser.add_argument('--drafts-per-email', type=int, default=2)
+        parser.add_argument('--reasons-per-draft', type=int, default=3)
+        parser.add_argument('--feedback-ratio', type=float, default=0.8, help='Fraction of drafts with feedback')
+        parser.add_argument('--ratings-per-feedback', type=int, default=2)
+        parser.add_argument('--datasets-per-lab', type=int, default=2)
+        parser.add_argument('--cases-per-dataset', type=int, default=200)
+        parser.add_argument('--runs-per-dataset', type=int, default=3, help='Evaluation runs per dataset')
+        parser.add_argument('--optimization-runs-per-lab', type=int, default=10)
+        parser.add_argument('--history-days', type=int, default=90, help='Spread timestamps over this many days')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Emails inserted per transaction')
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded labs first')
+        parser.add_argument('--dry-run', action='store_true', help='Print the planned row counts only')
+
+    def handle(self, *args, **options):
+        settings = {
+            'labs': options['labs'],
+            'drafts_per_email': options['drafts_per_email'],
+            'reasons_per_draft': options['reasons_per_draft'],
+            'feedback_ratio': options['feedback_ratio'],
+            'ratings_per_feedback': options['ratings_per_feedback'],
+            'datasets_per_lab': options['datasets_per_lab'],
+            'cases_per_dataset': options['cases_per_dataset'],
+            'runs_per_dataset': options['runs_per_dataset'],
+            'optimization_runs_per_lab': options['optimization_runs_per_lab'],
+            'history_days': options['history_days'],
+            'seed': options['seed'],
+            'chunk_size': options['chunk_size'],
+        }
+
+        if options['total_rows'] is not None:
+            if not 0 < options['total_rows'] <= 10_000_000:
+                raise CommandError('--total-rows must be between 1 and 10,000,000')
+            profile = ScaleProfile.for_total_rows(options['total_rows'], **settings)
+        else:
+            profile = ScaleProfile(emails_per_lab=options['emails_per_lab'], **settings)
+
+        if profile.labs < 1 or profile.chunk_size < 1:
+            raise CommandError('--labs and --chunk-size must be positive')
+
+        planned = profile.estimated_rows()
+        self.stdout.write(f'Planned rows ({sum(planned.values()):,} total, {profile.emails_per_lab:,} emails per lab):')
+        for name, count in planned.items():
+            self.stdout.write(f'  {name}: {count:,}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('\nDry run mode - no changes made.'))
+            return
+
+        if options['clear']:
+            cleared = ScaleDataSeeder.clear()
+            self.stdout.write(f'Deleted {cleared} previously seeded prompt lab(s)')
+
+        report = ScaleDataSeeder(profile, progress=self.stdout.write).seed()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nCreated {report.total_rows:,} rows in {report.elapsed_seconds:.1f}s '
+                f'({report.total_rows / max(report.elapsed_seconds, 1e-9):,.0f} rows/s)'
+            )
+        )
+        for name, count in report.rows.items():
+            self.stdout.write(f'  {name}: {count:,}')
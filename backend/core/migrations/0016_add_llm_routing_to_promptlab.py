@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_add_detailed_metrics_to_optimization_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promptlab',
+            name='llm_routing',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.1.2 on 2026-10-18 21:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_add_llm_routing_to_promptlab'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMUsageRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_type', models.CharField(max_length=50)),
+                ('provider', models.CharField(max_length=50)),
+                ('model', models.CharField(max_length=200)),
+                ('prompt_tokens', models.IntegerField(default=0)),
+                ('completion_tokens', models.IntegerField(default=0)),
+                ('latency_ms', models.FloatField(default=0.0)),
+                ('cost_usd', models.FloatField(default=0.0)),
+                ('estimated', models.BooleanField(default=False)),
+                ('success', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('evaluation_run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='llm_usage', to='core.evaluationrun')),
+                ('optimization_run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='llm_usage', to='core.optimizationrun')),
+                ('prompt_lab', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='llm_usage', to='core.promptlab')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['prompt_lab', 'created_at'], name='core_llmusa_prompt__f270c6_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.1.2 on 2026-10-18 22:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_add_llm_usage_record'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromptPopulationMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('origin', models.CharField(choices=[('seed', 'Seed'), ('mutation', 'Mutation'), ('crossover', 'Crossover')], default='seed', max_length=20)),
+                ('parent_ids', models.JSONField(blank=True, default=list)),
+                ('generation', models.IntegerField(default=0)),
+                ('fitness', models.FloatField(blank=True, null=True)),
+                ('evaluations', models.IntegerField(default=0)),
+                ('is_alive', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('prompt_lab', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='population', to='core.promptlab')),
+            ],
+            options={
+                'ordering': ['-fitness'],
+                'indexes': [models.Index(fields=['prompt_lab', 'is_alive'], name='core_prompt_prompt__39b917_idx')],
+                'unique_together': {('prompt_lab', 'fingerprint')},
+            },
+        ),
+    ]
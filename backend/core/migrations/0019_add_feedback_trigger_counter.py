@@ -0,0 +1,34 @@
+# Generated by Django 6.1.2 on 2026-10-18 22:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_add_prompt_population'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackTriggerCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('feedback_count', models.IntegerField(default=0)),
+                ('accept_count', models.IntegerField(default=0)),
+                ('reject_count', models.IntegerField(default=0)),
+                ('edit_count', models.IntegerField(default=0)),
+                ('ignore_count', models.IntegerField(default=0)),
+                ('reason_likes', models.IntegerField(default=0)),
+                ('factor_dislikes', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('prompt_lab', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigger_counters', to='core.promptlab')),
+            ],
+            options={
+                'ordering': ['-bucket_start'],
+                'unique_together': {('prompt_lab', 'bucket_start')},
+            },
+        ),
+    ]
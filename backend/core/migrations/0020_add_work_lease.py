@@ -0,0 +1,25 @@
+# Generated by Django 6.1.2 on 2026-10-18 22:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_add_feedback_trigger_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=100, unique=True)),
+                ('owner', models.CharField(max_length=100)),
+                ('acquired_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('heartbeat_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.1.2 on 2026-10-18 22:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_add_work_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptimizationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset_ids', models.JSONField(blank=True, default=list)),
+                ('candidates', models.JSONField(blank=True, default=list)),
+                ('resume_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('optimization_run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoint', to='core.optimizationrun')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CheckpointCaseResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prompt_fingerprint', models.CharField(max_length=64)),
+                ('case_key', models.CharField(max_length=64)),
+                ('response', models.TextField(blank=True)),
+                ('metrics', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='case_results', to='core.optimizationcheckpoint')),
+            ],
+            options={
+                'unique_together': {('checkpoint', 'prompt_fingerprint', 'case_key')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.1.2 on 2026-10-18 22:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_add_optimization_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfidenceAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feedback_count', models.IntegerField(default=0)),
+                ('accept_count', models.IntegerField(default=0)),
+                ('reject_count', models.IntegerField(default=0)),
+                ('edit_count', models.IntegerField(default=0)),
+                ('ignore_count', models.IntegerField(default=0)),
+                ('reasoned_feedback_count', models.IntegerField(default=0)),
+                ('reason_length_sum', models.IntegerField(default=0)),
+                ('rated_feedback_count', models.IntegerField(default=0)),
+                ('liked_count', models.IntegerField(default=0)),
+                ('disliked_count', models.IntegerField(default=0)),
+                ('streak_action', models.CharField(blank=True, max_length=20)),
+                ('streak_length', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('prompt_lab', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='confidence_aggregate', to='core.promptlab')),
+            ],
+        ),
+    ]
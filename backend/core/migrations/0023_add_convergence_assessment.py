@@ -0,0 +1,34 @@
+# Generated by Django 6.1.2 on 2026-10-18 23:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_add_confidence_aggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConvergenceAssessment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('converged', models.BooleanField(default=False)),
+                ('confidence_score', models.FloatField(default=0.0)),
+                ('factors', models.JSONField(blank=True, default=dict)),
+                ('assessment', models.JSONField(default=dict)),
+                ('optimization_iterations', models.IntegerField(default=0)),
+                ('total_feedback_collected', models.IntegerField(default=0)),
+                ('is_current', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('prompt_lab', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='convergence_assessments', to='core.promptlab')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['prompt_lab', 'is_current'], name='core_conver_prompt__c7fd59_idx')],
+            },
+        ),
+    ]
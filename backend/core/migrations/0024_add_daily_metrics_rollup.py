@@ -0,0 +1,38 @@
+# Generated by Django 6.1.2 on 2026-10-18 23:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_add_convergence_assessment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetricsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('scenario_type', models.CharField(blank=True, max_length=20)),
+                ('feedback_count', models.IntegerField(default=0)),
+                ('accept_count', models.IntegerField(default=0)),
+                ('reject_count', models.IntegerField(default=0)),
+                ('edit_count', models.IntegerField(default=0)),
+                ('ignore_count', models.IntegerField(default=0)),
+                ('draft_count', models.IntegerField(default=0)),
+                ('optimization_count', models.IntegerField(default=0)),
+                ('optimization_success_count', models.IntegerField(default=0)),
+                ('improvement_sum', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('prompt_lab', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='core.promptlab')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day'], name='core_dailym_day_128cff_idx')],
+                'unique_together': {('prompt_lab', 'day', 'scenario_type')},
+            },
+        ),
+    ]
@@ -18,6 +18,9 @@ class PromptLab(models.Model):
     total_emails_processed = models.IntegerField(default=0)
     total_feedback_collected = models.IntegerField(default=0)
     
+    # Per-task LLM routing overrides, e.g. {"scoring": {"chain": ["ollama:llama3.2:1b"], "max_tokens": 50}}
+    llm_routing = models.JSONField(default=dict, blank=True)
+    
     class Meta:
         ordering = ['-updated_at']
     
@@ -446,4 +449,224 @@ class ExtractedPreference(models.Model):
         super().save(*args, **kwargs)
     
     def __str__(self):
-        return f"{self.prompt_lab.name} - {self.preference_category}: {self.preference_text[:50]}... ({self.confidence_score:.2f})"
\ No newline at end of file
+        return f"{self.prompt_lab.name} - {self.preference_category}: {self.preference_text[:50]}... ({self.confidence_score:.2f})"
+
+class PromptPopulationMember(models.Model):
+    """Prompt in a lab's evolutionary search population, kept across optimization cycles"""
+    ORIGIN_CHOICES = [
+        ('seed', 'Seed'),
+        ('mutation', 'Mutation'),
+        ('crossover', 'Crossover'),
+    ]
+    
+    prompt_lab = models.ForeignKey(PromptLab, on_delete=models.CASCADE, related_name='population')
+    content = models.TextField()
+    fingerprint = models.CharField(max_length=64)  # Hash of the normalized content
+    origin = models.CharField(max_length=20, choices=ORIGIN_CHOICES, default='seed')
+    parent_ids = models.JSONField(default=list, blank=True)
+    generation = models.IntegerField(default=0)
+    fitness = models.FloatField(null=True, blank=True)  # Running mean of cheap evaluation scores
+    evaluations = models.IntegerField(default=0)
+    is_alive = models.BooleanField(default=True)  # False once replaced by fitter offspring
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-fitness']
+        unique_together = [['prompt_lab', 'fingerprint']]
+        indexes = [
+            models.Index(fields=['prompt_lab', 'is_alive']),
+        ]
+    
+    def __str__(self):
+        return f"{self.origin} gen {self.generation} (fitness {self.fitness})"
+
+
+class LLMUsageRecord(models.Model):
+    """Measured token usage and latency of a single LLM provider call"""
+    prompt_lab = models.ForeignKey(PromptLab, on_delete=models.CASCADE, related_name='llm_usage', null=True, blank=True)
+    optimization_run = models.ForeignKey(OptimizationRun, on_delete=models.CASCADE, related_name='llm_usage', null=True, blank=True)
+    evaluation_run = models.ForeignKey(EvaluationRun, on_delete=models.CASCADE, related_name='llm_usage', null=True, blank=True)
+    task_type = models.CharField(max_length=50)  # e.g. 'rewriting', 'scoring', 'draft_generation'
+    provider = models.CharField(max_length=50)
+    model = models.CharField(max_length=200)
+    prompt_tokens = models.IntegerField(default=0)
+    completion_tokens = models.IntegerField(default=0)
+    latency_ms = models.FloatField(default=0.0)
+    cost_usd = models.FloatField(default=0.0)
+    estimated = models.BooleanField(default=False)  # True when the provider did not report token counts
+    success = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['prompt_lab', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.task_type} via {self.provider}:{self.model} ({self.prompt_tokens}+{self.completion_tokens} tokens)"
+
+
+class FeedbackTriggerCounter(models.Model):
+    """Hourly feedback tallies for a prompt lab, maintained on each feedback write.
+    
+    Optimization trigger checks sum the buckets in their window instead of
+    rescanning UserFeedback.
+    """
+    prompt_lab = models.ForeignKey(PromptLab, on_delete=models.CASCADE, related_name='trigger_counters')
+    bucket_start = models.DateTimeField()  # Start of the hour the feedback was created in
+    feedback_count = models.IntegerField(default=0)
+    accept_count = models.IntegerField(default=0)
+    reject_count = models.IntegerField(default=0)
+    edit_count = models.IntegerField(default=0)
+    ignore_count = models.IntegerField(default=0)
+    reason_likes = models.IntegerField(default=0)
+    factor_dislikes = models.JSONField(default=dict, blank=True)  # Reason text -> disliked count
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-bucket_start']
+        unique_together = [['prompt_lab', 'bucket_start']]
+    
+    def __str__(self):
+        return f"{self.prompt_lab.name} @ {self.bucket_start:%Y-%m-%d %H:00}: {self.feedback_count} feedback"
+
+
+class WorkLease(models.Model):
+    """A worker process's claim on a prompt lab or run, kept alive by heartbeats.
+    
+    Resources are keys like "prompt_lab:<id>", "optimization_run:<id>" or
+    "evaluation_run:<id>". A lease whose heartbeat stops expires, and another
+    worker can then claim the resource.
+    """
+    resource = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=100)  # host:pid:nonce of the worker process
+    acquired_at = models.DateTimeField(default=timezone.now)
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.resource} held by {self.owner} until {self.expires_at:%H:%M:%S}"
+
+
+class OptimizationCheckpoint(models.Model):
+    """Resumable state of a dataset optimization run.
+    
+    Holds the candidates under test so a resumed run evaluates the same ones,
+    plus (via case_results) every prompt/case evaluation completed so far.
+    """
+    optimization_run = models.OneToOneField(OptimizationRun, on_delete=models.CASCADE, related_name='checkpoint')
+    dataset_ids = models.JSONField(default=list, blank=True)
+    candidates = models.JSONField(default=list, blank=True)  # Rewrite candidates in evaluation order
+    resume_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Checkpoint for {self.optimization_run_id}: {len(self.candidates)} candidates"
+
+
+class CheckpointCaseResult(models.Model):
+    """One completed prompt/case evaluation within an optimization checkpoint"""
+    checkpoint = models.ForeignKey(OptimizationCheckpoint, on_delete=models.CASCADE, related_name='case_results')
+    prompt_fingerprint = models.CharField(max_length=64)
+    case_key = models.CharField(max_length=64)
+    response = models.TextField(blank=True)
+    metrics = models.JSONField(default=dict)  # Includes overall_score
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = [['checkpoint', 'prompt_fingerprint', 'case_key']]
+    
+    def __str__(self):
+        return f"{self.prompt_fingerprint[:8]} x {self.case_key[:8]}: {self.metrics.get('overall_score')}"
+
+
+class ConfidenceAggregate(models.Model):
+    """Running feedback and reason rating totals for a prompt lab.
+    
+    Maintained on each UserFeedback and ReasonRating write; confidence
+    metrics are computed from these instead of rescanning the lab's history.
+    """
+    prompt_lab = models.OneToOneField(PromptLab, on_delete=models.CASCADE, related_name='confidence_aggregate')
+    feedback_count = models.IntegerField(default=0)
+    accept_count = models.IntegerField(default=0)
+    reject_count = models.IntegerField(default=0)
+    edit_count = models.IntegerField(default=0)
+    ignore_count = models.IntegerField(default=0)
+    reasoned_feedback_count = models.IntegerField(default=0)  # Feedback with a non-empty reason
+    reason_length_sum = models.IntegerField(default=0)  # Characters across those reasons
+    rated_feedback_count = models.IntegerField(default=0)  # Feedback with at least one reason rating
+    liked_count = models.IntegerField(default=0)
+    disliked_count = models.IntegerField(default=0)
+    streak_action = models.CharField(max_length=20, blank=True)  # Action of the most recent feedback
+    streak_length = models.IntegerField(default=0)  # Consecutive most recent feedback with that action
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.prompt_lab.name}: {self.feedback_count} feedback, {self.liked_count}/{self.disliked_count} ratings"
+
+
+class ConvergenceAssessment(models.Model):
+    """A persisted convergence assessment of a prompt lab.
+    
+    The lab's current assessment is reused until new prompt scores, feedback
+    or optimization iterations arrive; older rows form its history.
+    """
+    prompt_lab = models.ForeignKey(PromptLab, on_delete=models.CASCADE, related_name='convergence_assessments')
+    converged = models.BooleanField(default=False)
+    confidence_score = models.FloatField(default=0.0)
+    factors = models.JSONField(default=dict, blank=True)
+    assessment = models.JSONField(default=dict)  # Full assess_convergence result
+    optimization_iterations = models.IntegerField(default=0)  # Lab state the assessment saw
+    total_feedback_collected = models.IntegerField(default=0)
+    is_current = models.BooleanField(default=True)  # Cleared when new data invalidates it
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['prompt_lab', 'is_current']),
+        ]
+    
+    def __str__(self):
+        state = 'converged' if self.converged else 'not converged'
+        return f"{self.prompt_lab.name}: {state} ({self.confidence_score:.2f}) @ {self.created_at:%Y-%m-%d %H:%M}"
+
+
+class DailyMetricsRollup(models.Model):
+    """Per-day activity totals for a prompt lab and email scenario.
+    
+    Maintained on each UserFeedback, Draft and OptimizationRun write so
+    dashboards sum a few rows per day instead of scanning history.
+    Optimization runs have no scenario and are counted under scenario_type ''.
+    """
+    prompt_lab = models.ForeignKey(PromptLab, on_delete=models.CASCADE, related_name='daily_rollups', null=True, blank=True)
+    day = models.DateField()
+    scenario_type = models.CharField(max_length=20, blank=True)
+    feedback_count = models.IntegerField(default=0)
+    accept_count = models.IntegerField(default=0)
+    reject_count = models.IntegerField(default=0)
+    edit_count = models.IntegerField(default=0)
+    ignore_count = models.IntegerField(default=0)
+    draft_count = models.IntegerField(default=0)
+    optimization_count = models.IntegerField(default=0)
+    optimization_success_count = models.IntegerField(default=0)  # Completed with a new prompt
+    improvement_sum = models.FloatField(default=0.0)  # performance_improvement over successful runs
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-day']
+        unique_together = [['prompt_lab', 'day', 'scenario_type']]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+    
+    @property
+    def average_improvement(self) -> float:
+        return self.improvement_sum / self.optimization_success_count if self.optimization_success_count else 0.0
+    
+    def __str__(self):
+        scope = self.prompt_lab.name if self.prompt_lab else 'Global'
+        return f"{scope} {self.day} {self.scenario_type or 'all'}: {self.feedback_count} feedback, {self.draft_count} drafts"
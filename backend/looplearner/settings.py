@@ -84,6 +84,22 @@ DATABASES = {
 }
 
 
+# Cache
+# Response cache versions and compute usage counters must be shared by every
+# backend process (app/services/response_cache.py). All processes sharing the
+# SQLite database run on this host, so a file-based cache beside it is shared
+# by all of them. Version bumps use incr(), which the locked backend makes
+# atomic across those processes; switch to a networked backend with atomic
+# incr (Redis, Memcached) along with the database.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.LockedFileBasedCache',
+        'LOCATION': BASE_DIR / '.django_cache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,132 @@
+"""
+Benchmark harness for the optimization loop hot paths
+Measures wall-clock time, throughput, LLM calls, DB queries and peak memory,
+writes machine-readable JSON and compares against a stored baseline.
+"""
+import json
+import os
+import platform
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, List, Optional
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from app.services.llm_usage import track_llm_usage
+
+# Metrics where a higher value is better; everything else is lower-is-better
+HIGHER_IS_BETTER = {'cases_per_second'}
+COMPARED_METRICS = ['wall_clock_seconds', 'cases_per_second', 'llm_calls', 'db_queries', 'python_peak_mb']
+
+
+@dataclass
+class BenchmarkResult:
+    """Measurements for one hot path at one dataset size"""
+    name: str
+    size: int
+    wall_clock_seconds: float = 0.0
+    cases: int = 0
+    cases_per_second: float = 0.0
+    llm_calls: int = 0
+    llm_tokens: int = 0
+    db_queries: int = 0
+    peak_rss_mb: float = 0.0
+    python_peak_mb: float = 0.0
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.size}]"
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if platform.system() == 'Darwin' else peak / 1024
+
+
+@contextmanager
+def measure(name: str, size: int):
+    """Measure the enclosed block; set result.cases inside to get throughput"""
+    result = BenchmarkResult(name=name, size=size)
+    tracemalloc.start()
+    start = time.perf_counter()
+    with track_llm_usage() as usage, CaptureQueriesContext(connection) as queries:
+        yield result
+    result.wall_clock_seconds = time.perf_counter() - start
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result.python_peak_mb = python_peak / (1024 * 1024)
+    result.peak_rss_mb = _peak_rss_mb()
+    result.db_queries = len(queries.captured_queries)
+    result.llm_calls = len(usage.records)
+    result.llm_tokens = sum(r.total_tokens for r in usage.records)
+    if result.cases and result.wall_clock_seconds > 0:
+        result.cases_per_second = result.cases / result.wall_clock_seconds
+
+
+class BenchmarkReport:
+    """Collects results and serializes them as JSON"""
+
+    def __init__(self):
+        self.results: List[BenchmarkResult] = []
+
+    def add(self, result: BenchmarkResult):
+        self.results.append(result)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'mock_latency': os.getenv('MOCK_LLM_LATENCY', 'none'),
+                'mock_latency_ms': os.getenv('MOCK_LLM_LATENCY_MS'),
+            },
+            'results': {r.key: asdict(r) for r in self.results},
+        }
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def compare_to_baseline(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.2
+) -> List[Dict[str, Any]]:
+    """Return regressions larger than tolerance (fractional) per metric"""
+    regressions = []
+    for key, result in current.get('results', {}).items():
+        reference = baseline.get('results', {}).get(key)
+        if not reference:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = reference.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            if change > tolerance:
+                regressions.append({
+                    'benchmark': key,
+                    'metric': metric,
+                    'baseline': old,
+                    'current': new,
+                    'change_percent': round(change * 100, 1)
+                })
+    return regressions
+
+
+def load_baseline(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
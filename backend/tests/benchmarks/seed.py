@@ -0,0 +1,86 @@
+"""
+Deterministic benchmark data
+Builds a prompt lab with an evaluation dataset of the requested size plus
+proportional email/draft/feedback history for the dashboard endpoints.
+"""
+import random
+
+from app.services.counter_tables import rebuild
+from core.models import (
+    PromptLab, SystemPrompt, Email, Draft, DraftReason, UserFeedback, ReasonRating,
+    EvaluationDataset, EvaluationCase
+)
+
+SCENARIOS = ['professional', 'casual', 'complaint', 'inquiry']
+ACTIONS = ['accept', 'reject', 'edit', 'ignore']
+TOPICS = ['invoice', 'meeting', 'refund', 'shipping delay', 'account access', 'pricing', 'feedback']
+
+
+def seed_benchmark_lab(size: int, seed: int = 42, history_ratio: float = 0.1) -> PromptLab:
+    """Create a prompt lab with `size` evaluation cases and size*history_ratio emails of feedback history"""
+    rng = random.Random(seed)
+
+    prompt_lab = PromptLab.objects.create(name=f"Benchmark Lab {size}", description="Seeded benchmark data")
+    prompt = SystemPrompt.objects.create(
+        prompt_lab=prompt_lab,
+        content="You are a helpful email assistant. Reply professionally and concisely.",
+        version=1,
+        is_active=True
+    )
+
+    dataset = EvaluationDataset.objects.create(prompt_lab=prompt_lab, name=f"Benchmark dataset {size}")
+    EvaluationCase.objects.bulk_create([
+        EvaluationCase(
+            dataset=dataset,
+            input_text=f"Customer {i} asks about {rng.choice(TOPICS)} for order {rng.randint(1000, 9999)}.",
+            expected_output=f"Thank you for reaching out about your {rng.choice(TOPICS)}. We will help right away.",
+            context={'customer_id': i}
+        )
+        for i in range(size)
+    ], batch_size=1000)
+    dataset.case_count = size
+    dataset.save(update_fields=['case_count'])
+
+    email_count = max(10, int(size * history_ratio))
+    emails = Email.objects.bulk_create([
+        Email(
+            prompt_lab=prompt_lab,
+            subject=f"Question about {rng.choice(TOPICS)}",
+            body=f"Hello, I have a question about {rng.choice(TOPICS)}.",
+            sender=f"user{i}@example.com",
+            scenario_type=rng.choice(SCENARIOS)
+        )
+        for i in range(email_count)
+    ], batch_size=1000)
+
+    reasons = DraftReason.objects.bulk_create([
+        DraftReason(text=f"Reason {i}", confidence=round(rng.uniform(0.5, 0.95), 2))
+        for i in range(20)
+    ])
+    drafts = Draft.objects.bulk_create([
+        Draft(email=email, content=f"Draft reply to {email.subject}", system_prompt=prompt)
+        for email in emails
+    ], batch_size=1000)
+    Draft.reasons.through.objects.bulk_create([
+        Draft.reasons.through(draft_id=draft.id, draftreason_id=reason.id)
+        for draft in drafts
+        for reason in rng.sample(reasons, 2)
+    ], batch_size=1000)
+
+    feedback = UserFeedback.objects.bulk_create([
+        UserFeedback(draft=draft, action=rng.choice(ACTIONS), reason="Benchmark feedback")
+        for draft in drafts
+    ], batch_size=1000)
+    ReasonRating.objects.bulk_create([
+        ReasonRating(feedback=item, reason=reason, liked=rng.random() < 0.6)
+        for item in feedback
+        for reason in rng.sample(reasons, 2)
+    ], batch_size=1000)
+    rebuild([prompt_lab.id])
+
+    PromptLab.objects.filter(id=prompt_lab.id).update(
+        total_emails_processed=email_count,
+        total_feedback_collected=len(feedback)
+    )
+    prompt_lab.refresh_from_db()
+    return prompt_lab
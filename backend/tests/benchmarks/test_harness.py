@@ -0,0 +1,28 @@
+"""
+Tests for the benchmark harness baseline comparison
+"""
+from .harness import BenchmarkResult, BenchmarkReport, compare_to_baseline
+
+
+def _report(**metrics):
+    report = BenchmarkReport()
+    report.add(BenchmarkResult(name='execute_evaluation_run', size=100, **metrics))
+    return report.to_dict()
+
+
+def test_regressions_respect_metric_direction():
+    baseline = _report(wall_clock_seconds=1.0, cases_per_second=100.0, db_queries=200)
+    current = _report(wall_clock_seconds=1.1, cases_per_second=60.0, db_queries=400)
+
+    regressions = {r['metric']: r for r in compare_to_baseline(current, baseline, tolerance=0.2)}
+
+    assert set(regressions) == {'cases_per_second', 'db_queries'}
+    assert regressions['cases_per_second']['change_percent'] == 40.0
+
+
+def test_improvements_and_unknown_benchmarks_pass():
+    baseline = _report(wall_clock_seconds=2.0, db_queries=400)
+    current = _report(wall_clock_seconds=1.0, db_queries=10)
+    current['results']['new_benchmark[10]'] = {'wall_clock_seconds': 5.0}
+
+    assert compare_to_baseline(current, baseline) == []
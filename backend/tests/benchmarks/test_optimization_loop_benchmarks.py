@@ -0,0 +1,110 @@
+"""
+End-to-end performance benchmarks for the optimization loop
+Skipped unless BENCHMARK=1. Run serially so timings are not skewed:
+
+    BENCHMARK=1 BENCHMARK_SIZES=100,1000 python -m pytest tests/benchmarks -n0
+
+Environment:
+    BENCHMARK_SIZES      comma-separated dataset sizes (default 100,1000,10000)
+    BENCHMARK_OUTPUT     JSON results path (default benchmark_results.json)
+    BENCHMARK_BASELINE   JSON results to compare against; regressions fail
+    BENCHMARK_TOLERANCE  allowed fractional regression per metric (default 0.2)
+    MOCK_LLM_*           latency profile of the mock provider (default fixed 2ms)
+"""
+import os
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from app.services.evaluation_engine import EvaluationEngine
+from app.services.reward_aggregator import RewardFunctionAggregator
+from app.services.unified_llm_provider import get_llm_provider
+from core.models import EvaluationDataset, OptimizationRun
+from .harness import BenchmarkReport, measure, compare_to_baseline, load_baseline
+from .seed import seed_benchmark_lab
+
+pytestmark = pytest.mark.skipif(os.getenv('BENCHMARK') != '1', reason="Set BENCHMARK=1 to run benchmarks")
+
+SIZES = [int(size) for size in os.getenv('BENCHMARK_SIZES', '100,1000,10000').split(',') if size.strip()]
+
+
+@pytest.fixture(scope='module')
+def report():
+    report = BenchmarkReport()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('LLM_PROVIDER', 'mock')
+        patch.setenv('MOCK_LLM_LATENCY', os.getenv('MOCK_LLM_LATENCY', 'fixed'))
+        patch.setenv('MOCK_LLM_LATENCY_MS', os.getenv('MOCK_LLM_LATENCY_MS', '2'))
+        yield report
+    report.write(os.getenv('BENCHMARK_OUTPUT', 'benchmark_results.json'))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('size', SIZES)
+def test_execute_evaluation_run(report, size):
+    prompt_lab = seed_benchmark_lab(size)
+    dataset = EvaluationDataset.objects.get(prompt_lab=prompt_lab)
+    provider = get_llm_provider()
+    engine = EvaluationEngine(provider, RewardFunctionAggregator(provider))
+    run = engine.create_evaluation_run(dataset, prompt_lab.prompts.get(is_active=True))
+
+    with measure('execute_evaluation_run', size) as result:
+        results = engine.execute_evaluation_run(run)
+        result.cases = len(results)
+
+    report.add(result)
+    assert result.cases == size
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('size', SIZES)
+def test_trigger_optimization_with_datasets(report, size):
+    prompt_lab = seed_benchmark_lab(size)
+    dataset = EvaluationDataset.objects.get(prompt_lab=prompt_lab)
+
+    with measure('trigger_optimization_with_datasets', size) as result:
+        response = APIClient().post(reverse('trigger-optimization-with-dataset'), {
+            'prompt_lab_id': str(prompt_lab.id),
+            'dataset_ids': [dataset.id],
+            'force': True
+        }, format='json')
+        run = OptimizationRun.objects.filter(prompt_lab=prompt_lab).first()
+        result.cases = run.test_cases_used if run else 0
+
+    result.extra = {'status_code': response.status_code, 'llm_calls_per_cycle': result.llm_calls}
+    report.add(result)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('size', SIZES)
+def test_dashboard_endpoints(report, size):
+    prompt_lab = seed_benchmark_lab(size)
+    client = APIClient()
+    endpoints = {
+        'dashboard_overview': reverse('dashboard-overview'),
+        'learning_metrics': reverse('learning-metrics'),
+        'prompt_lab_stats': reverse('prompt-lab-stats', kwargs={'prompt_lab_id': prompt_lab.id}),
+    }
+
+    for name, url in endpoints.items():
+        with measure(name, size) as result:
+            response = client.get(url)
+        result.extra = {'status_code': response.status_code, 'feedback_rows': prompt_lab.total_feedback_collected}
+        report.add(result)
+
+    # The endpoints read the rollups, so the seeded history must be reflected in them
+    assert response.json()['feedback']['total_collected'] == prompt_lab.total_feedback_collected
+
+
+@pytest.mark.django_db
+def test_compare_with_baseline(report):
+    """Runs last in this module: fail on regressions against BENCHMARK_BASELINE"""
+    baseline = load_baseline(os.getenv('BENCHMARK_BASELINE'))
+    if baseline is None:
+        pytest.skip("No BENCHMARK_BASELINE to compare against")
+
+    tolerance = float(os.getenv('BENCHMARK_TOLERANCE', '0.2'))
+    regressions = compare_to_baseline(report.to_dict(), baseline, tolerance)
+
+    assert not regressions, f"Performance regressions beyond {tolerance:.0%}: {regressions}"
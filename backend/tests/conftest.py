@@ -0,0 +1,55 @@
+"""
+Shared fixtures for tests that build feedback history
+"""
+import pytest
+from django.utils import timezone
+
+from core.models import Draft, DraftReason, Email, PromptLab, ReasonRating, SystemPrompt, UserFeedback
+
+
+@pytest.fixture
+def prompt_lab():
+    """A prompt lab with an active first prompt"""
+    lab = PromptLab.objects.create(name="Test lab")
+    SystemPrompt.objects.create(prompt_lab=lab, content="Prompt v1", version=1, is_active=True)
+    return lab
+
+
+def _create_draft(prompt_lab, reason_texts=(), scenario_type='random', created_at=None) -> Draft:
+    """A draft answering a new email in the lab, written with the lab's first prompt"""
+    prompt = prompt_lab.prompts.first() or SystemPrompt.objects.create(
+        prompt_lab=prompt_lab, content="Prompt v1", version=1, is_active=True
+    )
+    email = Email.objects.create(
+        prompt_lab=prompt_lab, subject="Order", body="Where is it?", sender="a@example.com",
+        scenario_type=scenario_type
+    )
+    draft = Draft.objects.create(
+        email=email, content="It ships today.", system_prompt=prompt, created_at=created_at or timezone.now()
+    )
+    for text in reason_texts:
+        draft.reasons.add(DraftReason.objects.create(text=text, confidence=0.8))
+    return draft
+
+
+def _create_feedback(prompt_lab, action='accept', reason="", likes=(), dislikes=(), scenario_type='random',
+                     created_at=None) -> UserFeedback:
+    """Feedback on a new draft, with a rating for each liked and disliked reason text"""
+    created_at = created_at or timezone.now()
+    draft = _create_draft(prompt_lab, [*dislikes, *likes], scenario_type, created_at)
+    feedback = UserFeedback.objects.create(draft=draft, action=action, reason=reason, created_at=created_at)
+    for draft_reason in draft.reasons.all():
+        ReasonRating.objects.create(feedback=feedback, reason=draft_reason, liked=draft_reason.text in likes)
+    return feedback
+
+
+@pytest.fixture
+def draft_factory():
+    """Create drafts: draft_factory(prompt_lab, reason_texts=(), scenario_type=..., created_at=None)"""
+    return _create_draft
+
+
+@pytest.fixture
+def feedback_factory():
+    """Create feedback: feedback_factory(prompt_lab, action='accept', reason="", likes=(), dislikes=(), ...)"""
+    return _create_feedback
@@ -6,7 +6,8 @@ from datetime import timedelta
 from unittest.mock import patch, MagicMock, call
 from core.models import PromptLab, SystemPrompt, UserFeedback, Email, Draft
 from app.services.background_scheduler import BackgroundOptimizationScheduler
-from app.services.optimization_orchestrator import OptimizationTrigger
+from app.services.evaluation_engine import ComparisonResult, EvaluationResult
+from app.services.optimization_orchestrator import OptimizationOrchestrator, OptimizationTrigger
 
 
 class AutomatedOptimizationTests(TestCase):
@@ -322,4 +323,64 @@ class AutomatedOptimizationTests(TestCase):
                 if session_arg.name in test_prompt_lab_names:
                     executed_prompt_labs.append(session_arg.name)
             
-            self.assertEqual(len(executed_prompt_labs), 2)
\ No newline at end of file
+            self.assertEqual(len(executed_prompt_labs), 2)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_triggered_lab_is_optimized_end_to_end(monkeypatch):
+    """A lab over the thresholds goes from check_all_sessions through a real orchestrator to a new prompt"""
+    monkeypatch.setenv('LLM_PROVIDER', 'mock')
+    prompt_lab = PromptLab.objects.create(name="Triggered lab")
+    prompt = SystemPrompt.objects.create(
+        prompt_lab=prompt_lab, content="You are a helpful email assistant.", version=1, is_active=True
+    )
+    for i in range(5):
+        email = Email.objects.create(
+            prompt_lab=prompt_lab, subject=f"Order {i}", body="Where is my order?", sender="a@example.com"
+        )
+        draft = Draft.objects.create(email=email, content="It ships soon.", system_prompt=prompt)
+        UserFeedback.objects.create(draft=draft, action='reject', reason="Too vague about the date")
+
+    async def candidate_wins(self, baseline, candidate_prompts, test_case_count, **kwargs):
+        # The mock provider's scores are random; everything else runs for real
+        def result(evaluated, score):
+            return EvaluationResult(evaluated, score, {}, [], timezone.now(), test_case_count, 0.0)
+        comparisons = [
+            ComparisonResult(result(baseline, 0.5), result(candidate, 0.8), 60.0, 0.01, 'candidate', 0.95)
+            for candidate in candidate_prompts
+        ]
+        return comparisons, [], None
+
+    monkeypatch.setattr(OptimizationOrchestrator, '_compare_unique_candidates', candidate_wins)
+    scheduler = BackgroundOptimizationScheduler(trigger_config=OptimizationTrigger(
+        min_feedback_count=5, min_negative_feedback_ratio=0.3, feedback_window_hours=24
+    ))
+
+    results = scheduler.check_all_sessions()
+
+    assert results == [{'prompt_lab_id': prompt_lab.id, 'prompt_lab_name': "Triggered lab", 'triggered': True}]
+    active = SystemPrompt.objects.get(prompt_lab=prompt_lab, is_active=True)
+    assert active.version == 2 and active.content != prompt.content
+
+
+@pytest.mark.asyncio
+async def test_scheduler_initialize_routes_each_task_type(monkeypatch):
+    """The optimization scheduler gets its providers from the LLM router, not one shared provider"""
+    from app.services import llm_router
+    from app.services.background_scheduler import OptimizationScheduler
+    from app.services.prompt_rewriter import LLMBasedPromptRewriter
+
+    router = MagicMock()
+    router.get_provider.side_effect = lambda task_type, prompt_lab_id=None: MagicMock(name=task_type)
+    monkeypatch.setattr(llm_router, 'get_llm_router', lambda: router)
+    scheduler = OptimizationScheduler()
+
+    await scheduler.initialize()
+
+    routed = {call.args[0] for call in router.get_provider.call_args_list}
+    assert routed >= {
+        llm_router.TaskType.DRAFT_GENERATION, llm_router.TaskType.SCORING,
+        llm_router.TaskType.REWRITING, llm_router.TaskType.SIMILARITY
+    }
+    assert isinstance(scheduler.orchestrator.prompt_rewriter, LLMBasedPromptRewriter)
+    assert scheduler.orchestrator.trigger_config is scheduler.trigger_config
@@ -0,0 +1,130 @@
+"""
+Tests for near-duplicate candidate pruning and evaluation reuse
+"""
+import pytest
+from unittest.mock import AsyncMock
+from django.utils import timezone
+
+from app.services.candidate_dedup import (
+    BASELINE, CandidateDeduplicator, MinHasher, comparison_record, dataset_version, load_candidate_history,
+    normalize_prompt, prompt_fingerprint
+)
+from app.services.evaluation_engine import ComparisonResult, EvaluationResult
+from app.services.optimization_orchestrator import OptimizationOrchestrator
+from core.models import EvaluationCase, EvaluationDataset, OptimizationRun, PromptLab, SystemPrompt
+
+BASELINE_TEXT = "You are a helpful email assistant. Reply professionally and concisely to every customer email."
+REWRITE = (
+    "You are an expert customer support writer. Think step by step, acknowledge the customer's concern, "
+    "then give a specific next step with a clear timeline."
+)
+
+
+def _comparison(baseline, candidate, improvement):
+    def result(prompt, score):
+        return EvaluationResult(prompt, score, {'f1_score': score}, ['sample'], timezone.now(), 10, 0.0)
+    return ComparisonResult(
+        baseline=result(baseline, 0.6), candidate=result(candidate, 0.6 * (1 + improvement / 100)),
+        improvement=improvement, statistical_significance=0.03, winner='candidate', confidence_level=0.97
+    )
+
+
+class TestCandidateDeduplicator:
+
+    def test_normalized_hash_ignores_case_whitespace_and_punctuation(self):
+        assert normalize_prompt("Hello,  WORLD!\n{{name}}") == "hello world {{name}}"
+        assert prompt_fingerprint("Be concise.") == prompt_fingerprint("  be CONCISE ")
+
+    def test_minhash_estimates_similarity(self):
+        hasher = MinHasher()
+        base = hasher.signature(BASELINE_TEXT)
+
+        assert hasher.similarity(base, hasher.signature(BASELINE_TEXT + " Thanks.")) > 0.75
+        assert hasher.similarity(base, hasher.signature(REWRITE)) < 0.2
+
+    def test_plan_collapses_duplicates_and_reuses_history(self):
+        seen_before = "Always answer refund questions with the refund policy link and an apology first."
+        history = {prompt_fingerprint(seen_before): {'improvement': 12.0}}
+
+        plan = CandidateDeduplicator().plan(BASELINE_TEXT, [
+            BASELINE_TEXT.upper(),         # Same as baseline after normalization
+            REWRITE,
+            REWRITE.replace('.', '!'),     # Same as candidate 1 after normalization
+            seen_before,
+        ], history)
+
+        assert plan.evaluate == [1]
+        assert plan.duplicate_of == {0: BASELINE, 2: 1}
+        assert list(plan.reused) == [3]
+        assert plan.evaluations_avoided == 3
+
+    def test_expand_fills_results_in_candidate_order(self):
+        baseline = SystemPrompt(content=BASELINE_TEXT, version=1)
+        candidates = [SystemPrompt(content=text, version=2) for text in [BASELINE_TEXT, REWRITE, REWRITE + " "]]
+        plan = CandidateDeduplicator().plan(BASELINE_TEXT, [c.content for c in candidates])
+
+        results = plan.expand(baseline, candidates, [_comparison(baseline, candidates[1], 8.0)])
+
+        assert [r.candidate.prompt for r in results] == candidates
+        assert results[0].winner == 'tie' and results[0].improvement == 0.0
+        assert results[2].improvement == 8.0
+
+
+@pytest.mark.django_db
+class TestEvaluationReuse:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.asyncio
+    async def test_orchestrator_skips_previously_evaluated_candidates(self):
+        from asgiref.sync import sync_to_async
+
+        prompt_lab = await sync_to_async(PromptLab.objects.create)(name="Dedup lab")
+        baseline = await sync_to_async(SystemPrompt.objects.create)(
+            prompt_lab=prompt_lab, content=BASELINE_TEXT, version=1, is_active=True
+        )
+        candidate = SystemPrompt(prompt_lab=prompt_lab, content=REWRITE, version=2)
+        record = comparison_record(
+            _comparison(baseline, candidate, 9.0), prompt_fingerprint(BASELINE_TEXT),
+            prompt_fingerprint(REWRITE), [7], dataset_key=await sync_to_async(dataset_version)([7])
+        )
+        await sync_to_async(OptimizationRun.objects.create)(
+            prompt_lab=prompt_lab, baseline_prompt=baseline, status='completed',
+            candidate_metrics=[{'candidate_id': 'candidate_1', 'comparison': record}]
+        )
+
+        engine = AsyncMock()
+        orchestrator = OptimizationOrchestrator(llm_provider=None, prompt_rewriter=None, evaluation_engine=engine)
+        results, metrics, _ = await orchestrator._compare_unique_candidates(
+            baseline, [candidate, SystemPrompt(content=BASELINE_TEXT + ".", version=3)],
+            test_case_count=10, dataset_ids=[7], prompt_lab_id=prompt_lab.id
+        )
+
+        engine.compare_prompt_candidates.assert_not_called()
+        assert results[0].improvement == 9.0
+        assert [m['comparison']['source'] for m in metrics] == ['reused', 'duplicate']
+
+    def test_history_requires_same_baseline_and_datasets(self):
+        prompt_lab = PromptLab.objects.create(name="History lab")
+        record = {
+            'fingerprint': 'abc', 'baseline_fingerprint': prompt_fingerprint(BASELINE_TEXT), 'dataset_ids': [1, 2],
+            'dataset_version': dataset_version([1, 2])
+        }
+        OptimizationRun.objects.create(prompt_lab=prompt_lab, status='completed', candidate_metrics=[{'comparison': record}])
+
+        assert 'abc' in load_candidate_history(prompt_lab.id, BASELINE_TEXT, [2, 1])
+        assert load_candidate_history(prompt_lab.id, BASELINE_TEXT, [3]) == {}
+        assert load_candidate_history(prompt_lab.id, REWRITE, [1, 2]) == {}
+
+    def test_dataset_version_changes_when_cases_change(self):
+        dataset = EvaluationDataset.objects.create(name="Support cases")
+        case = EvaluationCase.objects.create(dataset=dataset, input_text="Where is it?", expected_output="It ships today.")
+        version = dataset_version([dataset.id])
+
+        assert dataset_version([dataset.id]) == version
+        case.expected_output = "It ships tomorrow."
+        case.save()
+        edited = dataset_version([dataset.id])
+        assert edited != version
+        EvaluationCase.objects.create(dataset=dataset, input_text="Refund?", expected_output="Approved.")
+        assert dataset_version([dataset.id]) not in (version, edited)
+        assert dataset_version([]) == ''
@@ -0,0 +1,148 @@
+"""
+Tests for multi-fidelity candidate screening
+"""
+import pytest
+from unittest.mock import AsyncMock, Mock
+from django.utils import timezone
+
+from app.services.candidate_screening import (
+    CandidateScreener, ScreeningCase, ScreeningConfig, ScreeningResult, prompt_structure_score,
+    screening_accuracy
+)
+from app.services.evaluation_engine import ComparisonResult, EvaluationResult
+from app.services.optimization_orchestrator import OptimizationOrchestrator
+from core.models import OptimizationRun, PromptLab, SystemPrompt
+
+BASELINE_TEXT = "You are a helpful assistant for {{company}}. Reply politely. Keep answers short and clear."
+CANDIDATES = [
+    "You are a support agent for {{company}}. Greet the customer. Confirm the refund date. Offer further help.",
+    "You are a support agent. Apologize for the delay. Explain the shipping status. Thank the customer.",
+    "You are an assistant for {{company}}. Answer questions. Be friendly and brief in every reply.",
+]
+
+
+def _no_history():
+    index = Mock()
+    index.search.return_value = []
+    return index
+
+
+def _provider(responses):
+    """Responds with a canned reply per system prompt"""
+    async def generate(prompt, system_prompt=None, **kwargs):
+        return responses[system_prompt]
+    provider = Mock()
+    provider.generate = AsyncMock(side_effect=generate)
+    return provider
+
+
+class TestScreeningConfig:
+
+    def test_budget_splits_between_screening_and_full_evaluation(self):
+        config = ScreeningConfig(screening_share=0.2, max_promoted=2)
+
+        assert config.budget(5, 20) == (4, 2)
+        # Little left after screening still promotes one candidate
+        assert ScreeningConfig(screening_share=0.9, max_promoted=3).budget(3, 10) == (9, 1)
+
+    def test_screening_skipped_when_it_saves_nothing(self):
+        screener = CandidateScreener(Mock(), _no_history(), ScreeningConfig(max_promoted=3))
+
+        assert screener.should_screen(4, 20)
+        assert not screener.should_screen(1, 20)
+        assert not screener.should_screen(3, 2)  # Subset would be the whole case set
+        assert not CandidateScreener(Mock(), config=ScreeningConfig(enabled=False)).should_screen(5, 20)
+
+
+def test_structure_score_penalizes_dropped_parameters_and_meta_text():
+    good = prompt_structure_score(CANDIDATES[0], BASELINE_TEXT)
+
+    assert prompt_structure_score(CANDIDATES[1], BASELINE_TEXT) < good
+    assert prompt_structure_score("Here is the improved prompt: " + CANDIDATES[0], BASELINE_TEXT) < good
+    assert prompt_structure_score("Be nice.", BASELINE_TEXT) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_screen_promotes_candidates_with_best_subset_scores():
+    expected = "thanks for reaching out your refund will arrive on monday"
+    provider = _provider({
+        CANDIDATES[0]: "Thanks for reaching out! Your refund will arrive on Monday.",
+        CANDIDATES[1]: "We are sorry about the shipping delay.",
+        CANDIDATES[2]: "Hello.",
+    })
+    screener = CandidateScreener(provider, _no_history(), ScreeningConfig(max_promoted=1, audit_rate=0.0))
+
+    result = await screener.screen(
+        BASELINE_TEXT, CANDIDATES, [ScreeningCase("Where is my refund?", expected)] * 5, full_case_count=10
+    )
+
+    assert result.promoted == [0]
+    assert result.screening_cases == 2
+    assert provider.generate.await_count == 6  # 3 candidates x 2 screening cases
+    assert result.signals[0]['history'] is None
+
+
+def test_accuracy_against_full_evaluation():
+    result = ScreeningResult(
+        scores=[0.9, 0.5, 0.7, 0.1], signals=[{}] * 4, promoted=[0, 2], screening_cases=2, audited=True
+    )
+
+    summary = result.accuracy({0: 0.8, 1: 0.75, 2: 0.7, 3: 0.2})
+
+    assert summary['top1_agreement'] is True
+    assert summary['best_promoted'] is True
+    assert summary['rank_correlation'] == pytest.approx(0.8)
+    assert summary['evaluations_skipped'] == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_orchestrator_fully_evaluates_only_promoted_candidates():
+    baseline = SystemPrompt(content=BASELINE_TEXT, version=1)
+    candidates = [SystemPrompt(content=content, version=i + 2) for i, content in enumerate(CANDIDATES)]
+
+    def evaluation(prompt, score):
+        return EvaluationResult(prompt, score, {}, [], timezone.now(), 10, 0.0)
+
+    engine = AsyncMock()
+    engine.compare_prompt_candidates.return_value = [ComparisonResult(
+        evaluation(baseline, 0.6), evaluation(candidates[0], 0.75), 25.0, 0.01, 'candidate', 0.99
+    )]
+    screener = CandidateScreener(
+        _provider({content: "Thanks, your refund is on its way." for content in CANDIDATES}),
+        _no_history(),
+        ScreeningConfig(max_promoted=1, audit_rate=0.0, structure_weight=1.0)
+    )
+    orchestrator = OptimizationOrchestrator(
+        llm_provider=None, prompt_rewriter=None, evaluation_engine=engine, candidate_screener=screener
+    )
+    orchestrator._load_screening_cases = AsyncMock(return_value=[ScreeningCase("Where is my refund?")] * 3)
+
+    results, metrics, summary = await orchestrator._compare_unique_candidates(
+        baseline, candidates, test_case_count=10
+    )
+
+    assert engine.compare_prompt_candidates.await_args.kwargs['candidates'] == [candidates[0]]
+    assert [m['comparison']['source'] for m in metrics] == ['evaluated', 'screened_out', 'screened_out']
+    assert metrics[0]['comparison']['screening']['promoted'] is True
+    assert results[1].winner == 'tie' and results[1].improvement == 0.0
+    assert summary['evaluations_skipped'] == 2
+    assert summary['top1_agreement'] is True
+
+
+@pytest.mark.django_db
+def test_screening_accuracy_aggregates_recent_runs():
+    prompt_lab = PromptLab.objects.create(name="Screening lab")
+    for top1, best_promoted in [(True, True), (False, None), (True, None)]:
+        OptimizationRun.objects.create(prompt_lab=prompt_lab, status='completed', detailed_metrics={'screening': {
+            'audited': best_promoted is not None, 'top1_agreement': top1, 'best_promoted': best_promoted,
+            'rank_correlation': None, 'evaluations_skipped': 2
+        }})
+
+    accuracy = screening_accuracy(prompt_lab.id)
+
+    assert accuracy['runs'] == 3
+    assert accuracy['audited_runs'] == 1
+    assert accuracy['top1_agreement'] == pytest.approx(2 / 3)
+    assert accuracy['best_promoted_rate'] == 1.0
+    assert accuracy['evaluations_skipped'] == 6
@@ -0,0 +1,135 @@
+"""
+Tests for the incrementally maintained confidence aggregates
+"""
+import pytest
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from app.services.confidence_aggregates import aggregate_for, rebuild_confidence_aggregates, split_history
+from app.services.confidence_calculator import ConfidenceCalculator
+from core.models import ConfidenceAggregate, PromptLab, ReasonRating, UserFeedback
+
+AGGREGATE_FIELDS = [
+    'feedback_count', 'accept_count', 'reject_count', 'edit_count', 'ignore_count',
+    'reasoned_feedback_count', 'reason_length_sum', 'rated_feedback_count',
+    'liked_count', 'disliked_count', 'streak_action', 'streak_length',
+]
+
+
+def _values(prompt_lab):
+    aggregate = aggregate_for(prompt_lab.id)
+    return {name: getattr(aggregate, name) for name in AGGREGATE_FIELDS}
+
+
+@pytest.mark.django_db
+class TestConfidenceAggregates:
+
+    def test_edits_update_totals_and_rebuild_repairs_bypassed_writes(self, prompt_lab, feedback_factory):
+        edited = feedback_factory(prompt_lab, 'edit', likes=["Answers the question"], dislikes=["Too long"])
+        feedback_factory(prompt_lab, 'accept', reason="Good")
+
+        edited.action = 'accept'
+        edited.reason = "Fine after all"
+        edited.save()
+        rating = ReasonRating.objects.get(feedback=edited, liked=False)
+        rating.liked = True
+        rating.save()
+
+        incremental = _values(prompt_lab)
+        assert (incremental['accept_count'], incremental['edit_count']) == (2, 0)
+        assert (incremental['liked_count'], incremental['disliked_count']) == (2, 0)
+        assert incremental['reason_length_sum'] == len("Fine after all") + len("Good")
+
+        UserFeedback.objects.filter(pk=edited.pk).update(action='reject')  # Bypasses signals
+        assert _values(prompt_lab) == incremental
+
+        rebuild_confidence_aggregates([prompt_lab.id])
+        assert (_values(prompt_lab)['accept_count'], _values(prompt_lab)['reject_count']) == (1, 1)
+        assert (_values(prompt_lab)['streak_action'], _values(prompt_lab)['streak_length']) == ('accept', 1)
+
+    def test_signal_maintained_totals(self, prompt_lab, feedback_factory):
+        feedback_factory(prompt_lab, 'reject', reason="Too formal", dislikes=["Formal tone"])
+        feedback_factory(prompt_lab, 'accept', likes=["Friendly", "Short"])
+        feedback_factory(prompt_lab, 'accept', reason="Great")
+        deleted = feedback_factory(prompt_lab, 'edit', dislikes=["Too long"])
+        deleted.delete()
+
+        incremental = _values(prompt_lab)
+        rebuild_confidence_aggregates([prompt_lab.id])
+        rebuilt = _values(prompt_lab)
+
+        assert rebuilt == {
+            'feedback_count': 3, 'accept_count': 2, 'reject_count': 1, 'edit_count': 0, 'ignore_count': 0,
+            'reasoned_feedback_count': 2, 'reason_length_sum': len("Too formal") + len("Great"),
+            'rated_feedback_count': 2, 'liked_count': 2, 'disliked_count': 1,
+            'streak_action': 'accept', 'streak_length': 2,
+        }
+        assert incremental == rebuilt
+
+    def test_deletes_and_edits_recompute_streak(self, prompt_lab, feedback_factory):
+        feedback_factory(prompt_lab, 'reject')
+        first_accept = feedback_factory(prompt_lab, 'accept')
+        last_accept = feedback_factory(prompt_lab, 'accept')
+        assert (_values(prompt_lab)['streak_action'], _values(prompt_lab)['streak_length']) == ('accept', 2)
+
+        last_accept.delete()
+        assert (_values(prompt_lab)['streak_action'], _values(prompt_lab)['streak_length']) == ('accept', 1)
+
+        first_accept.action = 'reject'
+        first_accept.save()
+        assert (_values(prompt_lab)['streak_action'], _values(prompt_lab)['streak_length']) == ('reject', 2)
+
+        first_accept.created_at = timezone.now() - timedelta(days=1)
+        first_accept.save()
+        assert (_values(prompt_lab)['streak_action'], _values(prompt_lab)['streak_length']) == ('reject', 2)
+
+        first_accept.delete()
+        incremental = _values(prompt_lab)
+        rebuild_confidence_aggregates([prompt_lab.id])
+        assert incremental == _values(prompt_lab)
+
+    def test_history_split_uses_hourly_buckets(self, prompt_lab, feedback_factory):
+        early = [feedback_factory(prompt_lab, 'reject') for _ in range(4)]
+        for feedback in early:
+            feedback.created_at = timezone.now() - timedelta(hours=5)
+            feedback.save()
+        for _ in range(4):
+            feedback_factory(prompt_lab, 'accept')
+
+        split = split_history(prompt_lab.id, 0.5)
+
+        assert (split.before_count, split.after_count) == (4, 4)
+        assert split.before['reject'] == 4 and split.before['accept'] == 0
+        assert split.after['accept'] == 4
+        assert ConfidenceCalculator()._calculate_learning_velocity(prompt_lab, aggregate_for(prompt_lab.id)) == 0.9
+
+    def test_confidence_update_does_not_scanfeedback_factory(self, feedback_factory):
+        def queries_for(feedback_count):
+            lab = PromptLab.objects.create(name=f"Lab {feedback_count}")
+            for i in range(feedback_count):
+                action = 'accept' if i % 3 else 'reject'
+                feedback_factory(lab, action, reason="Clear and polite reply", likes=["Polite"])
+            with CaptureQueriesContext(connection) as queries:
+                tracker = ConfidenceCalculator().update_prompt_lab_confidence(lab)
+            return len(queries), tracker
+
+        small, _ = queries_for(5)
+        large, tracker = queries_for(40)
+
+        assert large == small
+        assert tracker.total_feedback_count == 40
+        assert tracker.reasoning_alignment_score == 0.9
+
+    def test_rebuild_command(self, prompt_lab, feedback_factory):
+        feedback_factory(prompt_lab, 'accept', reason="Good")
+        ConfidenceAggregate.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_counters', '--table', 'confidence_aggregates', stdout=out)
+
+        assert 'Rebuilt 1 confidence_aggregates rows' in out.getvalue()
+        assert aggregate_for(prompt_lab.id).feedback_count == 1
@@ -0,0 +1,96 @@
+"""
+Tests for persisted convergence assessments and their invalidation
+"""
+import pytest
+from unittest.mock import patch
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from app.services.convergence_detector import ConvergenceDetector
+from core.models import ConvergenceAssessment, SystemPrompt
+
+
+@pytest.fixture
+def prompt_lab(prompt_lab):
+    """The shared lab after four optimization iterations, with plateauing prompt scores"""
+    prompt_lab.optimization_iterations = 4
+    prompt_lab.total_feedback_collected = 12
+    prompt_lab.save()
+    prompt_lab.prompts.update(performance_score=0.80)
+    for version, score in enumerate([0.81, 0.81, 0.82, 0.82], start=2):
+        SystemPrompt.objects.create(
+            prompt_lab=prompt_lab, content=f"Prompt v{version}", version=version, performance_score=score
+        )
+    return prompt_lab
+
+
+def _assess_spy(detector):
+    return patch.object(detector, 'assess_convergence', wraps=detector.assess_convergence)
+
+
+@pytest.mark.django_db
+class TestConvergenceAssessments:
+
+    def test_assessment_is_stored_and_reused(self, prompt_lab):
+        detector = ConvergenceDetector()
+
+        with _assess_spy(detector) as assess:
+            first = detector.get_assessment(prompt_lab)
+            second = detector.get_assessment(prompt_lab)
+
+        assert assess.call_count == 1
+        assert second == first
+        stored = ConvergenceAssessment.objects.get(prompt_lab=prompt_lab)
+        assert stored.is_current and stored.optimization_iterations == 4
+        assert stored.factors == first['factors']
+
+    def test_new_data_invalidates_current_assessment(self, prompt_lab, feedback_factory):
+        detector = ConvergenceDetector()
+        feedback = feedback_factory(prompt_lab)
+        changes = [
+            lambda: feedback_factory(prompt_lab, 'reject'),
+            lambda: SystemPrompt.objects.create(prompt_lab=prompt_lab, content="v6", version=6, performance_score=0.9),
+        ]
+
+        for change in changes:
+            detector.get_assessment(prompt_lab)
+            change()
+            assert not ConvergenceAssessment.objects.filter(prompt_lab=prompt_lab, is_current=True).exists()
+
+        detector.get_assessment(prompt_lab)
+        prompt_lab.optimization_iterations += 1
+        prompt_lab.save()
+        assert not ConvergenceAssessment.objects.filter(prompt_lab=prompt_lab, is_current=True).exists()
+
+        detector.get_assessment(prompt_lab)
+        feedback.reason = "Reworded"
+        feedback.save()
+        SystemPrompt.objects.create(prompt_lab=prompt_lab, content="Unscored", version=7)
+        assert ConvergenceAssessment.objects.filter(prompt_lab=prompt_lab, is_current=True).count() == 1
+        assert ConvergenceAssessment.objects.filter(prompt_lab=prompt_lab).count() == 4
+
+    def test_refresh_recomputes(self, prompt_lab):
+        detector = ConvergenceDetector()
+        detector.get_assessment(prompt_lab)
+
+        with _assess_spy(detector) as assess:
+            detector.get_assessment(prompt_lab, refresh=True)
+
+        assert assess.call_count == 1
+        assert ConvergenceAssessment.objects.filter(prompt_lab=prompt_lab).count() == 2
+        assert ConvergenceAssessment.objects.filter(prompt_lab=prompt_lab, is_current=True).count() == 1
+
+    def test_history_endpoint_reads_stored_assessments(self, prompt_lab):
+        detector = ConvergenceDetector()
+        detector.get_assessment(prompt_lab)
+        prompt_lab.optimization_iterations = 20
+        prompt_lab.save()
+
+        response = APIClient().get(reverse('convergence-history', kwargs={'prompt_lab_id': prompt_lab.id}))
+
+        assert response.status_code == 200
+        history = response.json()['convergence_history']
+        assert len(history) == 2
+        assert history[0]['is_current'] and history[0]['converged']  # Hard iteration limit
+        assert not history[1]['is_current']
+        assert response.json()['summary']['latest_convergence_state'] is True
@@ -0,0 +1,122 @@
+"""
+Tests for deadline-aware planning of fast optimization runs
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+from app.services.deadline_planner import (
+    BUDGET_SAFETY, Deadline, LatencyProfile, current_deadline, deadline_scope, load_latency_profile,
+    plan_fast_optimization
+)
+from app.services.evaluation_engine import BatchPromptEvaluator, EvaluationTestCase
+from app.services.optimization_orchestrator import OptimizationOrchestrator, OptimizationResult
+from core.models import Email, LLMUsageRecord, SystemPrompt
+
+
+def _test_cases(count):
+    return [
+        EvaluationTestCase(
+            email=Email(subject=f"Subject {i}", body=f"Body {i}", sender="a@example.com"),
+            expected_qualities={},
+            scenario_type="professional",
+            difficulty_level="easy"
+        )
+        for i in range(count)
+    ]
+
+
+class TestPlanning:
+
+    def test_fast_provider_gets_the_full_evaluation(self):
+        fast = LatencyProfile(model="fast", p50_ms=20, p95_ms=50, samples=100)
+
+        plan = plan_fast_optimization(10, fast)
+
+        assert (plan.candidates, plan.test_cases, plan.max_tokens) == (5, 15, 300)
+        assert plan.fits
+
+    def test_slow_provider_plan_fits_budget(self):
+        slow = LatencyProfile(model="slow", p50_ms=2000, p95_ms=3000, tokens_per_second=50, completion_tokens=250, samples=100)
+        scoring = LatencyProfile(model="scorer", p50_ms=200, p95_ms=300, samples=100)
+
+        plan = plan_fast_optimization(20, slow, scoring, max_concurrency=4)
+
+        assert plan.fits
+        assert plan.planned_seconds <= 20 * BUDGET_SAFETY
+        assert plan.candidates * plan.test_cases >= 10
+        assert plan.max_tokens < 300  # Shorter responses buy a useful evaluation
+        assert plan.concurrency == min(2 * plan.candidates, 4)
+
+    def test_budget_too_small_falls_back_to_minimal_plan(self):
+        slow = LatencyProfile(model="slow", p95_ms=5000, samples=100)
+
+        plan = plan_fast_optimization(2, slow)
+
+        assert not plan.fits
+        assert (plan.candidates, plan.test_cases) == (1, 3)
+
+    @pytest.mark.django_db
+    def test_profile_measured_from_recorded_calls(self):
+        for latency in range(100, 1100, 100):
+            LLMUsageRecord.objects.create(
+                task_type='draft_generation', provider='openai', model='gpt-4o-mini',
+                completion_tokens=200, latency_ms=latency
+            )
+        LLMUsageRecord.objects.create(
+            task_type='draft_generation', provider='openai', model='gpt-4o-mini', latency_ms=60000, success=False
+        )
+
+        profile = load_latency_profile('gpt-4o-mini')
+
+        assert profile.samples == 10
+        assert profile.p50_ms == pytest.approx(550)
+        assert profile.p95_ms == pytest.approx(900)
+        assert profile.completion_tokens == 200
+        assert load_latency_profile('unseen-model').p95_ms == LatencyProfile('unseen-model').p95_ms
+
+
+class TestDeadlineEnforcement:
+
+    async def test_evaluation_returns_best_so_far_at_deadline(self):
+        evaluator = BatchPromptEvaluator(Mock())
+
+        async def score_case(prompt, test_case, provider):
+            await asyncio.sleep(0.1)
+            return "reply", {'overall_score': 0.9}
+
+        deadline = Deadline(0.35)
+        with patch.object(evaluator, '_score_case', side_effect=score_case), deadline_scope(deadline):
+            result = await evaluator.evaluate_prompt(SystemPrompt(content="Be brief.", version=1), _test_cases(10), Mock())
+
+        assert 2 <= result.test_cases_used < 10
+        assert result.error_rate == 0.0
+        assert result.performance_score == pytest.approx(0.9)
+        assert deadline.cut_short
+        assert deadline.elapsed() < 0.6
+
+    async def test_fast_optimize_reports_realized_vs_planned(self):
+        orchestrator = OptimizationOrchestrator(
+            llm_provider=Mock(config=Mock(model="fast")), prompt_rewriter=Mock(), evaluation_engine=Mock(scoring_llm_provider=None)
+        )
+        seen = {}
+
+        async def force_optimization(reason, strategy):
+            seen['deadline'] = current_deadline()
+            return OptimizationResult(
+                trigger_reason=reason, baseline_prompt=None, candidate_prompts=[], best_candidate=None,
+                evaluation_results={}, deployed=False, improvement_percentage=0.0, feedback_batch_size=0,
+                optimization_time=None
+            )
+
+        with patch('app.services.optimization_orchestrator.load_latency_profile',
+                   return_value=LatencyProfile(model="fast", p95_ms=50, samples=100)), \
+                patch.object(orchestrator, 'force_optimization', side_effect=force_optimization):
+            result = await orchestrator.fast_optimize(time_budget=10)
+
+        assert seen['deadline'].plan.candidates == 5
+        assert current_deadline() is None
+        report = result.deadline_report
+        assert report['time_budget'] == 10 and report['met_budget']
+        assert report['plan']['test_cases'] == 15
+        assert report['realized_seconds'] < report['planned_seconds']
@@ -0,0 +1,76 @@
+"""
+Tests for the shared feedback, rating and draft signal pipeline
+"""
+import pytest
+from django.db import DatabaseError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from app.services import feedback_signals
+from core.models import (
+    ConfidenceAggregate, DailyMetricsRollup, Draft, DraftReason, FeedbackTriggerCounter, ReasonRating, UserFeedback
+)
+
+
+def _count_queries(write):
+    """Statements run by the write, leaving out the savepoint around each updater"""
+    with CaptureQueriesContext(connection) as queries:
+        write()
+    return len([query for query in queries if 'SAVEPOINT' not in query['sql']])
+
+
+@pytest.mark.django_db
+class TestFeedbackSignals:
+
+    def test_steady_state_writes_use_one_lookup_and_one_update_per_structure(self, prompt_lab, draft_factory):
+        reason = DraftReason.objects.create(text="Too formal", confidence=0.8)
+        feedback = UserFeedback.objects.create(draft=draft_factory(prompt_lab), action='accept')
+        ReasonRating.objects.create(feedback=feedback, reason=reason, liked=True)
+        draft = draft_factory(prompt_lab)
+
+        # Insert, scope lookup, then one UPDATE each for counters, confidence, rollups and convergence
+        assert _count_queries(lambda: UserFeedback.objects.create(draft=draft, action='accept')) == 6
+        feedback = UserFeedback.objects.get(draft=draft)
+        # Insert, scope lookup, counters, first-rating check, confidence
+        assert _count_queries(lambda: ReasonRating.objects.create(feedback=feedback, reason=reason, liked=True)) == 5
+        email = draft.email
+        # Insert, scope lookup, rollups
+        assert _count_queries(
+            lambda: Draft.objects.create(email=email, content="Again", system_prompt=draft.system_prompt)
+        ) == 3
+
+    def test_saves_without_tracked_changes_are_not_dispatched(self, prompt_lab, draft_factory):
+        feedback = UserFeedback.objects.create(draft=draft_factory(prompt_lab), action='accept')
+        feedback.edited_content = "Reworded"
+
+        assert _count_queries(feedback.save) == 1
+
+        feedback.action = 'reject'
+        feedback.save()
+        assert ConfidenceAggregate.objects.get(prompt_lab=prompt_lab).reject_count == 1
+        assert FeedbackTriggerCounter.objects.get(prompt_lab=prompt_lab).reject_count == 1
+        assert DailyMetricsRollup.objects.get(prompt_lab=prompt_lab).reject_count == 1
+
+    def test_failing_updater_does_not_stop_the_rest(self, prompt_lab, draft_factory, monkeypatch):
+        def broken(write):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(feedback_signals, '_feedback_updaters', [broken, *feedback_signals._feedback_updaters])
+
+        UserFeedback.objects.create(draft=draft_factory(prompt_lab), action='accept')
+
+        assert ConfidenceAggregate.objects.get(prompt_lab=prompt_lab).accept_count == 1
+        assert FeedbackTriggerCounter.objects.get(prompt_lab=prompt_lab).accept_count == 1
+
+    def test_failed_update_leaves_callers_transaction_usable(self, prompt_lab, draft_factory, monkeypatch):
+        def failing_write(write):
+            # What a failed ORM update does inside an atomic block
+            with transaction.mark_for_rollback_on_error():
+                raise DatabaseError("deadlock detected")
+
+        monkeypatch.setattr(feedback_signals, '_feedback_updaters', [failing_write, *feedback_signals._feedback_updaters])
+
+        with transaction.atomic():
+            UserFeedback.objects.create(draft=draft_factory(prompt_lab), action='accept')
+            assert UserFeedback.objects.count() == 1
+
+        assert ConfidenceAggregate.objects.get(prompt_lab=prompt_lab).accept_count == 1
@@ -0,0 +1,169 @@
+"""
+Tests for the rolling feedback trigger counters and debounced trigger events
+"""
+import asyncio
+import threading
+import pytest
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import AsyncMock, MagicMock, patch
+from django.core.management import call_command
+from django.utils import timezone
+
+from app.services.background_scheduler import BackgroundOptimizationScheduler, OptimizationScheduler
+from app.services.feedback_trigger_counters import (
+    TriggerEvents, get_trigger_events, rebuild_trigger_counters, trigger_window, trigger_windows
+)
+from app.services.optimization_orchestrator import OptimizationOrchestrator, OptimizationTrigger
+from core.models import Email, FeedbackTriggerCounter, PromptLab, UserFeedback
+
+
+@pytest.mark.django_db
+class TestTriggerCounters:
+
+    def test_counters_follow_feedback_writes(self, prompt_lab, feedback_factory):
+        feedback_factory(prompt_lab, 'reject', dislikes=["Too formal"])
+        feedback_factory(prompt_lab, 'edit', dislikes=["Too formal"], likes=["Addresses the question"])
+        accepted = feedback_factory(prompt_lab, 'accept')
+        feedback_factory(prompt_lab, 'ignore')
+
+        window = trigger_window(prompt_lab.id)
+
+        assert window.feedback_count == 4
+        assert window.negative_ratio == 0.5
+        assert window.factor_dislikes == {"Too formal": 2}
+        assert window.consistent_issues() == ["Too formal"]
+        assert window.average_rating == pytest.approx(1 + 4 / 3)
+
+        accepted.action = 'reject'
+        accepted.save()
+        assert trigger_window(prompt_lab.id).negative_count == 3
+
+        accepted.delete()
+        assert trigger_window(prompt_lab.id).feedback_count == 3
+
+    def test_window_excludes_feedback_moved_out_of_it(self, prompt_lab, feedback_factory):
+        old = feedback_factory(prompt_lab, 'reject', dislikes=["Too long"])
+        feedback_factory(prompt_lab, 'accept')
+
+        old.created_at = timezone.now() - timedelta(hours=30)
+        old.save()
+
+        window = trigger_window(prompt_lab.id, hours=24)
+        assert window.feedback_count == 1
+        assert window.factor_dislikes == {}
+        assert trigger_window(prompt_lab.id, hours=48).factor_dislikes == {"Too long": 1}
+
+    def test_windows_are_per_lab(self, prompt_lab, feedback_factory):
+        other = PromptLab.objects.create(name="Other lab")
+        feedback_factory(prompt_lab, 'reject')
+        feedback_factory(other, 'accept')
+        feedback_factory(other, 'accept')
+
+        windows = trigger_windows([prompt_lab.id, other.id])
+
+        assert windows[prompt_lab.id].feedback_count == 1
+        assert windows[other.id].negative_ratio == 0.0
+        assert trigger_window().feedback_count == 3
+
+    def test_rebuild_matches_incremental_counters(self, prompt_lab, feedback_factory, draft_factory):
+        for action in ['reject', 'accept', 'edit']:
+            feedback_factory(prompt_lab, action, dislikes=["Too formal"], likes=["Friendly"])
+        expected = trigger_window(prompt_lab.id)
+        # Bulk writes bypass the signals
+        UserFeedback.objects.bulk_create([UserFeedback(draft=draft_factory(prompt_lab), action='reject')])
+
+        rebuild_trigger_counters([prompt_lab.id])
+
+        rebuilt = trigger_window(prompt_lab.id)
+        assert rebuilt.feedback_count == expected.feedback_count + 1
+        assert rebuilt.factor_dislikes == expected.factor_dislikes
+        assert rebuilt.reason_likes == expected.reason_likes == 3
+        assert FeedbackTriggerCounter.objects.filter(prompt_lab=prompt_lab).count() == 1
+
+    def test_rebuild_command_only_touches_the_given_lab(self, prompt_lab, feedback_factory):
+        other = PromptLab.objects.create(name="Other lab")
+        feedback_factory(prompt_lab, 'reject')
+        feedback_factory(other, 'accept')
+        FeedbackTriggerCounter.objects.update(feedback_count=0)
+        out = StringIO()
+
+        call_command('rebuild_counters', '--table', 'trigger_counters', '--prompt-lab', str(prompt_lab.id), stdout=out)
+
+        assert 'Rebuilt 1 trigger_counters rows' in out.getvalue()
+        assert trigger_window(prompt_lab.id).feedback_count == 1
+        assert trigger_window(other.id).feedback_count == 0
+
+    def test_scheduler_loads_the_feedback_the_counters_count(self, prompt_lab, feedback_factory, draft_factory):
+        feedback_factory(prompt_lab, 'reject')
+        # Without an email lab, feedback counts toward the draft prompt's lab
+        draft = draft_factory(prompt_lab)
+        Email.objects.filter(pk=draft.email_id).update(prompt_lab=None)
+        UserFeedback.objects.create(draft=draft, action='edit')
+        scheduler = BackgroundOptimizationScheduler()
+
+        with patch.object(scheduler, '_run_queued', return_value=False) as run_queued:
+            scheduler._run_prompt_labs([prompt_lab])
+
+        feedback_list = run_queued.call_args.args[1]
+        assert len(feedback_list) == trigger_window(prompt_lab.id).feedback_count == 2
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_orchestrator_trigger_check_reads_counters(feedback_factory):
+    from asgiref.sync import sync_to_async
+
+    lab = await sync_to_async(PromptLab.objects.create)(name="Counter lab")
+    for action in ['reject', 'reject', 'accept', 'accept', 'accept']:
+        await sync_to_async(feedback_factory)(lab, action)
+    orchestrator = OptimizationOrchestrator(
+        llm_provider=None, prompt_rewriter=None, evaluation_engine=None,
+        trigger_config=OptimizationTrigger(min_feedback_count=5, min_negative_feedback_ratio=0.4)
+    )
+
+    analysis = await orchestrator._analyze_feedback_for_triggers()
+
+    assert analysis['should_trigger'] is True
+    assert analysis['negative_feedback_ratio'] == 0.4
+    assert len(analysis['feedback_batch']) == 5
+
+
+def test_trigger_events_are_debounced():
+    events = TriggerEvents(debounce_seconds=0.05, max_delay_seconds=1.0)
+    fired = []
+    done = threading.Event()
+
+    def subscriber(lab_id):
+        fired.append(lab_id)
+        done.set()
+
+    assert not events.push("lab")  # No subscribers, nothing scheduled
+    events.subscribe(subscriber)
+    for _ in range(5):
+        events.push("lab")
+
+    assert done.wait(1.0)
+    assert fired == ["lab"]
+
+
+async def test_event_driven_scheduler_wakes_before_interval():
+    scheduler = OptimizationScheduler(check_interval_minutes=60, event_driven=True)
+    scheduler.orchestrator = MagicMock(check_and_trigger_optimization=AsyncMock(return_value=None))
+    events = get_trigger_events()
+    events.debounce_seconds = 0.01
+    try:
+        await scheduler.start()
+        await asyncio.sleep(0.01)
+        assert scheduler._check_count == 1
+
+        events.push("lab")
+        for _ in range(100):
+            if scheduler._check_count == 2:
+                break
+            await asyncio.sleep(0.01)
+
+        assert scheduler._check_count == 2
+        assert scheduler._event_wakeups == 1
+    finally:
+        await scheduler.stop()
+        events.debounce_seconds = 30.0
@@ -0,0 +1,90 @@
+"""
+Tests for the per-assessment lab snapshot used by convergence and compute decisions
+"""
+import numpy as np
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from app.services.compute_optimizer import ComputeOptimizer
+from app.services.convergence_detector import ConvergenceDetector
+from app.services.lab_snapshot import LabSnapshot
+from core.models import Draft, Email, PromptLab, SystemPrompt, UserFeedback
+
+
+def _lab(scores, actions=(), iterations=6):
+    lab = PromptLab.objects.create(name="Snapshot lab", optimization_iterations=iterations, total_feedback_collected=len(actions))
+    prompts = [
+        SystemPrompt.objects.create(prompt_lab=lab, content=f"Prompt v{version}", version=version, performance_score=score)
+        for version, score in enumerate(scores, start=1)
+    ]
+    for action in actions:
+        email = Email.objects.create(prompt_lab=lab, subject="Order", body="Where is it?", sender="a@example.com")
+        draft = Draft.objects.create(email=email, content="It ships today.", system_prompt=prompts[-1])
+        UserFeedback.objects.create(draft=draft, action=action)
+    return lab
+
+
+def _snapshot(scores, actions=()):
+    return LabSnapshot(prompt_lab=None, scores=np.array(scores, dtype=np.float64), actions=np.array(actions, dtype=object))
+
+
+@pytest.mark.django_db
+def test_snapshot_loads_latest_scores_and_actions_newest_first():
+    lab = _lab([0.5, 0.6, 0.7, 0.8, 0.85, 0.9], ['reject'] * 3 + ['accept'] * 14)
+    SystemPrompt.objects.create(prompt_lab=lab, content="Unscored", version=7)
+
+    with CaptureQueriesContext(connection) as queries:
+        snapshot = ConvergenceDetector().load_snapshot(lab)
+
+    assert len(queries) == 2
+    assert snapshot.scores.tolist() == [0.9, 0.85, 0.8, 0.7, 0.6]
+    assert len(snapshot.actions) == 15 and set(snapshot.actions[:14]) == {'accept'}
+
+
+def test_vectorized_score_math():
+    snapshot = _snapshot([0.82, 0.83, 0.84, 0.86, 0.90])
+
+    assert snapshot.score_range(5) == pytest.approx(0.08)
+    assert snapshot.score_improvement(5) == pytest.approx(-0.08)
+    assert snapshot.score_slope(5) == pytest.approx(-0.019)
+    assert snapshot.strictly_declining(3)
+    assert not _snapshot([0.82, 0.84, 0.83]).strictly_declining(3)
+    assert snapshot.recent_scores(6) is None and snapshot.score_range(6) == 0.0
+
+
+def test_vectorized_feedback_math():
+    snapshot = _snapshot([], ['accept'] * 10 + ['edit'] * 3 + ['reject'] * 2)
+
+    assert snapshot.action_consistency(15) == pytest.approx(10 / 15)
+    assert snapshot.action_ratio(15, 'accept') == pytest.approx(10 / 15)
+    assert snapshot.action_ratio(16, 'accept') == 0.0
+
+
+@pytest.mark.django_db
+def test_assessment_reads_scores_and_feedback_once():
+    lab = _lab([0.80, 0.81, 0.81, 0.82, 0.82], ['accept'] * 15)
+
+    with CaptureQueriesContext(connection) as queries:
+        assessment = ConvergenceDetector().assess_convergence(lab)
+
+    history_queries = [
+        query['sql'] for query in queries
+        if 'core_systemprompt"."performance_score' in query['sql'] or 'FROM "core_userfeedback"' in query['sql']
+    ]
+    assert len(history_queries) == 2
+    assert 'error' not in assessment
+
+
+@pytest.mark.django_db
+def test_roi_uses_snapshot_scores():
+    lab = _lab([0.70, 0.72, 0.75, 0.80])
+    snapshot = LabSnapshot.load(lab)
+
+    with CaptureQueriesContext(connection) as queries:
+        roi = ComputeOptimizer()._calculate_optimization_roi(lab, snapshot)
+
+    assert len(queries) == 0
+    assert roi['recent_improvement_rate'] == pytest.approx(0.05 / 0.75)
+    assert roi['improvement_trend'] == pytest.approx((0.80 + 0.75) / 2 - (0.72 + 0.70) / 2)
+    assert roi['latest_score'] == 0.80
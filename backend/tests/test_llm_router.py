@@ -0,0 +1,164 @@
+"""
+Tests for the per-task LLM router
+Ensures each task type resolves its own provider chain, limits and fallbacks
+"""
+import asyncio
+from dataclasses import replace
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from asgiref.sync import sync_to_async
+
+from app.services.llm_router import LLMRouter, RoutedLLMProvider, TaskRoute, TaskType, parse_chain
+from app.services.unified_llm_provider import LLMConfig, MockProvider
+from core.models import PromptLab
+
+
+def make_provider(name, response=None, error=None, delay=0):
+    provider = MagicMock()
+    provider.config = LLMConfig(provider='mock', model=name)
+
+    async def generate(**kwargs):
+        if delay:
+            await asyncio.sleep(delay)
+        if error:
+            raise error
+        return response
+
+    provider.generate = AsyncMock(side_effect=generate)
+    return provider
+
+
+class TestRouteResolution:
+    """Route configuration from environment and prompt lab overrides"""
+
+    def test_unrouted_task_uses_global_provider_with_task_limits(self):
+        router = LLMRouter(environ={'LLM_PROVIDER': 'mock'})
+
+        route = router.get_route(TaskType.SCORING)
+
+        assert [c.provider for c in route.chain] == ['mock']
+        assert route.max_tokens == 50
+        assert route.temperature == 0.1
+
+    def test_environment_chain_and_limits(self):
+        router = LLMRouter(environ={
+            'LLM_PROVIDER': 'mock',
+            'LLM_ROUTE_REWRITING': 'openai:gpt-4o,ollama:llama3.2:3b',
+            'LLM_ROUTE_REWRITING_MAX_TOKENS': '800',
+            'LLM_ROUTE_REWRITING_MAX_CONCURRENCY': '1',
+        })
+
+        route = router.get_route(TaskType.REWRITING)
+
+        assert route.describe()['chain'] == ['openai:gpt-4o', 'ollama:llama3.2:3b']
+        assert route.max_tokens == 800
+        assert route.max_concurrency == 1
+
+    def test_parse_chain_keeps_ollama_tags(self):
+        chain = parse_chain('ollama:llama3.2:1b, mock')
+
+        assert chain[0].model == 'llama3.2:1b'
+        assert chain[1].model == 'mock-model'
+
+    def test_unknown_task_type_rejected(self):
+        with pytest.raises(ValueError):
+            LLMRouter(environ={}).get_route('translation')
+
+    @pytest.mark.django_db
+    def test_prompt_lab_override(self):
+        prompt_lab = PromptLab.objects.create(
+            name="Routing Lab",
+            llm_routing={'similarity': {'chain': ['mock:tiny'], 'timeout': 5}}
+        )
+        router = LLMRouter(environ={'LLM_PROVIDER': 'mock'})
+
+        by_instance = router.get_route(TaskType.SIMILARITY, prompt_lab)
+        by_id = router.get_route(TaskType.SIMILARITY, prompt_lab.id)
+        untouched = router.get_route(TaskType.REWRITING, prompt_lab)
+
+        assert by_instance.describe()['chain'] == ['mock:tiny']
+        assert by_id.timeout == 5.0
+        assert untouched.describe()['chain'] == ['mock:mock-model']
+
+    def test_get_provider_builds_routed_provider(self):
+        router = LLMRouter(environ={'LLM_PROVIDER': 'mock', 'LLM_ROUTE_SCORING': 'mock:fast'})
+
+        provider = router.get_provider(TaskType.SCORING)
+
+        assert isinstance(provider, RoutedLLMProvider)
+        assert isinstance(provider.primary, MockProvider)
+        assert provider.config.model == 'fast'
+
+
+class TestRoutedProvider:
+    """Fallback, timeout and concurrency behaviour"""
+
+    @pytest.mark.asyncio
+    async def test_falls_back_on_error_response(self):
+        router = LLMRouter(environ={})
+        route = TaskRoute(task_type=TaskType.SCORING, max_tokens=50, timeout=1)
+        primary = make_provider('primary', response="Ollama Error: connection refused")
+        fallback = make_provider('fallback', response="ok")
+
+        provider = RoutedLLMProvider(route, [primary, fallback], router)
+        result = await provider.generate("score this")
+
+        assert result == "ok"
+        assert fallback.generate.call_args.kwargs['max_tokens'] == 50
+
+    @pytest.mark.asyncio
+    async def test_timeout_moves_provider_behind_fallback(self):
+        router = LLMRouter(environ={})
+        route = TaskRoute(task_type=TaskType.SIMILARITY, timeout=0.05)
+        slow = make_provider('slow', response="late", delay=1)
+        fast = make_provider('fast', response="fast")
+
+        provider = RoutedLLMProvider(route, [slow, fast], router)
+        assert await provider.generate("first") == "fast"
+
+        # The slow provider is cooling down, so the next call skips it
+        assert await provider.generate("second") == "fast"
+        assert slow.generate.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_all_providers_failing_raises(self):
+        router = LLMRouter(environ={})
+        route = TaskRoute(task_type=TaskType.REWRITING, timeout=1)
+        broken = make_provider('broken', error=ConnectionError("down"))
+
+        provider = RoutedLLMProvider(route, [broken], router)
+        with pytest.raises(RuntimeError):
+            await provider.generate("rewrite")
+
+    @pytest.mark.asyncio
+    async def test_max_concurrency_ceiling(self):
+        router = LLMRouter(environ={})
+        route = TaskRoute(task_type=TaskType.SCORING, timeout=5, max_concurrency=2)
+        in_flight = 0
+        peak = 0
+
+        async def generate(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return "done"
+
+        backend = make_provider('backend')
+        backend.generate = AsyncMock(side_effect=generate)
+
+        provider = RoutedLLMProvider(route, [backend], router)
+        await asyncio.gather(*[provider.generate(f"p{i}") for i in range(6)])
+
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_lab_concurrency_override_gets_its_own_limit(self):
+        router = LLMRouter(environ={})
+        default = TaskRoute(task_type=TaskType.SCORING, timeout=5, max_concurrency=2)
+        override = replace(default, max_concurrency=5)
+
+        assert router.concurrency_slot(default) is router.concurrency_slot(replace(default))
+        assert router.concurrency_slot(override) is not router.concurrency_slot(default)
+        assert router.concurrency_slot(override)._value == 5
@@ -0,0 +1,128 @@
+"""
+Tests for LLM usage accounting
+Ensures provider calls produce usage records that aggregate per run and prompt lab
+"""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from app.services.llm_router import LLMRouter, TaskType
+from app.services.llm_usage import track_llm_usage, calculate_cost, get_prompt_lab_usage
+from app.services.compute_optimizer import ComputeOptimizer
+from app.services.unified_llm_provider import LLMConfig, MockProvider, OpenAIProvider
+from core.models import PromptLab, SystemPrompt, OptimizationRun, LLMUsageRecord
+
+
+def make_openai_provider(prompt_tokens, completion_tokens):
+    provider = OpenAIProvider.__new__(OpenAIProvider)
+    provider.config = LLMConfig(provider='openai', model='gpt-4o-mini')
+    response = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=" Hello there "))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    )
+    provider.client = MagicMock()
+    provider.client.chat.completions.create = AsyncMock(return_value=response)
+    return provider
+
+
+class TestUsageRecording:
+    """Provider calls emit usage records to active trackers"""
+
+    @pytest.mark.asyncio
+    async def test_reported_usage_is_recorded_with_cost(self):
+        provider = make_openai_provider(prompt_tokens=1000, completion_tokens=500)
+
+        with track_llm_usage() as usage:
+            await provider.generate("Say hello")
+
+        record = usage.records[0]
+        assert record.prompt_tokens == 1000
+        assert record.completion_tokens == 500
+        assert record.estimated is False
+        assert record.cost_usd == pytest.approx(calculate_cost('openai', 'gpt-4o-mini', 1000, 500))
+        assert record.latency_ms >= 0
+
+    @pytest.mark.asyncio
+    async def test_routed_calls_are_labelled_with_task_type(self):
+        router = LLMRouter(environ={'LLM_PROVIDER': 'mock'})
+        provider = router.get_provider(TaskType.SCORING)
+
+        with track_llm_usage() as usage:
+            await provider.generate("Rate this")
+
+        summary = usage.summary()
+        assert summary['calls'] == 1
+        assert summary['estimated_calls'] == 1
+        assert list(summary['by_task']) == ['scoring']
+
+    @pytest.mark.asyncio
+    async def test_calls_outside_a_scope_are_not_tracked(self):
+        with track_llm_usage() as usage:
+            pass
+        await MockProvider(LLMConfig(provider='mock', model='mock-model')).generate("hello")
+
+        assert usage.records == []
+
+    def test_local_providers_are_free(self):
+        assert calculate_cost('ollama', 'llama3.2:3b', 10000, 10000) == 0.0
+        assert calculate_cost('openai', 'gpt-4o-mini-2024-07-18', 1_000_000, 0) == pytest.approx(0.15)
+
+
+@pytest.mark.django_db
+class TestUsageAggregation:
+    """Persisted usage aggregates per optimization run and prompt lab"""
+
+    def setup_method(self):
+        self.prompt_lab = PromptLab.objects.create(name="Usage Lab")
+        self.prompt = SystemPrompt.objects.create(
+            prompt_lab=self.prompt_lab, content="You are helpful.", version=1, is_active=True
+        )
+        self.run = OptimizationRun.objects.create(prompt_lab=self.prompt_lab, baseline_prompt=self.prompt)
+
+    def _record_calls(self, count, prompt_tokens=1000, completion_tokens=1000):
+        provider = make_openai_provider(prompt_tokens, completion_tokens)
+        from asgiref.sync import async_to_sync
+
+        with track_llm_usage(prompt_lab_id=self.prompt_lab.id, optimization_run_id=self.run.id) as usage:
+            for _ in range(count):
+                async_to_sync(provider.generate)("Improve this prompt")
+        usage.persist()
+        return usage
+
+    def test_nested_scopes_persist_each_call_once(self):
+        with track_llm_usage(prompt_lab_id=self.prompt_lab.id, optimization_run_id=self.run.id) as outer:
+            inner_usage = self._record_calls(2)
+        written = outer.persist()
+
+        assert written == 0  # Already stored by the inner scope
+        assert LLMUsageRecord.objects.filter(optimization_run=self.run).count() == 2
+        assert len(outer.records) == 2
+        assert inner_usage.summary()['total_tokens'] == 4000
+
+    def test_prompt_lab_usage_and_measured_cost_estimate(self):
+        self._record_calls(3)
+
+        usage = get_prompt_lab_usage(self.prompt_lab)
+        estimate = ComputeOptimizer().estimate_optimization_cost(self.prompt_lab)
+
+        assert usage['calls'] == 3
+        assert usage['optimization_runs'] == 1
+        assert usage['total_cost_usd'] == pytest.approx(3 * calculate_cost('openai', 'gpt-4o-mini', 1000, 1000))
+        assert estimate['source'] == 'measured'
+        assert estimate['total_cost'] == pytest.approx(usage['total_cost_usd'], abs=1e-6)
+
+    def test_estimate_falls_back_without_usage(self):
+        estimate = ComputeOptimizer().estimate_optimization_cost(self.prompt_lab)
+
+        assert estimate['source'] == 'estimated'
+
+    def test_compute_cost_endpoint_exposes_measured_usage(self):
+        self._record_calls(2)
+
+        response = APIClient().get(reverse('prompt-lab-compute-cost', kwargs={'prompt_lab_id': self.prompt_lab.id}))
+
+        assert response.status_code == 200
+        assert response.data['historical_costs']['source'] == 'measured'
+        assert response.data['measured_usage']['calls'] == 2
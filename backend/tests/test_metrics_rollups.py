@@ -0,0 +1,98 @@
+"""
+Tests for the incrementally maintained daily metrics rollups
+"""
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from app.services.metrics_rollups import rebuild_metrics_rollups, rollup_day, rollup_sums, rollups
+from core.models import DailyMetricsRollup, OptimizationRun, SystemPrompt
+
+
+def _snapshot():
+    return sorted(
+        DailyMetricsRollup.objects.values_list(
+            'prompt_lab_id', 'day', 'scenario_type', 'feedback_count', 'accept_count', 'reject_count',
+            'edit_count', 'ignore_count', 'draft_count', 'optimization_count', 'optimization_success_count',
+            'improvement_sum'
+        ),
+        key=str
+    )
+
+
+@pytest.mark.django_db
+class TestMetricsRollups:
+
+    def test_incremental_rollups_match_rebuild(self, prompt_lab, feedback_factory):
+        for days_ago, action, scenario in [(0, 'accept', 'professional'), (0, 'reject', 'casual'),
+                                           (1, 'edit', 'professional'), (3, 'accept', 'professional')]:
+            feedback_factory(
+                prompt_lab, action, scenario_type=scenario, created_at=timezone.now() - timedelta(days=days_ago)
+            )
+        OptimizationRun.objects.create(prompt_lab=prompt_lab, status='failed')
+        incremental = _snapshot()
+
+        rebuild_metrics_rollups()
+
+        assert _snapshot() == incremental
+        today = rollups(rollup_day(timezone.now()), prompt_lab.id).aggregate(**rollup_sums())
+        assert (today['feedback_count'], today['accept_count'], today['reject_count']) == (2, 1, 1)
+        assert (today['draft_count'], today['optimization_count']) == (2, 1)
+
+    def test_edits_and_deletes_move_counts(self, prompt_lab, feedback_factory):
+        feedback = feedback_factory(prompt_lab, 'accept')
+        feedback.action = 'reject'
+        feedback.save()
+        feedback.created_at -= timedelta(days=2)
+        feedback.save()
+        feedback_factory(prompt_lab, 'edit').delete()
+        incremental = _snapshot()
+
+        rebuild_metrics_rollups()
+
+        assert _snapshot() == incremental
+        totals = rollups(prompt_lab_id=prompt_lab.id).aggregate(**rollup_sums())
+        assert (totals['feedback_count'], totals['accept_count'], totals['reject_count']) == (1, 0, 1)
+
+    def test_run_status_transitions(self, prompt_lab):
+        run = OptimizationRun.objects.create(prompt_lab=prompt_lab, status='running')
+        run.status = 'completed'
+        run.new_prompt = SystemPrompt.objects.create(prompt_lab=prompt_lab, content="Prompt v2", version=2)
+        run.performance_improvement = 8.0
+        run.save()
+        OptimizationRun.objects.create(prompt_lab=prompt_lab, status='completed', new_prompt=run.new_prompt,
+                                       performance_improvement=4.0).delete()
+
+        row = DailyMetricsRollup.objects.get(prompt_lab=prompt_lab, scenario_type='')
+        assert (row.optimization_count, row.optimization_success_count, row.improvement_sum) == (1, 1, 8.0)
+        assert row.average_improvement == 8.0
+
+    def test_rebuild_command(self, prompt_lab, feedback_factory):
+        feedback_factory(prompt_lab, 'accept')
+        feedback_factory(prompt_lab, 'ignore', created_at=timezone.now() - timedelta(days=1))
+        expected = _snapshot()
+        DailyMetricsRollup.objects.update(feedback_count=0, accept_count=0)
+
+        out = StringIO()
+        call_command('rebuild_counters', '--table', 'metrics_rollups', '--prompt-lab', str(prompt_lab.id), stdout=out)
+
+        assert 'Rebuilt 2 metrics_rollups rows' in out.getvalue()
+        assert _snapshot() == expected
+
+    def test_stats_read_rollups_instead_of_feedback(self, prompt_lab, feedback_factory):
+        for action in ['accept', 'accept', 'reject', 'edit']:
+            feedback_factory(prompt_lab, action)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(f'/api/prompt-labs/{prompt_lab.id}/stats/')
+
+        assert response.status_code == 200
+        assert response.json()['feedback']['by_action'] == {'accept': 2, 'reject': 1, 'edit': 1, 'ignore': 0}
+        assert response.json()['drafts']['total_generated'] == 4
+        assert not any('core_userfeedback' in query['sql'] for query in queries)
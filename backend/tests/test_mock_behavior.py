@@ -0,0 +1,88 @@
+"""
+Tests for MockProvider latency and failure injection
+Ensures load profiles are applied and selectable from the environment
+"""
+import asyncio
+import json
+import time
+import pytest
+
+from app.services.mock_behavior import MockBehavior, MockLoadSimulator, MockProviderError, load_latency_trace
+from app.services.unified_llm_provider import LLMConfig, MockProvider
+
+CONFIG = LLMConfig(provider='mock', model='mock-model')
+
+
+class TestMockBehavior:
+    """Latency, failures and concurrency ceiling"""
+
+    @pytest.mark.asyncio
+    async def test_default_mock_answers_instantly(self):
+        provider = MockProvider(CONFIG, MockBehavior())
+
+        start = time.perf_counter()
+        await provider.generate("hello")
+
+        assert provider.load is None
+        assert time.perf_counter() - start < 0.05
+
+    @pytest.mark.asyncio
+    async def test_fixed_latency_and_token_rate(self):
+        provider = MockProvider(CONFIG, MockBehavior(latency_mode='fixed', latency_ms=40, tokens_per_second=1000))
+
+        start = time.perf_counter()
+        response = await provider.generate("hello")
+
+        # 40ms base plus one millisecond per estimated completion token
+        assert response.startswith("Mock response")
+        assert time.perf_counter() - start >= 0.04
+
+    def test_lognormal_latency_is_seeded(self):
+        behavior = MockBehavior(latency_mode='lognormal', latency_ms=200, latency_sigma=0.8, seed=7)
+
+        first = MockLoadSimulator(behavior).sample_latency_seconds()
+        sim = MockLoadSimulator(behavior)
+        samples = [sim.sample_latency_seconds() for _ in range(200)]
+
+        assert samples[0] == first
+        assert 0.1 < sorted(samples)[100] < 0.4  # Median near 200ms
+
+    def test_trace_latencies(self, tmp_path):
+        trace = tmp_path / "latencies.json"
+        trace.write_text(json.dumps([120, 340]))
+
+        sim = MockLoadSimulator(MockBehavior(latency_mode='trace', latency_trace=load_latency_trace(str(trace))))
+
+        assert sim.sample_latency_seconds() in (0.12, 0.34)
+
+    @pytest.mark.asyncio
+    async def test_error_and_timeout_injection(self):
+        failing = MockProvider(CONFIG, MockBehavior(error_rate=1.0))
+        hanging = MockProvider(CONFIG, MockBehavior(timeout_rate=1.0, timeout_seconds=0.01))
+
+        with pytest.raises(MockProviderError):
+            await failing.generate("hello")
+        with pytest.raises(asyncio.TimeoutError):
+            await hanging.get_log_probabilities("hello there")
+
+    @pytest.mark.asyncio
+    async def test_max_concurrency_ceiling_serializes_calls(self):
+        provider = MockProvider(CONFIG, MockBehavior(latency_mode='fixed', latency_ms=30, max_concurrency=1))
+
+        start = time.perf_counter()
+        await asyncio.gather(*[provider.generate(f"prompt {i}") for i in range(4)])
+
+        assert time.perf_counter() - start >= 0.12
+
+    def test_behavior_selected_from_environment(self, monkeypatch):
+        monkeypatch.setenv('MOCK_LLM_LATENCY', 'lognormal')
+        monkeypatch.setenv('MOCK_LLM_LATENCY_MS', '800')
+        monkeypatch.setenv('MOCK_LLM_ERROR_RATE', '0.05')
+        monkeypatch.setenv('MOCK_LLM_MAX_CONCURRENCY', '1')
+
+        provider = MockProvider(CONFIG)
+
+        assert provider.behavior.latency_mode == 'lognormal'
+        assert provider.behavior.latency_ms == 800
+        assert provider.behavior.error_rate == 0.05
+        assert provider.load is not None
@@ -0,0 +1,136 @@
+"""
+Tests for warm-starting optimization cycles from persisted candidate history
+"""
+import pytest
+from asgiref.sync import sync_to_async
+from unittest.mock import AsyncMock
+
+from app.services.candidate_dedup import dataset_version, load_candidate_history, prompt_fingerprint
+from app.services.optimization_history import OptimizationHistory
+from app.services.optimization_orchestrator import OptimizationOrchestrator
+from app.services.prompt_rewriter import LLMBasedPromptRewriter, RewriteCandidate, RewriteContext
+from core.models import EvaluationCase, EvaluationDataset, OptimizationRun, PromptLab, SystemPrompt
+
+BASELINE_V1 = "You are a helpful email assistant. Reply politely."
+BASELINE_V2 = "You are a helpful email assistant. Reply politely and briefly."
+WINNER = "You are a support agent. Greet the customer and confirm the next step."
+LOSER = "Reply."
+
+
+def _entry(content, baseline, score, baseline_score, winner, dataset_ids=(1,), source='evaluated', stored=None):
+    return {
+        'prompt_content': stored if stored is not None else content,
+        'comparison': {
+            'fingerprint': prompt_fingerprint(content),
+            'baseline_fingerprint': prompt_fingerprint(baseline),
+            'dataset_ids': list(dataset_ids),
+            'dataset_version': dataset_version(list(dataset_ids)),
+            'source': source,
+            'baseline_score': baseline_score,
+            'candidate_score': score,
+            'improvement': (score - baseline_score) / baseline_score * 100,
+            'p_value': 0.01,
+            'winner': winner,
+            'confidence_level': 0.99,
+            'test_cases_used': 30,
+            'error_rate': 0.0,
+            'metrics': {},
+        }
+    }
+
+
+def _run(lab, *entries):
+    return OptimizationRun.objects.create(prompt_lab=lab, status='completed', candidate_metrics=list(entries))
+
+
+@pytest.mark.django_db
+class TestOptimizationHistory:
+
+    def test_scores_rebased_when_only_the_baseline_changed(self):
+        lab = PromptLab.objects.create(name="History lab")
+        # Run 1: V1 baseline, V2 won. Run 2 scored the winner against V1 too.
+        _run(lab, _entry(BASELINE_V2, BASELINE_V1, 0.7, 0.5, 'candidate'))
+        _run(lab, _entry(WINNER, BASELINE_V1, 0.9, 0.5, 'candidate'))
+
+        history = load_candidate_history(lab.id, BASELINE_V2, [1])
+
+        record = history[prompt_fingerprint(WINNER)]
+        assert record['rebased'] is True
+        assert record['baseline_fingerprint'] == prompt_fingerprint(BASELINE_V2)
+        assert record['baseline_score'] == 0.7
+        assert record['improvement'] == pytest.approx((0.9 - 0.7) / 0.7 * 100)
+        assert prompt_fingerprint(BASELINE_V2) not in history
+        # Different datasets are never reused
+        assert load_candidate_history(lab.id, BASELINE_V2, [2]) == {}
+
+    def test_scores_not_reused_after_dataset_cases_change(self):
+        lab = PromptLab.objects.create(name="History lab")
+        dataset = EvaluationDataset.objects.create(prompt_lab=lab, name="Support cases")
+        case = EvaluationCase.objects.create(dataset=dataset, input_text="Where is it?", expected_output="Today.")
+        _run(lab, _entry(WINNER, BASELINE_V1, 0.9, 0.5, 'candidate', dataset_ids=[dataset.id]))
+        assert prompt_fingerprint(WINNER) in load_candidate_history(lab.id, BASELINE_V1, [dataset.id])
+
+        case.expected_output = "Tomorrow."
+        case.save()
+
+        assert load_candidate_history(lab.id, BASELINE_V1, [dataset.id]) == {}
+
+    def test_losers_and_contenders(self):
+        lab = PromptLab.objects.create(name="History lab")
+        truncated = WINNER + " Always sign off warmly."
+        _run(
+            lab,
+            _entry(WINNER, BASELINE_V1, 0.8, 0.5, 'candidate'),
+            _entry(truncated, BASELINE_V1, 0.95, 0.5, 'candidate', stored=truncated[:20]),
+            _entry(LOSER, BASELINE_V1, 0.2, 0.5, 'baseline'),
+            _entry("Screened out.", BASELINE_V1, 0.0, 0.5, 'baseline', source='screened_out'),
+        )
+
+        history = OptimizationHistory.load(lab.id)
+
+        assert [o.content for o in history.losers()] == [LOSER]
+        assert [o.content for o in history.contenders(BASELINE_V1)] == [WINNER]
+        assert history.contenders(BASELINE_V1, exclude={prompt_fingerprint(WINNER)}) == []
+        assert history.contenders(WINNER) == []
+
+    def test_trajectory_is_ascending_by_score(self):
+        lab = PromptLab.objects.create(name="History lab")
+        _run(lab, _entry(WINNER, BASELINE_V1, 0.8, 0.5, 'candidate'), _entry(LOSER, BASELINE_V1, 0.2, 0.5, 'baseline'))
+        _run(lab, _entry(BASELINE_V2, BASELINE_V1, 0.6, 0.5, 'candidate'))
+
+        trajectory = OptimizationHistory.load(lab.id).trajectory(limit=2)
+
+        assert [item['prompt'] for item in trajectory] == [BASELINE_V2, WINNER]
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_orchestrator_reenters_undeployed_winners():
+    lab = await sync_to_async(PromptLab.objects.create)(name="History lab")
+    await sync_to_async(lambda: _run(lab, _entry(WINNER, BASELINE_V1, 0.8, 0.5, 'candidate')))()
+    baseline = await sync_to_async(SystemPrompt.objects.create)(prompt_lab=lab, content=BASELINE_V1, version=1)
+    orchestrator = OptimizationOrchestrator(llm_provider=None, prompt_rewriter=None, evaluation_engine=None)
+
+    reentered = await orchestrator._reentered_candidates(baseline, [])
+    already_generated = await orchestrator._reentered_candidates(
+        baseline, [RewriteCandidate(WINNER, 0.7, 0.5, "generated")]
+    )
+
+    assert [c.content for c in reentered] == [WINNER]
+    assert 'Re-entered' in reentered[0].reasoning
+    assert already_generated == []
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_mini_opro_prompt_includes_rejected_rewrites():
+    lab = await sync_to_async(PromptLab.objects.create)(name="History lab")
+    await sync_to_async(lambda: _run(lab, _entry(LOSER, BASELINE_V1, 0.2, 0.5, 'baseline')))()
+    baseline = await sync_to_async(SystemPrompt.objects.create)(prompt_lab=lab, content=BASELINE_V1, version=1)
+    llm = AsyncMock()
+    llm.generate.return_value = WINNER
+    rewriter = LLMBasedPromptRewriter(llm, AsyncMock(), AsyncMock(), None)
+
+    await rewriter.rewrite_prompt(RewriteContext("support", baseline, [], {}, {}), mode='mini_opro')
+
+    meta_prompt = llm.generate.await_args_list[0].args[0]
+    assert f'"{LOSER}"' in meta_prompt
+    assert 'performed worse' in meta_prompt
@@ -0,0 +1,124 @@
+"""
+Tests for the fair-share optimization queue
+"""
+import threading
+import pytest
+from unittest.mock import Mock
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from app.services.optimization_queue import AdmissionRejected, OptimizationQueue, QueueLimits
+
+
+def _queue(budget=100, weights=None, **limits):
+    compute_optimizer = Mock()
+    compute_optimizer.get_compute_budget_status.return_value = {'budget_remaining': budget}
+    return OptimizationQueue(
+        QueueLimits(**limits), compute_optimizer=compute_optimizer,
+        lab_weight=lambda lab_id: (weights or {}).get(lab_id, 1.0)
+    )
+
+
+class TestOptimizationQueue:
+
+    def test_global_and_provider_caps(self):
+        queue = _queue(max_concurrent=2, provider_limits={'ollama': 1})
+
+        first = queue.enqueue('a', provider='ollama')
+        second = queue.enqueue('b', provider='ollama')
+        third = queue.enqueue('c', provider='openai')
+        fourth = queue.enqueue('d', provider='openai')
+
+        assert first.running and third.running
+        assert not second.running and not fourth.running  # Provider cap, then global cap
+        queue.release(first)
+        assert second.running and not fourth.running
+        assert queue.compute_optimizer.increment_usage_counter.call_count == 3
+
+    def test_fair_share_lets_new_lab_ahead_of_busy_lab(self):
+        queue = _queue(max_concurrent=1)
+        busy_first = queue.enqueue('busy', exclusive=False)
+        busy_second = queue.enqueue('busy', exclusive=False)
+        newcomer = queue.enqueue('new')
+
+        queue.release(busy_first)
+
+        assert newcomer.running and not busy_second.running
+
+    def test_negative_feedback_weight_boosts_priority(self):
+        queue = _queue(max_concurrent=1, weights={'struggling': 3.0})
+        holder = queue.enqueue('holder')
+        calm = queue.enqueue('calm')
+        struggling = queue.enqueue('struggling')
+
+        queue.release(holder)
+
+        assert struggling.running and not calm.running
+
+    def test_admission_control(self):
+        queue = _queue(budget=2, max_concurrent=1, max_queue_depth=5)
+        queue.enqueue('a')
+
+        with pytest.raises(AdmissionRejected) as busy:
+            queue.enqueue('a')
+        assert busy.value.reason == 'lab_busy'
+
+        queue.enqueue('b')
+        with pytest.raises(AdmissionRejected) as budget:
+            queue.enqueue('c')
+        assert budget.value.reason == 'budget_exhausted'
+
+        full = _queue(max_concurrent=1, max_queue_depth=1)
+        full.enqueue('a')
+        full.enqueue('b')
+        with pytest.raises(AdmissionRejected) as depth:
+            full.enqueue('c')
+        assert depth.value.reason == 'queue_full'
+
+    def test_wait_blocks_until_slot_frees_and_times_out(self):
+        queue = _queue(max_concurrent=1)
+        holder = queue.enqueue('holder')
+
+        with pytest.raises(AdmissionRejected) as timeout:
+            queue.wait(queue.enqueue('late'), timeout=0.01)
+        assert timeout.value.reason == 'timeout'
+        assert not queue.is_busy('late')
+
+        waiter = queue.enqueue('waiter')
+        threading.Timer(0.02, queue.release, [holder]).start()
+        assert queue.wait(waiter, timeout=1.0).running
+
+    def test_status_reports_depth_and_waits(self):
+        queue = _queue(max_concurrent=1)
+        queue.enqueue('a', provider='openai')
+        queue.enqueue('b', provider='openai')
+
+        status = queue.status()
+
+        assert status['running'] == 1 and status['queued'] == 1
+        assert status['providers']['openai'] == {'running': 1, 'queued': 1, 'limit': 2}
+        assert [(lab['prompt_lab_id'], lab['position']) for lab in status['labs']] == [('a', None), ('b', 1)]
+        assert status['wait_seconds']['queued_max'] >= 0.0
+
+
+@pytest.mark.django_db
+def test_negative_feedback_weight_reads_trigger_counters():
+    from core.models import Draft, Email, PromptLab, SystemPrompt, UserFeedback
+
+    lab = PromptLab.objects.create(name="Queue lab")
+    prompt = SystemPrompt.objects.create(prompt_lab=lab, content="Be helpful.", version=1, is_active=True)
+    for action in ['reject', 'accept']:
+        email = Email.objects.create(prompt_lab=lab, subject="Hi", body="Hello", sender="a@example.com")
+        UserFeedback.objects.create(draft=Draft.objects.create(email=email, content="Hi", system_prompt=prompt), action=action)
+
+    queue = OptimizationQueue(QueueLimits(negative_feedback_boost=2.0), compute_optimizer=Mock())
+
+    assert queue.negative_feedback_weight(str(lab.id)) == pytest.approx(2.0)
+
+
+@pytest.mark.django_db
+def test_queue_status_endpoint():
+    response = APIClient().get(reverse('optimization-queue'))
+
+    assert response.status_code == 200
+    assert {'running', 'queued', 'max_concurrent', 'providers', 'wait_seconds', 'labs'} <= set(response.json())
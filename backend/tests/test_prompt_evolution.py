@@ -0,0 +1,126 @@
+"""
+Tests for the evolutionary (population-based) rewrite mode
+"""
+import random
+import pytest
+from asgiref.sync import sync_to_async
+from unittest.mock import AsyncMock
+
+from app.services.candidate_dedup import prompt_fingerprint
+from app.services.candidate_screening import ScreeningCase
+from app.services.prompt_evolution import EvolutionConfig, PromptEvolution, load_fitness_cases
+from app.services.prompt_rewriter import LLMBasedPromptRewriter, RewriteContext
+from core.models import Draft, Email, PromptLab, PromptPopulationMember, SystemPrompt, UserFeedback
+
+BASELINE_TEXT = "You are a helpful email assistant. Reply politely and keep answers short."
+CASES = [ScreeningCase("Where is my order?", "your order ships today and arrives on friday")] * 2
+
+
+def _rewriter_llm():
+    """Returns a new, distinct prompt per call"""
+    counter = iter(range(1000))
+
+    async def generate(prompt, **kwargs):
+        n = next(counter)
+        return f"Prompt: You are a support assistant. Variant {n}. Explain when the order ships. Offer help."
+    return AsyncMock(generate=AsyncMock(side_effect=generate))
+
+
+def _task_llm():
+    async def generate(prompt, system_prompt=None, **kwargs):
+        # Later variants answer closer to the expected reply
+        variant = int(system_prompt.split('Variant ')[1].split('.')[0]) if 'Variant' in system_prompt else -1
+        return "Your order ships today and arrives on Friday" if variant % 2 else "Thanks for writing"
+    return AsyncMock(generate=AsyncMock(side_effect=generate))
+
+
+def _evolution(budget=20, population_size=4):
+    config = EvolutionConfig(llm_call_budget=budget, population_size=population_size, workers=3, fitness_cases=2)
+    return PromptEvolution(_rewriter_llm(), _task_llm(), config, rng=random.Random(7))
+
+
+@pytest.mark.django_db(transaction=True)
+class TestPromptEvolution:
+
+    async def test_cycle_stays_within_llm_call_budget(self):
+        lab = await sync_to_async(PromptLab.objects.create)(name="Evolution lab")
+        evolution = _evolution(budget=20)
+
+        members, report = await evolution.run_cycle(lab.id, BASELINE_TEXT, CASES)
+
+        calls = evolution.rewriter_llm.generate.await_count + evolution.task_llm.generate.await_count
+        assert calls == report.llm_calls <= 20
+        assert report.offspring == evolution.rewriter_llm.generate.await_count
+        assert members and all(m.fingerprint != prompt_fingerprint(BASELINE_TEXT) for m in members)
+        assert members[0].fitness >= members[-1].fitness
+        alive = await sync_to_async(PromptPopulationMember.objects.filter(prompt_lab=lab, is_alive=True).count)()
+        assert alive <= 4
+
+    async def test_population_carries_across_cycles(self):
+        lab = await sync_to_async(PromptLab.objects.create)(name="Evolution lab")
+
+        await _evolution(budget=12).run_cycle(lab.id, BASELINE_TEXT, CASES)
+        _, report = await _evolution(budget=12).run_cycle(lab.id, BASELINE_TEXT, CASES)
+
+        seed = await sync_to_async(PromptPopulationMember.objects.get)(
+            prompt_lab=lab, fingerprint=prompt_fingerprint(BASELINE_TEXT)
+        )
+        assert seed.evaluations == 2  # Current prompt rescored each cycle
+        assert report.best_fitness_before is not None
+        generations = await sync_to_async(
+            lambda: set(PromptPopulationMember.objects.filter(prompt_lab=lab).values_list('generation', flat=True))
+        )()
+        assert max(generations) >= 1
+
+
+def test_steady_state_insert_replaces_weakest_but_keeps_current():
+    evolution = _evolution(population_size=2)
+    current = PromptPopulationMember(content="current", fingerprint="c", fitness=0.1)
+    other = PromptPopulationMember(content="other", fingerprint="o", fitness=0.5)
+    population = [current, other]
+
+    weak_child = PromptPopulationMember(content="weak", fingerprint="w", fitness=0.4)
+    strong_child = PromptPopulationMember(content="strong", fingerprint="s", fitness=0.9)
+
+    assert not evolution._insert(population, weak_child, protected=current)
+    assert evolution._insert(population, strong_child, protected=current)
+    assert current.is_alive and not other.is_alive
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_rewriter_evolutionary_mode_returns_population_members():
+    lab = await sync_to_async(PromptLab.objects.create)(name="Evolution lab")
+    prompt = await sync_to_async(SystemPrompt.objects.create)(
+        prompt_lab=lab, content=BASELINE_TEXT, version=1, is_active=True
+    )
+    evolution = _evolution(budget=15)
+    rewriter = LLMBasedPromptRewriter(
+        evolution.rewriter_llm, AsyncMock(), AsyncMock(), None, evolution=evolution
+    )
+    context = RewriteContext("support", prompt, [], {}, {})
+
+    candidates = await rewriter.rewrite_prompt(context, mode='evolutionary')
+
+    assert 1 <= len(candidates) <= 3
+    assert all('Evolutionary' in c.reasoning for c in candidates)
+
+
+@pytest.mark.django_db
+def test_fitness_cases_use_accepted_and_edited_drafts():
+    prompt = SystemPrompt.objects.create(content=BASELINE_TEXT, version=1)
+    email = Email.objects.create(subject="Order", body="Where is it?", sender="a@example.com", scenario_type="casual")
+    accepted = UserFeedback.objects.create(
+        draft=Draft.objects.create(email=email, content="It ships today", system_prompt=prompt), action='accept'
+    )
+    edited = UserFeedback.objects.create(
+        draft=Draft.objects.create(email=email, content="Soon", system_prompt=prompt),
+        action='edit', edited_content="It ships Monday"
+    )
+    rejected = UserFeedback.objects.create(
+        draft=Draft.objects.create(email=email, content="No idea", system_prompt=prompt), action='reject'
+    )
+
+    cases = load_fitness_cases(RewriteContext("casual", prompt, [accepted, edited, rejected], {}, {}), limit=5)
+
+    assert sorted(c.expected_output for c in cases) == ["It ships Monday", "It ships today"]
+    assert all(c.scenario_type == "casual" for c in cases)
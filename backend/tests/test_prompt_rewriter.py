@@ -393,4 +393,85 @@ async def test_llm_rewriter_configuration_parameters(mock_rewriter_llm, mock_sim
     assert rewriter.similarity_llm == mock_similarity_llm
     assert rewriter.reward_aggregator == mock_reward_aggregator
     assert rewriter.meta_prompt_manager == mock_meta_prompt_manager
-    assert rewriter.feedback_patterns == []
\ No newline at end of file
+    assert rewriter.feedback_patterns == []
+
+def _slow_rewriter_llm(delays):
+    """Rewriter LLM whose Nth call sleeps delays[N] seconds before answering"""
+    import asyncio
+    calls = []
+
+    async def generate(prompt, temperature=None, **kwargs):
+        index = len(calls)
+        calls.append(temperature)
+        await asyncio.sleep(delays[index % len(delays)])
+        return f"Candidate prompt {index + 1}"
+
+    mock_llm = AsyncMock()
+    mock_llm.generate = AsyncMock(side_effect=generate)
+    return mock_llm, calls
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_candidate_generation_runs_concurrently(mock_similarity_llm, mock_reward_aggregator, mock_meta_prompt_manager, rewrite_context):
+    """Mini-OPRO candidate calls are all in flight at once"""
+    rewriter_llm, _ = _slow_rewriter_llm([0.05])
+    generate = rewriter_llm.generate.side_effect
+    in_flight = peak = 0
+
+    async def tracked(*args, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            return await generate(*args, **kwargs)
+        finally:
+            in_flight -= 1
+
+    rewriter_llm.generate = AsyncMock(side_effect=tracked)
+    rewriter = LLMBasedPromptRewriter(rewriter_llm, mock_similarity_llm, mock_reward_aggregator, mock_meta_prompt_manager)
+
+    candidates = await rewriter.rewrite_prompt(rewrite_context, mode="mini_opro")
+
+    assert len(candidates) == 3
+    assert peak == 3
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_candidate_timeout_keeps_partial_results(mock_similarity_llm, mock_reward_aggregator, mock_meta_prompt_manager):
+    """A call exceeding candidate_timeout is dropped instead of failing the batch"""
+    rewriter_llm, _ = _slow_rewriter_llm([0.01, 5.0, 0.01])
+    rewriter = LLMBasedPromptRewriter(
+        rewriter_llm, mock_similarity_llm, mock_reward_aggregator, mock_meta_prompt_manager,
+        candidate_timeout=0.1
+    )
+
+    candidates = await rewriter._generate_exploratory_rewrites("Improve this prompt")
+
+    assert [c.reasoning for c in candidates] == [
+        "Exploratory rewrite focusing on clarity",
+        "Exploratory rewrite focusing on efficiency"
+    ]
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_candidate_count_and_temperatures_configurable(mock_similarity_llm, mock_reward_aggregator, mock_meta_prompt_manager, monkeypatch):
+    """Candidate count and diversity temperatures come from arguments or the environment"""
+    monkeypatch.setenv('REWRITER_CANDIDATE_COUNT', '5')
+    monkeypatch.setenv('REWRITER_CANDIDATE_TEMPERATURES', '0.2,0.9')
+    rewriter_llm, temperatures = _slow_rewriter_llm([0])
+    rewriter = LLMBasedPromptRewriter(rewriter_llm, mock_similarity_llm, mock_reward_aggregator, mock_meta_prompt_manager)
+
+    candidates = await rewriter._generate_hybrid_rewrites("Improve this prompt")
+
+    assert rewriter.candidate_count == 5
+    assert len(candidates) == 5  # 1 conservative + 4 exploratory
+    assert sorted(temperatures[1:]) == [0.2, 0.2, 0.9, 0.9]
+
+    explicit = LLMBasedPromptRewriter(
+        rewriter_llm, mock_similarity_llm, mock_reward_aggregator, mock_meta_prompt_manager,
+        candidate_count=2, candidate_temperatures=[0.5]
+    )
+    assert explicit._candidate_temperatures([0.7]) == [0.5, 0.5]
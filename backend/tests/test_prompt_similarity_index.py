@@ -0,0 +1,127 @@
+"""
+Tests for the local prompt similarity index
+Covers TF-IDF retrieval, incremental updates and feedback counters
+"""
+import pytest
+from asgiref.sync import sync_to_async
+from unittest.mock import AsyncMock
+from django.db import transaction
+
+from app.services.prompt_rewriter import LLMBasedPromptRewriter, RewriteContext
+from app.services.prompt_similarity_index import PromptSimilarityIndex, get_prompt_similarity_index
+from core.models import PromptLab, SystemPrompt, Email, Draft, UserFeedback
+
+
+def _feedback(prompt, scenario, actions):
+    email = Email.objects.create(subject="Hi", body="Question", sender="a@example.com", scenario_type=scenario)
+    draft = Draft.objects.create(email=email, content="Reply", system_prompt=prompt)
+    for action in actions:
+        UserFeedback.objects.create(draft=draft, action=action)
+
+
+@pytest.mark.django_db
+class TestPromptSimilarityIndex:
+
+    @pytest.fixture
+    def lab(self):
+        return PromptLab.objects.create(name="Index lab")
+
+    def test_search_ranks_by_tfidf_similarity(self, lab):
+        refund = SystemPrompt.objects.create(prompt_lab=lab, version=1, content="Handle refund requests politely and explain the refund policy")
+        SystemPrompt.objects.create(prompt_lab=lab, version=2, content="Schedule meetings and confirm calendar invites")
+        index = PromptSimilarityIndex()
+
+        hits = index.search("Explain our refund policy for refund requests", k=1, prompt_lab_id=lab.id)
+
+        assert hits[0].prompt_id == refund.id
+        assert 0 < hits[0].similarity <= 1
+
+    def test_feedback_thresholds_and_scenarios(self, lab):
+        good = SystemPrompt.objects.create(prompt_lab=lab, version=1, content="Be professional and concise")
+        bad = SystemPrompt.objects.create(prompt_lab=lab, version=2, content="Be professional and verbose")
+        _feedback(good, 'professional', ['accept', 'accept', 'edit'])
+        _feedback(bad, 'professional', ['reject', 'reject', 'accept'])
+        index = PromptSimilarityIndex()
+
+        successful = index.successful_prompts('professional')
+
+        assert [hit.prompt_id for hit in successful] == [good.id]
+        assert successful[0].feedback_summary == "Accepts: 2, Edits: 1"
+        assert index.successful_prompts('casual') == []
+
+    def test_incremental_updates_from_signals(self, lab, django_capture_on_commit_callbacks):
+        index = get_prompt_similarity_index()
+        index.rebuild()
+        with django_capture_on_commit_callbacks(execute=True):
+            prompt = SystemPrompt.objects.create(prompt_lab=lab, version=1, content="Answer shipping delay questions")
+
+        assert index.search("shipping delay", k=1, prompt_lab_id=lab.id)[0].prompt_id == prompt.id
+
+        with django_capture_on_commit_callbacks(execute=True):
+            _feedback(prompt, 'inquiry', ['accept', 'accept', 'accept'])
+        assert index.successful_prompts('inquiry', limit=50)[0].prompt_id == prompt.id
+
+        with django_capture_on_commit_callbacks(execute=True):
+            prompt.content = "Write onboarding welcome emails"
+            prompt.performance_score = 0.9
+            prompt.save()
+        hit = index.search("onboarding welcome", k=1, prompt_lab_id=lab.id)[0]
+        assert hit.performance_score == 0.9
+
+        with django_capture_on_commit_callbacks(execute=True):
+            prompt.delete()
+        assert index.search("onboarding welcome", prompt_lab_id=lab.id) == []
+
+    def test_rolled_back_writes_are_not_indexed(self, lab, django_capture_on_commit_callbacks):
+        index = get_prompt_similarity_index()
+        index.rebuild()
+
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    SystemPrompt.objects.create(prompt_lab=lab, version=1, content="Answer warranty claim questions")
+                    raise RuntimeError("Rolled back")
+            except RuntimeError:
+                pass
+
+        assert callbacks == []
+        assert index.search("warranty claim", prompt_lab_id=lab.id) == []
+
+    def test_lookups_reuse_the_built_index(self, lab, django_assert_num_queries):
+        SystemPrompt.objects.bulk_create([
+            SystemPrompt(prompt_lab=lab, version=i, content=f"Prompt {i} about topic {i % 17} with extra detail {i % 5}")
+            for i in range(500)
+        ])
+        index = PromptSimilarityIndex()
+        index.search("warm up")
+        weighted = index._weighted
+
+        # No per-lookup table scan or re-weighting: one matrix product against the cached vectors
+        with django_assert_num_queries(0):
+            for _ in range(50):
+                hits = index.search("topic 3 with extra detail", k=3)
+
+        assert index._weighted is weighted
+        assert len(hits) == 3
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_rewriter_similarity_uses_index_without_llm():
+    lab = await sync_to_async(PromptLab.objects.create)(name="Rewriter index lab")
+    current = await sync_to_async(SystemPrompt.objects.create)(prompt_lab=lab, version=2, content="Reply to complaints with empathy")
+    previous = await sync_to_async(SystemPrompt.objects.create)(prompt_lab=lab, version=1, content="Reply to complaints with empathy and a refund offer")
+    await sync_to_async(_feedback)(previous, 'complaint', ['accept', 'edit', 'accept'])
+
+    similarity_llm = AsyncMock()
+    rewriter = LLMBasedPromptRewriter(
+        AsyncMock(), similarity_llm, AsyncMock(), None, similarity_index=PromptSimilarityIndex()
+    )
+    context = RewriteContext("complaint", current, [], {}, {})
+
+    matches = await rewriter._find_similar_successful_prompts(context)
+
+    assert [m.prompt.id for m in matches] == [previous.id]
+    assert matches[0].similarity_score > 0.5
+    assert matches[0].success_rate == 1.0
+    similarity_llm.generate.assert_not_called()
@@ -0,0 +1,79 @@
+"""
+Query-count regression tests for the prompt lab stats and reasoning endpoints
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core.models import Draft, DraftReason, Email, ReasonRating, UserFeedback
+
+
+def _add_history(prompt_lab, emails, reasons):
+    """Emails with two drafts each; each draft is rated on every reason (liked unless it is the last)"""
+    prompt = prompt_lab.prompts.first()
+    drafts = []
+    for i in range(emails):
+        email = Email.objects.create(prompt_lab=prompt_lab, subject=f"Email {i}", body="Body", sender="a@example.com")
+        for _ in range(2):
+            draft = Draft.objects.create(email=email, content="Draft", system_prompt=prompt)
+            draft.reasons.set(reasons)
+            feedback = UserFeedback.objects.create(draft=draft, action='accept')
+            for index, reason in enumerate(reasons):
+                ReasonRating.objects.create(feedback=feedback, reason=reason, liked=index < len(reasons) - 1)
+            drafts.append(draft)
+    return drafts
+
+
+def _reasons(count):
+    return [DraftReason.objects.create(text=f"Reason {i}", confidence=0.8) for i in range(count)]
+
+
+def _count_queries(url):
+    with CaptureQueriesContext(connection) as queries:
+        response = APIClient().get(url, {'refresh': 'true'})
+    assert response.status_code == 200
+    return len(queries), response.json()
+
+
+@pytest.mark.django_db
+class TestPromptLabQueryCounts:
+
+    def test_stats_query_count_does_not_grow_with_history(self, prompt_lab):
+        url = f'/api/prompt-labs/{prompt_lab.id}/stats/'
+        _add_history(prompt_lab, emails=1, reasons=_reasons(1))
+        small, _ = _count_queries(url)
+
+        _add_history(prompt_lab, emails=10, reasons=_reasons(3))
+        large, stats = _count_queries(url)
+
+        assert small == large
+        assert stats['drafts']['total_generated'] == 22
+        assert stats['feedback']['by_action']['accept'] == 22
+
+    def test_reasoning_summary_query_count_does_not_grow_with_reasons(self, prompt_lab):
+        url = f'/api/prompt-labs/{prompt_lab.id}/'
+        _add_history(prompt_lab, emails=1, reasons=_reasons(1))
+        small, _ = _count_queries(url)
+
+        _add_history(prompt_lab, emails=5, reasons=_reasons(4))
+        large, detail = _count_queries(url)
+
+        assert small == large
+        summary = detail['reasoning_summary']
+        assert summary['total_reasons_generated'] == 5
+        assert summary['reason_rating_breakdown'] == {'liked': 30, 'disliked': 12, 'total': 42}
+        assert summary['most_liked_reasons'][0]['like_count'] == 10
+        assert {reason['text'] for reason in summary['least_liked_reasons']} == {'Reason 0', 'Reason 3'}
+
+    def test_draft_reasoning_factors_in_one_query(self, prompt_lab):
+        reasons = _reasons(6)
+        draft = _add_history(prompt_lab, emails=3, reasons=reasons)[0]
+        url = f'/api/prompt-labs/{prompt_lab.id}/drafts/{draft.id}/reasoning-factors/'
+
+        count, data = _count_queries(url)
+
+        assert count == 3  # Lab, draft, reasons with rating counts
+        factors = {factor['text']: factor['rating_stats'] for factor in data['reasoning_factors']}
+        assert factors['Reason 0'] == {'likes': 6, 'dislikes': 0, 'total_ratings': 6}
+        assert factors['Reason 5'] == {'likes': 0, 'dislikes': 6, 'total_ratings': 6}
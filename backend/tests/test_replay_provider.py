@@ -0,0 +1,85 @@
+"""
+Tests for the record/replay LLM provider
+Ensures recorded calls replay deterministically from the on-disk store
+"""
+import time
+import pytest
+
+from app.services.replay_provider import RecordingProvider, ReplayProvider, ReplayStore, request_key
+from app.services.unified_llm_provider import LLMConfig, LLMProviderFactory, MockProvider
+from app.services.llm_usage import track_llm_usage
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "calls.jsonl.gz")
+
+
+def make_replay(store_path, **kwargs):
+    return ReplayProvider(LLMConfig(provider='replay', model='replay'), store=ReplayStore(store_path), **kwargs)
+
+
+class TestRecordReplay:
+    """Round trips through the replay store"""
+
+    @pytest.mark.asyncio
+    async def test_recorded_responses_replay_in_order(self, store_path):
+        recorder = RecordingProvider(MockProvider(LLMConfig(provider='mock', model='mock-model')), ReplayStore(store_path))
+        first = await recorder.generate("Write an email reply", system_prompt="You are an email assistant", temperature=0.7)
+        second = await recorder.generate("Write an email reply", system_prompt="You are an email assistant", temperature=0.7)
+        log_probs = await recorder.get_log_probabilities("Thanks for reaching out")
+
+        replay = make_replay(store_path)
+
+        assert await replay.generate("Write an email reply", system_prompt="You are an email assistant", temperature=0.7) == first
+        assert await replay.generate("Write an email reply", system_prompt="You are an email assistant", temperature=0.7) == second
+        assert await replay.get_log_probabilities("Thanks for reaching out") == log_probs
+        assert replay.hits == 3
+
+    @pytest.mark.asyncio
+    async def test_drafts_round_trip(self, store_path):
+        recorder = RecordingProvider(MockProvider(LLMConfig(provider='mock', model='mock-model')), ReplayStore(store_path))
+        drafts = await recorder.generate_drafts("Can we meet?", "You are helpful", num_drafts=2)
+
+        replayed = await make_replay(store_path).generate_drafts("Can we meet?", "You are helpful", num_drafts=2)
+
+        assert [d.content for d in replayed] == [d.content for d in drafts]
+
+    @pytest.mark.asyncio
+    async def test_miss_strict_and_lenient(self, store_path):
+        with pytest.raises(LookupError):
+            await make_replay(store_path, strict=True).generate("never recorded")
+
+        lenient = make_replay(store_path, strict=False)
+        assert "Replay miss" in await lenient.generate("never recorded")
+        assert lenient.misses == 1
+
+    @pytest.mark.asyncio
+    async def test_recorded_latency_and_usage(self, store_path):
+        store = ReplayStore(store_path)
+        store.append({
+            'key': request_key('generate', prompt='slow', system_prompt=None, temperature=None, max_tokens=None),
+            'operation': 'generate', 'request': {}, 'response': 'done',
+            'latency_ms': 50, 'model': 'gpt-4o-mini', 'prompt_tokens': 12, 'completion_tokens': 3
+        })
+
+        replay = make_replay(store_path, latency_scale=1.0)
+        start = time.perf_counter()
+        with track_llm_usage() as usage:
+            assert await replay.generate("slow") == 'done'
+
+        assert time.perf_counter() - start >= 0.045
+        assert usage.records[0].prompt_tokens == 12
+        assert usage.records[0].cost_usd == 0.0
+
+    def test_factory_record_mode_and_replay_provider(self, store_path, monkeypatch):
+        monkeypatch.setenv('LLM_REPLAY_MODE', 'record')
+        monkeypatch.setenv('LLM_REPLAY_PATH', store_path)
+        recorder = LLMProviderFactory.create_provider(LLMConfig(provider='mock', model='mock-model'))
+        monkeypatch.delenv('LLM_REPLAY_MODE')
+        replay = LLMProviderFactory.create_provider(LLMConfig(provider='replay', model='replay', base_url=store_path))
+
+        assert isinstance(recorder, RecordingProvider)
+        assert recorder.store.path == store_path
+        assert isinstance(replay, ReplayProvider)
+        assert replay.store.path == store_path
@@ -0,0 +1,141 @@
+"""
+Tests for the versioned response cache on read-heavy endpoints
+"""
+import threading
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from app.services.run_leases import claim_optimization_run, optimization_run_resource, reap_expired_runs
+from core.cache import LockedFileBasedCache
+from core.models import OptimizationRun, PromptLab, WorkLease
+
+
+def _stats_url(prompt_lab):
+    return f'/api/prompt-labs/{prompt_lab.id}/stats/'
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+
+    def test_repeat_get_is_served_from_cache(self, prompt_lab, feedback_factory):
+        feedback_factory(prompt_lab)
+        client = APIClient()
+        first = client.get(_stats_url(prompt_lab))
+
+        with CaptureQueriesContext(connection) as queries:
+            second = client.get(_stats_url(prompt_lab))
+
+        assert len(queries) == 0
+        assert second.status_code == 200 and second.json() == first.json()
+        assert second['ETag'] == first['ETag']
+
+    def test_conditional_get_returns_not_modified(self, prompt_lab):
+        client = APIClient()
+        etag = client.get(_stats_url(prompt_lab))['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(_stats_url(prompt_lab), HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 304 and len(queries) == 0
+        assert client.get(_stats_url(prompt_lab), HTTP_IF_NONE_MATCH='"stale"').status_code == 200
+
+    def test_feedback_write_invalidates_lab_and_dashboard(
+        self, prompt_lab, feedback_factory, django_capture_on_commit_callbacks
+    ):
+        other_lab = PromptLab.objects.create(name="Other lab")
+        client = APIClient()
+        first = client.get(_stats_url(prompt_lab))
+        other = client.get(_stats_url(other_lab))
+        metrics = Client().get('/api/dashboard/metrics/')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            feedback_factory(prompt_lab, 'reject')
+
+        second = client.get(_stats_url(prompt_lab))
+        assert second['ETag'] != first['ETag']
+        assert second.json()['feedback']['by_action']['reject'] == 1
+        assert client.get(_stats_url(other_lab), HTTP_IF_NONE_MATCH=other['ETag']).status_code == 304
+        assert Client().get('/api/dashboard/metrics/', HTTP_IF_NONE_MATCH=metrics['ETag']).status_code == 200
+
+    def test_only_run_status_changes_invalidate(self, prompt_lab, django_capture_on_commit_callbacks):
+        run = OptimizationRun.objects.create(prompt_lab=prompt_lab, status='running')
+        client = APIClient()
+        etag = client.get(_stats_url(prompt_lab))['ETag']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            run.current_step = 'Evaluating candidates'
+            run.save()
+        assert client.get(_stats_url(prompt_lab), HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        with django_capture_on_commit_callbacks(execute=True):
+            run.status = 'completed'
+            run.save()
+        assert client.get(_stats_url(prompt_lab), HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_refresh_and_disabled_cache_recompute(self, prompt_lab, monkeypatch):
+        client = APIClient()
+        client.get(_stats_url(prompt_lab))
+
+        with CaptureQueriesContext(connection) as queries:
+            client.get(_stats_url(prompt_lab), {'refresh': 'true'})
+        assert len(queries) > 0
+
+        monkeypatch.setenv('RESPONSE_CACHE_SECONDS', '0')
+        response = client.get(_stats_url(prompt_lab))
+        assert response.status_code == 200 and 'ETag' not in response
+
+    def test_versions_are_bumped_only_when_the_write_commits(
+        self, prompt_lab, feedback_factory, django_capture_on_commit_callbacks
+    ):
+        client = APIClient()
+        etag = client.get(_stats_url(prompt_lab))['ETag']
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            feedback_factory(prompt_lab, 'reject')
+            # Until the commit, other requests still get the committed data's response
+            assert client.get(_stats_url(prompt_lab), HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        for callback in callbacks:
+            callback()
+        assert client.get(_stats_url(prompt_lab), HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_reaped_runs_invalidate(self, prompt_lab, django_capture_on_commit_callbacks):
+        run = OptimizationRun.objects.create(prompt_lab=prompt_lab, status='running')
+        claim_optimization_run(run.id, owner="dead-worker")
+        WorkLease.objects.filter(resource=optimization_run_resource(run.id)).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        client = APIClient()
+        etag = client.get(_stats_url(prompt_lab))['ETag']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            assert reap_expired_runs(prompt_lab.id)['optimization_runs'] == 1
+
+        assert client.get(_stats_url(prompt_lab), HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_locked_file_cache_incr_is_atomic(tmp_path):
+    cache = LockedFileBasedCache(str(tmp_path), {})
+    cache.add('counter', 0, None)
+    cache.set('expiring', 0, 60)
+
+    def bump():
+        for _ in range(25):
+            cache.incr('counter')
+
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.get('counter') == 200
+    cache.incr('expiring')
+    assert cache._remaining_timeout('expiring', None) <= 60
+    assert cache._remaining_timeout('counter', None) is None
@@ -0,0 +1,180 @@
+"""
+Tests for cooperative cancellation of optimization and evaluation runs
+"""
+import asyncio
+import threading
+import time
+import pytest
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from app.services.evaluation_engine import EvaluationEngine
+from app.services.llm_router import LLMRouter, RoutedLLMProvider, TaskRoute, TaskType
+from app.services.optimization_queue import OptimizationQueue, QueueLimits
+from app.services.run_cancellation import (
+    RunCancelled, cancel_run, cancellable, cancellation_scope, check_cancelled, running_here
+)
+from app.services.run_leases import LeaseHeartbeat, claim, optimization_run_resource
+from app.services.unified_llm_provider import LLMConfig
+from core.models import (
+    EvaluationCase, EvaluationDataset, EvaluationRun, OptimizationRun, PromptLab, SystemPrompt, WorkLease
+)
+
+
+def _slow_provider(started: threading.Event):
+    provider = MagicMock()
+    provider.config = LLMConfig(provider='mock', model='slow')
+
+    async def generate(**kwargs):
+        started.set()
+        await asyncio.sleep(10)
+        return "late"
+
+    provider.generate = AsyncMock(side_effect=generate)
+    return provider
+
+
+class TestCancellationToken:
+
+    async def test_cancel_from_another_thread_stops_routed_call_and_frees_slot(self):
+        router = LLMRouter(environ={})
+        route = TaskRoute(task_type=TaskType.SCORING, timeout=30, max_concurrency=1)
+        started = threading.Event()
+        provider = RoutedLLMProvider(route, [_slow_provider(started)], router)
+
+        with cancellation_scope("optimization_run:1") as token:
+            call = asyncio.ensure_future(provider.generate("score this"))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 1.0)
+            threading.Thread(target=cancel_run, args=("optimization_run:1", "stop")).start()
+
+            begun = time.monotonic()
+            with pytest.raises(RunCancelled, match="stop"):
+                await call
+            assert time.monotonic() - begun < 1.0
+
+        assert not running_here("optimization_run:1")
+        assert not router.concurrency_slot(route).locked()  # Slot released for other runs
+        assert token.cancelled
+
+    async def test_cancelling_top_level_task_unwinds_gather(self):
+        finished = []
+
+        async def branch(name):
+            await asyncio.sleep(10)
+            finished.append(name)
+
+        async def optimization():
+            await asyncio.gather(branch("baseline"), branch("candidate"))
+
+        with cancellation_scope("optimization_run:2") as token:
+            run = asyncio.ensure_future(cancellable(optimization(), token))
+            await asyncio.sleep(0.01)
+            token.cancel("Optimization cancelled by user")
+
+            with pytest.raises(RunCancelled):
+                await run
+        assert finished == []
+
+    def test_check_cancelled_outside_a_run_is_a_no_op(self):
+        check_cancelled()
+        assert cancel_run("optimization_run:missing") is False
+
+    def test_queue_wait_abandoned_on_cancel(self):
+        queue = OptimizationQueue(
+            QueueLimits(max_concurrent=1),
+            compute_optimizer=Mock(get_compute_budget_status=Mock(return_value={'budget_remaining': 10})),
+            lab_weight=lambda lab_id: 1.0
+        )
+        queue.enqueue('holder')
+        waiting = queue.enqueue('waiting')
+
+        with cancellation_scope("optimization_run:3") as token:
+            threading.Timer(0.05, token.cancel).start()
+            with pytest.raises(RunCancelled):
+                queue.wait(waiting, timeout=30, cancellation=token)
+
+        assert not queue.is_busy('waiting')
+
+
+@pytest.mark.django_db
+class TestRunCancellation:
+
+    def test_cancelled_evaluation_keeps_finished_cases(self):
+        lab = PromptLab.objects.create(name="Cancel lab")
+        prompt = SystemPrompt.objects.create(prompt_lab=lab, content="Be helpful.", version=1, is_active=True)
+        dataset = EvaluationDataset.objects.create(prompt_lab=lab, name="Cases")
+        for i in range(5):
+            EvaluationCase.objects.create(dataset=dataset, input_text=f"Q{i}", expected_output="Answer")
+        engine = EvaluationEngine(Mock(), Mock())
+        run = engine.create_evaluation_run(dataset, prompt)
+        calls = []
+
+        def generate(prompt, case):
+            calls.append(case.id)
+            if len(calls) == 2:
+                cancel_run(f"evaluation_run:{run.id}")
+            return "Answer"
+
+        with patch.object(engine, '_generate_response_for_case', side_effect=generate):
+            results = engine.execute_evaluation_run(run)
+
+        run.refresh_from_db()
+        assert len(calls) == 2 and len(results) == 2
+        assert run.status == 'cancelled'
+        assert run.overall_score == pytest.approx(1.0)
+        assert run.results.count() == 2
+        assert not WorkLease.objects.exists()
+
+    def test_cancel_view_stops_run_in_this_process(self):
+        lab = PromptLab.objects.create(name="Cancel lab")
+        run = OptimizationRun.objects.create(prompt_lab=lab, status='running')
+
+        with cancellation_scope(optimization_run_resource(run.id)) as token:
+            response = APIClient().post(reverse('cancel-optimization', args=[run.id]))
+
+        assert response.status_code == 200
+        assert response.json()['stopped_in_process'] is True
+        assert token.cancelled
+        assert OptimizationRun.objects.get(id=run.id).status == 'failed'
+
+    def test_cancel_view_revokes_lease_of_other_process(self):
+        lab = PromptLab.objects.create(name="Cancel lab")
+        run = OptimizationRun.objects.create(prompt_lab=lab, status='running')
+        claim(optimization_run_resource(run.id), owner="other-worker")
+
+        response = APIClient().post(reverse('cancel-optimization', args=[run.id]))
+
+        assert response.json()['stopped_in_process'] is False
+        assert not WorkLease.objects.filter(resource=optimization_run_resource(run.id)).exists()
+
+    def test_evaluation_cancel_endpoint(self):
+        lab = PromptLab.objects.create(name="Cancel lab")
+        prompt = SystemPrompt.objects.create(prompt_lab=lab, content="Be helpful.", version=1, is_active=True)
+        dataset = EvaluationDataset.objects.create(prompt_lab=lab, name="Cases")
+        run = EvaluationRun.objects.create(dataset=dataset, prompt=prompt, status='pending')
+
+        response = APIClient().post(reverse('evaluation-run-cancel', args=[run.id]))
+
+        assert response.status_code == 200
+        assert EvaluationRun.objects.get(id=run.id).status == 'cancelled'
+        assert APIClient().post(reverse('evaluation-run-cancel', args=[run.id])).status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_revoked_lease_cancels_local_run():
+    lease = claim("optimization_run:4", owner="worker-a", ttl=timedelta(seconds=30))
+
+    with cancellation_scope("optimization_run:4") as token:
+        beat = LeaseHeartbeat(lease, interval=0.02, on_lost=lambda lost: token.cancel("revoked")).start()
+        try:
+            WorkLease.objects.filter(resource="optimization_run:4").delete()
+            for _ in range(100):
+                if token.cancelled:
+                    break
+                time.sleep(0.01)
+        finally:
+            beat.stop()
+
+    assert token.cancelled and token.reason == "revoked"
@@ -0,0 +1,120 @@
+"""
+Tests for checkpointing and resuming optimization and evaluation runs
+"""
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from asgiref.sync import sync_to_async
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from app.services.evaluation_engine import BatchPromptEvaluator, EvaluationEngine, EvaluationTestCase
+from app.services.optimization_orchestrator import OptimizationOrchestrator
+from app.services.prompt_rewriter import RewriteCandidate
+from app.services.run_checkpoints import CheckpointStore, checkpoint_scope
+from core.models import (
+    CheckpointCaseResult, Email, EvaluationCase, EvaluationDataset, EvaluationResult, EvaluationRun,
+    OptimizationCheckpoint, OptimizationRun, PromptLab, SystemPrompt
+)
+
+
+def _test_cases(count):
+    return [
+        EvaluationTestCase(
+            email=Email(subject=f"Subject {i}", body=f"Body {i}", sender="a@example.com"),
+            expected_qualities={},
+            scenario_type="professional",
+            difficulty_level="easy"
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_interrupted_evaluation_resumes_without_repeating_completed_cases():
+    lab = await sync_to_async(PromptLab.objects.create)(name="Checkpoint lab")
+    run = await sync_to_async(OptimizationRun.objects.create)(prompt_lab=lab, status='running')
+    prompt = SystemPrompt(content="Be concise.", version=2)
+    cases = _test_cases(4)
+    evaluator = BatchPromptEvaluator(Mock())
+    calls = []
+
+    async def generate(prompt, email, provider):
+        calls.append(email.subject)
+        if len(calls) == 3:
+            raise KeyboardInterrupt  # Worker dies mid-run
+        return f"Reply to {email.subject}"
+
+    metrics = AsyncMock(return_value={'overall_score': 0.8})
+    with patch.object(evaluator, '_generate_response_with_prompt', side_effect=generate), \
+            patch.object(evaluator, '_calculate_metrics', metrics):
+        store = await sync_to_async(CheckpointStore.open)(run.id, [1])
+        with checkpoint_scope(store), pytest.raises(KeyboardInterrupt):
+            await evaluator.evaluate_prompt(prompt, cases, Mock())
+
+        resumed = await sync_to_async(CheckpointStore.open)(run.id, [1])
+        with checkpoint_scope(resumed):
+            result = await evaluator.evaluate_prompt(prompt, cases, Mock())
+
+    assert calls == ["Subject 0", "Subject 1", "Subject 2", "Subject 2", "Subject 3"]
+    assert result.performance_score == pytest.approx(0.8) and result.test_cases_used == 4
+    assert resumed.summary()['replayed_evaluations'] == 2
+    assert await sync_to_async(CheckpointCaseResult.objects.count)() == 4
+
+
+@pytest.mark.django_db
+class TestRunCheckpoints:
+
+    def test_checkpointed_candidates_are_reused(self):
+        lab = PromptLab.objects.create(name="Checkpoint lab")
+        run = OptimizationRun.objects.create(prompt_lab=lab, status='running')
+        candidates = [RewriteCandidate(content="Be brief.", confidence=0.7, temperature=0.5, reasoning="shorter")]
+
+        CheckpointStore.open(run.id, [3]).save_candidates(candidates)
+        store = CheckpointStore.open(run.id)
+
+        assert store.candidates() == candidates
+        assert store.checkpoint.dataset_ids == [3]
+
+    def test_resumed_evaluation_run_scores_only_missing_and_failed_cases(self):
+        lab = PromptLab.objects.create(name="Checkpoint lab")
+        prompt = SystemPrompt.objects.create(prompt_lab=lab, content="Be helpful.", version=1, is_active=True)
+        dataset = EvaluationDataset.objects.create(prompt_lab=lab, name="Cases")
+        cases = [
+            EvaluationCase.objects.create(dataset=dataset, input_text=f"Q{i}", expected_output="Answer")
+            for i in range(3)
+        ]
+        run = EvaluationRun.objects.create(dataset=dataset, prompt=prompt, status='failed')
+        EvaluationResult.objects.create(run=run, case=cases[0], generated_output="Answer", similarity_score=1.0, passed=True)
+        EvaluationResult.objects.create(
+            run=run, case=cases[1], generated_output="", similarity_score=0.0, passed=False, details={'error': 'timeout'}
+        )
+        engine = EvaluationEngine(Mock(), Mock())
+
+        with patch.object(engine, '_generate_response_for_case', return_value="Answer") as generate:
+            results = engine.execute_evaluation_run(run)
+
+        run.refresh_from_db()
+        assert [call.args[1].id for call in generate.call_args_list] == [cases[1].id, cases[2].id]
+        assert len(results) == 3 and run.results.count() == 3
+        assert run.status == 'completed' and run.overall_score == pytest.approx(1.0)
+
+    def test_resume_endpoint_continues_failed_run(self):
+        lab = PromptLab.objects.create(name="Checkpoint lab")
+        SystemPrompt.objects.create(prompt_lab=lab, content="Be helpful.", version=1, is_active=True)
+        run = OptimizationRun.objects.create(prompt_lab=lab, status='failed', error_message="Worker died")
+        result = Mock(test_cases_used=4, detailed_metrics={}, candidate_metrics={}, cost_analysis={})
+        result.best_candidate = Mock(improvement=0.1, deployed=False)
+
+        assert APIClient().post(reverse('resume-optimization', args=[run.id])).status_code == 400
+
+        OptimizationCheckpoint.objects.create(
+            optimization_run=run, dataset_ids=[5], candidates=[{'content': "Be brief.", 'confidence': 0.7, 'temperature': 0.5}]
+        )
+        with patch.object(OptimizationOrchestrator, 'resume_optimization', new=AsyncMock(return_value=result)) as resume:
+            response = APIClient().post(reverse('resume-optimization', args=[run.id]))
+
+        run.refresh_from_db()
+        assert response.status_code == 200
+        resume.assert_awaited_once_with(str(run.id))
+        assert run.status == 'completed' and run.error_message == ''
+        assert APIClient().post(reverse('resume-optimization', args=[run.id])).status_code == 400
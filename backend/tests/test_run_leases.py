@@ -0,0 +1,138 @@
+"""
+Tests for DB-backed worker leases on prompt labs and runs
+"""
+import time
+import pytest
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from app.services.evaluation_engine import EvaluationEngine
+from app.services.run_leases import (
+    LeaseHeartbeat, claim, claim_evaluation_run, claim_optimization_run, claim_prompt_lab,
+    evaluation_run_resource, prompt_lab_resource
+)
+from core.models import EvaluationDataset, EvaluationRun, OptimizationRun, WorkLease
+
+
+def _expire(resource):
+    WorkLease.objects.filter(resource=resource).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+
+@pytest.mark.django_db
+class TestLeases:
+
+    def test_claim_is_exclusive_until_expiry(self):
+        first = claim("prompt_lab:1", owner="worker-a")
+
+        assert first is not None
+        assert claim("prompt_lab:1", owner="worker-b") is None
+        assert claim("prompt_lab:1", owner="worker-a") is not None  # Re-claiming our own lease renews it
+
+        _expire("prompt_lab:1")
+        takeover = claim("prompt_lab:1", owner="worker-b")
+
+        assert takeover is not None
+        assert first.renew() is False and first.lost
+        assert WorkLease.objects.get(resource="prompt_lab:1").owner == "worker-b"
+
+    def test_release_frees_resource(self):
+        lease = claim("optimization_run:1", owner="worker-a")
+        lease.release()
+
+        assert claim("optimization_run:1", owner="worker-b") is not None
+
+    def test_lab_claim_fails_runs_orphaned_by_dead_worker(self, prompt_lab):
+        orphan = OptimizationRun.objects.create(prompt_lab=prompt_lab, status='running')
+        claim_prompt_lab(prompt_lab.id, owner="dead-worker")
+        claim_optimization_run(orphan.id, owner="dead-worker")
+        live = OptimizationRun.objects.create(prompt_lab=prompt_lab, status='running')
+        claim_optimization_run(live.id, owner="forced-worker")
+        _expire(prompt_lab_resource(prompt_lab.id))
+        _expire(f"optimization_run:{orphan.id}")
+
+        assert claim_prompt_lab(prompt_lab.id, owner="new-worker") is not None
+
+        orphan.refresh_from_db()
+        live.refresh_from_db()
+        assert orphan.status == 'failed'
+        assert "dead-worker stopped heartbeating" in orphan.error_message
+        assert live.status == 'running'
+
+    def test_evaluation_run_refused_while_another_worker_holds_it(self, prompt_lab):
+        dataset = EvaluationDataset.objects.create(prompt_lab=prompt_lab, name="Cases")
+        run = EvaluationRun.objects.create(dataset=dataset, prompt=prompt_lab.prompts.first(), status='running')
+        claim_evaluation_run(run.id, owner="other-worker")
+
+        with pytest.raises(ValueError, match="another worker"):
+            EvaluationEngine(Mock(), Mock()).execute_evaluation_run(run)
+
+    def test_trigger_view_rejects_lab_leased_elsewhere(self, prompt_lab):
+        dataset = EvaluationDataset.objects.create(prompt_lab=prompt_lab, name="Cases")
+        claim_prompt_lab(prompt_lab.id, owner="other-worker")
+
+        response = APIClient().post(reverse('trigger-optimization-with-dataset'), {
+            'prompt_lab_id': str(prompt_lab.id), 'dataset_ids': [dataset.id]
+        }, format='json')
+
+        assert response.status_code == 409
+        assert response.json()['lease_owner'] == "other-worker"
+
+    def test_trigger_view_releases_lab_lease_when_setup_fails(self, prompt_lab, monkeypatch):
+        from app.services import run_leases
+        dataset = EvaluationDataset.objects.create(prompt_lab=prompt_lab, name="Cases")
+
+        def broken_claim(run_id, owner=None, ttl=None):
+            raise RuntimeError("lease table unavailable")
+
+        monkeypatch.setattr(run_leases, 'claim_optimization_run', broken_claim)
+        response = APIClient().post(reverse('trigger-optimization-with-dataset'), {
+            'prompt_lab_id': str(prompt_lab.id), 'dataset_ids': [dataset.id]
+        }, format='json')
+
+        assert response.status_code == 500
+        assert not WorkLease.objects.filter(resource=prompt_lab_resource(prompt_lab.id)).exists()
+
+    def test_trigger_view_fails_run_it_cannot_lease(self, prompt_lab, monkeypatch):
+        from app.services import run_leases
+        dataset = EvaluationDataset.objects.create(prompt_lab=prompt_lab, name="Cases")
+        monkeypatch.setattr(run_leases, 'claim_optimization_run', lambda run_id, owner=None, ttl=None: None)
+
+        response = APIClient().post(reverse('trigger-optimization-with-dataset'), {
+            'prompt_lab_id': str(prompt_lab.id), 'dataset_ids': [dataset.id]
+        }, format='json')
+
+        assert response.status_code == 409
+        run = OptimizationRun.objects.get(id=response.json()['run_id'])
+        assert run.status == 'failed' and 'holds the lease' in run.error_message
+        assert not WorkLease.objects.filter(resource=prompt_lab_resource(prompt_lab.id)).exists()
+
+    def test_cleanup_command_skips_runs_with_live_leases(self, prompt_lab):
+        long_ago = timezone.now() - timedelta(hours=2)
+        leased = OptimizationRun.objects.create(prompt_lab=prompt_lab, status='running', started_at=long_ago)
+        unleased = OptimizationRun.objects.create(prompt_lab=prompt_lab, status='running', started_at=long_ago)
+        claim_optimization_run(leased.id, owner="busy-worker")
+
+        call_command('cleanup_stuck_optimizations', stdout=StringIO())
+
+        assert OptimizationRun.objects.get(id=leased.id).status == 'running'
+        assert OptimizationRun.objects.get(id=unleased.id).status == 'failed'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_heartbeat_keeps_lease_alive():
+    lease = claim(evaluation_run_resource(1), owner="worker-a", ttl=timedelta(seconds=0.2))
+    beat = LeaseHeartbeat(lease, interval=0.05).start()
+    try:
+        time.sleep(0.4)
+        assert claim(evaluation_run_resource(1), owner="worker-b") is None
+    finally:
+        beat.stop()
+
+    assert not beat.lost
+    time.sleep(0.25)
+    assert claim(evaluation_run_resource(1), owner="worker-b") is not None
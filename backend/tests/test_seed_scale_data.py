@@ -0,0 +1,91 @@
+"""
+Tests for the scale data seeding command
+Checks row counts, determinism and clearing of seeded labs
+"""
+import pytest
+from io import StringIO
+from django.core.management import call_command
+
+from app.services.scale_data_seeder import ScaleDataSeeder, ScaleProfile
+from core.models import (
+    PromptLab, Email, Draft, DraftReason, UserFeedback, ReasonRating, EvaluationResult, OptimizationRun
+)
+
+SMALL = dict(
+    emails_per_lab=30, datasets_per_lab=1, cases_per_dataset=5, runs_per_dataset=2,
+    optimization_runs_per_lab=3, reason_pool_per_lab=10, chunk_size=7
+)
+
+
+@pytest.mark.django_db
+class TestScaleDataSeeder:
+
+    def test_seeds_consistent_history(self):
+        report = ScaleDataSeeder(ScaleProfile(labs=2, **SMALL)).seed()
+
+        lab = PromptLab.objects.get(id=report.prompt_lab_ids[0])
+        assert Email.objects.filter(prompt_lab=lab).count() == 30
+        assert Draft.objects.filter(email__prompt_lab=lab).count() == 60
+        assert lab.total_feedback_collected == UserFeedback.objects.filter(draft__email__prompt_lab=lab).count()
+        assert lab.prompts.filter(is_active=True).count() == 1
+        assert EvaluationResult.objects.filter(run__dataset__prompt_lab=lab).count() == 10
+        assert OptimizationRun.objects.filter(prompt_lab=lab).count() == 3
+        assert report.rows['emails'] == 60
+        assert report.total_rows == sum(report.rows.values())
+
+        # Ratings only reference reasons attached to the rated draft
+        rating = ReasonRating.objects.filter(feedback__draft__email__prompt_lab=lab).first()
+        assert rating.feedback.draft.reasons.filter(id=rating.reason_id).exists()
+
+    def test_same_seed_generates_same_content(self):
+        first = ScaleDataSeeder(ScaleProfile(labs=1, seed=7, **SMALL)).seed()
+        second = ScaleDataSeeder(ScaleProfile(labs=1, seed=7, **SMALL)).seed()
+
+        def snapshot(lab_id):
+            return list(
+                UserFeedback.objects.filter(draft__email__prompt_lab_id=lab_id)
+                .order_by('id').values_list('action', 'draft__email__subject')
+            )
+
+        assert first.rows == second.rows
+        assert snapshot(first.prompt_lab_ids[0]) == snapshot(second.prompt_lab_ids[0])
+
+    def test_total_rows_sizing(self):
+        profile = ScaleProfile.for_total_rows(1_000_000, labs=4)
+
+        assert abs(sum(profile.estimated_rows().values()) - 1_000_000) < 1_000
+
+    def test_clear_removes_only_seeded_labs(self):
+        other = PromptLab.objects.create(name="Real lab")
+        report = ScaleDataSeeder(ScaleProfile(labs=1, **SMALL)).seed()
+        reason_ids = list(
+            Draft.reasons.through.objects.filter(draft__email__prompt_lab_id=report.prompt_lab_ids[0])
+            .values_list('draftreason_id', flat=True)
+        )
+
+        assert ScaleDataSeeder.clear() == 1
+        assert PromptLab.objects.filter(id=other.id).exists()
+        assert not PromptLab.objects.filter(id=report.prompt_lab_ids[0]).exists()
+        assert not Draft.objects.filter(email__prompt_lab_id=report.prompt_lab_ids[0]).exists()
+        assert not DraftReason.objects.filter(id__in=reason_ids).exists()
+
+
+@pytest.mark.django_db
+def test_seed_scale_data_command():
+    out = StringIO()
+    call_command(
+        'seed_scale_data', '--emails-per-lab', '10', '--cases-per-dataset', '3',
+        '--optimization-runs-per-lab', '1', stdout=out
+    )
+
+    assert 'Created' in out.getvalue()
+    assert Email.objects.filter(prompt_lab__name="Scale Lab 1").count() == 10
+
+
+@pytest.mark.django_db
+def test_seed_scale_data_dry_run_creates_nothing():
+    out = StringIO()
+    call_command('seed_scale_data', '--total-rows', '10000000', '--labs', '10', '--dry-run', stdout=out)
+
+    assert 'Dry run' in out.getvalue()
+    assert not PromptLab.objects.filter(name__startswith="Scale Lab").exists()